@@ -0,0 +1,152 @@
+"""Background worker processes for queued agent runs.
+
+Usage:
+    python agent_worker.py [--processes N]
+
+Each process leases jobs from ``core.job_queue.agent_job_queue`` and runs them
+with ``main.run_agent_session``. Progress messages are written back to the
+queue, from where the web processes relay them to the user's websocket. While
+a job runs, a background task renews its lease every third of
+AGENT_JOB_LEASE_SECONDS, so long tool calls that log nothing do not lose it.
+Queue calls block on sqlite, so they run on the 'cpu' executor rather than
+the event loop the agent run shares. The
+AgentSession is checkpointed after every step, so a job re-leased after a
+worker crash resumes from the last completed step instead of starting over.
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+
+import cdp_browser
+from core.config import settings
+from core.executors import run_in_category
+from core.job_queue import JobQueue, LeaseLostError, agent_job_queue
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class AgentWorker:
+    """Leases agent run jobs and executes them one at a time."""
+
+    def __init__(self, queue: JobQueue = agent_job_queue, worker_id: str = None):
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = getattr(settings, 'AGENT_JOB_LEASE_SECONDS', 120)
+        self.poll_interval = getattr(settings, 'AGENT_WORKER_POLL_INTERVAL', 1.0)
+        self.stopping = False
+
+    async def keep_lease(self, job, progress):
+        """Renew the lease on ``job`` until cancelled; raises LeaseLostError once another worker owns it."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                renewed = await run_in_category('cpu', self.queue.heartbeat, job["id"], self.worker_id, self.lease_seconds, dict(progress))
+            except Exception as e:
+                logging.warning(f"Worker {self.worker_id}: failed to renew lease on job {job['id']}: {e}")
+                continue
+            if not renewed:
+                raise LeaseLostError(f"Lease on job {job['id']} was lost")
+
+    async def run_with_lease(self, job, progress, coro):
+        """Await ``coro`` while renewing the lease on ``job``.
+
+        If the lease is lost the run is cancelled, since another worker may already be
+        resuming it, and LeaseLostError is raised.
+        """
+        run = asyncio.ensure_future(coro)
+        lease = asyncio.ensure_future(self.keep_lease(job, progress))
+        try:
+            await asyncio.wait({run, lease}, return_when=asyncio.FIRST_COMPLETED)
+            if not run.done():
+                lease.result()
+            return run.result()
+        finally:
+            run.cancel()
+            lease.cancel()
+            await asyncio.gather(run, lease, return_exceptions=True)
+
+    async def process(self, job):
+        # Importing main pulls in the whole tool stack, so only do it in workers
+        import main
+        import schemas
+        from core.db import SessionLocal
+
+        run_id = job["run_id"]
+        user_id = job["user_id"]
+        payload = job.get("payload") or {}
+        # A retried job resumes from the session checkpoint instead of restarting the goal
+        user_input = payload.get("user_input") if job["attempts"] == 1 else None
+        progress = {"messages": 0}
+
+        async def send_log(message: str):
+            progress["messages"] += 1
+            await run_in_category('cpu', self.queue.publish_event, run_id, user_id, {"topic": "agent_updates", "payload": {"log": message, "run_id": run_id}})
+
+        db = SessionLocal()
+        try:
+            logging.info(f"Worker {self.worker_id} running job {job['id']} (run_id={run_id}, attempt={job['attempts']})")
+            agent_req = schemas.AgentStateRequest(run_id=run_id, user_input=user_input)
+            response = await self.run_with_lease(job, progress, main.run_agent_session(user_id, agent_req, db, send_log))
+            await run_in_category('cpu', self.queue.complete, job["id"], self.worker_id, status=response.status, result={"message": response.message, "final_result": response.final_result})
+            await run_in_category('cpu', self.queue.publish_event, run_id, user_id, {"topic": "agent_updates", "payload": {"status": "run_finished", "run_id": run_id, "data": {"status": response.status, "message": response.message}}})
+        except LeaseLostError as e:
+            logging.warning(f"Worker {self.worker_id}: {e}; abandoning run {run_id}")
+        except Exception as e:
+            status = await run_in_category('cpu', self.queue.fail, job["id"], self.worker_id, str(e))
+            logging.error(f"Worker {self.worker_id} failed job {job['id']} (now {status}): {e}", exc_info=True)
+        finally:
+            db.close()
+
+    async def run_forever(self):
+        logging.info(f"Agent worker {self.worker_id} started")
+        while not self.stopping:
+            job = await run_in_category('cpu', self.queue.lease, self.worker_id, self.lease_seconds)
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self.process(job)
+        await cdp_browser.shutdown()
+        logging.info(f"Agent worker {self.worker_id} stopped")
+
+    def stop(self, *args):
+        self.stopping = True
+
+
+def run_worker_process():
+    worker = AgentWorker()
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    asyncio.run(worker.run_forever())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run background agent workers")
+    parser.add_argument("--processes", type=int, default=getattr(settings, 'AGENT_WORKER_PROCESSES', 2))
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        run_worker_process()
+        return
+
+    processes = [multiprocessing.Process(target=run_worker_process, name=f"agent-worker-{i}") for i in range(args.processes)]
+    for process in processes:
+        process.start()
+
+    def terminate(*_):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, terminate)
+    signal.signal(signal.SIGINT, terminate)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark the single-pass lxml extraction against the BeautifulSoup baseline.
+
+Usage:
+    python bench_extraction.py saved_pages/            # every *.html / *.htm file in the directory
+    python bench_extraction.py page1.html page2.html --repeat 5
+    python bench_extraction.py --synthetic 20          # generated pages when no corpus is at hand
+
+Pages can be saved from a browser session with
+``open(path, "w").write(browsing.get_page_content(browser_id))``.
+For each page, the script prints the parse and extract time of both engines
+and whether their statistics agree. Totals and the speedup are printed at
+the end.
+"""
+
+import argparse
+import glob
+import os
+import random
+import statistics
+import time
+from typing import Callable, List, Tuple
+
+from page_extract import extract_page, extract_page_bs4
+
+
+def synthetic_page(seed: int, sections: int = 60) -> str:
+    """A content-heavy page with links, images, tables, forms, lists and scripts."""
+    rng = random.Random(seed)
+    words = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor".split()
+    parts = ["<!DOCTYPE html><html><head><title>Page %d</title>" % seed,
+             '<meta name="description" content="synthetic"><script type="application/ld+json">{"@type": "WebPage"}</script>',
+             "<style>body{margin:0}</style></head><body><nav>"]
+    parts += ['<a href="/nav/%d">Nav %d</a>' % (i, i) for i in range(40)]
+    parts.append("</nav>")
+    for s in range(sections):
+        parts.append("<section><h%d>Heading %d</h%d>" % (s % 3 + 1, s, s % 3 + 1))
+        for _ in range(4):
+            parts.append("<p>%s <a href='/a/%d'>more</a></p>" % (" ".join(rng.choice(words) for _ in range(40)), rng.randint(0, 9999)))
+        parts.append('<img src="/img/%d.png" alt="image %d">' % (s, s))
+        parts.append("<ul>%s</ul>" % "".join("<li>item %d</li>" % i for i in range(6)))
+        if s % 5 == 0:
+            rows = "".join("<tr>%s</tr>" % "".join("<td>%d</td>" % rng.randint(0, 999) for _ in range(6)) for _ in range(20))
+            parts.append("<table><tr>%s</tr>%s</table>" % ("".join("<th>col %d</th>" % c for c in range(6)), rows))
+        if s % 20 == 0:
+            parts.append('<form action="/f"><input name="q" required><select name="s"></select></form>')
+        parts.append("<script>window.track && track(%d);</script></section>" % s)
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def load_corpus(paths: List[str]) -> List[Tuple[str, str]]:
+    pages = []
+    for path in paths:
+        files = sorted(glob.glob(os.path.join(path, "*.htm*"))) if os.path.isdir(path) else [path]
+        for name in files:
+            with open(name, encoding="utf-8", errors="replace") as f:
+                pages.append((os.path.basename(name), f.read()))
+    return pages
+
+
+def best_of(func: Callable, html: str, repeat: int) -> Tuple[float, tuple]:
+    timings, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(html, "https://example.com/", "all")
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare lxml single-pass extraction with the BeautifulSoup baseline")
+    parser.add_argument("paths", nargs="*", help="HTML files or directories of saved pages")
+    parser.add_argument("--synthetic", type=int, default=0, help="Add N generated pages to the corpus")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per page; the best time is reported")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.paths) + [("synthetic_%d.html" % i, synthetic_page(i)) for i in range(args.synthetic)]
+    if not pages:
+        parser.error("no pages: pass saved HTML files/directories or --synthetic N")
+
+    totals = {"bs4": 0.0, "lxml": 0.0}
+    speedups = []
+    print(f"{'page':40} {'KB':>8} {'bs4 ms':>10} {'lxml ms':>10} {'speedup':>8}  stats")
+    for name, html in pages:
+        bs4_time, (_, bs4_stats) = best_of(extract_page_bs4, html, args.repeat)
+        lxml_time, (_, lxml_stats) = best_of(extract_page, html, args.repeat)
+        totals["bs4"] += bs4_time
+        totals["lxml"] += lxml_time
+        speedups.append(bs4_time / lxml_time if lxml_time else float("inf"))
+        # word_count differs by design (visible text only), so compare the element counts
+        same = all(bs4_stats[k] == lxml_stats[k] for k in bs4_stats if k != "word_count")
+        print(f"{name[:40]:40} {len(html) / 1024:8.1f} {bs4_time * 1000:10.1f} {lxml_time * 1000:10.1f} "
+              f"{speedups[-1]:7.1f}x  {'same' if same else 'DIFFERENT'}")
+
+    print(f"\n{len(pages)} pages: bs4 {totals['bs4'] * 1000:.0f} ms, lxml {totals['lxml'] * 1000:.0f} ms, "
+          f"total speedup {totals['bs4'] / totals['lxml']:.1f}x, median per page {statistics.median(speedups):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
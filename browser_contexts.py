@@ -0,0 +1,343 @@
+"""
+Multiplexing of logical browsers onto shared Chrome processes.
+
+Every ``browser_id`` used to be a whole Chrome process (150-300MB). With
+multiplexing enabled, a ``browser_id`` is an isolated browser context (its own
+cookies, storage and cache, like an incognito profile) with a single tab,
+created with ``Target.createBrowserContext`` inside one of a few shared Chrome
+processes.
+
+The tools keep using ``browsers[browser_id]`` as a WebDriver: ``TabDriver``
+forwards every call to the host driver after switching it to the right tab.
+A host's WebDriver session can only talk to one tab at a time, so calls on
+tabs that share a host are serialized by the host lock; what is gained is
+memory, not per-call parallelism.
+"""
+
+import json
+import logging
+import threading
+import urllib.request
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from core.config import settings
+
+try:
+    from selenium.webdriver.remote.webelement import WebElement
+except ImportError:  # pragma: no cover - selenium is a hard dependency of browsing.py
+    WebElement = ()
+
+
+class BrowserCDPSession:
+    """Minimal synchronous client for the browser-level DevTools websocket.
+
+    ``Target.createBrowserContext`` is only allowed on the browser target,
+    which chromedriver's ``execute_cdp_cmd`` (bound to the current page) does
+    not reach.
+    """
+
+    def __init__(self, ws_url: str, timeout: float = 30):
+        import websocket  # websocket-client, installed with selenium
+        self.ws = websocket.create_connection(ws_url, timeout=timeout, suppress_origin=True)
+        self.lock = threading.Lock()
+        self.next_id = 0
+
+    @classmethod
+    def for_driver(cls, driver) -> Optional["BrowserCDPSession"]:
+        try:
+            address = driver.capabilities.get("goog:chromeOptions", {}).get("debuggerAddress")
+            if not address:
+                return None
+            with urllib.request.urlopen(f"http://{address}/json/version", timeout=10) as response:
+                ws_url = json.loads(response.read().decode("utf-8"))["webSocketDebuggerUrl"]
+            return cls(ws_url)
+        except Exception as e:
+            logging.warning(f"Could not connect to browser DevTools endpoint, using page session: {e}")
+            return None
+
+    def send(self, method: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        with self.lock:
+            self.next_id += 1
+            message_id = self.next_id
+            self.ws.send(json.dumps({"id": message_id, "method": method, "params": params or {}}))
+            while True:
+                message = json.loads(self.ws.recv())
+                if message.get("id") != message_id:
+                    continue  # events and stale replies
+                if "error" in message:
+                    raise Exception(f"CDP {method} failed: {message['error'].get('message')}")
+                return message.get("result", {})
+
+    def close(self):
+        try:
+            self.ws.close()
+        except Exception:
+            pass
+
+
+class ContextHost:
+    """A shared Chrome process hosting several isolated browser contexts."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.lock = threading.RLock()
+        # The default tab stays open so Chrome keeps running when all contexts are closed
+        self.base_handle = driver.current_window_handle
+        self.current_handle = self.base_handle
+        self.contexts: Dict[str, str] = {}  # window handle -> browserContextId
+        # Log entries read by one tab that belong to another: window handle -> log type -> entries
+        self.pending_logs: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        self.cdp = BrowserCDPSession.for_driver(driver)
+
+    def _browser_command(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        if self.cdp is not None:
+            return self.cdp.send(method, params)
+        return self.driver.execute_cdp_cmd(method, params)
+
+    def activate(self, handle: str):
+        if self.current_handle != handle:
+            self.driver.switch_to.window(handle)
+            self.current_handle = handle
+
+    def create_context(self) -> str:
+        """Create an isolated context with one blank tab and return the tab's window handle."""
+        with self.lock:
+            known = set(self.driver.window_handles)
+            context_id = self._browser_command("Target.createBrowserContext", {"disposeOnDetach": False})["browserContextId"]
+            try:
+                target_id = self._browser_command("Target.createTarget", {"url": "about:blank", "browserContextId": context_id})["targetId"]
+                handles = self.driver.window_handles
+                if target_id in handles:
+                    handle = target_id
+                else:
+                    new_handles = [h for h in handles if h not in known]
+                    if not new_handles:
+                        raise Exception("New browser context tab is not visible to the driver")
+                    handle = new_handles[0]
+            except Exception:
+                self._browser_command("Target.disposeBrowserContext", {"browserContextId": context_id})
+                raise
+            self.contexts[handle] = context_id
+            return handle
+
+    def dispose_context(self, handle: str):
+        with self.lock:
+            context_id = self.contexts.pop(handle, None)
+            self.pending_logs.pop(handle, None)
+            if context_id is None:
+                return
+            try:
+                self._browser_command("Target.disposeBrowserContext", {"browserContextId": context_id})
+            except Exception as e:
+                logging.warning(f"Failed to dispose browser context {context_id}: {e}")
+            try:
+                self.driver.switch_to.window(self.base_handle)
+                self.current_handle = self.base_handle
+            except Exception:
+                self.current_handle = None
+
+    def close(self):
+        if self.cdp is not None:
+            self.cdp.close()
+
+
+def _log_webview(entry: Dict[str, Any]) -> Optional[str]:
+    try:
+        return json.loads(entry["message"]).get("webview")
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
+
+
+def _unwrap(value: Any) -> Any:
+    if isinstance(value, TabElement):
+        return value._element
+    if isinstance(value, (list, tuple)):
+        return type(value)(_unwrap(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _unwrap(v) for k, v in value.items()}
+    return value
+
+
+class _TabBound:
+    """Forwards attribute access to a wrapped object while its tab is active."""
+
+    def _target(self):
+        raise NotImplementedError
+
+    def _wrap(self, value: Any) -> Any:
+        # execute_script returns elements nested in lists and dicts; all of them must switch tabs
+        if isinstance(value, WebElement):
+            return TabElement(self._tab, value)
+        if isinstance(value, list):
+            return [self._wrap(v) for v in value]
+        if isinstance(value, dict):
+            return {k: self._wrap(v) for k, v in value.items()}
+        return value
+
+    def __getattr__(self, name: str) -> Any:
+        host = self._tab._host
+        with host.lock:
+            host.activate(self._tab._handle)
+            value = getattr(self._target(), name)
+        if not callable(value):
+            return self._wrap(value)
+
+        def call(*args, **kwargs):
+            with host.lock:
+                host.activate(self._tab._handle)
+                args = tuple(_unwrap(a) for a in args)
+                kwargs = {k: _unwrap(v) for k, v in kwargs.items()}
+                return self._wrap(value(*args, **kwargs))
+        return call
+
+
+class TabDriver(_TabBound):
+    """WebDriver stand-in bound to one tab/context of a shared host."""
+
+    def __init__(self, host: ContextHost, handle: str, manager: "BrowserContextManager"):
+        self._host = host
+        self._handle = handle
+        self._manager = manager
+        self._tab = self
+
+    def _target(self):
+        return self._host.driver
+
+    @property
+    def window_handles(self) -> List[str]:
+        return [self._handle]
+
+    def get_log(self, log_type: str) -> List[Dict[str, Any]]:
+        # chromedriver keeps one log for all tabs: hold other tabs' entries until they read it
+        host = self._host
+        with host.lock:
+            entries = host.pending_logs.get(self._handle, {}).pop(log_type, [])
+            for entry in host.driver.get_log(log_type):
+                webview = _log_webview(entry)
+                if webview in (None, self._handle):
+                    entries.append(entry)
+                elif webview in host.contexts:
+                    host.pending_logs.setdefault(webview, {}).setdefault(log_type, []).append(entry)
+        return entries
+
+    @property
+    def context_id(self) -> Optional[str]:
+        return self._host.contexts.get(self._handle)
+
+    def quit(self):
+        """Close this context only; the shared Chrome process keeps running."""
+        self._manager.close_context(self)
+
+    def close(self):
+        self.quit()
+
+
+class TabElement(_TabBound):
+    """WebElement wrapper that re-activates its tab before every call."""
+
+    def __init__(self, tab: TabDriver, element):
+        self._tab = tab
+        self._element = element
+
+    def _target(self):
+        return self._element
+
+
+class BrowserContextManager:
+    """Places logical browsers into contexts of a few shared Chrome processes."""
+
+    def __init__(self, acquire_driver: Callable[[], Any], release_driver: Callable[[Any], None],
+                 contexts_per_process: Optional[int] = None, enabled: Optional[bool] = None):
+        self.acquire_driver = acquire_driver
+        self.release_driver = release_driver
+        self.contexts_per_process = max(1, int(contexts_per_process or getattr(settings, "BROWSER_CONTEXTS_PER_PROCESS", 8)))
+        self.enabled = enabled if enabled is not None else getattr(settings, "BROWSER_MULTIPLEX_CONTEXTS", False)
+        self.lock = threading.Lock()
+        self.hosts: List[ContextHost] = []
+        self.stats = {"contexts_opened": 0, "contexts_closed": 0, "hosts_launched": 0, "hosts_released": 0}
+
+    def _reserve_slot(self, host: Optional[ContextHost] = None):
+        """Reserve a context slot on ``host`` or the least loaded host with room (caller holds ``self.lock``)."""
+        if host is None:
+            candidates = [h for h in self.hosts if len(h.contexts) < self.contexts_per_process]
+            if not candidates:
+                return None, None
+            host = min(candidates, key=lambda h: len(h.contexts))
+        reservation = f"pending-{uuid.uuid4()}"
+        host.contexts[reservation] = ""
+        return host, reservation
+
+    def _launch_host(self) -> ContextHost:
+        driver = self.acquire_driver()
+        try:
+            return ContextHost(driver)
+        except Exception:
+            self.release_driver(driver)
+            raise
+
+    def _discard_host(self, host: ContextHost):
+        host.close()
+        self.release_driver(host.driver)
+
+    def open_context(self) -> TabDriver:
+        """Open a new isolated context, starting a new host process if all are full."""
+        with self.lock:
+            host, reservation = self._reserve_slot()
+        if host is None:
+            # Chrome takes seconds to start; launch it without blocking other callers
+            launched = self._launch_host()
+            with self.lock:
+                host, reservation = self._reserve_slot()
+                if host is None:
+                    self.hosts.append(launched)
+                    self.stats["hosts_launched"] += 1
+                    host, reservation = self._reserve_slot(launched)
+            if host is not launched:
+                # Another caller freed or added a slot while this host was starting
+                self._discard_host(launched)
+        try:
+            handle = host.create_context()
+        except Exception:
+            with host.lock:
+                host.contexts.pop(reservation, None)
+            self._release_if_idle(host)
+            raise
+        with host.lock:
+            host.contexts.pop(reservation, None)
+        with self.lock:
+            self.stats["contexts_opened"] += 1
+        return TabDriver(host, handle, self)
+
+    def _release_if_idle(self, host: ContextHost):
+        with self.lock:
+            if host.contexts or host not in self.hosts:
+                return
+            self.hosts.remove(host)
+            self.stats["hosts_released"] += 1
+        self._discard_host(host)
+
+    def close_context(self, tab: TabDriver):
+        tab._host.dispose_context(tab._handle)
+        with self.lock:
+            self.stats["contexts_closed"] += 1
+        self._release_if_idle(tab._host)
+
+    def shutdown(self):
+        with self.lock:
+            hosts, self.hosts = self.hosts, []
+        for host in hosts:
+            for handle in list(host.contexts):
+                host.dispose_context(handle)
+            self._discard_host(host)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "enabled": self.enabled,
+                "contexts_per_process": self.contexts_per_process,
+                "hosts": len(self.hosts),
+                "contexts": sum(len(h.contexts) for h in self.hosts),
+                "contexts_by_host": [len(h.contexts) for h in self.hosts],
+                **self.stats,
+            }
@@ -0,0 +1,306 @@
+"""
+Out-of-process browser service shared by all web and worker processes.
+
+Usage:
+    BROWSER_SERVICE_SOCKET=/run/agent/browsers.sock python browser_service.py
+
+Under ``gunicorn -w 4`` every worker used to have its own ``browsers`` dict,
+so a ``browser_id`` created by one worker was "not found" in the next. With
+``BROWSER_SERVICE_SOCKET`` set, a single service process owns all drivers, the
+warm pool, context multiplexing and session lifecycle. The browser functions
+in ``browsing.py`` that are marked with ``@service_method`` turn into thin RPC
+clients. The protocol is one JSON request line and one JSON response line
+per connection over a Unix socket.
+
+Code that uses ``browsers[browser_id]`` directly gets an ``AttachedDriver``.
+This is a regular Selenium WebDriver attached to the service's chromedriver
+session, so WebDriver calls go straight to chromedriver and not through the
+RPC. With ``BROWSER_MULTIPLEX_CONTEXTS`` enabled, such direct access switches
+the shared host to the right tab but is not serialized against other processes.
+"""
+
+import argparse
+import functools
+import inspect
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import threading
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Optional
+
+from core.config import settings
+from browser_sessions import BrowserQuotaExceeded, get_browser_owner, set_browser_owner
+
+DEFAULT_SOCKET_PATH = "/tmp/agent-browser-service.sock"
+
+# Local implementations callable over RPC, keyed by method name
+SERVICE_METHODS: Dict[str, Callable] = {}
+
+_is_server = False
+
+
+class BrowserServiceError(Exception):
+    """Raised by the client when the service is unreachable or returns a malformed response."""
+    pass
+
+
+def client_enabled() -> bool:
+    """True when this process should delegate browser work to the service."""
+    return bool(getattr(settings, "BROWSER_SERVICE_SOCKET", "")) and not _is_server
+
+
+def service_method(func: Callable) -> Callable:
+    """Run ``func`` in the browser service when this process is a client of one."""
+    signature = inspect.signature(func)
+    SERVICE_METHODS[func.__name__] = func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not client_enabled():
+            return func(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        return get_client().call(func.__name__, **bound.arguments)
+
+    wrapper.local = func
+    return wrapper
+
+
+class BrowserServiceClient:
+    """Calls methods of the browser service over its Unix socket."""
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        self.socket_path = socket_path
+        self.timeout = float(timeout if timeout is not None else getattr(settings, "BROWSER_SERVICE_TIMEOUT", 300))
+
+    def call(self, method: str, **params) -> Any:
+        request = {"method": method, "params": params, "owner": list(get_browser_owner())}
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.socket_path)
+                sock.sendall(json.dumps(request, default=str).encode("utf-8") + b"\n")
+                with sock.makefile("rb") as reader:
+                    line = reader.readline()
+        except OSError as e:
+            raise BrowserServiceError(f"Browser service unavailable at {self.socket_path}: {e}")
+        if not line:
+            raise BrowserServiceError(f"Browser service closed the connection during '{method}'")
+        response = json.loads(line)
+        if "error" in response:
+            if response.get("type") == "BrowserQuotaExceeded":
+                raise BrowserQuotaExceeded(response["error"])
+            if response.get("type") == "KeyError":
+                raise KeyError(response["error"])
+            raise Exception(response["error"])
+        return response.get("result")
+
+
+_client: Optional[BrowserServiceClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> BrowserServiceClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = BrowserServiceClient(getattr(settings, "BROWSER_SERVICE_SOCKET", "") or DEFAULT_SOCKET_PATH)
+    return _client
+
+
+def _executor_url(driver) -> str:
+    """URL of the chromedriver HTTP server behind ``driver``."""
+    service = getattr(driver, "service", None)
+    if service is not None and getattr(service, "service_url", None):
+        return service.service_url
+    executor = driver.command_executor
+    config = getattr(executor, "_client_config", None)
+    return config.remote_server_addr if config is not None else executor._url
+
+
+def _attach_info(browser_id: str) -> Dict[str, Any]:
+    import browsing
+
+    if browser_id not in browsing.browsers:
+        raise KeyError(browser_id)
+    driver = browsing.browsers[browser_id]  # counts as activity for the session manager
+    handle = None
+    if isinstance(driver, browsing.TabDriver):
+        handle = driver._handle
+        driver = driver._host.driver
+    return {"executor_url": _executor_url(driver), "session_id": driver.session_id,
+            "capabilities": driver.capabilities, "window_handle": handle}
+
+
+def _has_browser(browser_id: str) -> bool:
+    import browsing
+    return browser_id in browsing.browsers
+
+
+def _list_browsers() -> list:
+    import browsing
+    return list(browsing.browsers.keys())
+
+
+SERVICE_METHODS.update({
+    "attach_browser": _attach_info,
+    "has_browser": _has_browser,
+    "list_browsers": _list_browsers,
+})
+
+
+try:
+    from selenium import webdriver
+    from selenium.webdriver.chromium.remote_connection import ChromiumRemoteConnection
+    from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
+
+    class AttachedDriver(RemoteWebDriver):
+        """WebDriver attached to an existing chromedriver session owned by the service."""
+
+        def __init__(self, browser_id: str, executor_url: str, session_id: str, capabilities: Dict[str, Any]):
+            self._browser_id = browser_id
+            self._attach_to = (session_id, capabilities)
+            connection = ChromiumRemoteConnection(remote_server_addr=executor_url, vendor_prefix="goog", browser_name="chrome")
+            super().__init__(command_executor=connection, options=webdriver.ChromeOptions())
+
+        def start_session(self, capabilities, *args, **kwargs):
+            # Reuse the service's session instead of creating a new one
+            self.session_id, self.caps = self._attach_to
+
+        def execute_cdp_cmd(self, cmd: str, cmd_args: dict):
+            return self.execute("executeCdpCommand", {"cmd": cmd, "params": cmd_args})["value"]
+
+        def quit(self):
+            """Return the browser to the service instead of ending its session."""
+            get_client().call("close_browser", browser_id=self._browser_id)
+
+        def close(self):
+            self.quit()
+except ImportError:  # pragma: no cover - selenium is a hard dependency of browsing.py
+    AttachedDriver = None
+
+
+class RemoteBrowsers(Mapping):
+    """Client-side view of the service's ``browsers`` dict."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.attached: Dict[str, Any] = {}
+        self.manager = None  # browsing assigns its session manager; unused on the client
+
+    def __getitem__(self, browser_id: str):
+        info = get_client().call("attach_browser", browser_id=browser_id)
+        with self.lock:
+            driver = self.attached.get(browser_id)
+            if driver is None or driver.session_id != info["session_id"]:
+                driver = AttachedDriver(browser_id, info["executor_url"], info["session_id"], info["capabilities"])
+                self.attached[browser_id] = driver
+        if info.get("window_handle"):
+            driver.switch_to.window(info["window_handle"])
+        return driver
+
+    def __contains__(self, browser_id) -> bool:
+        return bool(get_client().call("has_browser", browser_id=browser_id))
+
+    def __iter__(self):
+        return iter(get_client().call("list_browsers"))
+
+    def __len__(self) -> int:
+        return len(get_client().call("list_browsers"))
+
+    def get(self, browser_id, default=None):
+        try:
+            return self[browser_id]
+        except KeyError:
+            return default
+
+    def pop(self, browser_id, *default):
+        with self.lock:
+            self.attached.pop(browser_id, None)
+        get_client().call("close_browser", browser_id=browser_id)
+        return default[0] if default else None
+
+    def __setitem__(self, browser_id, driver):
+        raise TypeError("Browsers are owned by the browser service; open them with open_browser()")
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+            method = SERVICE_METHODS.get(request.get("method"))
+            if method is None:
+                raise ValueError(f"Unknown browser service method '{request.get('method')}'")
+            set_browser_owner(*(request.get("owner") or (None, None)))
+            response = {"result": method(**(request.get("params") or {}))}
+        except Exception as e:
+            message = e.args[0] if isinstance(e, KeyError) and e.args else str(e)
+            response = {"error": message, "type": type(e).__name__}
+        self.wfile.write(json.dumps(response, default=str).encode("utf-8") + b"\n")
+
+
+class BrowserServiceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str):
+        if os.path.exists(socket_path):
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                    probe.connect(socket_path)
+                raise RuntimeError(f"A browser service is already listening on {socket_path}")
+            except ConnectionRefusedError:
+                os.unlink(socket_path)  # stale socket from a previous run
+        super().__init__(socket_path, _RequestHandler)
+        os.chmod(socket_path, 0o600)
+        self.socket_path = socket_path
+
+
+def serve(socket_path: Optional[str] = None):
+    """Run the browser service until SIGTERM/SIGINT."""
+    global _is_server
+    _is_server = True
+    import browsing
+
+    socket_path = socket_path or getattr(settings, "BROWSER_SERVICE_SOCKET", "") or DEFAULT_SOCKET_PATH
+    server = BrowserServiceServer(socket_path)
+
+    def stop(*_):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    if getattr(settings, "BROWSER_POOL_WARM_ON_STARTUP", False):
+        browsing.browser_pool.warm()
+    logging.info(f"Browser service listening on {socket_path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        browsing.cleanup_all_browsers()
+        browsing.session_manager.stop()
+        browsing.context_manager.shutdown()
+        browsing.browser_pool.shutdown()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        logging.info("Browser service stopped")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Run the shared browser service")
+    parser.add_argument("--socket", default=None, help="Unix socket path (defaults to BROWSER_SERVICE_SOCKET)")
+    args = parser.parse_args()
+    # Run from the importable module so browsing.py sees the server flag, not __main__'s copy
+    import browser_service
+    browser_service.serve(args.socket)
+
+
+if __name__ == "__main__":
+    main()
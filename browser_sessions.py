@@ -0,0 +1,329 @@
+"""
+Lifecycle management for open browser sessions.
+
+Entries in ``browsing.browsers`` used to live until someone called
+``close_browser``, so agent runs that errored out or hit their loop limit
+leaked Chrome processes. ``BrowserSessionManager`` tracks for every
+``browser_id`` its owner (user and agent run), its last activity and its
+memory use, and
+
+- reaps sessions that have been idle for longer than ``BROWSER_IDLE_TTL``;
+- caps open sessions per user (``BROWSER_MAX_PER_USER``) and in total
+  (``BROWSER_MAX_SESSIONS``). ``open_browser`` waits in a queue for a free
+  slot for up to ``BROWSER_QUEUE_TIMEOUT`` seconds. Async callers wait with
+  ``slot_reserved_ahead`` on the event loop instead, so waiting opens do not
+  hold the ``browser`` executor threads the closes that free slots run on.
+
+The owner is taken from a context variable that the agent loop and plan
+executor set with ``set_browser_owner``. It propagates into executor threads.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.config import settings
+
+_browser_owner: contextvars.ContextVar = contextvars.ContextVar("browser_owner", default=(None, None))
+# A slot reserved by ``slot_reserved_ahead`` for the next ``reserve_slot`` in this context
+_reserved_ahead: contextvars.ContextVar = contextvars.ContextVar("browser_slot_reserved_ahead", default=None)
+
+
+def _take(reserved: Optional[list]) -> bool:
+    """Claim a reservation made ahead; the executor thread and the async caller may race for it."""
+    try:
+        return bool(reserved) and reserved.pop()
+    except IndexError:
+        return False
+
+
+def set_browser_owner(user_id: Optional[int] = None, run_id: Optional[str] = None):
+    """Attribute browsers opened from the current context to ``user_id``/``run_id``."""
+    return _browser_owner.set((user_id, run_id))
+
+
+def get_browser_owner() -> Tuple[Optional[int], Optional[str]]:
+    return _browser_owner.get()
+
+
+class BrowserQuotaExceeded(Exception):
+    """Raised when no browser slot became free within the queue timeout."""
+    pass
+
+
+@dataclass
+class BrowserSession:
+    """Bookkeeping for one open browser."""
+    browser_id: str
+    user_id: Optional[int]
+    run_id: Optional[str]
+    created_at: float
+    last_activity: float
+    rss_mb: Optional[float] = None
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        return {
+            "browser_id": self.browser_id,
+            "user_id": self.user_id,
+            "run_id": self.run_id,
+            "age_seconds": round(now - self.created_at, 1),
+            "idle_seconds": round(now - self.last_activity, 1),
+            "rss_mb": round(self.rss_mb, 1) if self.rss_mb is not None else None,
+        }
+
+
+class BrowserSessionManager:
+    """Tracks, limits and reaps open browser sessions."""
+
+    def __init__(self, close_browser: Callable[[str], Any], rss_of: Optional[Callable[[str], Optional[float]]] = None,
+                 idle_ttl: Optional[float] = None, max_sessions: Optional[int] = None,
+                 max_per_user: Optional[int] = None, queue_timeout: Optional[float] = None,
+                 reap_interval: Optional[float] = None):
+        self.close_browser = close_browser
+        self.rss_of = rss_of
+        self.idle_ttl = float(idle_ttl if idle_ttl is not None else getattr(settings, "BROWSER_IDLE_TTL", 600))
+        self.max_sessions = int(max_sessions if max_sessions is not None else getattr(settings, "BROWSER_MAX_SESSIONS", 10))
+        self.max_per_user = int(max_per_user if max_per_user is not None else getattr(settings, "BROWSER_MAX_PER_USER", 3))
+        self.queue_timeout = float(queue_timeout if queue_timeout is not None else getattr(settings, "BROWSER_QUEUE_TIMEOUT", 60))
+        self.reap_interval = float(reap_interval if reap_interval is not None else getattr(settings, "BROWSER_REAP_INTERVAL", 30))
+        self.condition = threading.Condition()
+        self.sessions: Dict[str, BrowserSession] = {}
+        self.pending: Dict[Optional[int], int] = {}  # slots reserved by opens in progress, per user
+        self.waiting = 0
+        self.stats = {"opened": 0, "closed": 0, "reaped": 0, "queued": 0, "rejected": 0}
+        self._reaper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _count(self, user_id: Optional[int]) -> Tuple[int, int]:
+        total = len(self.sessions) + sum(self.pending.values())
+        per_user = sum(1 for s in self.sessions.values() if s.user_id == user_id) + self.pending.get(user_id, 0)
+        return total, per_user
+
+    def _has_slot(self, user_id: Optional[int]) -> bool:
+        total, per_user = self._count(user_id)
+        if self.max_sessions > 0 and total >= self.max_sessions:
+            return False
+        # Anonymous browsers (no owner) only count against the global cap
+        return user_id is None or self.max_per_user <= 0 or per_user < self.max_per_user
+
+    def _rejected(self, timeout: float) -> BrowserQuotaExceeded:
+        self.stats["rejected"] += 1
+        return BrowserQuotaExceeded(
+            f"No browser slot available within {timeout:.0f}s "
+            f"(limits: {self.max_per_user} per user, {self.max_sessions} total)"
+        )
+
+    def reserve_slot(self, timeout: Optional[float] = None):
+        """Reserve a session slot for the current owner, waiting in line if the caps are reached."""
+        if _take(_reserved_ahead.get()):
+            return  # the async caller already waited for this slot
+        user_id, _ = get_browser_owner()
+        timeout = self.queue_timeout if timeout is None else timeout
+        with self.condition:
+            if not self._has_slot(user_id):
+                self.stats["queued"] += 1
+                self.waiting += 1
+                try:
+                    if not self.condition.wait_for(lambda: self._has_slot(user_id), timeout=timeout):
+                        raise self._rejected(timeout)
+                finally:
+                    self.waiting -= 1
+            self.pending[user_id] = self.pending.get(user_id, 0) + 1
+
+    async def reserve_slot_async(self, timeout: Optional[float] = None, poll_interval: float = 0.1):
+        """``reserve_slot`` for coroutines: waits on the event loop instead of blocking a thread."""
+        user_id, _ = get_browser_owner()
+        timeout = self.queue_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            if self._has_slot(user_id):
+                self.pending[user_id] = self.pending.get(user_id, 0) + 1
+                return
+            self.stats["queued"] += 1
+            self.waiting += 1
+        try:
+            while True:
+                await asyncio.sleep(poll_interval)
+                with self.condition:
+                    if self._has_slot(user_id):
+                        self.pending[user_id] = self.pending.get(user_id, 0) + 1
+                        return
+                    if time.monotonic() >= deadline:
+                        raise self._rejected(timeout)
+        finally:
+            with self.condition:
+                self.waiting -= 1
+
+    @contextlib.asynccontextmanager
+    async def slot_reserved_ahead(self, timeout: Optional[float] = None):
+        """Wait for a slot on the event loop for a blocking open made inside the block.
+
+        The ``reserve_slot`` of that open (run in an executor thread, which inherits this
+        context) uses the reservation instead of waiting; an unused one is released on exit.
+        """
+        await self.reserve_slot_async(timeout)
+        reserved = [True]
+        token = _reserved_ahead.set(reserved)
+        try:
+            yield
+        finally:
+            _reserved_ahead.reset(token)
+            # Unused, e.g. the caller timed out before its executor thread got to the open
+            if _take(reserved):
+                self.release_slot()
+
+    def release_slot(self):
+        """Give back a slot reserved by ``reserve_slot`` when the open failed."""
+        user_id, _ = get_browser_owner()
+        with self.condition:
+            self._drop_pending(user_id)
+            self.condition.notify_all()
+
+    def _drop_pending(self, user_id: Optional[int]):
+        if self.pending.get(user_id, 0) > 0:
+            self.pending[user_id] -= 1
+            if not self.pending[user_id]:
+                del self.pending[user_id]
+
+    def register(self, browser_id: str):
+        """Start tracking ``browser_id`` for the current owner, consuming its reserved slot."""
+        user_id, run_id = get_browser_owner()
+        now = time.time()
+        with self.condition:
+            self._drop_pending(user_id)
+            self.sessions[browser_id] = BrowserSession(browser_id, user_id, run_id, now, now)
+            self.stats["opened"] += 1
+        self._ensure_reaper()
+
+    def touch(self, browser_id: str):
+        session = self.sessions.get(browser_id)
+        if session is not None:
+            session.last_activity = time.time()
+
+    def unregister(self, browser_id: str):
+        with self.condition:
+            if self.sessions.pop(browser_id, None) is not None:
+                self.stats["closed"] += 1
+                self.condition.notify_all()
+
+    def _close(self, browser_id: str, reason: str):
+        logging.info(f"Closing browser {browser_id}: {reason}")
+        try:
+            self.close_browser(browser_id)
+        except Exception as e:
+            logging.warning(f"Failed to close browser {browser_id}: {e}")
+        self.unregister(browser_id)
+
+    def run_sessions(self, run_id: str) -> List[str]:
+        """Ids of the browsers opened by agent run ``run_id``."""
+        with self.condition:
+            return [s.browser_id for s in self.sessions.values() if run_id and s.run_id == run_id]
+
+    def close_run_sessions(self, run_id: str) -> int:
+        """Close every browser opened by agent run ``run_id``."""
+        browser_ids = self.run_sessions(run_id)
+        for browser_id in browser_ids:
+            self._close(browser_id, f"run {run_id} ended")
+        return len(browser_ids)
+
+    def reap_idle(self) -> List[str]:
+        """Close sessions idle for longer than the TTL and refresh memory readings."""
+        now = time.time()
+        with self.condition:
+            sessions = list(self.sessions.values())
+        reaped = []
+        for session in sessions:
+            if self.idle_ttl > 0 and now - session.last_activity > self.idle_ttl:
+                self._close(session.browser_id, f"idle for {now - session.last_activity:.0f}s")
+                reaped.append(session.browser_id)
+            elif self.rss_of is not None:
+                session.rss_mb = self.rss_of(session.browser_id)
+        if reaped:
+            with self.condition:
+                self.stats["reaped"] += len(reaped)
+        return reaped
+
+    def _ensure_reaper(self):
+        if self._reaper is not None and self._reaper.is_alive():
+            return
+        with self.condition:
+            if self._reaper is not None and self._reaper.is_alive():
+                return
+            self._stop.clear()
+            self._reaper = threading.Thread(target=self._reap_loop, name="browser-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        while not self._stop.wait(self.reap_interval):
+            try:
+                self.reap_idle()
+            except Exception as e:
+                logging.warning(f"Browser reaper error: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self.condition:
+            sessions = [s.to_dict(now) for s in self.sessions.values()]
+            per_user: Dict[str, int] = {}
+            for session in self.sessions.values():
+                key = str(session.user_id) if session.user_id is not None else "anonymous"
+                per_user[key] = per_user.get(key, 0) + 1
+            return {
+                "idle_ttl_seconds": self.idle_ttl,
+                "max_sessions": self.max_sessions,
+                "max_per_user": self.max_per_user,
+                "open": len(self.sessions),
+                "pending": sum(self.pending.values()),
+                "waiting": self.waiting,
+                "per_user": per_user,
+                "sessions": sessions,
+                **self.stats,
+            }
+
+
+class BrowserRegistry(dict):
+    """``browser_id -> driver`` dict that keeps a session manager informed.
+
+    Storing a driver registers the session, reading it counts as activity and
+    removing it ends the session, so every existing ``browsers[...]`` access
+    is tracked without changes at the call sites.
+    """
+
+    def __init__(self, manager: Optional[BrowserSessionManager] = None):
+        super().__init__()
+        self.manager = manager
+
+    def __setitem__(self, browser_id, driver):
+        super().__setitem__(browser_id, driver)
+        if self.manager is not None:
+            self.manager.register(browser_id)
+
+    def __getitem__(self, browser_id):
+        driver = super().__getitem__(browser_id)
+        if self.manager is not None:
+            self.manager.touch(browser_id)
+        return driver
+
+    def get(self, browser_id, default=None):
+        if browser_id in self:
+            return self[browser_id]
+        return default
+
+    def pop(self, browser_id, *default):
+        driver = super().pop(browser_id, *default)
+        if self.manager is not None:
+            self.manager.unregister(browser_id)
+        return driver
+
+    def __delitem__(self, browser_id):
+        super().__delitem__(browser_id)
+        if self.manager is not None:
+            self.manager.unregister(browser_id)
@@ -1,4 +1,4 @@
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional, Set
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webdriver import WebDriver
@@ -6,23 +6,73 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.keys import Keys
-import requests
+import logging
 import os
+import threading
 import time
+from contextlib import contextmanager
+from dataclasses import dataclass
 from bs4 import BeautifulSoup
+import itertools
 import json
 import re
 from datetime import datetime
+from urllib.parse import urlparse
 from core.config import settings
-
-browsers: Dict[str, WebDriver] = {}
+from core.http_cache import http_session
+from browser_contexts import BrowserContextManager, TabDriver
+import cdp_browser
+from browser_sessions import BrowserRegistry, BrowserSessionManager, get_browser_owner
+from browser_service import RemoteBrowsers, client_enabled, service_method
+from network_profiles import apply_profile, drain_performance_log, get_profile, network_stats, page_stats_from_events
+from dom_snapshot import first_present_selector, resolve_selectors
+from page_content import SELENIUM_PAGE_CONTENT_JS, format_page_content, resolve_max_chars, resolve_mode
+from session_snapshots import capture_snapshot, delete_snapshot, load_snapshot, restore_cookies, restore_local_storage, save_snapshot
+
+# With BROWSER_SERVICE_SOCKET set, drivers live in the browser service process
+browsers: Dict[str, WebDriver] = RemoteBrowsers() if client_enabled() else BrowserRegistry()
+_browser_counter = itertools.count()
 
 # Browser profiles for persistent sessions
 browser_profiles: Dict[str, Dict] = {}
 
-# Service login states
+# Service login states, keyed by "{profile or browser_id}:{service}" (see _login_state_key)
 service_login_states: Dict[str, Dict] = {}
 
+SERVICE_URLS = {
+    "gmail": "https://mail.google.com",
+    "skype": "https://web.skype.com",
+    "outlook": "https://outlook.live.com",
+    "slack": "https://app.slack.com",
+    "discord": "https://discord.com/app",
+    "whatsapp": "https://web.whatsapp.com",
+    "telegram": "https://web.telegram.org",
+    "facebook": "https://www.facebook.com",
+    "twitter": "https://twitter.com",
+    "linkedin": "https://www.linkedin.com",
+    "zoom": "https://zoom.us",
+    "teams": "https://teams.microsoft.com",
+    "meet": "https://meet.google.com"
+}
+
+LOGIN_INDICATORS = {
+    "gmail": {
+        "login_hosts": ["accounts.google.com"],
+        "logged_in_selectors": ["[data-testid='inbox']", ".gb_ua", "[role='banner']"],
+        "logout_selectors": ["[aria-label*='Google Account']"]
+    },
+    "skype": {
+        "login_hosts": ["login.live.com", "login.microsoftonline.com"],
+        "logged_in_selectors": ["[data-text-as-pseudo-element='Skype']", ".swxFrame"],
+        "logout_selectors": [".logout", "[data-text-as-pseudo-element='Sign out']"]
+    },
+    "outlook": {
+        "login_hosts": ["login.live.com", "login.microsoftonline.com"],
+        "logged_in_selectors": ["[role='main']", ".ms-Nav", "#main"],
+        "logout_selectors": ["[aria-label*='Sign out']"]
+    }
+}
+
 
 def search_web(query: str, engine: str = 'duckduckgo') -> str:
     """Searches the web for the given query using DuckDuckGo Instant Answer API or headless browser scraping.
@@ -102,7 +152,7 @@ def search_web(query: str, engine: str = 'duckduckgo') -> str:
                     try:
                         duckduckgo_url = f"https://api.duckduckgo.com/?q={query}&format=json&pretty=1"
                         headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36"}
-                        response = requests.get(duckduckgo_url, timeout=10, headers=headers)
+                        response = http_session().get(duckduckgo_url, timeout=10, headers=headers)
                         response.raise_for_status()
                         data = response.json()
                         
@@ -155,15 +205,472 @@ def search_web(query: str, engine: str = 'duckduckgo') -> str:
     return f"All search attempts failed. Details:\n{error_summary}\n\nPlease try again later or with a different query."
 
 
-def open_browser(url: str, max_retries: int = None, retry_delay: float = None) -> str:
+def _build_chrome_options() -> webdriver.ChromeOptions:
+    """Chrome options shared by all headless (pooled) browsers."""
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--log-level=3")
+    # Comprehensive GPU and WebGL disabling
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-gpu-sandbox")
+    # NOTE: Do NOT disable software rasterizer; we want SwiftShader for headless stability
+    # options.add_argument("--disable-software-rasterizer")
+    options.add_argument("--disable-gpu-rasterization")
+    options.add_argument("--disable-gpu-memory-buffer-compositor-resources")
+    options.add_argument("--disable-gpu-memory-buffer-video-frames")
+    options.add_argument("--disable-accelerated-2d-canvas")
+    options.add_argument("--disable-accelerated-jpeg-decoding")
+    options.add_argument("--disable-accelerated-mjpeg-decode")
+    options.add_argument("--disable-accelerated-video-decode")
+    options.add_argument("--disable-accelerated-video-encode")
+    options.add_argument("--disable-webgl")
+    options.add_argument("--disable-webgl2")
+    options.add_argument("--disable-3d-apis")
+    options.add_argument("--disable-webgl-image-chromium")
+    options.add_argument("--disable-webgl-draft-extensions")
+    options.add_argument("--use-gl=swiftshader")
+    options.add_argument("--enable-unsafe-swiftshader")
+    # Additional GPU context fixes for virtualization
+    options.add_argument("--disable-gpu-process-crash-limit")
+    options.add_argument("--disable-gpu-process-for-dx12-vulkan-info-collection")
+    options.add_argument("--disable-vulkan")
+    options.add_argument("--disable-vulkan-fallback-to-gl-for-testing")
+    options.add_argument("--disable-gl-drawing-for-tests")
+    options.add_argument("--disable-gl-error-limit")
+    options.add_argument("--disable-canvas-aa")
+    options.add_argument("--disable-2d-canvas-clip-aa")
+    options.add_argument("--disable-gl-extensions")
+    options.add_argument("--use-angle=swiftshader")
+    options.add_argument("--ignore-gpu-blocklist")
+    options.add_argument("--disable-gpu-driver-bug-workarounds")
+    options.add_argument("--disable-infobars")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--mute-audio")
+    options.add_argument("--metrics-recording-only")
+    options.add_argument("--disable-notifications")
+    options.add_argument("--disable-cloud-import")
+    options.add_argument("--disable-sync")
+    options.add_argument("--disable-client-side-phishing-detection")
+    options.add_argument("--disable-background-networking")
+    options.add_argument("--disable-background-timer-throttling")
+    options.add_argument("--disable-backgrounding-occluded-windows")
+    options.add_argument("--disable-component-update")
+    options.add_argument("--disable-default-apps")
+    options.add_argument("--no-first-run")
+    options.add_argument("--no-default-browser-check")
+    options.add_argument("--ignore-certificate-errors")
+    options.add_argument("--guest")
+    options.add_argument("--disable-speech-api")
+    # Performance optimizations
+    options.add_argument("--disable-renderer-backgrounding")
+    options.add_argument("--disable-background-media-suspend")
+    options.add_argument("--disable-ipc-flooding-protection")
+    options.add_argument("--memory-pressure-off")
+    options.add_argument("--max_old_space_size=4096")
+    # Chrome only honours the last --disable-features switch, so list them all in one
+    options.add_argument("--disable-features=VizDisplayCompositor,VizHitTestSurfaceLayer,TranslateUI,BlinkGenPropertyTrees,dsp")
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_argument("--disable-web-security")
+    # Enhanced Chrome options for better stability and timeout handling
+    options.add_argument("--disable-logging")
+    options.add_argument("--disable-login-animations")
+    options.add_argument("--disable-smooth-scrolling")
+    options.add_argument("--page-load-strategy=eager")  # Interactive instead of complete
+    options.add_argument("--dns-prefetch-disable")  # Network optimization
+    options.add_argument("--disable-background-timer-throttling")  # Better performance
+    options.add_argument("--disable-backgrounding-occluded-windows")
+    options.add_argument("--disable-renderer-backgrounding")
+    options.add_argument("--no-first-run")
+    options.add_argument("--no-default-browser-check")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--disable-plugins")
+    options.add_argument("--headless=new")  # Use new headless mode for better stability
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--disable-gpu")  # Disable GPU acceleration
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")  # Overcome limited resource problems
+
+    options.add_experimental_option('excludeSwitches', ['enable-logging'])
+    options.add_experimental_option('useAutomationExtension', False)
+    options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.plugins": 2,  # Block plugins
+    })
+    # Images, CSS, fonts etc. are blocked per session by network profiles (see
+    # network_profiles.py); the performance log provides the stats for them.
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+    return options
+
+
+def _launch_driver() -> WebDriver:
+    """Launch a new headless Chrome driver and load about:blank."""
+    # Create service with longer timeout and better error handling
+    service = webdriver.ChromeService(
+        log_path=os.devnull,  # Suppress logs
+    )
+
+    driver = webdriver.Chrome(service=service, options=_build_chrome_options())
+    driver.set_page_load_timeout(60)  # Increased timeout to 60 seconds
+    driver.set_script_timeout(60)
+    driver.implicitly_wait(10)  # Implicit wait for elements
+
+    # Test with a simple page load first
+    try:
+        driver.get("about:blank")
+    except Exception as e:
+        driver.quit()
+        raise Exception(f"Failed to initialize Chrome: {e}")
+    return driver
+
+
+@dataclass
+class PooledDriver:
+    """A pooled Chrome driver and its usage bookkeeping."""
+    driver: WebDriver
+    launched_at: float
+    uses: int = 0
+
+
+class BrowserPool:
+    """Keeps pre-launched headless Chrome drivers ready to be leased.
+
+    Launching Chrome costs seconds, so drivers are reused: ``acquire`` hands out
+    an idle warm driver (a hit) or launches one (a miss), and ``release`` resets
+    it (cookies, cache and storage cleared, extra tabs closed, navigated to
+    about:blank) and puts it back. Drivers are recycled after ``max_uses``
+    leases or when their process tree exceeds ``max_rss_mb``. Up to ``size``
+    released drivers are kept idle; only after ``warm`` does a background
+    thread pre-launch drivers to keep ``size`` idle. With ``size=0`` every
+    lease launches a fresh driver and release quits it, like before pooling.
+    """
+
+    def __init__(self, size: int = None, max_uses: int = None, max_rss_mb: int = None,
+                 launcher: Callable[[], WebDriver] = None):
+        self.size = max(0, int(size if size is not None else getattr(settings, "BROWSER_POOL_SIZE", 1)))
+        self.max_uses = max(1, int(max_uses or getattr(settings, "BROWSER_POOL_MAX_USES", 20)))
+        self.max_rss_mb = int(max_rss_mb if max_rss_mb is not None else getattr(settings, "BROWSER_POOL_MAX_RSS_MB", 512))
+        self.launcher = launcher or _launch_driver
+        self.lock = threading.Lock()
+        self.idle: List[PooledDriver] = []
+        self.leased: Dict[int, PooledDriver] = {}
+        self._refilling = False
+        self._warming = False
+        self._closed = False
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "launches": 0,
+            "launch_failures": 0,
+            "launch_ms_total": 0.0,
+            "last_launch_ms": None,
+            "recycled": {"max_uses": 0, "memory": 0, "reset_failed": 0, "pool_full": 0},
+        }
+
+    def _launch(self) -> PooledDriver:
+        started = time.perf_counter()
+        try:
+            driver = self.launcher()
+        except Exception:
+            with self.lock:
+                self.stats["launch_failures"] += 1
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self.lock:
+            self.stats["launches"] += 1
+            self.stats["launch_ms_total"] += elapsed_ms
+            self.stats["last_launch_ms"] = round(elapsed_ms, 1)
+        return PooledDriver(driver=driver, launched_at=time.time())
+
+    def acquire(self) -> WebDriver:
+        """Lease a driver, launching one if no warm driver is idle."""
+        with self.lock:
+            entry = self.idle.pop() if self.idle else None
+            if entry is not None:
+                self.stats["hits"] += 1
+            else:
+                self.stats["misses"] += 1
+        if entry is None:
+            entry = self._launch()
+        entry.uses += 1
+        with self.lock:
+            self.leased[id(entry.driver)] = entry
+        self._schedule_refill()
+        return entry.driver
+
+    def release(self, driver: WebDriver, discard: bool = False):
+        """Return a leased driver. Drivers not leased from the pool are quit."""
+        with self.lock:
+            entry = self.leased.pop(id(driver), None)
+        if entry is None or discard or self._closed:
+            self._quit(driver)
+            return
+
+        reason = None
+        if entry.uses >= self.max_uses:
+            reason = "max_uses"
+        elif self.max_rss_mb and (_driver_rss_mb(driver) or 0) > self.max_rss_mb:
+            reason = "memory"
+        elif not _reset_driver(driver):
+            reason = "reset_failed"
+
+        with self.lock:
+            if reason is None and len(self.idle) >= self.size:
+                reason = "pool_full"
+            if reason is None:
+                self.idle.append(entry)
+            else:
+                self.stats["recycled"][reason] += 1
+        if reason is not None:
+            if reason != "pool_full":
+                logging.info(f"Recycling pooled browser after {entry.uses} uses ({reason})")
+            self._quit(driver)
+            self._schedule_refill()
+
+    @staticmethod
+    def _quit(driver: WebDriver):
+        try:
+            driver.quit()
+        except Exception as quit_error:
+            print(f"Warning: Error during driver quit: {quit_error}")
+            try:
+                # Force close if regular quit fails
+                driver.service.stop()
+            except Exception:
+                pass
+
+    def _schedule_refill(self):
+        with self.lock:
+            if not self._warming or self._refilling or self._closed or len(self.idle) >= self.size:
+                return
+            self._refilling = True
+        threading.Thread(target=self._refill, name="browser-pool-refill", daemon=True).start()
+
+    def _refill(self):
+        try:
+            while True:
+                with self.lock:
+                    if self._closed or len(self.idle) >= self.size:
+                        return
+                try:
+                    entry = self._launch()
+                except Exception as e:
+                    logging.warning(f"Failed to pre-launch pooled browser: {e}")
+                    return
+                with self.lock:
+                    if self._closed or len(self.idle) >= self.size:
+                        surplus = entry
+                    else:
+                        self.idle.append(entry)
+                        surplus = None
+                if surplus is not None:
+                    self._quit(surplus.driver)
+                    return
+        finally:
+            with self.lock:
+                self._refilling = False
+
+    def warm(self):
+        """Start pre-launching drivers in the background up to ``size``.
+
+        Once warmed, the pool also replaces leased and recycled drivers.
+        """
+        self._closed = False
+        self._warming = True
+        self._schedule_refill()
+
+    def drain(self) -> int:
+        """Quit all idle drivers. Leased drivers are quit when released."""
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for entry in idle:
+            self._quit(entry.driver)
+        return len(idle)
+
+    def shutdown(self) -> int:
+        """Stop refilling and quit all idle drivers."""
+        self._closed = True
+        self._warming = False
+        return self.drain()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool occupancy, hit/miss counts and launch latency."""
+        with self.lock:
+            requests_total = self.stats["hits"] + self.stats["misses"]
+            launches = self.stats["launches"]
+            return {
+                "size": self.size,
+                "warming": self._warming,
+                "idle": len(self.idle),
+                "leased": len(self.leased),
+                "max_uses": self.max_uses,
+                "max_rss_mb": self.max_rss_mb,
+                "hits": self.stats["hits"],
+                "misses": self.stats["misses"],
+                "hit_rate": round(self.stats["hits"] / requests_total, 3) if requests_total else None,
+                "launches": launches,
+                "launch_failures": self.stats["launch_failures"],
+                "avg_launch_ms": round(self.stats["launch_ms_total"] / launches, 1) if launches else None,
+                "last_launch_ms": self.stats["last_launch_ms"],
+                "recycled": dict(self.stats["recycled"]),
+            }
+
+
+def _origin(url: str) -> Optional[str]:
+    parsed = urlparse(url or "")
+    return f"{parsed.scheme}://{parsed.netloc}" if parsed.scheme in ("http", "https") and parsed.netloc else None
+
+
+def _tab_origins(driver: WebDriver) -> Set[str]:
+    """Origins the current tab has shown: its navigation history plus the frames of the current page."""
+    urls = []
+    try:
+        urls.append(driver.execute_script("return window.location.href"))
+        history = driver.execute_cdp_cmd("Page.getNavigationHistory", {}) or {}
+        urls.extend(entry.get("url", "") for entry in history.get("entries", []))
+        frames = [(driver.execute_cdp_cmd("Page.getFrameTree", {}) or {}).get("frameTree", {})]
+        while frames:
+            node = frames.pop()
+            urls.append(node.get("frame", {}).get("url", ""))
+            frames.extend(node.get("childFrames", []))
+    except Exception:
+        pass
+    return {origin for origin in map(_origin, urls) if origin}
+
+
+def _reset_driver(driver: WebDriver) -> bool:
+    """Clear cookies, cache and storage and navigate to about:blank. Returns False if the driver is unusable.
+
+    Cookies and cache are cleared browser-wide. Storage is cleared for every origin in the
+    navigation history and frames of each open tab, so a lease that moved across sites or
+    opened popups leaves nothing behind for the next one.
+    """
+    try:
+        handles = driver.window_handles
+        origins = set()
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            origins |= _tab_origins(driver)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        origins |= _tab_origins(driver)
+        for origin in sorted(origins):
+            try:
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+            except Exception as e:
+                logging.debug(f"Failed to clear storage for {origin}: {e}")
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+        driver.get("about:blank")
+        try:
+            # Keep the next lease's history (and the origins cleared after it) to its own pages
+            driver.execute_cdp_cmd("Page.resetNavigationHistory", {})
+        except Exception:
+            pass
+        drain_performance_log(driver)
+        return True
+    except Exception as e:
+        logging.warning(f"Failed to reset pooled browser: {e}")
+        return False
+
+
+def _discard_performance_log(driver):
+    # chromedriver buffers DevTools events until they are read, and only opens
+    # measure them; interactive tools drop them so long sessions stay bounded
+    drain_performance_log(driver)
+
+
+def _driver_rss_mb(driver: WebDriver) -> Optional[float]:
+    """Resident memory of the chromedriver process tree in MB, if psutil is available."""
+    try:
+        import psutil
+        process = psutil.Process(driver.service.process.pid)
+        processes = [process] + process.children(recursive=True)
+        return sum(p.memory_info().rss for p in processes) / 1024 / 1024
+    except Exception:
+        return None
+
+
+# Global pool used by open_browser/close_browser
+browser_pool = BrowserPool()
+
+# Optional multiplexing of browser_ids onto contexts of shared pooled Chrome processes
+context_manager = BrowserContextManager(browser_pool.acquire, browser_pool.release)
+
+
+def _session_rss_mb(browser_id: str) -> Optional[float]:
+    driver = dict.get(browsers, browser_id)  # plain lookup: measuring is not activity
+    if isinstance(driver, TabDriver):
+        driver = driver._host.driver  # contexts share their host's process
+    return _driver_rss_mb(driver) if driver is not None else None
+
+
+# Owner tracking, idle reaping and per-user/global caps for entries in ``browsers``
+def _close_session(browser_id: str) -> str:
+    # CDP pages (BROWSER_BACKEND=cdp) share the session manager with the Selenium browsers
+    if browser_id in cdp_browser.pages:
+        return cdp_browser.close_browser_from_thread(browser_id)
+    return close_browser(browser_id)
+
+
+session_manager = BrowserSessionManager(_close_session, rss_of=_session_rss_mb)
+browsers.manager = session_manager
+
+
+def _acquire_driver():
+    if context_manager.enabled:
+        return context_manager.open_context()
+    return browser_pool.acquire()
+
+
+def _release_driver(driver, discard: bool = False):
+    if isinstance(driver, TabDriver):
+        context_manager.close_context(driver)
+    else:
+        browser_pool.release(driver, discard=discard)
+
+
+def next_browser_id(prefix: str = "browser") -> str:
+    # Ids must stay unique while browsers are closed and reopened concurrently
+    while True:
+        browser_id = f"{prefix}_{next(_browser_counter)}"
+        if browser_id not in browsers:
+            return browser_id
+
+
+@contextmanager
+def leased_browser(url: str, profile: str = None):
+    """Open a pooled browser at ``url`` and close it on exit.
+
+    Example:
+        with leased_browser(search_url, profile="scrape-fast") as (browser_id, driver):
+            driver.find_elements(...)
+    """
+    result = open_browser(url, profile=profile)
+    match = re.search(r"Browser opened with ID: (browser_\d+)", result)
+    if not match:
+        raise Exception(f"Could not open browser: {result}")
+    browser_id = match.group(1)
+    try:
+        yield browser_id, browsers[browser_id]
+    finally:
+        close_browser(browser_id)
+
+
+@service_method
+def open_browser(url: str, max_retries: int = None, retry_delay: float = None, profile: str = None) -> str:
     """Opens a new headless Chrome browser window and navigates to the specified URL.
     
     Args:
         url (str): The URL to navigate to
         max_retries (int): Maximum number of retry attempts (defaults to settings)
         retry_delay (float): Initial delay between retries in seconds (defaults to settings)
+        profile (str): Network profile: 'scrape-fast', 'interactive' or 'full' (defaults to settings)
     """
-    browser_id = f"browser_{len(browsers)}"
+    browser_id = next_browser_id()
+    network_profile = get_profile(profile)
     
     # Sanitize and normalize the URL input to prevent crashes due to invalid characters (e.g., backticks)
     if url:
@@ -181,125 +688,25 @@ def open_browser(url: str, max_retries: int = None, retry_delay: float = None) -
         max_retries = getattr(settings, "MAX_RETRIES", 3)
     if retry_delay is None:
         retry_delay = float(getattr(settings, "INITIAL_RETRY_DELAY", 2.0))
-    
+
+    # Waits in line when the owner or the process is at its browser cap
+    session_manager.reserve_slot()
+    try:
+        return _open_browser_attempts(browser_id, url, network_profile, max_retries, retry_delay)
+    except BaseException:
+        session_manager.release_slot()
+        raise
+
+
+def _open_browser_attempts(browser_id: str, url: str, network_profile, max_retries: int, retry_delay: float) -> str:
     for attempt in range(max_retries):
         try:
-            options = webdriver.ChromeOptions()
-            options.add_argument("--headless=new")
-            options.add_argument("--no-sandbox")
-            options.add_argument("--disable-dev-shm-usage")
-            options.add_argument("--log-level=3")
-            # Comprehensive GPU and WebGL disabling
-            options.add_argument("--disable-gpu")
-            options.add_argument("--disable-gpu-sandbox")
-            # NOTE: Do NOT disable software rasterizer; we want SwiftShader for headless stability
-            # options.add_argument("--disable-software-rasterizer")
-            options.add_argument("--disable-gpu-rasterization")
-            options.add_argument("--disable-gpu-memory-buffer-compositor-resources")
-            options.add_argument("--disable-gpu-memory-buffer-video-frames")
-            options.add_argument("--disable-accelerated-2d-canvas")
-            options.add_argument("--disable-accelerated-jpeg-decoding")
-            options.add_argument("--disable-accelerated-mjpeg-decode")
-            options.add_argument("--disable-accelerated-video-decode")
-            options.add_argument("--disable-accelerated-video-encode")
-            options.add_argument("--disable-webgl")
-            options.add_argument("--disable-webgl2")
-            options.add_argument("--disable-3d-apis")
-            options.add_argument("--disable-webgl-image-chromium")
-            options.add_argument("--disable-webgl-draft-extensions")
-            options.add_argument("--use-gl=swiftshader")
-            options.add_argument("--enable-unsafe-swiftshader")
-            # Additional GPU context fixes for virtualization
-            options.add_argument("--disable-gpu-process-crash-limit")
-            options.add_argument("--disable-gpu-process-for-dx12-vulkan-info-collection")
-            options.add_argument("--disable-vulkan")
-            options.add_argument("--disable-vulkan-fallback-to-gl-for-testing")
-            options.add_argument("--disable-features=VizDisplayCompositor,VizHitTestSurfaceLayer")
-            options.add_argument("--disable-gl-drawing-for-tests")
-            options.add_argument("--disable-gl-error-limit")
-            options.add_argument("--disable-canvas-aa")
-            options.add_argument("--disable-2d-canvas-clip-aa")
-            options.add_argument("--disable-gl-extensions")
-            options.add_argument("--use-angle=swiftshader")
-            options.add_argument("--ignore-gpu-blocklist")
-            options.add_argument("--disable-gpu-driver-bug-workarounds")
-            options.add_argument("--disable-infobars")
-            options.add_argument("--disable-extensions")
-            options.add_argument("--mute-audio")
-            options.add_argument("--metrics-recording-only")
-            options.add_argument("--disable-notifications")
-            options.add_argument("--disable-cloud-import")
-            options.add_argument("--disable-sync")
-            options.add_argument("--disable-client-side-phishing-detection")
-            options.add_argument("--disable-background-networking")
-            options.add_argument("--disable-background-timer-throttling")
-            options.add_argument("--disable-backgrounding-occluded-windows")
-            options.add_argument("--disable-component-update")
-            options.add_argument("--disable-default-apps")
-            options.add_argument("--no-first-run")
-            options.add_argument("--no-default-browser-check")
-            options.add_argument("--ignore-certificate-errors")
-            options.add_argument("--guest")
-            options.add_argument("--disable-speech-api")
-            # Performance optimizations
-            options.add_argument("--disable-renderer-backgrounding")
-            options.add_argument("--disable-background-media-suspend")
-            options.add_argument("--disable-ipc-flooding-protection")
-            options.add_argument("--memory-pressure-off")
-            options.add_argument("--max_old_space_size=4096")
-            options.add_argument("--disable-features=VizDisplayCompositor")
-            options.add_argument("--disable-features=TranslateUI")
-            options.add_argument("--disable-features=BlinkGenPropertyTrees")
-            options.add_argument("--disable-blink-features=AutomationControlled")
-            options.add_argument("--disable-web-security")
-            options.add_argument("--disable-features=dsp")
-            # Enhanced Chrome options for better stability and timeout handling
-            options.add_argument("--disable-logging")
-            options.add_argument("--disable-login-animations")
-            options.add_argument("--disable-smooth-scrolling")
-            options.add_argument("--page-load-strategy=eager")  # Interactive instead of complete
-            options.add_argument("--dns-prefetch-disable")  # Network optimization
-            options.add_argument("--disable-background-timer-throttling")  # Better performance
-            options.add_argument("--disable-backgrounding-occluded-windows")
-            options.add_argument("--disable-renderer-backgrounding")
-            options.add_argument("--no-first-run")
-            options.add_argument("--no-default-browser-check")
-            options.add_argument("--disable-extensions")
-            options.add_argument("--disable-plugins")
-            options.add_argument("--disable-images")  # Speed up loading
-            options.add_argument("--disable-javascript")  # For scraping only, re-enable if needed
-            options.add_argument("--headless=new")  # Use new headless mode for better stability
-            options.add_argument("--window-size=1920,1080")
-            options.add_argument("--disable-gpu")  # Disable GPU acceleration
-            options.add_argument("--no-sandbox")
-            options.add_argument("--disable-dev-shm-usage")  # Overcome limited resource problems
-
-            options.add_experimental_option('excludeSwitches', ['enable-logging'])
-            options.add_experimental_option('useAutomationExtension', False)
-            options.add_experimental_option("prefs", {
-                "profile.managed_default_content_settings.images": 2,  # Block images
-                "profile.managed_default_content_settings.stylesheets": 2,  # Block CSS
-                "profile.managed_default_content_settings.plugins": 2,  # Block plugins
-            })
-
-            options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-
-            # Create service with longer timeout and better error handling
-            service = webdriver.ChromeService(
-                log_path=os.devnull,  # Suppress logs
-            )
-
-            driver = webdriver.Chrome(service=service, options=options)
-            driver.set_page_load_timeout(60)  # Increased timeout to 60 seconds
-            driver.set_script_timeout(60)
-            driver.implicitly_wait(10)  # Implicit wait for elements
-
-            # Test with a simple page load first
+            driver = _acquire_driver()
             try:
-                driver.get("about:blank")
+                drain_performance_log(driver)
+                apply_profile(driver, network_profile)
             except Exception as e:
-                driver.quit()
-                raise Exception(f"Failed to initialize Chrome: {e}")
+                logging.warning(f"Could not apply network profile '{network_profile.name}': {e}")
 
             # Now navigate to the requested URL with better error handling
             try:
@@ -312,10 +719,11 @@ def open_browser(url: str, max_retries: int = None, retry_delay: float = None) -
                 # If page times out, still keep the browser for potential interaction
                 print(f"Warning: Page load timed out for {url}, but browser is ready for interaction")
             except Exception as e:
-                driver.quit()
+                _release_driver(driver, discard=True)
                 raise Exception(f"Failed to navigate to {url}: {e}")
 
             browsers[browser_id] = driver
+            network_stats.record(browser_id, url, page_stats_from_events(network_profile, drain_performance_log(driver)))
             return f"Browser opened with ID: {browser_id}. Navigated to {url}. You can now read its content or interact with it."
             
         except Exception as e:
@@ -338,24 +746,32 @@ def open_browser(url: str, max_retries: int = None, retry_delay: float = None) -
             raise Exception(f"Failed to open browser after {attempt+1} attempts: {e}")
 
 
-def get_page_content(browser_id: str) -> str:
-    """Gets the full HTML content of the current page in the specified browser."""
+@service_method
+def get_page_content(browser_id: str, mode: str = "html", max_chars: int = None) -> str:
+    """Gets the content of the current page in the specified browser.
+
+    ``mode`` is 'html' (full HTML, the default for parsers), or one of the compact
+    views 'text', 'outline' and 'links' (see page_content.py). Extraction runs in the
+    page and is capped at ``max_chars`` before it is transferred.
+    """
     if browser_id not in browsers:
         raise Exception(f"Browser with ID '{browser_id}' not found.")
+    mode = resolve_mode(mode)
     try:
         driver = browsers[browser_id]
-        # Prefer executing JS to get full HTML for accurate parsing of links, images, tables, etc.
+        _discard_performance_log(driver)
         try:
-            html = driver.execute_script(
-                "return document.documentElement ? document.documentElement.outerHTML : (document.body ? document.body.outerHTML : '');"
-            )
+            result = driver.execute_script(SELENIUM_PAGE_CONTENT_JS, mode, resolve_max_chars(mode, max_chars))
         except Exception:
-            html = driver.page_source
-        return html
+            if mode != "html":
+                raise
+            result = {"mode": "html", "content": driver.page_source}
+        return format_page_content(result)
     except Exception as e:
         raise Exception(f"Failed to get page content from browser '{browser_id}': {e}")
 
 
+@service_method
 def fill_form(browser_id: str, selector: str, value: str) -> str:
     """Fills a form field in the specified browser.
 
@@ -371,6 +787,7 @@ def fill_form(browser_id: str, selector: str, value: str) -> str:
         raise Exception(f"Browser with ID '{browser_id}' not found.")
     try:
         driver = browsers[browser_id]
+        _discard_performance_log(driver)
         WebDriverWait(driver, 10).until(
             EC.presence_of_element_located((By.CSS_SELECTOR, selector))
         ).send_keys(value)
@@ -381,27 +798,22 @@ def fill_form(browser_id: str, selector: str, value: str) -> str:
         raise Exception(f"Failed to fill form field '{selector}' in browser '{browser_id}': {e}")
 
 
+@service_method
 def close_browser(browser_id: str) -> str:
     """Closes the specified browser window and removes it from the list."""
     if browser_id not in browsers:
         return f"Browser with ID '{browser_id}' not found or already closed."
     try:
         driver = browsers.pop(browser_id)
-        try:
-            driver.quit()
-        except Exception as quit_error:
-            print(f"Warning: Error during driver quit for {browser_id}: {quit_error}")
-            try:
-                # Force close if regular quit fails
-                driver.service.stop()
-            except:
-                pass
+        # Pooled drivers are reset and kept warm, contexts are disposed; others are quit
+        _release_driver(driver)
         return f"Browser {browser_id} closed successfully."
     except Exception as e:
         if browser_id in browsers:
             browsers.pop(browser_id)
         raise Exception(f"Failed to close browser {browser_id}: {e}")
 
+@service_method
 def cleanup_all_browsers():
     """Clean up all browser instances - useful for startup and error recovery."""
     browsers_to_close = list(browsers.keys())
@@ -416,14 +828,35 @@ def cleanup_all_browsers():
             # Remove from dict even if cleanup fails
             browsers.pop(browser_id, None)
 
+    browser_pool.drain()
     if closed_count > 0:
         print(f"Cleaned up {closed_count} browser instances")
     return closed_count
 
+@service_method
 def get_browser_count() -> int:
     """Get the current number of active browsers."""
     return len(browsers)
 
+@service_method
+def get_browser_status() -> Dict[str, Any]:
+    """Get browsers, pool, context, network and session stats of the process owning the drivers."""
+    return {
+        "active_browsers": len(browsers),
+        "browser_ids": list(browsers.keys()),
+        "profiles": list(browser_profiles.keys()),
+        "pool": browser_pool.get_stats(),
+        "contexts": context_manager.get_stats(),
+        "network": network_stats.get_stats(),
+        "sessions": session_manager.get_stats(),
+    }
+
+@service_method
+def close_run_browsers(run_id: str) -> int:
+    """Close every browser opened by agent run ``run_id``."""
+    return session_manager.close_run_sessions(run_id)
+
+@service_method
 def create_persistent_browser(profile_name: str = "default", user_data_dir: str = None) -> str:
     """Create a browser with persistent profile for saved sessions."""
     if not user_data_dir:
@@ -532,6 +965,58 @@ def detect_service_from_url(url: str) -> str:
 
     return "unknown"
 
+def _snapshot_profile(browser_id: str) -> Optional[str]:
+    """Snapshot name for a persistent browser, scoped to the owning user; None for other browsers."""
+    profile = browser_profiles.get(browser_id)
+    if profile is None:
+        return None
+    user_id, _ = get_browser_owner()
+    return f"{profile['profile_name']}_user{user_id}" if user_id is not None else profile["profile_name"]
+
+def _login_state_key(browser_id: str, service: str) -> str:
+    return f"{_snapshot_profile(browser_id) or browser_id}:{service}"
+
+def _on_login_page(url: str, service: str) -> bool:
+    host = urlparse(url or "").netloc.lower()
+    return any(host == h or host.endswith("." + h) for h in LOGIN_INDICATORS[service]["login_hosts"])
+
+def _cached_login_state(browser_id: str, service: str) -> Optional[Dict]:
+    ttl = getattr(settings, "BROWSER_LOGIN_STATE_TTL", 1800)
+    state = service_login_states.get(_login_state_key(browser_id, service))
+    if not state or ttl <= 0 or time.time() - state["checked_at"] > ttl:
+        return None
+    return state
+
+def _forget_login(browser_id: str, service: str):
+    service_login_states.pop(_login_state_key(browser_id, service), None)
+    profile = _snapshot_profile(browser_id)
+    if profile and delete_snapshot(profile, service):
+        logging.info(f"Dropped stale {service} session snapshot for {profile}")
+
+def _remember_login(browser_id: str, service: str, driver, current_url: str) -> Dict:
+    """Cache a detected login and snapshot its cookies and storage for later browsers."""
+    service_login_states[_login_state_key(browser_id, service)] = {
+        "logged_in": True,
+        "checked_at": time.time(),
+        "current_url": current_url,
+        "source": "detected"
+    }
+    profile = _snapshot_profile(browser_id)
+    if profile:
+        try:
+            snapshot = capture_snapshot(driver, service)
+            save_snapshot(profile, snapshot)
+            logging.info(f"Saved {service} session snapshot for {profile} ({len(snapshot['cookies'])} cookies)")
+        except Exception as e:
+            logging.warning(f"Failed to snapshot {service} session for {profile}: {e}")
+    return {
+        "logged_in": True,
+        "service": service,
+        "current_url": current_url,
+        "confidence": "high"
+    }
+
+@service_method
 def check_login_status(browser_id: str, service: str) -> Dict:
     """Check if user is logged into a specific service."""
     if browser_id not in browsers:
@@ -540,66 +1025,35 @@ def check_login_status(browser_id: str, service: str) -> Dict:
     driver = browsers[browser_id]
     current_url = driver.current_url
 
-    # Service-specific login detection
-    login_indicators = {
-        "gmail": {
-            "login_url": "https://accounts.google.com",
-            "logged_in_selectors": ["[data-testid='inbox']", ".gb_ua", "[role='banner']"],
-            "logout_selectors": ["[aria-label*='Google Account']"]
-        },
-        "skype": {
-            "login_url": "https://web.skype.com",
-            "logged_in_selectors": ["[data-text-as-pseudo-element='Skype']", ".swxFrame"],
-            "logout_selectors": [".logout", "[data-text-as-pseudo-element='Sign out']"]
-        },
-        "outlook": {
-            "login_url": "https://outlook.live.com",
-            "logged_in_selectors": ["[role='main']", ".ms-Nav", "#main"],
-            "logout_selectors": ["[aria-label*='Sign out']"]
-        }
-    }
-
-    if service not in login_indicators:
+    if service not in LOGIN_INDICATORS:
         return {"logged_in": False, "service": service, "error": "Service not supported for login detection"}
 
-    indicators = login_indicators[service]
+    indicators = LOGIN_INDICATORS[service]
 
     try:
         # Check if we're on a login page
-        if any(login_domain in current_url for login_domain in indicators["login_url"]):
+        if _on_login_page(current_url, service):
+            _forget_login(browser_id, service)
             return {"logged_in": False, "service": service, "current_url": current_url}
 
-        # Check for logged-in indicators
-        for selector in indicators["logged_in_selectors"]:
-            try:
-                element = WebDriverWait(driver, 5).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                )
-                if element:
-                    return {
-                        "logged_in": True,
-                        "service": service,
-                        "current_url": current_url,
-                        "confidence": "high"
-                    }
-            except:
-                continue
-
-        # Check for logout options (indicates logged in)
-        for selector in indicators["logout_selectors"]:
-            try:
-                element = WebDriverWait(driver, 3).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                )
-                if element:
-                    return {
-                        "logged_in": True,
-                        "service": service,
-                        "current_url": current_url,
-                        "confidence": "high"
-                    }
-            except:
-                continue
+        # A recent detection or restored snapshot skips the selector waits below
+        cached = _cached_login_state(browser_id, service)
+        if cached:
+            return {
+                "logged_in": True,
+                "service": service,
+                "current_url": current_url,
+                "confidence": "high",
+                "cached": True
+            }
+
+        # Poll all logged-in and logout indicators together in one script call per attempt
+        selectors = indicators["logged_in_selectors"] + indicators["logout_selectors"]
+        try:
+            WebDriverWait(driver, 5).until(lambda d: first_present_selector(d, selectors))
+            return _remember_login(browser_id, service, driver, current_url)
+        except TimeoutException:
+            pass
 
         return {
             "logged_in": False,
@@ -616,42 +1070,56 @@ def check_login_status(browser_id: str, service: str) -> Dict:
             "current_url": current_url
         }
 
+def _wait_for_document(driver):
+    WebDriverWait(driver, 30).until(
+        lambda d: d.execute_script("return document.readyState") == "complete"
+    )
+
+@service_method
 def navigate_to_service(browser_id: str, service: str) -> str:
-    """Navigate to a specific service's main page."""
+    """Navigate to a specific service's main page, restoring a saved login session if there is one."""
     if browser_id not in browsers:
         logging.error(f"Browser {browser_id} not found. Available browsers: {list(browsers.keys())}")
         return f"Browser {browser_id} not found"
 
-    service_urls = {
-        "gmail": "https://mail.google.com",
-        "skype": "https://web.skype.com",
-        "outlook": "https://outlook.live.com",
-        "slack": "https://app.slack.com",
-        "discord": "https://discord.com/app",
-        "whatsapp": "https://web.whatsapp.com",
-        "telegram": "https://web.telegram.org",
-        "facebook": "https://www.facebook.com",
-        "twitter": "https://twitter.com",
-        "linkedin": "https://www.linkedin.com",
-        "zoom": "https://zoom.us",
-        "teams": "https://teams.microsoft.com",
-        "meet": "https://meet.google.com"
-    }
-
-    if service not in service_urls:
+    if service not in SERVICE_URLS:
         return f"Service '{service}' not supported"
 
     driver = browsers[browser_id]
+    profile = _snapshot_profile(browser_id)
+    snapshot = load_snapshot(profile, service) if profile else None
     try:
-        driver.get(service_urls[service])
-        WebDriverWait(driver, 30).until(
-            lambda d: d.execute_script("return document.readyState") == "complete"
-        )
+        _discard_performance_log(driver)
+        if snapshot:
+            try:
+                restored = restore_cookies(driver, snapshot)
+                logging.info(f"Restored {restored} {service} cookies for {profile}")
+            except Exception as e:
+                logging.warning(f"Failed to restore {service} session for {profile}: {e}")
+                snapshot = None
+
+        driver.get(SERVICE_URLS[service])
+        _wait_for_document(driver)
+
+        if snapshot:
+            # Apps read localStorage on startup, so reload once if keys were missing
+            if restore_local_storage(driver, snapshot):
+                driver.refresh()
+                _wait_for_document(driver)
+            if service in LOGIN_INDICATORS and not _on_login_page(driver.current_url, service):
+                service_login_states[_login_state_key(browser_id, service)] = {
+                    "logged_in": True,
+                    "checked_at": snapshot["captured_at"],
+                    "current_url": driver.current_url,
+                    "source": "snapshot"
+                }
+            return f"Successfully navigated to {service} (saved session restored)"
         return f"Successfully navigated to {service}"
     except Exception as e:
         return f"Failed to navigate to {service}: {e}"
 
 
+@service_method
 def fill_multiple_fields(browser_id: str, fields: list) -> str:
     """Fills multiple form fields in the specified browser.
 
@@ -666,11 +1134,17 @@ def fill_multiple_fields(browser_id: str, fields: list) -> str:
         raise Exception(f"Browser with ID '{browser_id}' not found.")
     try:
         results = []
+        valid = [f for f in fields if f.get('selector') and f.get('value')]
+        # Locate every field in one round-trip; only missing ones fall back to fill_form's wait
+        elements = dict(zip((f['selector'] for f in valid), resolve_selectors(browsers[browser_id], [f['selector'] for f in valid])))
         for field in fields:
             selector = field.get('selector')
             value = field.get('value')
             if selector and value:
-                fill_form(browser_id, selector, value)
+                if elements.get(selector) is not None:
+                    elements[selector].send_keys(value)
+                else:
+                    fill_form(browser_id, selector, value)
                 results.append(f"Filled '{selector}' with '{value}'.")
             else:
                 results.append(f"Skipped invalid field: {field}")
@@ -678,6 +1152,7 @@ def fill_multiple_fields(browser_id: str, fields: list) -> str:
     except Exception as e:
         raise Exception(f"Failed to fill multiple fields in browser '{browser_id}': {e}")
 
+@service_method
 def submit_form(browser_id: str, selector: str) -> str:
     """Submits a form by pressing Enter on the specified element.
 
@@ -692,6 +1167,7 @@ def submit_form(browser_id: str, selector: str) -> str:
         raise Exception(f"Browser with ID '{browser_id}' not found.")
     try:
         driver = browsers[browser_id]
+        _discard_performance_log(driver)
         WebDriverWait(driver, 10).until(
             EC.presence_of_element_located((By.CSS_SELECTOR, selector))
         ).send_keys(Keys.ENTER)
@@ -0,0 +1,574 @@
+"""
+Async browser backend driving Chrome over the DevTools Protocol.
+
+The Selenium tools are blocking, so the agent loop runs them in threads and a
+timed-out call keeps running and holding the driver. This backend talks CDP
+over a websocket from the event loop instead:
+
+- operations are coroutines, so ``asyncio.wait_for`` really cancels them (an
+  interrupted navigation also sends ``Page.stopLoading``);
+- waits are event driven: navigation waits for ``Page.loadEventFired`` and
+  element waits resolve from a ``MutationObserver`` inside the page instead of
+  polling ``WebDriverWait``/``time.sleep``;
+- every ``browser_id`` is an isolated browser context in one shared Chrome
+  process, and operations on different tabs run concurrently.
+
+Pages are tracked by ``browsing.session_manager`` like Selenium browsers: they
+count against the same caps, idle ones are reaped and ``close_run_browsers``
+closes those of a finished run.
+
+Select it per deployment with ``BROWSER_BACKEND=cdp``; the async tool functions
+at the bottom of this module are then used by the agent loop in place of the
+Selenium tools with the same names.
+"""
+
+import asyncio
+import json
+import logging
+import shutil
+import subprocess
+import tempfile
+from typing import Any, Callable, Dict, List, Optional
+
+from core.config import settings
+from network_profiles import NetworkProfile, PageNetworkStats, get_profile, network_stats
+from page_content import PAGE_CONTENT_JS, format_page_content, resolve_max_chars, resolve_mode
+from page_settle import SETTLE_JS, SettleResult, result_from_js, settle_stats
+
+CHROME_CANDIDATES = ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome")
+
+WAIT_FOR_SELECTOR_JS = """
+(selector, timeoutMs) => new Promise((resolve) => {
+    if (document.querySelector(selector)) { resolve(true); return; }
+    const observer = new MutationObserver(() => {
+        if (document.querySelector(selector)) { observer.disconnect(); clearTimeout(timer); resolve(true); }
+    });
+    observer.observe(document.documentElement || document, {childList: true, subtree: true, attributes: true});
+    const timer = setTimeout(() => { observer.disconnect(); resolve(false); }, timeoutMs);
+})
+"""
+
+
+class CDPError(Exception):
+    """Raised when Chrome returns an error for a DevTools command."""
+    pass
+
+
+class CDPConnection:
+    """Multiplexes commands, replies and events over one DevTools websocket."""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.next_id = 0
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.waiters: List[tuple] = []
+        self.listeners: List[tuple] = []
+        self.closed = False
+        self.reader = asyncio.ensure_future(self._read_loop())
+
+    @classmethod
+    async def connect(cls, ws_url: str) -> "CDPConnection":
+        import websockets
+        ws = await websockets.connect(ws_url, max_size=None, ping_interval=None)
+        return cls(ws)
+
+    async def send(self, method: str, params: Optional[Dict[str, Any]] = None, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Send a command and await its result. Cancelling the caller stops waiting for the reply."""
+        if self.closed:
+            raise CDPError("DevTools connection is closed")
+        self.next_id += 1
+        message_id = self.next_id
+        future = asyncio.get_running_loop().create_future()
+        self.pending[message_id] = future
+        message = {"id": message_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        try:
+            await self.ws.send(json.dumps(message))
+            return await future
+        finally:
+            self.pending.pop(message_id, None)
+
+    def wait_for_event(self, method: str, session_id: Optional[str] = None,
+                       predicate: Optional[Callable[[Dict[str, Any]], bool]] = None) -> asyncio.Future:
+        """Return a future resolved with the params of the next matching event.
+
+        Register the waiter before sending the command that triggers the event.
+        Cancel the future if it is no longer needed.
+        """
+        future = asyncio.get_running_loop().create_future()
+        waiter = (method, session_id, predicate, future)
+        self.waiters.append(waiter)
+        future.add_done_callback(lambda _: self.waiters.remove(waiter) if waiter in self.waiters else None)
+        return future
+
+    def on(self, method: str, callback: Callable[[Dict[str, Any]], None], session_id: Optional[str] = None) -> Callable[[], None]:
+        """Call ``callback(params)`` for every matching event. Returns a function that removes the listener."""
+        listener = (method, session_id, callback)
+        self.listeners.append(listener)
+        return lambda: self.listeners.remove(listener) if listener in self.listeners else None
+
+    async def _read_loop(self):
+        try:
+            async for raw in self.ws:
+                message = json.loads(raw)
+                if "id" in message:
+                    future = self.pending.get(message["id"])
+                    if future is None or future.done():
+                        continue
+                    if "error" in message:
+                        future.set_exception(CDPError(message["error"].get("message", "CDP error")))
+                    else:
+                        future.set_result(message.get("result", {}))
+                    continue
+                method = message.get("method")
+                params = message.get("params", {})
+                session_id = message.get("sessionId")
+                for listener_method, listener_session, callback in list(self.listeners):
+                    if listener_method == method and listener_session in (None, session_id):
+                        try:
+                            callback(params)
+                        except Exception as e:
+                            logging.warning(f"CDP listener for {method} failed: {e}")
+                for waiter_method, waiter_session, predicate, future in list(self.waiters):
+                    if future.done() or waiter_method != method:
+                        continue
+                    if waiter_session is not None and waiter_session != session_id:
+                        continue
+                    if predicate is not None and not predicate(params):
+                        continue
+                    future.set_result(params)
+        except Exception as e:
+            logging.warning(f"DevTools connection closed: {e}")
+        finally:
+            self.closed = True
+            for future in list(self.pending.values()) + [w[3] for w in self.waiters]:
+                if not future.done():
+                    future.set_exception(CDPError("DevTools connection closed"))
+
+    async def close(self):
+        self.closed = True
+        try:
+            await self.ws.close()
+        except Exception:
+            pass
+        self.reader.cancel()
+
+
+class CDPPage:
+    """One tab in its own browser context."""
+
+    def __init__(self, connection: CDPConnection, context_id: str, target_id: str, session_id: str):
+        self.connection = connection
+        self.context_id = context_id
+        self.target_id = target_id
+        self.session_id = session_id
+        self.network_stats: Optional[PageNetworkStats] = None
+        self._remove_listeners: List[Callable[[], None]] = []
+
+    async def send(self, method: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self.connection.send(method, params, session_id=self.session_id)
+
+    async def apply_profile(self, profile: NetworkProfile):
+        """Block requests according to ``profile`` and start counting network stats.
+
+        Ads and trackers are blocked by URL pattern; resource types are
+        intercepted with the Fetch domain and failed as blocked by client.
+        """
+        for remove in self._remove_listeners:
+            remove()
+        stats = self.network_stats = PageNetworkStats(profile.name)
+        self._remove_listeners = [
+            self.connection.on(method, lambda params, method=method: stats.record_event(method, params), self.session_id)
+            for method in ("Network.requestWillBeSent", "Network.loadingFinished", "Network.loadingFailed")
+        ]
+        self._remove_listeners.append(self.connection.on("Fetch.requestPaused", self._block_request, self.session_id))
+        await self.send("Network.enable")
+        await self.send("Network.setBlockedURLs", {"urls": profile.blocked_url_patterns(include_types=False)})
+        if profile.blocked_types:
+            await self.send("Fetch.enable", {"patterns": [
+                {"resourceType": resource_type, "requestStage": "Request"} for resource_type in profile.blocked_types
+            ]})
+        else:
+            await self.send("Fetch.disable")
+
+    def _block_request(self, params: Dict[str, Any]):
+        asyncio.ensure_future(self._fail_request(params["requestId"]))
+
+    async def _fail_request(self, request_id: str):
+        try:
+            await self.send("Fetch.failRequest", {"requestId": request_id, "errorReason": "BlockedByClient"})
+        except CDPError:
+            pass  # the page navigated away or was closed
+
+    async def goto(self, url: str, timeout: float = 30, wait_until: str = "load") -> bool:
+        """Navigate and wait for the load (or DOMContentLoaded) event.
+
+        Returns False if the page did not finish loading within ``timeout``;
+        the page is still usable, as with the Selenium backend.
+        """
+        event = "Page.loadEventFired" if wait_until == "load" else "Page.domContentEventFired"
+        loaded = self.connection.wait_for_event(event, self.session_id)
+        try:
+            result = await self.send("Page.navigate", {"url": url})
+            if result.get("errorText"):
+                raise CDPError(f"Failed to navigate to {url}: {result['errorText']}")
+            await asyncio.wait_for(asyncio.shield(loaded), timeout)
+            return True
+        except asyncio.TimeoutError:
+            await self._stop_loading()
+            return False
+        except asyncio.CancelledError:
+            await asyncio.shield(self._stop_loading())
+            raise
+        finally:
+            loaded.cancel()
+
+    async def _stop_loading(self):
+        try:
+            await self.send("Page.stopLoading")
+        except Exception:
+            pass
+
+    async def evaluate(self, expression: str, await_promise: bool = False) -> Any:
+        result = await self.send("Runtime.evaluate", {
+            "expression": expression,
+            "returnByValue": True,
+            "awaitPromise": await_promise,
+        })
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise CDPError(details.get("exception", {}).get("description") or details.get("text", "JavaScript error"))
+        return result.get("result", {}).get("value")
+
+    async def call(self, function_js: str, *args: Any, await_promise: bool = False) -> Any:
+        arguments = ", ".join(json.dumps(a) for a in args)
+        return await self.evaluate(f"({function_js})({arguments})", await_promise=await_promise)
+
+    async def wait_for_selector(self, selector: str, timeout: float = 10) -> bool:
+        """Wait for an element to appear, observing DOM mutations in the page."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            try:
+                return bool(await self.call(WAIT_FOR_SELECTOR_JS, selector, int(remaining * 1000), await_promise=True))
+            except CDPError as e:
+                # A navigation destroyed the execution context; wait for the new document
+                if "context" not in str(e).lower():
+                    raise
+                ready = self.connection.wait_for_event("Page.domContentEventFired", self.session_id)
+                try:
+                    await asyncio.wait_for(asyncio.shield(ready), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    return False
+                finally:
+                    ready.cancel()
+
+    async def settle(self, quiet_ms: int = None, timeout: float = None, label: str = "cdp") -> SettleResult:
+        """Wait until no requests are in flight and the DOM has been quiet for ``quiet_ms``."""
+        quiet_ms = quiet_ms if quiet_ms is not None else int(getattr(settings, "PAGE_SETTLE_QUIET_MS", 500))
+        timeout = timeout if timeout is not None else float(getattr(settings, "PAGE_SETTLE_TIMEOUT", 10.0))
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            result = result_from_js(await self.call(SETTLE_JS, quiet_ms, int(timeout * 1000), await_promise=True))
+        except CDPError as e:
+            result = SettleResult(settled=False, timed_out=False, elapsed_ms=int((loop.time() - started) * 1000), error=str(e))
+        settle_stats.record(label, result)
+        return result
+
+    async def content(self) -> str:
+        return await self.evaluate("document.documentElement ? document.documentElement.outerHTML : ''") or ""
+
+    async def url(self) -> str:
+        return await self.evaluate("window.location.href") or ""
+
+    async def fill(self, selector: str, value: str, timeout: float = 15):
+        if not await self.wait_for_selector(selector, timeout):
+            raise CDPError(f"Timeout: Element with selector '{selector}' not found")
+        await self.call("""(selector) => {
+            const el = document.querySelector(selector);
+            el.scrollIntoView({block: 'center'});
+            el.focus();
+            if ('value' in el) { el.value = ''; }
+        }""", selector)
+        await self.send("Input.insertText", {"text": str(value)})
+        await self.call("""(selector) => {
+            document.querySelector(selector).dispatchEvent(new Event('change', {bubbles: true}));
+        }""", selector)
+
+    async def click(self, selector: str, timeout: float = 10):
+        if not await self.wait_for_selector(selector, timeout):
+            raise CDPError(f"Timeout: Element with selector '{selector}' not found")
+        box = await self.call("""(selector) => {
+            const el = document.querySelector(selector);
+            el.scrollIntoView({block: 'center'});
+            const r = el.getBoundingClientRect();
+            return {x: r.left + r.width / 2, y: r.top + r.height / 2, w: r.width, h: r.height};
+        }""", selector)
+        if not box or not box.get("w") or not box.get("h"):
+            # Invisible or zero-size element: fall back to a DOM click
+            await self.call("(selector) => document.querySelector(selector).click()", selector)
+            return
+        for event_type in ("mouseMoved", "mousePressed", "mouseReleased"):
+            await self.send("Input.dispatchMouseEvent", {
+                "type": event_type, "x": box["x"], "y": box["y"], "button": "left", "clickCount": 1,
+            })
+
+    async def press_enter(self, selector: str, timeout: float = 10):
+        if not await self.wait_for_selector(selector, timeout):
+            raise CDPError(f"Timeout: Element with selector '{selector}' not found")
+        await self.call("(selector) => document.querySelector(selector).focus()", selector)
+        key = {"key": "Enter", "code": "Enter", "windowsVirtualKeyCode": 13, "nativeVirtualKeyCode": 13}
+        await self.send("Input.dispatchKeyEvent", {"type": "keyDown", "text": "\r", **key})
+        await self.send("Input.dispatchKeyEvent", {"type": "keyUp", **key})
+
+    async def close(self):
+        for remove in self._remove_listeners:
+            remove()
+        await self.connection.send("Target.disposeBrowserContext", {"browserContextId": self.context_id})
+
+
+class CDPBrowser:
+    """A headless Chrome process controlled through its browser DevTools endpoint."""
+
+    def __init__(self, binary: Optional[str] = None):
+        self.binary = binary or getattr(settings, "CHROME_BINARY", "") or next(
+            (path for path in map(shutil.which, CHROME_CANDIDATES) if path), None
+        )
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.connection: Optional[CDPConnection] = None
+        self.user_data_dir: Optional[str] = None
+        self._stderr_task: Optional[asyncio.Task] = None
+
+    async def launch(self, timeout: float = 30):
+        if not self.binary:
+            raise CDPError("Chrome binary not found; set CHROME_BINARY")
+        self.user_data_dir = tempfile.mkdtemp(prefix="cdp-chrome-")
+        self.process = await asyncio.create_subprocess_exec(
+            self.binary, "--headless=new", "--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu",
+            "--no-first-run", "--no-default-browser-check", "--mute-audio", "--disable-extensions",
+            "--disable-background-networking", "--window-size=1920,1080",
+            "--remote-debugging-port=0", f"--user-data-dir={self.user_data_dir}", "about:blank",
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+        ws_url = await asyncio.wait_for(self._read_ws_url(), timeout)
+        # Keep draining stderr so Chrome never blocks on a full pipe
+        self._stderr_task = asyncio.ensure_future(self._drain_stderr())
+        self.connection = await CDPConnection.connect(ws_url)
+        logging.info(f"Launched CDP Chrome (pid {self.process.pid})")
+
+    async def _read_ws_url(self) -> str:
+        while True:
+            line = await self.process.stderr.readline()
+            if not line:
+                raise CDPError("Chrome exited before opening the DevTools endpoint")
+            text = line.decode("utf-8", "replace").strip()
+            if text.startswith("DevTools listening on "):
+                return text[len("DevTools listening on "):]
+
+    async def _drain_stderr(self):
+        while self.process and await self.process.stderr.readline():
+            pass
+
+    @property
+    def alive(self) -> bool:
+        return bool(self.process and self.process.returncode is None and self.connection and not self.connection.closed)
+
+    async def new_page(self) -> CDPPage:
+        """Open a tab in a new isolated browser context."""
+        context_id = (await self.connection.send("Target.createBrowserContext", {"disposeOnDetach": True}))["browserContextId"]
+        target_id = (await self.connection.send("Target.createTarget", {"url": "about:blank", "browserContextId": context_id}))["targetId"]
+        session_id = (await self.connection.send("Target.attachToTarget", {"targetId": target_id, "flatten": True}))["sessionId"]
+        page = CDPPage(self.connection, context_id, target_id, session_id)
+        await page.send("Page.enable")
+        await page.send("Runtime.enable")
+        return page
+
+    async def close(self):
+        if self.connection:
+            await self.connection.close()
+        if self.process and self.process.returncode is None:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), 10)
+            except asyncio.TimeoutError:
+                self.process.kill()
+        if self._stderr_task:
+            self._stderr_task.cancel()
+        if self.user_data_dir:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+
+
+# Shared browser process and open pages for the CDP tool functions below
+_browser: Optional[CDPBrowser] = None
+_browser_lock: Optional[asyncio.Lock] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+pages: Dict[str, CDPPage] = {}
+
+
+def is_enabled() -> bool:
+    return getattr(settings, "BROWSER_BACKEND", "selenium").lower() == "cdp"
+
+
+async def get_browser() -> CDPBrowser:
+    """Return the shared CDP browser, launching (or relaunching) it if needed."""
+    global _browser, _browser_lock, _loop
+    if _browser_lock is None:
+        _browser_lock = asyncio.Lock()
+        _loop = asyncio.get_running_loop()
+    async with _browser_lock:
+        if _browser is None or not _browser.alive:
+            if _browser is not None:
+                await _browser.close()
+                _forget_pages()
+            _browser = CDPBrowser()
+            await _browser.launch()
+        return _browser
+
+
+def _forget_pages():
+    from browsing import session_manager
+    for browser_id in list(pages):
+        pages.pop(browser_id, None)
+        session_manager.unregister(browser_id)
+
+
+def _get_page(browser_id: str) -> CDPPage:
+    page = pages.get(browser_id)
+    if page is None:
+        raise Exception(f"Browser with ID '{browser_id}' not found.")
+    from browsing import session_manager
+    session_manager.touch(browser_id)
+    return page
+
+
+async def open_browser(url: str, max_retries: int = None, retry_delay: float = None, profile: str = None) -> str:
+    """Opens a new isolated tab and navigates to the specified URL."""
+    from browsing import next_browser_id, session_manager
+
+    network_profile = get_profile(profile)
+    # Same per-user and global caps as Selenium browsers, waited for on the event loop
+    await session_manager.reserve_slot_async()
+    try:
+        browser = await get_browser()
+        page = await browser.new_page()
+    except BaseException:
+        session_manager.release_slot()
+        raise
+    browser_id = next_browser_id()
+    pages[browser_id] = page
+    session_manager.register(browser_id)
+    try:
+        await page.apply_profile(network_profile)
+        if not await page.goto(url):
+            logging.warning(f"Page load timed out for {url}, but browser is ready for interaction")
+    except BaseException:
+        pages.pop(browser_id, None)
+        session_manager.unregister(browser_id)
+        await asyncio.shield(page.close())
+        raise
+    network_stats.record(browser_id, url, page.network_stats)
+    return f"Browser opened with ID: {browser_id}. Navigated to {url}. You can now read its content or interact with it."
+
+
+async def get_page_content(browser_id: str, mode: str = None, max_chars: int = None) -> str:
+    """Gets the content of the current page; ``mode`` defaults to the compact agent view (see page_content.py)."""
+    mode = resolve_mode(mode)
+    result = await _get_page(browser_id).call(PAGE_CONTENT_JS, mode, resolve_max_chars(mode, max_chars))
+    return format_page_content(result)
+
+
+async def fill_form(browser_id: str, selector: str, value: str, wait_timeout: int = 15) -> str:
+    """Fills a form field in the specified browser."""
+    await _get_page(browser_id).fill(selector, value, timeout=wait_timeout)
+    return f"Successfully filled form field '{selector}' in browser '{browser_id}'."
+
+
+async def click_button(browser_id: str, selector: str) -> str:
+    """Clicks a button in the specified browser using a CSS selector."""
+    page = _get_page(browser_id)
+    await page.click(selector)
+    await page.settle(quiet_ms=300, timeout=5, label="cdp_click")
+    return f"Clicked button with selector '{selector}' successfully. Current URL is now {await page.url()}"
+
+
+async def submit_form(browser_id: str, selector: str) -> str:
+    """Submits a form by pressing Enter on the specified element."""
+    await _get_page(browser_id).press_enter(selector)
+    return f"Successfully submitted form using element '{selector}' in browser '{browser_id}'."
+
+
+async def wait_for_element(browser_id: str, selector: str, timeout: int = 10) -> str:
+    """Wait for an element to be present on the page."""
+    if await _get_page(browser_id).wait_for_selector(selector, timeout):
+        return f"Element '{selector}' is present in browser '{browser_id}'."
+    raise Exception(f"Timeout: Element with selector '{selector}' not found in browser '{browser_id}'.")
+
+
+async def close_browser(browser_id: str) -> str:
+    """Closes the specified tab and disposes its browser context."""
+    from browsing import session_manager
+
+    page = pages.pop(browser_id, None)
+    if page is None:
+        return f"Browser with ID '{browser_id}' not found or already closed."
+    session_manager.unregister(browser_id)
+    try:
+        await page.close()
+    except Exception as e:
+        logging.warning(f"Error closing CDP page {browser_id}: {e}")
+    return f"Browser {browser_id} closed successfully."
+
+
+def close_browser_from_thread(browser_id: str, timeout: float = 10) -> str:
+    """``close_browser`` for threads outside the event loop, such as the session reaper."""
+    if _loop is None or _loop.is_closed():
+        from browsing import session_manager
+        pages.pop(browser_id, None)
+        session_manager.unregister(browser_id)
+        return f"Browser {browser_id} closed successfully."
+    return asyncio.run_coroutine_threadsafe(close_browser(browser_id), _loop).result(timeout)
+
+
+async def close_run_browsers(run_id: str) -> int:
+    """Close the pages opened by agent run ``run_id``."""
+    from browsing import session_manager
+
+    browser_ids = [browser_id for browser_id in session_manager.run_sessions(run_id) if browser_id in pages]
+    for browser_id in browser_ids:
+        await close_browser(browser_id)
+    return len(browser_ids)
+
+
+async def shutdown():
+    """Close all pages and the shared Chrome process."""
+    global _browser
+    _forget_pages()
+    if _browser is not None:
+        await _browser.close()
+        _browser = None
+
+
+def get_stats() -> Dict[str, Any]:
+    return {
+        "enabled": is_enabled(),
+        "running": bool(_browser is not None and _browser.alive),
+        "pages": len(pages),
+        "browser_ids": list(pages.keys()),
+    }
+
+
+# Async implementations of the browser tools, keyed by tool name
+ASYNC_TOOLS = {
+    "open_browser": open_browser,
+    "get_page_content": get_page_content,
+    "fill_form": fill_form,
+    "click_button": click_button,
+    "submit_form": submit_form,
+    "wait_for_element": wait_for_element,
+    "close_browser": close_browser,
+}
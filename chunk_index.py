@@ -0,0 +1,161 @@
+"""
+Per-task retrieval index over scraped content.
+
+``index_scraped_page`` runs when a scrape is saved. It splits the page data
+into chunks of about ``CHAT_INDEX_CHUNK_CHARS`` (see ``text_chunks.py``) and
+stores, in the task store (each page of a crawl adds to its task's index):
+
+- the chunk texts;
+- BM25 postings, i.e. term counts per chunk and each chunk's length in terms;
+- a normalized embedding per chunk, when local embeddings are enabled
+  (``ENABLE_LOCAL_EMBEDDINGS``, see ``core/local_embeddings.py``).
+
+``search`` ranks chunks for a question with BM25 and, when embeddings are
+available, cosine similarity. The two rankings are merged with reciprocal
+rank fusion. Only the postings of the question's terms and the texts of the
+chunks returned are read from SQLite. Chunk lengths and the embedding matrix
+are kept for the last ``CHAT_INDEX_CACHE_TASKS`` tasks searched, so
+follow-up questions about the same page read almost nothing.
+"""
+
+import logging
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from core.config import settings
+from text_chunks import data_blocks, pack_chunks
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = {
+    "a", "about", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how", "i",
+    "in", "is", "it", "me", "of", "on", "or", "page", "so", "that", "the", "this", "to", "was", "what", "when",
+    "where", "which", "who", "why", "with", "you",
+}
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+
+_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+def local_embedder() -> Optional[Callable[[List[str]], List[List[float]]]]:
+    """``core.local_embeddings.generate_embeddings_batch`` when local embeddings can be used, else None."""
+    try:
+        from core import local_embeddings
+    except ImportError as e:
+        logging.debug(f"Local embeddings unavailable: {e}")
+        return None
+    return local_embeddings.generate_embeddings_batch if local_embeddings.is_available() else None
+
+
+def _normalized(vectors: Sequence[Sequence[float]]) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def index_scraped_page(task_id: str, data: Dict[str, Any], manager, info: Optional[Dict[str, Any]] = None,
+                       embed: Optional[Callable[[List[str]], List[List[float]]]] = None, append: bool = False) -> int:
+    """Build (or rebuild) the chunk index of ``task_id`` from page ``data``; returns the number of chunks.
+
+    ``info`` (url, title, word_count) is stored with the index so chats need not read the scrape.
+    ``embed`` defaults to the local embedding model, if enabled. With ``append`` the page is
+    added to the task's existing index instead of replacing it.
+    """
+    chunks = pack_chunks(data_blocks(data), getattr(settings, "CHAT_INDEX_CHUNK_CHARS", 1500))
+    texts = [chunk.as_prompt_text() for chunk in chunks]
+    terms = [Counter(tokenize(text)) for text in texts]
+    embeddings = None
+    embed = embed or local_embedder()
+    if embed and texts:
+        try:
+            embeddings = _normalized(embed(texts))
+        except Exception as e:
+            logging.warning(f"Could not embed chunks of task {task_id}, indexing for keyword search only: {e}")
+    text_content = data.get("text_content") or {}
+    info = {
+        "title": text_content.get("title", ""),
+        "outline": "; ".join(heading.get("text", "") for heading in text_content.get("headings", [])[:30]),
+        "chars": sum(len(text) for text in texts),
+        **(info or {}),
+    }
+    vectors = [row.tobytes() for row in embeddings] if embeddings is not None else None
+    manager.save_chunk_index(task_id, info, texts, terms, vectors, append=append)
+    with _cache_lock:
+        _cache.pop(task_id, None)
+    return len(chunks)
+
+
+def load_index(task_id: str, manager) -> Optional[Dict[str, Any]]:
+    """Index info, chunk lengths and embeddings of ``task_id``, cached per task."""
+    with _cache_lock:
+        if task_id in _cache:
+            _cache.move_to_end(task_id)
+            return _cache[task_id]
+    index = manager.get_chunk_index(task_id)
+    if index is None:
+        return None
+    vectors = index.pop("vectors")
+    index["embeddings"] = np.vstack([np.frombuffer(vector, dtype=np.float32) for vector in vectors]) if vectors else None
+    with _cache_lock:
+        _cache[task_id] = index
+        while len(_cache) > max(1, int(getattr(settings, "CHAT_INDEX_CACHE_TASKS", 16))):
+            _cache.popitem(last=False)
+    return index
+
+
+def bm25_scores(postings: Sequence[Sequence[Any]], lengths: Sequence[int]) -> Dict[int, float]:
+    """BM25 score per chunk from ``(term, chunk, tf)`` postings of the query terms."""
+    count = len(lengths)
+    average = (sum(lengths) / count) if count else 0
+    document_frequency = Counter(term for term, _, _ in postings)
+    scores: Dict[int, float] = {}
+    for term, chunk, tf in postings:
+        df = document_frequency[term]
+        idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+        norm = 1 - BM25_B + BM25_B * (lengths[chunk] / average if average else 1)
+        scores[chunk] = scores.get(chunk, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+    return scores
+
+
+def search(task_id: str, query: str, manager, limit: int = 8,
+           embed: Optional[Callable[[List[str]], List[List[float]]]] = None) -> Optional[List[Dict[str, Any]]]:
+    """Chunks of ``task_id`` most relevant to ``query``, best first (None when the task has no index).
+
+    Each result has ``chunk``, ``text`` and ``score`` (reciprocal rank fusion of BM25 and embeddings).
+    """
+    index = load_index(task_id, manager)
+    if index is None:
+        return None
+    rankings = []
+    terms = sorted(set(tokenize(query)))
+    if terms:
+        scores = bm25_scores(manager.get_chunk_postings(task_id, terms), index["lengths"])
+        rankings.append(sorted(scores, key=scores.get, reverse=True))
+    if index["embeddings"] is not None:
+        embed = embed or local_embedder()
+        if embed:
+            try:
+                query_vector = _normalized(embed([query]))[0]
+                if query_vector.shape[0] == index["embeddings"].shape[1]:
+                    similarity = index["embeddings"] @ query_vector
+                    rankings.append([int(i) for i in np.argsort(-similarity)[:max(limit * 4, 20)]])
+            except Exception as e:
+                logging.warning(f"Query embedding failed, using keyword search only: {e}")
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking):
+            fused[chunk] = fused.get(chunk, 0.0) + 1.0 / (RRF_K + rank + 1)
+    best = sorted(fused, key=lambda chunk: (-fused[chunk], chunk))[:limit]
+    texts = manager.get_chunk_texts(task_id, best)
+    return [{"chunk": chunk, "text": texts[chunk], "score": round(fused[chunk], 6)} for chunk in best if chunk in texts]
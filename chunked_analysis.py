@@ -0,0 +1,195 @@
+"""
+Map-reduce LLM analysis of long pages.
+
+``scrape_and_analyze`` used to send the first 2000 characters of a page to
+Gemini, so most of a long page was never read. ``analyze_blocks`` reads all
+of it:
+
+1. The page is cut into semantic chunks of about ``ANALYSIS_CHUNK_CHARS``
+   (see ``text_chunks.py``). A page that fits in one chunk is a single call.
+2. Map: each chunk is analyzed on its own, in parallel on the shared network
+   pool (``core.executors``), with as many calls at once as there are Gemini
+   keys with quota left (at most ``ANALYSIS_MAX_PARALLEL``).
+3. Reduce: consecutive partial results are combined in groups of up to
+   ``ANALYSIS_REDUCE_FAN_IN``, level by level, until one result is left.
+
+Calls are planned against ``gemini.get_request_budget()``. When the map and
+reduce calls would not fit in the requests the keys have left, chunks are
+made larger (up to ``ANALYSIS_MAX_CHUNK_CHARS``) so fewer calls are needed.
+
+Every map and reduce result is cached in the task store. The key is a hash
+of the analysis, the prompt and the input text. Re-analyzing a page, or
+another page that shares content with it, only calls the model for text it
+has not seen.
+"""
+
+import hashlib
+import logging
+import math
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from core.config import settings
+from core.executors import NETWORK, category_executors
+from task_data_manager import task_manager
+from text_chunks import TextBlock, chunk_hash, pack_chunks, total_chars
+
+PROMPTS = {
+    "summarize": {
+        "single": "Summarize the following content{title}:\n\n{text}",
+        "map": ("The following is one part of a longer web page{title}. Summarize this part, keeping its key "
+                "facts, figures, names and conclusions.\n\n{text}"),
+        "reduce": ("The following are summaries of consecutive parts of a web page{title}. Combine them into "
+                   "one coherent summary of the whole page without repeating points.\n\n{text}"),
+    },
+    "extract_data": {
+        "single": "Extract key data points from the following content{title}:\n\n{text}",
+        "map": ("The following is one part of a longer web page{title}. Extract the key data points from this "
+                "part (facts, figures, dates, names, prices) as a bullet list.\n\n{text}"),
+        "reduce": ("The following are data points extracted from consecutive parts of a web page{title}. Merge "
+                   "them into one bullet list, removing duplicates.\n\n{text}"),
+    },
+}
+ANALYSES = tuple(PROMPTS)
+PART_SEPARATOR = "\n\n---\n\n"
+
+
+def _setting(name: str, default: int) -> int:
+    return int(getattr(settings, name, default) or default)
+
+
+def reduce_calls(parts: int, fan_in: int) -> int:
+    """Reduce calls needed to combine ``parts`` results, ``fan_in`` at a time."""
+    calls = 0
+    while parts > 1:
+        parts = math.ceil(parts / fan_in)
+        calls += parts
+    return calls
+
+
+class _Run:
+    """One analysis: prompts, cache keys, the call budget and the counters reported back."""
+
+    def __init__(self, analysis: str, title: str, generate: Callable[[str], str], workers: int):
+        self.analysis = analysis
+        self.title = f' titled "{title}"' if title else ""
+        self.generate = generate
+        self.workers = max(1, workers)
+        self.calls = 0
+        self.cached = 0
+        self.failed: List[str] = []
+
+    def key(self, stage: str, text_hash: str) -> str:
+        template = PROMPTS[self.analysis][stage]
+        return hashlib.sha256(f"{self.analysis}\0{stage}\0{template}\0{self.title}\0{text_hash}".encode("utf-8")).hexdigest()
+
+    def cached_results(self, stage: str, texts: Sequence[str]) -> Dict[str, str]:
+        try:
+            return task_manager.get_cached_analyses([self.key(stage, chunk_hash(text)) for text in texts])
+        except Exception as e:
+            logging.warning(f"Analysis cache unavailable: {e}")
+            return {}
+
+    def run_stage(self, stage: str, texts: Sequence[str]) -> List[Optional[str]]:
+        """Results for ``texts`` in order: cached ones first, the rest generated in parallel (None on failure)."""
+        keys = [self.key(stage, chunk_hash(text)) for text in texts]
+        found = self.cached_results(stage, texts)
+        self.cached += sum(1 for key in keys if key in found)
+        missing = [i for i, key in enumerate(keys) if key not in found]
+
+        def call(i: int) -> Optional[str]:
+            prompt = PROMPTS[self.analysis][stage].format(title=self.title, text=texts[i])
+            try:
+                result = self.generate(prompt)
+            except Exception as e:
+                detail = getattr(e, "detail", None) or str(e)
+                logging.warning(f"{stage} call {i + 1}/{len(texts)} of '{self.analysis}' analysis failed: {detail}")
+                self.failed.append(f"{stage} {i + 1}: {detail}")
+                return None
+            try:
+                task_manager.save_cached_analysis(keys[i], self.analysis, stage, result)
+            except Exception as e:
+                logging.warning(f"Could not cache {stage} result: {e}")
+            return result
+
+        if missing:
+            self.calls += len(missing)
+            for i, result in zip(missing, category_executors.map(NETWORK, call, missing, limit=self.workers)):
+                found[keys[i]] = result
+        return [found.get(key) for key in keys]
+
+
+def analyze_blocks(blocks: Sequence[TextBlock], analysis: str = "summarize", title: str = "",
+                   generate: Optional[Callable[[str], str]] = None, budget: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """Analyze the whole of ``blocks`` with map-reduce (see module docstring).
+
+    Returns ``result`` (the analysis text) with ``chunks``, ``calls``, ``cached``, ``levels``,
+    ``chunk_chars`` and any ``failed`` parts. Raises only when every part failed.
+    """
+    if analysis not in PROMPTS:
+        raise ValueError(f"Unsupported analysis type '{analysis}'; expected one of {', '.join(ANALYSES)}")
+    if generate is None or budget is None:
+        import gemini
+        generate = generate or gemini.generate_text
+        if budget is None:
+            try:
+                budget = gemini.get_request_budget()
+            except Exception as e:
+                logging.warning(f"Gemini request budget unavailable: {e}")
+                budget = {}
+    chunk_chars = _setting("ANALYSIS_CHUNK_CHARS", 12000)
+    max_chunk_chars = max(chunk_chars, _setting("ANALYSIS_MAX_CHUNK_CHARS", 60000))
+    fan_in = max(2, _setting("ANALYSIS_REDUCE_FAN_IN", 6))
+    workers = min(_setting("ANALYSIS_MAX_PARALLEL", 4), budget.get("keys") or _setting("ANALYSIS_MAX_PARALLEL", 4))
+    run = _Run(analysis, title, generate, workers)
+
+    chunks = pack_chunks(blocks, chunk_chars)
+    requests_left = budget.get("requests") or 0
+    if requests_left and len(chunks) > 1:
+        uncached = len(chunks) - len(run.cached_results("map", [chunk.as_prompt_text() for chunk in chunks]))
+        if uncached + reduce_calls(len(chunks), fan_in) > requests_left:
+            # Fewer, larger chunks so the whole page fits in the requests the keys have left
+            parts = 1
+            while parts + 1 + reduce_calls(parts + 1, fan_in) <= requests_left:
+                parts += 1
+            chunk_chars = min(max_chunk_chars, math.ceil(total_chars(blocks) / parts))
+            chunks = pack_chunks(blocks, chunk_chars)
+            # Chunks break early at headings, so packing can need more parts than the estimate
+            while len(chunks) > parts and chunk_chars < max_chunk_chars:
+                chunk_chars = min(max_chunk_chars, math.ceil(chunk_chars * 1.25))
+                chunks = pack_chunks(blocks, chunk_chars)
+            logging.info(f"Analysis budget is {requests_left} requests; using {len(chunks)} chunks of up to {chunk_chars} characters")
+
+    report = {"chunks": len(chunks), "chunk_chars": chunk_chars, "levels": 0}
+    if not chunks:
+        return {**report, "result": "", "calls": 0, "cached": 0}
+    if len(chunks) == 1:
+        results = run.run_stage("single", [chunks[0].text])
+    else:
+        results = run.run_stage("map", [chunk.as_prompt_text() for chunk in chunks])
+        while len(results) > 1:
+            parts = [result for result in results if result]
+            if not parts:
+                break
+            groups: List[List[str]] = [[]]
+            for part in parts:
+                group = groups[-1]
+                if group and (len(group) >= fan_in or sum(map(len, group)) + len(part) > max_chunk_chars):
+                    groups.append([part])
+                else:
+                    group.append(part)
+            if len(groups) == len(parts) and len(parts) > 1:
+                # Every part is too long to share a prompt; combine pairs anyway so the reduction ends
+                groups = [parts[i:i + 2] for i in range(0, len(parts), 2)]
+            report["levels"] += 1
+            combined = run.run_stage("reduce", [PART_SEPARATOR.join(group) for group in groups if len(group) > 1])
+            merged = iter(combined)
+            results = [next(merged) if len(group) > 1 else group[0] for group in groups]
+            if len(results) == 1 and results[0] is None:
+                results = [PART_SEPARATOR.join(parts)]
+    result = next((result for result in results if result), None)
+    if result is None:
+        raise RuntimeError(f"'{analysis}' analysis failed: {run.failed[0] if run.failed else 'no result'}")
+    report.update(result=result, calls=run.calls, cached=run.cached)
+    if run.failed:
+        report["failed"] = run.failed
+    return report
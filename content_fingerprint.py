@@ -0,0 +1,154 @@
+"""
+Content fingerprints and block diffs for repeated scrapes of the same page.
+
+``page_blocks`` flattens ``extract_page`` data into an ordered list of
+blocks: the title, each heading, paragraph, list, link, image, form and
+structured-data item, each table header and table row. The page-wide
+``full_text`` is split into word runs at content-defined boundaries, so an
+edit only changes the runs around it; it is stored with whitespace collapsed.
+A block's hash covers its kind and its text with whitespace collapsed. The
+page fingerprint hashes the sequence of block hashes.
+
+``TaskDataManager`` keys the stored blocks by hash, so a re-scrape only
+writes blocks it has not seen before. ``diff_blocks`` describes what changed
+between two versions. ``assemble_blocks`` rebuilds the ``data`` dict.
+"""
+
+import difflib
+import hashlib
+import json
+import re
+import unicodedata
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Blocks are (kind, content) pairs
+Block = Tuple[str, Any]
+
+_WHITESPACE = re.compile(r"\s+")
+# full_text runs: cut after a word whose CRC ends in these bits, within these lengths
+_RUN_BOUNDARY_MASK = 0x0F
+_RUN_MIN_WORDS = 8
+_RUN_MAX_WORDS = 256
+
+_TEXT_KINDS = {"heading": "headings", "paragraph": "paragraphs", "list": "lists"}
+_ITEM_KINDS = {"link": "links", "image": "images", "form": "forms", "structured": "structured_data"}
+
+
+def normalize_text(value: Any) -> Any:
+    """Collapse whitespace (NFKC) in every string of ``value``, recursively."""
+    if isinstance(value, str):
+        return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", value)).strip()
+    if isinstance(value, dict):
+        return {key: normalize_text(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_text(item) for item in value]
+    return value
+
+
+def block_hash(kind: str, content: Any) -> str:
+    canonical = json.dumps(normalize_text(content), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(f"{kind}\0{canonical}".encode("utf-8")).hexdigest()[:32]
+
+
+def text_runs(text: str) -> List[str]:
+    """Split ``text`` into word runs whose boundaries depend only on nearby words."""
+    runs, current = [], []
+    for word in (text or "").split():
+        current.append(word)
+        boundary = (zlib.crc32(word.encode("utf-8")) & _RUN_BOUNDARY_MASK) == 0
+        if (boundary and len(current) >= _RUN_MIN_WORDS) or len(current) >= _RUN_MAX_WORDS:
+            runs.append(" ".join(current))
+            current = []
+    if current:
+        runs.append(" ".join(current))
+    return runs
+
+
+def page_blocks(data: Dict[str, Any]) -> Tuple[List[str], List[Block]]:
+    """``(sections, blocks)`` for ``extract_page`` data; ``sections`` are the keys present in ``data``."""
+    sections, blocks = list(data), []
+    text_content = data.get("text_content")
+    if text_content is not None:
+        blocks.append(("title", text_content.get("title")))
+        for kind, key in _TEXT_KINDS.items():
+            blocks.extend((kind, item) for item in text_content.get(key, []))
+        if "full_text" in text_content:
+            blocks.append(("full_text", None))
+            blocks.extend(("text", run) for run in text_runs(text_content["full_text"]))
+    for kind, key in _ITEM_KINDS.items():
+        blocks.extend((kind, item) for item in data.get(key) or [])
+    for table in data.get("tables") or []:
+        blocks.append(("table", {k: v for k, v in table.items() if k != "data"}))
+        blocks.extend(("row", row) for row in table.get("data", []))
+    for key in sections:
+        if key not in ("text_content", "tables") and key not in _ITEM_KINDS.values():
+            blocks.append((f"section:{key}", data[key]))
+    return sections, blocks
+
+
+def page_fingerprint(block_hashes: Sequence[str], sections: Sequence[str]) -> str:
+    return hashlib.sha256(json.dumps([list(sections), list(block_hashes)]).encode("utf-8")).hexdigest()
+
+
+def fingerprint(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Page fingerprint, block hashes and blocks of ``extract_page`` data."""
+    sections, blocks = page_blocks(data)
+    hashes = [block_hash(kind, content) for kind, content in blocks]
+    return {"page_hash": page_fingerprint(hashes, sections), "sections": sections,
+            "block_hashes": hashes, "blocks": blocks}
+
+
+def assemble_blocks(sections: Sequence[str], blocks: Iterable[Block]) -> Dict[str, Any]:
+    """Inverse of ``page_blocks``."""
+    data: Dict[str, Any] = {}
+    for key in sections:
+        if key == "text_content":
+            data[key] = {"title": None, "headings": [], "paragraphs": [], "lists": []}
+        elif key == "tables" or key in _ITEM_KINDS.values():
+            data[key] = []
+        else:
+            data[key] = None
+    for kind, content in blocks:
+        if kind == "title":
+            data["text_content"]["title"] = content
+        elif kind in _TEXT_KINDS:
+            data["text_content"][_TEXT_KINDS[kind]].append(content)
+        elif kind == "full_text":
+            data["text_content"]["full_text"] = ""
+        elif kind == "text":
+            full_text = data["text_content"]["full_text"]
+            data["text_content"]["full_text"] = f"{full_text} {content}" if full_text else content
+        elif kind in _ITEM_KINDS:
+            data[_ITEM_KINDS[kind]].append(content)
+        elif kind == "table":
+            data["tables"].append({**content, "data": []})
+        elif kind == "row":
+            data["tables"][-1]["data"].append(content)
+        elif kind.startswith("section:"):
+            data[kind[len("section:"):]] = content
+    return data
+
+
+def diff_blocks(old_hashes: Sequence[str], new_hashes: Sequence[str]) -> Dict[str, Any]:
+    """Block-level diff: counts, plus ``ops`` as ``[tag, old_start, old_end, new_start, new_end]``."""
+    matcher = difflib.SequenceMatcher(None, list(old_hashes), list(new_hashes), autojunk=False)
+    ops = [[tag, i1, i2, j1, j2] for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"]
+    added = sum(j2 - j1 for tag, i1, i2, j1, j2 in ops)
+    removed = sum(i2 - i1 for tag, i1, i2, j1, j2 in ops)
+    return {"added": added, "removed": removed, "unchanged": len(new_hashes) - added, "ops": ops}
+
+
+def describe_diff(diff: Dict[str, Any], old_blocks: Sequence[Block], new_blocks: Sequence[Block],
+                  max_ops: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Readable form of ``diff["ops"]``: what was added, removed or replaced, block by block."""
+    changes = []
+    for tag, i1, i2, j1, j2 in diff["ops"][:max_ops]:
+        change: Dict[str, Any] = {"op": {"insert": "added", "delete": "removed", "replace": "replaced"}[tag],
+                                  "position": j1}
+        if i2 > i1:
+            change["removed"] = [{"kind": kind, "content": content} for kind, content in old_blocks[i1:i2]]
+        if j2 > j1:
+            change["added"] = [{"kind": kind, "content": content} for kind, content in new_blocks[j1:j2]]
+        changes.append(change)
+    return changes
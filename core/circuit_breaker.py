@@ -8,9 +8,10 @@ import time
 import threading
 import inspect
 from functools import wraps
-from typing import Any, Callable, Dict, Optional, Type
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple, Type
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from core.config import settings
 from core.logging import get_logger
 
@@ -26,18 +27,32 @@ class CircuitState(Enum):
 
 @dataclass
 class CircuitBreakerConfig:
-    """Configuration for circuit breaker."""
+    """Configuration for circuit breaker.
+    
+    The circuit opens when, within the last ``window_size`` calls made in the
+    last ``window_seconds``, at least ``failure_threshold`` calls were recorded
+    and the failure rate reaches ``failure_rate_threshold``. After
+    ``recovery_timeout`` up to ``half_open_max_calls`` probe calls may run
+    concurrently; the circuit closes once that many probes have succeeded and
+    re-opens on the first probe failure.
+    """
     failure_threshold: int = 5
     recovery_timeout: float = 60.0
     expected_exception: Type[Exception] = Exception
     name: str = "default"
+    failure_rate_threshold: float = field(default_factory=lambda: float(getattr(settings, 'CIRCUIT_BREAKER_FAILURE_RATE', 0.5)))
+    window_size: int = field(default_factory=lambda: int(getattr(settings, 'CIRCUIT_BREAKER_WINDOW_SIZE', 20)))
+    window_seconds: float = field(default_factory=lambda: float(getattr(settings, 'CIRCUIT_BREAKER_WINDOW_SECONDS', 60.0)))
+    half_open_max_calls: int = field(default_factory=lambda: int(getattr(settings, 'CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS', 1)))
 
 
 class CircuitBreaker:
     """Circuit breaker implementation.
     
-    Monitors failures and opens the circuit when failure threshold is exceeded.
-    After recovery timeout, allows test calls to check if service has recovered.
+    Tracks call outcomes in a sliding window and opens the circuit when the
+    failure rate gets too high. The lock only guards state transitions and
+    window bookkeeping; protected calls run outside of it, so concurrent
+    callers are never serialized by the breaker.
     """
     
     def __init__(self, config: CircuitBreakerConfig):
@@ -45,15 +60,31 @@ class CircuitBreaker:
         self.state = CircuitState.CLOSED
         self.failure_count = 0
         self.last_failure_time = 0.0
+        self.opened_at = 0.0
         self.lock = threading.RLock()
+        # (timestamp, succeeded) for recent calls, newest last
+        self._outcomes: Deque[Tuple[float, bool]] = deque(maxlen=max(1, config.window_size))
+        # Bumped on every state transition so late results from calls admitted
+        # under a previous state do not skew the current one.
+        self._generation = 0
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+        self.rejected_calls = 0
         
     def __call__(self, func: Callable) -> Callable:
         """Decorator to wrap functions with circuit breaker.
         Ensures FastAPI can introspect the original function signature.
+        Coroutine functions get an async wrapper so they stay awaitable.
         """
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            return self.call(func, *args, **kwargs)
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await self.acall(func, *args, **kwargs)
+            wrapper = async_wrapper
+        else:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                return self.call(func, *args, **kwargs)
         # Explicitly preserve the original signature for frameworks that rely on it
         try:
             wrapper.__signature__ = inspect.signature(func)  # type: ignore[attr-defined]
@@ -61,54 +92,145 @@ class CircuitBreaker:
             pass
         return wrapper
     
-    def call(self, func: Callable, *args, **kwargs) -> Any:
-        """Execute function with circuit breaker protection."""
+    def _acquire(self) -> Tuple[int, bool]:
+        """Admit a call or raise CircuitBreakerOpenError.
+        
+        Returns the state generation the call was admitted under and whether
+        it is a half-open probe.
+        """
         with self.lock:
             if self.state == CircuitState.OPEN:
                 if self._should_attempt_reset():
-                    self.state = CircuitState.HALF_OPEN
-                    logger.info(f"Circuit breaker '{self.config.name}' transitioning to HALF_OPEN")
+                    self._transition(CircuitState.HALF_OPEN)
                 else:
+                    self.rejected_calls += 1
                     raise CircuitBreakerOpenError(
                         f"Circuit breaker '{self.config.name}' is OPEN"
                     )
-            
-            try:
-                result = func(*args, **kwargs)
-                self._on_success()
-                return result
-            except self.config.expected_exception as e:
-                self._on_failure()
-                raise e
+            if self.state == CircuitState.HALF_OPEN:
+                if self._half_open_in_flight >= max(1, self.config.half_open_max_calls):
+                    self.rejected_calls += 1
+                    raise CircuitBreakerOpenError(
+                        f"Circuit breaker '{self.config.name}' is HALF_OPEN and all probe slots are busy"
+                    )
+                self._half_open_in_flight += 1
+                return self._generation, True
+            return self._generation, False
+    
+    def _release(self, generation: int, probe: bool, succeeded: Optional[bool]):
+        """Record the outcome of an admitted call (``None`` = not counted)."""
+        with self.lock:
+            if generation != self._generation:
+                return
+            if probe:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+            if succeeded is None:
+                return
+            if succeeded:
+                self._on_success(probe)
+            else:
+                self._on_failure(probe)
+    
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """Execute function with circuit breaker protection.
+        
+        The protected call itself runs outside the lock, so concurrent callers
+        are not serialized behind each other.
+        """
+        generation, probe = self._acquire()
+        succeeded = None
+        try:
+            result = func(*args, **kwargs)
+            succeeded = True
+            return result
+        except self.config.expected_exception:
+            succeeded = False
+            raise
+        finally:
+            self._release(generation, probe, succeeded)
+    
+    async def acall(self, func: Callable, *args, **kwargs) -> Any:
+        """Await a coroutine function with circuit breaker protection."""
+        generation, probe = self._acquire()
+        succeeded = None
+        try:
+            result = await func(*args, **kwargs)
+            succeeded = True
+            return result
+        except self.config.expected_exception:
+            succeeded = False
+            raise
+        finally:
+            self._release(generation, probe, succeeded)
     
     def _should_attempt_reset(self) -> bool:
         """Check if enough time has passed to attempt reset."""
-        return time.time() - self.last_failure_time >= self.config.recovery_timeout
+        return time.time() - self.opened_at >= self.config.recovery_timeout
     
-    def _on_success(self):
-        """Handle successful call."""
-        if self.state == CircuitState.HALF_OPEN:
-            self.state = CircuitState.CLOSED
-            logger.info(f"Circuit breaker '{self.config.name}' reset to CLOSED")
-        self.failure_count = 0
-    
-    def _on_failure(self):
-        """Handle failed call."""
-        self.failure_count += 1
-        self.last_failure_time = time.time()
-        
-        if self.failure_count >= self.config.failure_threshold:
-            self.state = CircuitState.OPEN
+    def _transition(self, state: CircuitState):
+        """Move to a new state. Caller must hold the lock."""
+        self.state = state
+        self._generation += 1
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+        if state == CircuitState.OPEN:
+            self.opened_at = time.time()
             logger.warning(
-                f"Circuit breaker '{self.config.name}' opened after {self.failure_count} failures"
+                f"Circuit breaker '{self.config.name}' opened "
+                f"(failure rate {self.failure_rate:.0%} over {len(self._outcomes)} calls)"
             )
+        elif state == CircuitState.HALF_OPEN:
+            logger.info(f"Circuit breaker '{self.config.name}' transitioning to HALF_OPEN")
+        else:
+            self._outcomes.clear()
+            self.failure_count = 0
+            logger.info(f"Circuit breaker '{self.config.name}' reset to CLOSED")
+    
+    def _prune_window(self, now: float):
+        """Drop outcomes older than the time window. Caller must hold the lock."""
+        cutoff = now - self.config.window_seconds
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
+        self.failure_count = sum(1 for _, ok in self._outcomes if not ok)
+    
+    def _on_success(self, probe: bool = False):
+        """Handle successful call. Caller must hold the lock."""
+        if probe:
+            self._half_open_successes += 1
+            if self._half_open_successes >= max(1, self.config.half_open_max_calls):
+                self._transition(CircuitState.CLOSED)
+            return
+        now = time.time()
+        self._outcomes.append((now, True))
+        self._prune_window(now)
+    
+    def _on_failure(self, probe: bool = False):
+        """Handle failed call. Caller must hold the lock."""
+        now = time.time()
+        self.last_failure_time = now
+        if probe:
+            self._transition(CircuitState.OPEN)
+            return
+        self._outcomes.append((now, False))
+        self._prune_window(now)
+        if (self.state == CircuitState.CLOSED
+                and self.failure_count >= self.config.failure_threshold
+                and self.failure_rate >= self.config.failure_rate_threshold):
+            self._transition(CircuitState.OPEN)
+    
+    @property
+    def failure_rate(self) -> float:
+        """Failure rate over the current sliding window."""
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for _, ok in self._outcomes if not ok) / len(self._outcomes)
     
     def reset(self):
         """Manually reset the circuit breaker."""
         with self.lock:
-            self.state = CircuitState.CLOSED
-            self.failure_count = 0
+            self._transition(CircuitState.CLOSED)
             self.last_failure_time = 0.0
+            self.opened_at = 0.0
             logger.info(f"Circuit breaker '{self.config.name}' manually reset")
     
     @property
@@ -140,10 +262,14 @@ class CircuitBreakerManager:
             if name not in self.breakers:
                 if config is None:
                     # Use default config from settings
+                    expected_exception = getattr(settings, 'CIRCUIT_BREAKER_EXPECTED_EXCEPTION', Exception)
+                    if not (isinstance(expected_exception, type) and issubclass(expected_exception, BaseException)):
+                        # The setting is a boolean flag in core.config
+                        expected_exception = Exception
                     config = CircuitBreakerConfig(
                         failure_threshold=getattr(settings, 'CIRCUIT_BREAKER_FAILURE_THRESHOLD', 5),
                         recovery_timeout=float(getattr(settings, 'CIRCUIT_BREAKER_RECOVERY_TIMEOUT', 60.0)),
-                        expected_exception=getattr(settings, 'CIRCUIT_BREAKER_EXPECTED_EXCEPTION', Exception),
+                        expected_exception=expected_exception,
                         name=name
                     )
                 else:
@@ -167,6 +293,10 @@ class CircuitBreakerManager:
                 name: {
                     'state': breaker.state.value,
                     'failure_count': breaker.failure_count,
+                    'failure_rate': round(breaker.failure_rate, 3),
+                    'window_calls': len(breaker._outcomes),
+                    'half_open_in_flight': breaker._half_open_in_flight,
+                    'rejected_calls': breaker.rejected_calls,
                     'last_failure_time': breaker.last_failure_time,
                     'is_open': breaker.is_open,
                     'is_closed': breaker.is_closed
@@ -96,6 +96,10 @@ class Settings(BaseSettings):
     CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = int(os.environ.get("CIRCUIT_BREAKER_FAILURE_THRESHOLD", 5))
     CIRCUIT_BREAKER_RECOVERY_TIMEOUT: int = int(os.environ.get("CIRCUIT_BREAKER_RECOVERY_TIMEOUT", 60))
     CIRCUIT_BREAKER_EXPECTED_EXCEPTION: bool = os.environ.get("CIRCUIT_BREAKER_EXPECTED_EXCEPTION", "True").lower() == "true"
+    CIRCUIT_BREAKER_FAILURE_RATE: float = float(os.environ.get("CIRCUIT_BREAKER_FAILURE_RATE", 0.5))
+    CIRCUIT_BREAKER_WINDOW_SIZE: int = int(os.environ.get("CIRCUIT_BREAKER_WINDOW_SIZE", 20))
+    CIRCUIT_BREAKER_WINDOW_SECONDS: float = float(os.environ.get("CIRCUIT_BREAKER_WINDOW_SECONDS", 60.0))
+    CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS: int = int(os.environ.get("CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS", 1))
     
     # Memory and embedding settings
     EMBEDDING_BATCH_SIZE: int = int(os.environ.get("EMBEDDING_BATCH_SIZE", 10))
@@ -118,6 +122,103 @@ class Settings(BaseSettings):
     MAX_CONSECUTIVE_FAILURES: int = int(os.environ.get("MAX_CONSECUTIVE_FAILURES", 3))
     AGENT_DECISION_RETRY_ATTEMPTS: int = int(os.environ.get("AGENT_DECISION_RETRY_ATTEMPTS", 3))
     BROWSER_ERROR_EXTRA_DELAY: bool = os.environ.get("BROWSER_ERROR_EXTRA_DELAY", "True").lower() == "true"
+    PLAN_MAX_PARALLEL_STEPS: int = int(os.environ.get("PLAN_MAX_PARALLEL_STEPS", 4))
+
+    # Per-category executors for blocking tool calls made from async handlers
+    BROWSER_EXECUTOR_WORKERS: int = int(os.environ.get("BROWSER_EXECUTOR_WORKERS", 4))
+    NETWORK_EXECUTOR_WORKERS: int = int(os.environ.get("NETWORK_EXECUTOR_WORKERS", 16))
+    CPU_EXECUTOR_WORKERS: int = int(os.environ.get("CPU_EXECUTOR_WORKERS", 0))  # 0 = os.cpu_count()
+
+    # Warm pool of headless Chrome drivers (0 disables pooling); idle drivers are
+    # only pre-launched when BROWSER_POOL_WARM_ON_STARTUP is set
+    BROWSER_POOL_SIZE: int = int(os.environ.get("BROWSER_POOL_SIZE", 1))
+    BROWSER_POOL_MAX_USES: int = int(os.environ.get("BROWSER_POOL_MAX_USES", 20))
+    BROWSER_POOL_MAX_RSS_MB: int = int(os.environ.get("BROWSER_POOL_MAX_RSS_MB", 512))
+    BROWSER_POOL_WARM_ON_STARTUP: bool = os.environ.get("BROWSER_POOL_WARM_ON_STARTUP", "False").lower() == "true"
+    # Run each browser_id as an isolated context inside shared Chrome processes
+    BROWSER_MULTIPLEX_CONTEXTS: bool = os.environ.get("BROWSER_MULTIPLEX_CONTEXTS", "False").lower() == "true"
+    BROWSER_CONTEXTS_PER_PROCESS: int = int(os.environ.get("BROWSER_CONTEXTS_PER_PROCESS", 8))
+    # Browser automation backend for the agent loop: 'selenium' or 'cdp' (async, see cdp_browser.py)
+    BROWSER_BACKEND: str = os.environ.get("BROWSER_BACKEND", "selenium")
+    CHROME_BINARY: str = os.environ.get("CHROME_BINARY", "")
+    # Default network profile for open_browser: 'scrape-fast', 'interactive' or 'full' (see network_profiles.py)
+    BROWSER_NETWORK_PROFILE: str = os.environ.get("BROWSER_NETWORK_PROFILE", "interactive")
+    # Page settling: quiet window without DOM mutations or requests, the max wait, and the max total wait of
+    # all settles while scrolling a scraped page (see page_settle.py)
+    PAGE_SETTLE_QUIET_MS: int = int(os.environ.get("PAGE_SETTLE_QUIET_MS", 500))
+    PAGE_SETTLE_TIMEOUT: float = float(os.environ.get("PAGE_SETTLE_TIMEOUT", 10.0))
+    PAGE_SCROLL_SETTLE_TIMEOUT: float = float(os.environ.get("PAGE_SCROLL_SETTLE_TIMEOUT", 9.0))
+    # get_page_content for agent steps: 'text', 'outline', 'links' or 'html' (see page_content.py), capped in the browser
+    AGENT_PAGE_CONTENT_MODE: str = os.environ.get("AGENT_PAGE_CONTENT_MODE", "text")
+    PAGE_CONTENT_MAX_CHARS: int = int(os.environ.get("PAGE_CONTENT_MAX_CHARS", 20000))
+    # Browser session lifecycle (see browser_sessions.py); 0 disables a limit
+    BROWSER_IDLE_TTL: int = int(os.environ.get("BROWSER_IDLE_TTL", 600))
+    BROWSER_REAP_INTERVAL: int = int(os.environ.get("BROWSER_REAP_INTERVAL", 30))
+    BROWSER_MAX_SESSIONS: int = int(os.environ.get("BROWSER_MAX_SESSIONS", 10))
+    BROWSER_MAX_PER_USER: int = int(os.environ.get("BROWSER_MAX_PER_USER", 3))
+    BROWSER_QUEUE_TIMEOUT: int = int(os.environ.get("BROWSER_QUEUE_TIMEOUT", 60))
+    # Unix socket of the shared browser service (browser_service.py); empty keeps drivers in-process
+    BROWSER_SERVICE_SOCKET: str = os.environ.get("BROWSER_SERVICE_SOCKET", "")
+    BROWSER_SERVICE_TIMEOUT: int = int(os.environ.get("BROWSER_SERVICE_TIMEOUT", 300))
+    # Saved service logins (see session_snapshots.py); a detected login is trusted for BROWSER_LOGIN_STATE_TTL seconds
+    BROWSER_SNAPSHOT_DIR: str = os.environ.get("BROWSER_SNAPSHOT_DIR", "./browser_profiles/_snapshots")
+    BROWSER_LOGIN_STATE_TTL: int = int(os.environ.get("BROWSER_LOGIN_STATE_TTL", 1800))
+    # Multi-page crawls for scrape_website_comprehensive(max_depth > 1) (see crawler.py); delays in seconds
+    CRAWL_MAX_PAGES: int = int(os.environ.get("CRAWL_MAX_PAGES", 100))
+    CRAWL_CONCURRENCY: int = int(os.environ.get("CRAWL_CONCURRENCY", 16))
+    CRAWL_PER_HOST_CONNECTIONS: int = int(os.environ.get("CRAWL_PER_HOST_CONNECTIONS", 4))
+    CRAWL_HOST_DELAY: float = float(os.environ.get("CRAWL_HOST_DELAY", 0.25))
+    CRAWL_TIMEOUT: float = float(os.environ.get("CRAWL_TIMEOUT", 20))
+    CRAWL_RESPECT_ROBOTS: bool = os.environ.get("CRAWL_RESPECT_ROBOTS", "True").lower() == "true"
+    CRAWL_BROWSER_CONCURRENCY: int = int(os.environ.get("CRAWL_BROWSER_CONCURRENCY", 2))
+    # HTTP-first fetching (see fetch_strategy.py): pages under FETCH_JS_MIN_WORDS visible words with scripts go to a browser
+    FETCH_JS_MIN_WORDS: int = int(os.environ.get("FETCH_JS_MIN_WORDS", 50))
+    FETCH_DECISION_TTL: int = int(os.environ.get("FETCH_DECISION_TTL", 3600))
+    FETCH_HTTP_TIMEOUT: float = float(os.environ.get("FETCH_HTTP_TIMEOUT", 20))
+    # Streamed scrapes (see scrape_stream.py): items per text/links/images event
+    SCRAPE_STREAM_CHUNK_ITEMS: int = int(os.environ.get("SCRAPE_STREAM_CHUNK_ITEMS", 50))
+    # Chunked LLM analysis (see chunked_analysis.py): chunk size, the largest chunk a tight request budget may use,
+    # parallel calls and how many partial results one reduce call combines
+    ANALYSIS_CHUNK_CHARS: int = int(os.environ.get("ANALYSIS_CHUNK_CHARS", 12000))
+    ANALYSIS_MAX_CHUNK_CHARS: int = int(os.environ.get("ANALYSIS_MAX_CHUNK_CHARS", 60000))
+    ANALYSIS_MAX_PARALLEL: int = int(os.environ.get("ANALYSIS_MAX_PARALLEL", 4))
+    ANALYSIS_REDUCE_FAN_IN: int = int(os.environ.get("ANALYSIS_REDUCE_FAN_IN", 6))
+    # Chat over scraped pages (see chunk_index.py, scraped_chat.py): index chunk size, excerpts per question,
+    # prompt context size and how many tasks' indexes stay in memory
+    CHAT_INDEX_CHUNK_CHARS: int = int(os.environ.get("CHAT_INDEX_CHUNK_CHARS", 1500))
+    CHAT_RETRIEVE_CHUNKS: int = int(os.environ.get("CHAT_RETRIEVE_CHUNKS", 8))
+    CHAT_CONTEXT_CHARS: int = int(os.environ.get("CHAT_CONTEXT_CHARS", 6000))
+    CHAT_INDEX_CACHE_TASKS: int = int(os.environ.get("CHAT_INDEX_CACHE_TASKS", 16))
+    # Extraction templates (see extraction_templates.py): directory of JSON template files, cached results per
+    # domain, compiled specs kept, domains with cached templates and results
+    EXTRACTION_TEMPLATES_DIR: str = os.environ.get("EXTRACTION_TEMPLATES_DIR", "")
+    EXTRACTION_CACHE_PER_DOMAIN: int = int(os.environ.get("EXTRACTION_CACHE_PER_DOMAIN", 128))
+    EXTRACTION_COMPILED_TEMPLATES: int = int(os.environ.get("EXTRACTION_COMPILED_TEMPLATES", 256))
+    EXTRACTION_CACHE_DOMAINS: int = int(os.environ.get("EXTRACTION_CACHE_DOMAINS", 1024))
+    # Table exports (see table_export.py): rows per Arrow record batch / Parquet row group
+    TABLE_EXPORT_BATCH_ROWS: int = int(os.environ.get("TABLE_EXPORT_BATCH_ROWS", 10000))
+    # Shared HTTP cache (see core/http_cache.py); HTTP_CACHE_DOMAIN_TTLS forces "domain=seconds" lifetimes, comma-separated
+    HTTP_CACHE_ENABLED: bool = os.environ.get("HTTP_CACHE_ENABLED", "True").lower() == "true"
+    HTTP_CACHE_PATH: str = os.environ.get("HTTP_CACHE_PATH", "")
+    HTTP_CACHE_MAX_MB: int = int(os.environ.get("HTTP_CACHE_MAX_MB", 256))
+    HTTP_CACHE_HEURISTIC_MAX: int = int(os.environ.get("HTTP_CACHE_HEURISTIC_MAX", 86400))
+    HTTP_CACHE_DOMAIN_TTLS: str = os.environ.get(
+        "HTTP_CACHE_DOMAIN_TTLS", "api.duckduckgo.com=3600,duckduckgo.com=900,www.google.com=900,www.bing.com=900,yandex.com=900"
+    )
+
+    # Background agent runs (see core/job_queue.py and agent_worker.py)
+    AGENT_RUN_BACKGROUND: bool = os.environ.get("AGENT_RUN_BACKGROUND", "False").lower() == "true"
+    AGENT_JOB_DB_PATH: str = os.environ.get("AGENT_JOB_DB_PATH", "")
+    AGENT_JOB_LEASE_SECONDS: int = int(os.environ.get("AGENT_JOB_LEASE_SECONDS", 120))
+    AGENT_JOB_MAX_ATTEMPTS: int = int(os.environ.get("AGENT_JOB_MAX_ATTEMPTS", 3))
+    AGENT_WORKER_PROCESSES: int = int(os.environ.get("AGENT_WORKER_PROCESSES", 2))
+    AGENT_WORKER_POLL_INTERVAL: float = float(os.environ.get("AGENT_WORKER_POLL_INTERVAL", 1.0))
+    AGENT_EVENT_RETENTION_HOURS: int = int(os.environ.get("AGENT_EVENT_RETENTION_HOURS", 24))
+
+    # Local question router thresholds; below them the LLM classifier is used
+    QUESTION_ROUTER_RULE_CONFIDENCE: float = float(os.environ.get("QUESTION_ROUTER_RULE_CONFIDENCE", 0.85))
+    QUESTION_ROUTER_MODEL_CONFIDENCE: float = float(os.environ.get("QUESTION_ROUTER_MODEL_CONFIDENCE", 0.75))
+    QUESTION_ROUTER_USE_EMBEDDINGS: bool = os.environ.get("QUESTION_ROUTER_USE_EMBEDDINGS", "False").lower() == "true"
     
     # Form automation resilience
     FORM_ELEMENT_WAIT_STRATEGIES: int = int(os.environ.get("FORM_ELEMENT_WAIT_STRATEGIES", 3))
@@ -0,0 +1,161 @@
+"""Dedicated thread pools for blocking work started from async handlers.
+
+Async endpoints must not block the event loop, but most of the agent's tools
+(Selenium, requests, cloud SDKs, embedding search) are synchronous. Instead of
+sharing the default threadpool, blocking calls are routed to a pool per
+workload category so that slow browser automation cannot starve LLM/HTTP calls
+and CPU-bound work stays bounded by the number of cores.
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from core.config import settings
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+BROWSER = "browser"
+NETWORK = "network"
+CPU = "cpu"
+
+EXECUTOR_CATEGORIES = (BROWSER, NETWORK, CPU)
+
+
+def _default_sizes() -> Dict[str, int]:
+    cpu_count = os.cpu_count() or 2
+    return {
+        BROWSER: int(getattr(settings, 'BROWSER_EXECUTOR_WORKERS', 4)),
+        NETWORK: int(getattr(settings, 'NETWORK_EXECUTOR_WORKERS', 16)),
+        CPU: int(getattr(settings, 'CPU_EXECUTOR_WORKERS', 0)) or cpu_count,
+    }
+
+
+class CategoryExecutors:
+    """Lazily created thread pools keyed by workload category."""
+
+    def __init__(self, sizes: Optional[Dict[str, int]] = None):
+        self.sizes = sizes or _default_sizes()
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._stats: Dict[str, Dict[str, int]] = {
+            name: {"submitted": 0, "active": 0, "completed": 0, "failed": 0}
+            for name in EXECUTOR_CATEGORIES
+        }
+        self.lock = threading.Lock()
+
+    def get_executor(self, category: str) -> ThreadPoolExecutor:
+        """Return the pool for ``category``, creating it on first use."""
+        if category not in EXECUTOR_CATEGORIES:
+            logger.warning(f"Unknown executor category '{category}', using '{NETWORK}'")
+            category = NETWORK
+        executor = self._executors.get(category)
+        if executor is None:
+            with self.lock:
+                executor = self._executors.get(category)
+                if executor is None:
+                    executor = ThreadPoolExecutor(
+                        max_workers=max(1, self.sizes.get(category, 4)),
+                        thread_name_prefix=f"{category}-worker",
+                    )
+                    self._executors[category] = executor
+                    logger.info(f"Created '{category}' executor with {executor._max_workers} workers")
+        return executor
+
+    def _tracked(self, category: str, func: Callable, *args, **kwargs) -> Any:
+        with self.lock:
+            self._stats[category]["active"] += 1
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            with self.lock:
+                self._stats[category]["failed"] += 1
+            raise
+        finally:
+            with self.lock:
+                self._stats[category]["active"] -= 1
+                self._stats[category]["completed"] += 1
+        return result
+
+    async def run(self, category: str, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking callable on the pool for ``category`` and await it."""
+        if category not in EXECUTOR_CATEGORIES:
+            category = NETWORK
+        executor = self.get_executor(category)
+        with self.lock:
+            self._stats[category]["submitted"] += 1
+        loop = asyncio.get_running_loop()
+        # Like asyncio.to_thread, run in a copy of the caller's context so context variables propagate
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, self._tracked, category, func, *args, **kwargs)
+        return await loop.run_in_executor(executor, call)
+
+    def map(self, category: str, func: Callable, items: Iterable, limit: Optional[int] = None) -> List[Any]:
+        """Blocking ``[func(item) for item in items]`` spread over the pool for ``category``.
+
+        At most ``limit`` items run at once. The calling thread works through the items
+        too, so the call finishes even when made from a busy worker of the same pool.
+        """
+        if category not in EXECUTOR_CATEGORIES:
+            category = NETWORK
+        items = list(items)
+        results: List[Any] = [None] * len(items)
+        indexes = iter(range(len(items)))
+        indexes_lock = threading.Lock()
+
+        def work():
+            while True:
+                with indexes_lock:
+                    i = next(indexes, None)
+                if i is None:
+                    return
+                results[i] = self._tracked(category, func, items[i])
+
+        with self.lock:
+            self._stats[category]["submitted"] += len(items)
+        helpers = max(0, min(limit or len(items), len(items)) - 1)
+        executor = self.get_executor(category)
+        futures = [executor.submit(contextvars.copy_context().run, work) for _ in range(helpers)]
+        work()
+        for future in futures:
+            # Helpers still queued behind busy workers have nothing left to do
+            if not future.cancel():
+                future.result()
+        return results
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Get per-category pool sizes and call counters."""
+        with self.lock:
+            return {
+                name: {
+                    "max_workers": self.sizes.get(name, 0),
+                    "started": name in self._executors,
+                    **counters,
+                }
+                for name, counters in self._stats.items()
+            }
+
+    def shutdown(self, wait: bool = False):
+        """Shut down all pools (used on application shutdown)."""
+        with self.lock:
+            executors = list(self._executors.values())
+            self._executors.clear()
+        for executor in executors:
+            executor.shutdown(wait=wait)
+
+
+# Global executors shared by all async handlers in the process
+category_executors = CategoryExecutors()
+
+
+async def run_in_category(category: str, func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking callable on the shared pool for ``category``.
+
+    Example:
+        html = await run_in_category('browser', browsing.get_page_content, browser_id)
+    """
+    return await category_executors.run(category, func, *args, **kwargs)
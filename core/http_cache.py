@@ -0,0 +1,532 @@
+"""Shared pooled HTTP clients with an on-disk HTTP cache.
+
+Scraping, web search, ``call_api`` and the DuckDuckGo answer lookup each
+made a fresh ``requests.get``. That meant a new TCP/TLS handshake for every
+call, and no reuse of anything already downloaded. This module gives them
+one pooled ``requests.Session`` (``http_session()``). For httpx users it
+provides a caching transport (``CachingTransport``). Both go through one
+SQLite-backed cache that follows RFC 9111 for a private cache:
+
+- GET responses are stored when they are cacheable: a storable status, no
+  ``no-store`` or ``private``, and no ``Vary: *``. The store is shared by
+  every user of the process, so requests carrying credentials
+  (``Authorization``, ``Cookie``, API-key or token headers) are never stored
+  or served from it.
+- A stored response is served without a request while it is fresh.
+  Freshness comes from ``max-age``, then ``Expires``, then the
+  ``Last-Modified`` heuristic, with age computed from ``Date``/``Age``.
+- Stale entries are revalidated with ``If-None-Match`` / ``If-Modified-Since``.
+  A ``304`` refreshes the entry and returns the stored body.
+- Successful unsafe requests (POST, PUT, ...) invalidate the stored entry.
+
+``HTTP_CACHE_DOMAIN_TTLS`` forces a freshness lifetime per domain. The
+lifetime overrides the response's ``max-age``/``no-cache`` (search result
+pages are sent uncacheable), but never ``no-store``, ``private`` or
+credentials. Counters are reported by ``get_stats()`` (see ``/healthz``).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from http.cookiejar import DefaultCookiePolicy
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from core.config import settings
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Statuses that may be stored (RFC 9110 "heuristically cacheable", plus 200/203)
+STORABLE_STATUSES = {200, 203, 204, 300, 301, 308, 404, 405, 410, 414, 501}
+# Hop-by-hop and body-encoding headers; stored bodies are already decoded
+DROPPED_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-encoding", "content-length",
+                   "set-cookie", "set-cookie2", "proxy-authenticate", "trailer", "upgrade"}
+UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+MAX_ENTRY_BYTES = 20 * 1024 * 1024
+# Request headers that make a response specific to one user
+CREDENTIAL_HEADERS = {"authorization", "proxy-authorization", "cookie"}
+CREDENTIAL_HEADER_MARKERS = ("api-key", "apikey", "api_key", "token", "secret", "auth")
+
+
+def has_credentials(request_headers: Mapping[str, str]) -> bool:
+    """True when the request carries anything that identifies a user or an API account."""
+    for name in request_headers.keys():
+        name = name.lower()
+        if name in CREDENTIAL_HEADERS or any(marker in name for marker in CREDENTIAL_HEADER_MARKERS):
+            return True
+    return False
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """``"max-age=60, no-cache"`` -> ``{"max-age": "60", "no-cache": None}``."""
+    directives: Dict[str, Optional[str]] = {}
+    for part in (value or "").split(","):
+        name, sep, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip().strip('"') if sep else None
+    return directives
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def _seconds(value: Optional[str]) -> Optional[int]:
+    try:
+        return max(0, int(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _domain_ttls() -> Dict[str, float]:
+    ttls = {}
+    for item in (getattr(settings, "HTTP_CACHE_DOMAIN_TTLS", "") or "").split(","):
+        domain, _, ttl = item.strip().partition("=")
+        if domain and ttl:
+            try:
+                ttls[domain.lower().lstrip(".")] = float(ttl)
+            except ValueError:
+                logger.warning(f"Ignoring HTTP_CACHE_DOMAIN_TTLS entry '{item}'")
+    return ttls
+
+
+def forced_ttl(url: str) -> Optional[float]:
+    """Operator-configured freshness lifetime for the URL's domain (subdomains included)."""
+    host = (urlparse(url).hostname or "").lower()
+    for domain, ttl in _domain_ttls().items():
+        if host == domain or host.endswith("." + domain):
+            return ttl
+    return None
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    status: int
+    reason: str
+    headers: Dict[str, str]
+    body: bytes
+    request_time: float
+    response_time: float
+    vary: Dict[str, str] = field(default_factory=dict)
+
+    def header(self, name: str) -> Optional[str]:
+        return self.headers.get(name.lower())
+
+    def age(self, now: Optional[float] = None) -> float:
+        """Current age per RFC 9111 section 4.2.3."""
+        now = time.time() if now is None else now
+        date = _http_date(self.header("date")) or self.response_time
+        apparent_age = max(0.0, self.response_time - date)
+        corrected_age = (_seconds(self.header("age")) or 0) + (self.response_time - self.request_time)
+        return max(apparent_age, corrected_age) + (now - self.response_time)
+
+    def freshness_lifetime(self) -> float:
+        ttl = forced_ttl(self.url)
+        if ttl is not None:
+            return ttl
+        cache_control = parse_cache_control(self.header("cache-control"))
+        if "no-cache" in cache_control:
+            return 0.0
+        if "max-age" in cache_control:
+            return float(_seconds(cache_control["max-age"]) or 0)
+        date = _http_date(self.header("date")) or self.response_time
+        if self.header("expires") is not None:
+            expires = _http_date(self.header("expires"))
+            return max(0.0, expires - date) if expires is not None else 0.0
+        last_modified = _http_date(self.header("last-modified"))
+        if last_modified is not None and date > last_modified:
+            return min(0.1 * (date - last_modified), float(getattr(settings, "HTTP_CACHE_HEURISTIC_MAX", 86400)))
+        return 0.0
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return self.age(now) < self.freshness_lifetime()
+
+    def validators(self) -> Dict[str, str]:
+        headers = {}
+        if self.header("etag"):
+            headers["If-None-Match"] = self.header("etag")
+        if self.header("last-modified"):
+            headers["If-Modified-Since"] = self.header("last-modified")
+        return headers
+
+
+def _normalize_headers(headers: Any) -> Dict[str, str]:
+    """Lower-cased response headers without hop-by-hop/encoding fields; repeated fields are joined."""
+    pairs = headers.multi_items() if hasattr(headers, "multi_items") else headers.items()
+    normalized: Dict[str, str] = {}
+    for name, value in pairs:
+        name = name.lower()
+        if name in DROPPED_HEADERS:
+            continue
+        normalized[name] = f"{normalized[name]}, {value}" if name in normalized else value
+    return normalized
+
+
+class HttpCache:
+    """Private HTTP cache stored in a local SQLite database."""
+
+    def __init__(self, db_path: Optional[str] = None, max_bytes: Optional[int] = None):
+        if db_path is None:
+            db_path = getattr(settings, "HTTP_CACHE_PATH", "") or os.path.join(
+                os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "http_cache.db"
+            )
+        self.db_path = db_path
+        self.max_bytes = int(max_bytes if max_bytes is not None else getattr(settings, "HTTP_CACHE_MAX_MB", 256) * 1024 * 1024)
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._stats_lock = threading.Lock()
+        self._stores_since_prune = 0
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "stored": 0, "not_storable": 0,
+                      "invalidated": 0, "bytes_from_cache": 0, "errors": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(getattr(settings, "HTTP_CACHE_ENABLED", True))
+
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        self._ensure_schema()
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA busy_timeout = 30000")
+            yield conn
+        finally:
+            conn.close()
+
+    def _ensure_schema(self):
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS responses (
+                        url TEXT PRIMARY KEY,
+                        status INTEGER NOT NULL,
+                        reason TEXT,
+                        headers TEXT NOT NULL,
+                        vary TEXT NOT NULL,
+                        body BLOB NOT NULL,
+                        request_time REAL NOT NULL,
+                        response_time REAL NOT NULL,
+                        last_used REAL NOT NULL
+                    )
+                ''')
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)")
+                conn.commit()
+            finally:
+                conn.close()
+            self._initialized = True
+
+    def lookup(self, url: str, request_headers: Mapping[str, str]) -> Optional[CacheEntry]:
+        """Stored response for a GET of ``url`` whose Vary'd request headers match, or None."""
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT status, reason, headers, vary, body, request_time, response_time "
+                                   "FROM responses WHERE url = ?", (url,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE responses SET last_used = ? WHERE url = ?", (time.time(), url))
+        except sqlite3.Error as e:
+            self._count("errors")
+            logger.warning(f"HTTP cache lookup failed for {url}: {e}")
+            return None
+        entry = CacheEntry(url, row[0], row[1] or "", json.loads(row[2]), bytes(row[4]), row[5], row[6], json.loads(row[3]))
+        for name, value in entry.vary.items():
+            if (request_headers.get(name) or "") != value:
+                return None
+        return entry
+
+    def storable(self, url: str, status: int, request_headers: Mapping[str, str], response_headers: Mapping[str, str]) -> bool:
+        if status not in STORABLE_STATUSES:
+            return False
+        if (response_headers.get("vary") or "").strip() == "*":
+            return False
+        # The store is shared across users: nothing credentialed or private, even under a forced TTL
+        if has_credentials(request_headers):
+            return False
+        request_cc = parse_cache_control(request_headers.get("cache-control"))
+        response_cc = parse_cache_control(response_headers.get("cache-control"))
+        if {"no-store", "private"} & (set(request_cc) | set(response_cc)):
+            return False
+        if forced_ttl(url) is not None:
+            return True
+        # Worth keeping only if it can be fresh or revalidated later
+        return bool({"max-age", "public"} & set(response_cc) or response_headers.get("expires")
+                    or response_headers.get("etag") or response_headers.get("last-modified"))
+
+    def store(self, url: str, status: int, reason: str, request_headers: Mapping[str, str], response_headers: Any,
+              body: bytes, request_time: float, response_time: float) -> bool:
+        headers = _normalize_headers(response_headers)
+        if not self.storable(url, status, request_headers, headers) or len(body) > MAX_ENTRY_BYTES:
+            self._count("not_storable")
+            return False
+        vary = {name.strip().lower(): request_headers.get(name.strip()) or ""
+                for name in headers.get("vary", "").split(",") if name.strip()}
+        try:
+            with self._connect() as conn:
+                conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             (url, status, reason, json.dumps(headers), json.dumps(vary), sqlite3.Binary(body),
+                              request_time, response_time, time.time()))
+        except sqlite3.Error as e:
+            self._count("errors")
+            logger.warning(f"HTTP cache store failed for {url}: {e}")
+            return False
+        self._count("stored")
+        with self._stats_lock:
+            self._stores_since_prune += 1
+            prune = self._stores_since_prune >= 50
+            if prune:
+                self._stores_since_prune = 0
+        if prune:
+            self.prune()
+        return True
+
+    def refresh(self, entry: CacheEntry, not_modified_headers: Any, request_time: float, response_time: float) -> CacheEntry:
+        """Apply a 304 response to ``entry`` (RFC 9111 section 4.3.4) and persist it."""
+        entry.headers.update(_normalize_headers(not_modified_headers))
+        entry.request_time, entry.response_time = request_time, response_time
+        try:
+            with self._connect() as conn:
+                conn.execute("UPDATE responses SET headers = ?, request_time = ?, response_time = ?, last_used = ? "
+                             "WHERE url = ?", (json.dumps(entry.headers), request_time, response_time, time.time(), entry.url))
+        except sqlite3.Error as e:
+            self._count("errors")
+            logger.warning(f"HTTP cache refresh failed for {entry.url}: {e}")
+        return entry
+
+    def invalidate(self, url: str):
+        try:
+            with self._connect() as conn:
+                removed = conn.execute("DELETE FROM responses WHERE url = ?", (url,)).rowcount
+        except sqlite3.Error as e:
+            self._count("errors")
+            logger.warning(f"HTTP cache invalidation failed for {url}: {e}")
+            return
+        if removed:
+            self._count("invalidated")
+
+    def prune(self):
+        """Drop least recently used entries until the cache fits ``max_bytes``."""
+        try:
+            with self._connect() as conn:
+                total = conn.execute("SELECT COALESCE(SUM(LENGTH(body)), 0) FROM responses").fetchone()[0]
+                if total <= self.max_bytes:
+                    return
+                excess = total - self.max_bytes
+                for url, size in conn.execute("SELECT url, LENGTH(body) FROM responses ORDER BY last_used").fetchall():
+                    if excess <= 0:
+                        break
+                    conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+                    excess -= size
+        except sqlite3.Error as e:
+            self._count("errors")
+            logger.warning(f"HTTP cache prune failed: {e}")
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["revalidated"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["revalidated"]) / lookups, 3) if lookups else None
+        stats["enabled"] = self.enabled
+        try:
+            with self._connect() as conn:
+                stats["entries"], size = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM responses").fetchone()
+            stats["size_mb"] = round(size / (1024 * 1024), 2)
+        except sqlite3.Error:
+            pass
+        return stats
+
+    def before_request(self, method: str, url: str, request_headers: Mapping[str, str]) -> Tuple[Optional[CacheEntry], Dict[str, str]]:
+        """Shared first half of a cached request.
+
+        Returns ``(entry, conditional_headers)``. A fresh entry comes back with
+        empty headers and should be served as is. A stale one comes back with
+        the validators to send. ``(None, {})`` means: send the request unchanged.
+        """
+        if not self.enabled or method != "GET" or has_credentials(request_headers):
+            return None, {}
+        request_cc = parse_cache_control(request_headers.get("cache-control"))
+        if "no-store" in request_cc:
+            return None, {}
+        entry = self.lookup(url, request_headers)
+        if entry is None:
+            self._count("misses")
+            return None, {}
+        revalidate = "no-cache" in request_cc or request_cc.get("max-age") == "0"
+        if not revalidate and entry.is_fresh():
+            self._count("hits")
+            self._count("bytes_from_cache", len(entry.body))
+            return entry, {}
+        validators = entry.validators()
+        if not validators:
+            self._count("misses")
+            return None, {}
+        return entry, validators
+
+    def after_response(self, method: str, url: str, entry: Optional[CacheEntry], status: int, reason: str,
+                       request_headers: Mapping[str, str], response_headers: Any, read_body, request_time: float) -> Optional[CacheEntry]:
+        """Shared second half: returns the entry to serve instead of the response (after a 304), else None.
+
+        ``read_body`` is called only when the response is going to be stored.
+        """
+        response_time = time.time()
+        if method in UNSAFE_METHODS:
+            if status < 400:
+                self.invalidate(url)
+            return None
+        if method != "GET" or not self.enabled:
+            return None
+        if entry is not None and status == 304:
+            self._count("revalidated")
+            self._count("bytes_from_cache", len(entry.body))
+            return self.refresh(entry, response_headers, request_time, response_time)
+        if entry is not None:
+            self._count("misses")
+        if status in STORABLE_STATUSES:
+            headers = _normalize_headers(response_headers)
+            too_large = (_seconds(response_headers.get("content-length")) or 0) > MAX_ENTRY_BYTES
+            if not too_large and self.storable(url, status, request_headers, headers):
+                self.store(url, status, reason, request_headers, response_headers, read_body(), request_time, response_time)
+            else:
+                self._count("not_storable")
+        return None
+
+
+http_cache = HttpCache()
+
+
+class CachingAdapter(HTTPAdapter):
+    """``requests`` transport adapter that serves and stores responses through ``HttpCache``."""
+
+    def __init__(self, cache: Optional[HttpCache] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache or http_cache
+
+    def _cached_response(self, entry: CacheEntry, request) -> requests.Response:
+        response = requests.Response()
+        response.status_code = entry.status
+        response.reason = entry.reason
+        response.headers = CaseInsensitiveDict(entry.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = entry.body
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.from_cache = True
+        return response
+
+    def send(self, request, **kwargs):
+        method = (request.method or "GET").upper()
+        entry, conditional = self.cache.before_request(method, request.url, request.headers)
+        if entry is not None and not conditional:
+            return self._cached_response(entry, request)
+        request.headers.update(conditional)
+        request_time = time.time()
+        response = super().send(request, **kwargs)
+        served = self.cache.after_response(method, request.url, entry, response.status_code, response.reason or "",
+                                           request.headers, response.headers, lambda: response.content, request_time)
+        if served is not None:
+            response.close()
+            return self._cached_response(served, request)
+        response.from_cache = False
+        return response
+
+
+class CachingTransport(httpx.BaseTransport):
+    """httpx transport wrapper with the same caching as ``CachingAdapter``."""
+
+    def __init__(self, transport: Optional[httpx.BaseTransport] = None, cache: Optional[HttpCache] = None):
+        self.transport = transport or httpx.HTTPTransport()
+        self.cache = cache or http_cache
+
+    @staticmethod
+    def _cached_response(entry: CacheEntry, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(entry.status, headers=list(entry.headers.items()), content=entry.body,
+                              request=request, extensions={"from_cache": True})
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        entry, conditional = self.cache.before_request(request.method, url, request.headers)
+        if entry is not None and not conditional:
+            return self._cached_response(entry, request)
+        request.headers.update(conditional)
+        request_time = time.time()
+        response = self.transport.handle_request(request)
+        body: List[bytes] = []
+
+        def read_body() -> bytes:
+            body.append(response.read())
+            return body[0]
+
+        served = self.cache.after_response(request.method, url, entry, response.status_code, response.reason_phrase,
+                                           request.headers, response.headers, read_body, request_time)
+        if served is not None:
+            response.close()
+            return self._cached_response(served, request)
+        if body:
+            # The stream was consumed for the cache; hand back a decoded copy
+            response.close()
+            return httpx.Response(response.status_code, headers=list(_normalize_headers(response.headers).items()),
+                                  content=body[0], request=request, extensions={"from_cache": False})
+        return response
+
+    def close(self):
+        self.transport.close()
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def http_session() -> requests.Session:
+    """Process-wide pooled ``requests.Session`` with the HTTP cache mounted.
+
+    Cookies are never kept, so callers (different users, different APIs)
+    share connections without sharing state.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            adapter = CachingAdapter(pool_connections=32, pool_maxsize=32)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def get_stats() -> Dict[str, Any]:
+    return http_cache.get_stats()
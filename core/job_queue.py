@@ -0,0 +1,284 @@
+"""SQLite-backed durable job queue with leases.
+
+Long-running agent runs do not fit inside a single HTTP request (gunicorn kills
+workers after ``--timeout``). Runs are instead enqueued here and picked up by
+worker processes (see ``agent_worker.py``). A worker leases a job for a limited
+time and keeps extending the lease while it makes progress; if it crashes the
+lease expires and another worker picks the job up again, resuming from the
+last checkpoint stored on the ``AgentSession``.
+
+The queue also carries progress events from workers back to the web processes,
+which relay them to connected websockets.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from core.config import settings
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+ACTIVE_STATUSES = ("queued", "leased")
+
+
+class LeaseLostError(Exception):
+    """Raised in a worker when its lease on a job was taken over or revoked."""
+    pass
+
+
+class JobQueue:
+    """Durable FIFO queue of jobs stored in a local SQLite database."""
+
+    def __init__(self, db_path: Optional[str] = None, max_attempts: Optional[int] = None):
+        if db_path is None:
+            db_path = getattr(settings, 'AGENT_JOB_DB_PATH', '') or os.path.join(
+                os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'agent_jobs.db'
+            )
+        self.db_path = db_path
+        self.max_attempts = int(max_attempts or getattr(settings, 'AGENT_JOB_MAX_ATTEMPTS', 3))
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        self._ensure_schema()
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA busy_timeout = 30000")
+            yield conn
+        finally:
+            conn.close()
+
+    def _ensure_schema(self):
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                # WAL lets the web processes read events while workers write
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS jobs (
+                        id TEXT PRIMARY KEY,
+                        run_id TEXT NOT NULL,
+                        user_id INTEGER NOT NULL,
+                        payload TEXT,
+                        status TEXT NOT NULL,
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        lease_owner TEXT,
+                        lease_expires_at REAL,
+                        progress TEXT,
+                        result TEXT,
+                        last_error TEXT,
+                        created_at REAL NOT NULL,
+                        updated_at REAL NOT NULL
+                    )
+                ''')
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_run_id ON jobs (run_id)")
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS job_events (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        run_id TEXT NOT NULL,
+                        user_id INTEGER NOT NULL,
+                        payload TEXT NOT NULL,
+                        created_at REAL NOT NULL
+                    )
+                ''')
+                conn.commit()
+            finally:
+                conn.close()
+            self._initialized = True
+
+    @staticmethod
+    def _row_to_job(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        for key in ("payload", "progress", "result"):
+            if job.get(key):
+                try:
+                    job[key] = json.loads(job[key])
+                except (TypeError, ValueError):
+                    pass
+        return job
+
+    def enqueue(self, run_id: str, user_id: int, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Enqueue a job for ``run_id``.
+
+        If the run already has a queued or leased job, that job is returned
+        instead of creating a duplicate.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = conn.execute(
+                    "SELECT * FROM jobs WHERE run_id = ? AND status IN (?, ?) ORDER BY created_at DESC LIMIT 1",
+                    (run_id, *ACTIVE_STATUSES),
+                ).fetchone()
+                if existing is not None:
+                    conn.execute("COMMIT")
+                    return self._row_to_job(existing)
+                job_id = str(uuid.uuid4())
+                conn.execute(
+                    "INSERT INTO jobs (id, run_id, user_id, payload, status, created_at, updated_at) VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                    (job_id, run_id, user_id, json.dumps(payload or {}), now, now),
+                )
+                row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        logger.info(f"Enqueued job {job_id} for run {run_id}")
+        return self._row_to_job(row)
+
+    def lease(self, worker_id: str, lease_seconds: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Lease the oldest runnable job, including jobs whose lease expired.
+
+        Expired jobs that already used up ``max_attempts`` are marked failed.
+        """
+        lease_seconds = float(lease_seconds or getattr(settings, 'AGENT_JOB_LEASE_SECONDS', 120))
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', last_error = 'Lease expired too many times', lease_owner = NULL, updated_at = ? "
+                    "WHERE status = 'leased' AND lease_expires_at < ? AND attempts >= ?",
+                    (now, now, self.max_attempts),
+                )
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'leased' AND lease_expires_at < ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                if row["status"] == 'leased':
+                    logger.warning(f"Reclaiming job {row['id']} from expired lease held by {row['lease_owner']}")
+                conn.execute(
+                    "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires_at = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (worker_id, now + lease_seconds, now, row["id"]),
+                )
+                leased = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self._row_to_job(leased)
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: Optional[float] = None,
+                  progress: Optional[Dict[str, Any]] = None) -> bool:
+        """Extend the lease on a job. Returns False if the lease is no longer ours."""
+        lease_seconds = float(lease_seconds or getattr(settings, 'AGENT_JOB_LEASE_SECONDS', 120))
+        now = time.time()
+        with self._connect() as conn:
+            if progress is None:
+                cursor = conn.execute(
+                    "UPDATE jobs SET lease_expires_at = ?, updated_at = ? WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                    (now + lease_seconds, now, job_id, worker_id),
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE jobs SET lease_expires_at = ?, progress = ?, updated_at = ? WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                    (now + lease_seconds, json.dumps(progress), now, job_id, worker_id),
+                )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str, status: str = "completed", result: Any = None) -> bool:
+        """Mark a leased job as finished with the given terminal status."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, lease_owner = NULL, lease_expires_at = NULL, updated_at = ? "
+                "WHERE id = ? AND lease_owner = ?",
+                (status, json.dumps(result), now, job_id, worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> str:
+        """Record a failed attempt. The job is re-queued until ``max_attempts``."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT attempts FROM jobs WHERE id = ? AND lease_owner = ?", (job_id, worker_id)).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return "lost"
+                status = "queued" if row["attempts"] < self.max_attempts else "failed"
+                conn.execute(
+                    "UPDATE jobs SET status = ?, last_error = ?, lease_owner = NULL, lease_expires_at = NULL, updated_at = ? WHERE id = ?",
+                    (status, error[:2000], now, job_id),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return status
+
+    def get_job(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Get the most recent job for a run."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE run_id = ? ORDER BY created_at DESC LIMIT 1", (run_id,)
+            ).fetchone()
+        return self._row_to_job(row)
+
+    def publish_event(self, run_id: str, user_id: int, payload: Dict[str, Any]):
+        """Store a progress event for relaying to the user's websocket."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO job_events (run_id, user_id, payload, created_at) VALUES (?, ?, ?, ?)",
+                (run_id, user_id, json.dumps(payload, default=str), time.time()),
+            )
+
+    def latest_event_id(self) -> int:
+        with self._connect() as conn:
+            row = conn.execute("SELECT COALESCE(MAX(id), 0) FROM job_events").fetchone()
+        return int(row[0])
+
+    def read_events(self, after_id: int, limit: int = 200) -> List[Dict[str, Any]]:
+        """Read events with an id greater than ``after_id`` in insertion order."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM job_events WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit)
+            ).fetchall()
+        events = []
+        for row in rows:
+            event = dict(row)
+            event["payload"] = json.loads(event["payload"])
+            events.append(event)
+        return events
+
+    def prune_events(self, older_than_seconds: float) -> int:
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM job_events WHERE created_at < ?", (time.time() - older_than_seconds,))
+            return cursor.rowcount
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get job counts per status."""
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            oldest = conn.execute("SELECT MIN(created_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        return {
+            "counts": counts,
+            "oldest_queued_age_seconds": round(time.time() - oldest, 1) if oldest else None,
+            "max_attempts": self.max_attempts,
+        }
+
+
+# Global queue for agent runs
+agent_job_queue = JobQueue()
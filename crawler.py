@@ -0,0 +1,354 @@
+"""
+Concurrent multi-page crawler behind ``scrape_website_comprehensive(max_depth > 1)``.
+
+Pages are fetched over HTTP with one shared ``httpx.AsyncClient``. Each host
+gets its own connection limit and a politeness delay; the delay is raised to
+the robots.txt ``Crawl-delay`` when the site sets one. The frontier
+normalizes every URL and remembers it in a Bloom filter, so each page is
+queued at most once. Crawls stop at ``max_depth`` and ``max_pages``.
+robots.txt is fetched once per origin and honoured.
+
+A headless browser is used only for pages that ``fetch_strategy`` judges
+to need JavaScript, and hosts it has already pinned to the browser go
+straight there. Each page is extracted with
+``page_extract.extract_page`` and handed to ``on_page`` as soon as it is
+done, so callers (``scraping_analysis.crawl_website`` saves to the task
+store) consume results while the crawl runs.
+"""
+
+import asyncio
+import hashlib
+import inspect
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+from urllib.robotparser import RobotFileParser
+
+import httpx
+
+from core.config import settings
+from core.executors import run_in_category
+import fetch_strategy
+from fetch_strategy import BROWSER, HTTP, FetchDecisions, js_required_reason
+from page_extract import extract_page
+
+ROBOTS_AGENT = "*"
+
+# Links to files that are never HTML pages
+SKIPPED_EXTENSIONS = {
+    ".pdf", ".zip", ".gz", ".tar", ".rar", ".7z", ".exe", ".dmg", ".iso", ".jpg", ".jpeg", ".png", ".gif",
+    ".webp", ".svg", ".ico", ".bmp", ".mp3", ".mp4", ".avi", ".mov", ".webm", ".woff", ".woff2", ".ttf",
+    ".css", ".js", ".json", ".xml", ".rss", ".csv", ".xls", ".xlsx", ".doc", ".docx", ".ppt", ".pptx",
+}
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "mc_cid", "mc_eid", "ref", "ref_src"}
+
+OnPage = Callable[[Dict[str, Any]], Union[None, Awaitable[None]]]
+
+
+def normalize_url(url: str) -> Optional[str]:
+    """Canonical form used for deduplication, or None for non-HTTP URLs.
+
+    Lowercases scheme and host, drops default ports, fragments and tracking
+    parameters, sorts the query and gives an empty path a ``/``.
+    """
+    try:
+        parsed = urlparse(url.strip())
+    except ValueError:
+        return None
+    scheme = parsed.scheme.lower()
+    if scheme not in ("http", "https") or not parsed.hostname:
+        return None
+    host = parsed.hostname.lower()
+    port = parsed.port if parsed.port and (scheme, parsed.port) not in (("http", 80), ("https", 443)) else None
+    netloc = f"{host}:{port}" if port else host
+    query = sorted((k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+                   if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS)
+    return urlunparse((scheme, netloc, parsed.path or "/", "", urlencode(query), ""))
+
+
+class BloomFilter:
+    """Fixed-size probabilistic set; ``add`` returns False for (probably) seen items."""
+
+    def __init__(self, capacity: int, error_rate: float = 1e-4):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def add(self, item: str) -> bool:
+        new = False
+        for p in self._positions(item):
+            if not self.bits[p >> 3] & (1 << (p & 7)):
+                self.bits[p >> 3] |= 1 << (p & 7)
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+
+class RobotsCache:
+    """robots.txt rules per origin, fetched once per crawl."""
+
+    def __init__(self, client: httpx.AsyncClient, timeout: float = 10):
+        self.client = client
+        self.timeout = timeout
+        self.parsers: Dict[str, Optional[RobotFileParser]] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+
+    async def get(self, origin: str) -> Optional[RobotFileParser]:
+        if origin in self.parsers:
+            return self.parsers[origin]
+        lock = self.locks.setdefault(origin, asyncio.Lock())
+        async with lock:
+            if origin not in self.parsers:
+                self.parsers[origin] = await self._fetch(origin)
+        return self.parsers[origin]
+
+    async def _fetch(self, origin: str) -> Optional[RobotFileParser]:
+        try:
+            response = await self.client.get(f"{origin}/robots.txt", timeout=self.timeout)
+        except httpx.HTTPError as e:
+            logging.info(f"robots.txt unavailable for {origin}: {e}")
+            return None
+        if response.status_code >= 400:
+            return None  # no rules (4xx) or unreachable (5xx): crawl without restrictions
+        parser = RobotFileParser()
+        parser.parse(response.text.splitlines())
+        return parser
+
+    async def allowed(self, url: str) -> bool:
+        parsed = urlparse(url)
+        parser = await self.get(f"{parsed.scheme}://{parsed.netloc}")
+        return parser is None or parser.can_fetch(ROBOTS_AGENT, url)
+
+    def crawl_delay(self, origin: str) -> Optional[float]:
+        parser = self.parsers.get(origin)
+        delay = parser.crawl_delay(ROBOTS_AGENT) if parser is not None else None
+        return float(delay) if delay is not None else None
+
+
+@dataclass
+class _HostState:
+    semaphore: asyncio.Semaphore
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    next_request_at: float = 0.0
+
+
+@dataclass
+class CrawlStats:
+    fetched: int = 0
+    via_browser: int = 0
+    failed: int = 0
+    skipped_robots: int = 0
+    skipped_non_html: int = 0
+    duplicates: int = 0
+    bytes: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started_at
+        return {
+            "pages_fetched": self.fetched,
+            "pages_via_browser": self.via_browser,
+            "pages_failed": self.failed,
+            "skipped_by_robots": self.skipped_robots,
+            "skipped_non_html": self.skipped_non_html,
+            "duplicate_links": self.duplicates,
+            "bytes_downloaded": self.bytes,
+            "elapsed_seconds": round(elapsed, 2),
+            "pages_per_second": round(self.fetched / elapsed, 2) if elapsed > 0 else None,
+        }
+
+
+def _browser_fetch(url: str) -> str:
+    """Render ``url`` in a pooled headless browser and return its HTML."""
+    return fetch_strategy.browser_fetch(url)[0]
+
+
+class Crawler:
+    """Breadth-first crawl of one site with bounded concurrency."""
+
+    def __init__(self, start_url: str, max_depth: int = 2, max_pages: Optional[int] = None, scrape_type: str = "all",
+                 on_page: Optional[OnPage] = None, client: Optional[httpx.AsyncClient] = None,
+                 browser_fetch: Optional[Callable[[str], str]] = _browser_fetch,
+                 decisions: Optional[FetchDecisions] = None):
+        self.start_url = normalize_url(start_url)
+        if not self.start_url:
+            raise ValueError(f"Cannot crawl '{start_url}': only http(s) URLs are supported")
+        self.max_depth = max(1, int(max_depth))
+        self.max_pages = int(max_pages or getattr(settings, "CRAWL_MAX_PAGES", 100))
+        self.scrape_type = scrape_type
+        self.on_page = on_page
+        self.browser_fetch = browser_fetch
+        self.decisions = decisions if decisions is not None else fetch_strategy.fetch_decisions
+        self.concurrency = int(getattr(settings, "CRAWL_CONCURRENCY", 16))
+        self.per_host = int(getattr(settings, "CRAWL_PER_HOST_CONNECTIONS", 4))
+        self.host_delay = float(getattr(settings, "CRAWL_HOST_DELAY", 0.25))
+        self.timeout = float(getattr(settings, "CRAWL_TIMEOUT", 20))
+        self.respect_robots = bool(getattr(settings, "CRAWL_RESPECT_ROBOTS", True))
+        self.browser_semaphore = asyncio.Semaphore(int(getattr(settings, "CRAWL_BROWSER_CONCURRENCY", 2)))
+        self.client = client
+        self._owns_client = client is None
+        start_host = urlparse(self.start_url).hostname
+        self.allowed_hosts = {start_host, start_host[4:] if start_host.startswith("www.") else f"www.{start_host}"}
+        self.seen = BloomFilter(max(10000, self.max_pages * 100))
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.scheduled = 0
+        self.hosts: Dict[str, _HostState] = {}
+        self.stats = CrawlStats()
+        self.pages: List[Dict[str, Any]] = []
+        self.errors: List[Dict[str, str]] = []
+        self.robots: Optional[RobotsCache] = None
+
+    def _schedule(self, url: str, depth: int):
+        if self.scheduled >= self.max_pages:
+            return
+        if not self.seen.add(url):
+            self.stats.duplicates += 1
+            return
+        self.scheduled += 1
+        self.queue.put_nowait((url, depth))
+
+    def _follow(self, url: str) -> Optional[str]:
+        normalized = normalize_url(url)
+        if not normalized:
+            return None
+        parsed = urlparse(normalized)
+        if parsed.hostname not in self.allowed_hosts:
+            return None
+        path = parsed.path.lower()
+        if any(path.endswith(ext) for ext in SKIPPED_EXTENSIONS):
+            return None
+        return normalized
+
+    async def _wait_for_host(self, url: str) -> _HostState:
+        parsed = urlparse(url)
+        host = self.hosts.get(parsed.netloc)
+        if host is None:
+            host = self.hosts[parsed.netloc] = _HostState(asyncio.Semaphore(self.per_host))
+        delay = self.host_delay
+        if self.robots is not None:
+            delay = max(delay, min(self.robots.crawl_delay(f"{parsed.scheme}://{parsed.netloc}") or 0, 10.0))
+        async with host.lock:
+            now = time.monotonic()
+            if host.next_request_at > now:
+                await asyncio.sleep(host.next_request_at - now)
+            host.next_request_at = max(now, host.next_request_at) + delay
+        return host
+
+    async def _fetch(self, url: str) -> Tuple[Optional[str], str]:
+        """Return ``(html, final_url)``; html is None for non-HTML responses."""
+        host = await self._wait_for_host(url)
+        async with host.semaphore:
+            response = await self.client.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        self.stats.bytes += len(response.content)
+        content_type = response.headers.get("content-type", "")
+        if content_type and "html" not in content_type.lower():
+            return None, str(response.url)
+        return response.text, str(response.url)
+
+    async def _process(self, url: str, depth: int):
+        if self.respect_robots and not await self.robots.allowed(url):
+            self.stats.skipped_robots += 1
+            return
+        fetched_via, html, final_url = HTTP, None, url
+        if self.browser_fetch is not None and self.decisions.get(url) == BROWSER:
+            reason = "host needs a browser (cached)"
+            await self._wait_for_host(url)
+        else:
+            html, final_url = await self._fetch(url)
+            if html is None:
+                self.stats.skipped_non_html += 1
+                return
+            data, statistics = await run_in_category("cpu", extract_page, html, final_url, self.scrape_type, True)
+            reason = js_required_reason(html, statistics["word_count"])
+        if reason and self.browser_fetch is not None:
+            async with self.browser_semaphore:
+                rendered = await asyncio.to_thread(self.browser_fetch, final_url)
+            if rendered:
+                html, fetched_via = rendered, BROWSER
+                data, statistics = await run_in_category("cpu", extract_page, html, final_url, self.scrape_type, True)
+                self.stats.via_browser += 1
+                self.decisions.record(url, BROWSER, reason)
+            elif html is None:
+                raise RuntimeError("browser returned no content")
+        else:
+            self.decisions.record(url, HTTP, "static HTML")
+
+        links = data.get("links", []) if self.scrape_type in ("all", "links") else data.pop("links", [])
+        if depth + 1 < self.max_depth:
+            for link in links:
+                next_url = self._follow(link["url"])
+                if next_url:
+                    self._schedule(next_url, depth + 1)
+
+        self.stats.fetched += 1
+        page = {
+            "success": True,
+            "url": final_url,
+            "depth": depth,
+            "fetched_via": fetched_via,
+            "scraped_at": datetime.now().isoformat(),
+            "scrape_type": self.scrape_type,
+            "data": data,
+            "statistics": statistics,
+        }
+        self.pages.append({"url": final_url, "depth": depth, "fetched_via": fetched_via,
+                           "title": data.get("text_content", {}).get("title", ""), "statistics": statistics})
+        if self.on_page is not None:
+            outcome = self.on_page(page)
+            if inspect.isawaitable(outcome):
+                await outcome
+
+    async def _worker(self):
+        while True:
+            url, depth = await self.queue.get()
+            try:
+                await self._process(url, depth)
+            except Exception as e:
+                self.stats.failed += 1
+                self.errors.append({"url": url, "error": str(e).split("\n")[0]})
+                logging.info(f"Crawl failed for {url}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def run(self) -> Dict[str, Any]:
+        if self._owns_client:
+            self.client = httpx.AsyncClient(
+                headers=fetch_strategy.HTTP_HEADERS,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            )
+        self.robots = RobotsCache(self.client, timeout=self.timeout)
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        try:
+            self._schedule(self.start_url, 0)
+            await self.queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if self._owns_client:
+                await self.client.aclose()
+        return {"pages": self.pages, "errors": self.errors, "stats": self.stats.to_dict()}
+
+
+async def crawl_site(start_url: str, max_depth: int = 2, max_pages: Optional[int] = None, scrape_type: str = "all",
+                     on_page: Optional[OnPage] = None, **kwargs) -> Dict[str, Any]:
+    """Crawl ``start_url`` to ``max_depth`` (1 = the start page only); see ``Crawler``."""
+    return await Crawler(start_url, max_depth=max_depth, max_pages=max_pages, scrape_type=scrape_type,
+                         on_page=on_page, **kwargs).run()
@@ -50,7 +50,7 @@ def create_tempmail_account():
             
             # Step 3: Get page content
             print("Step 3: Getting page content...")
-            content_result = get_page_content(browser_id)
+            content_result = get_page_content(browser_id, mode="html")
             print(f"Page content length: {len(content_result) if content_result else 0}")
             
             if not content_result:
@@ -0,0 +1,251 @@
+"""
+Single round-trip DOM snapshots for form and field detection.
+
+Every ``find_element``/``get_attribute``/``is_displayed`` call is an HTTP
+round-trip to chromedriver, and with ``implicitly_wait(10)`` every selector
+that matches nothing stalls for ten seconds. ``take_dom_snapshot`` runs one
+``execute_script`` that returns all inputs, buttons, links and forms with
+their attributes, label text, visibility and a generated unique CSS selector.
+Classification then runs locally in Python.
+
+The script also returns the elements themselves, which Selenium hands back
+as WebElements without extra requests, so callers can fill or click a
+detected field directly.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+# Shared helper: selectorFor(el) builds a CSS selector that matches only ``el``
+SELECTOR_JS = r"""
+var esc = (window.CSS && CSS.escape) ? CSS.escape : function (s) { return String(s).replace(/[^a-zA-Z0-9_-]/g, '\\$&'); };
+function unique(sel) { try { return document.querySelectorAll(sel).length === 1; } catch (e) { return false; } }
+function selectorFor(el) {
+  var tag = el.tagName.toLowerCase();
+  if (el.id && unique('#' + esc(el.id))) return '#' + esc(el.id);
+  var name = el.getAttribute('name');
+  if (name) {
+    var byName = tag + '[name="' + name.replace(/"/g, '\\"') + '"]';
+    if (unique(byName)) return byName;
+  }
+  var parts = [];
+  for (var node = el; node && node.nodeType === 1 && node !== document.documentElement; node = node.parentElement) {
+    if (node !== el && node.id && unique('#' + esc(node.id))) { parts.unshift('#' + esc(node.id)); break; }
+    var part = node.tagName.toLowerCase(), index = 1;
+    for (var sib = node.previousElementSibling; sib; sib = sib.previousElementSibling) {
+      if (sib.tagName === node.tagName) index++;
+    }
+    parts.unshift(part + ':nth-of-type(' + index + ')');
+  }
+  return parts.join(' > ');
+}
+"""
+
+DOM_SNAPSHOT_JS = SELECTOR_JS + r"""
+function visible(el) {
+  if (!el.getClientRects().length) return false;
+  var style = getComputedStyle(el);
+  return style.visibility !== 'hidden' && style.display !== 'none' && parseFloat(style.opacity || '1') > 0;
+}
+function labelOf(el) {
+  var text = [];
+  if (el.labels) for (var i = 0; i < el.labels.length; i++) text.push(el.labels[i].innerText);
+  var ids = (el.getAttribute('aria-labelledby') || '').split(/\s+/);
+  for (var j = 0; j < ids.length; j++) { var ref = ids[j] && document.getElementById(ids[j]); if (ref) text.push(ref.innerText); }
+  return text.join(' ').replace(/\s+/g, ' ').trim().slice(0, 120);
+}
+var forms = Array.prototype.slice.call(document.forms);
+function describe(el, kind) {
+  var item = {kind: kind, element: el, tag: el.tagName.toLowerCase(), selector: selectorFor(el),
+              visible: visible(el), enabled: !el.disabled && !el.readOnly, form: forms.indexOf(el.form)};
+  var attrs = ['type', 'name', 'id', 'class', 'placeholder', 'aria-label', 'autocomplete', 'href', 'role'];
+  for (var i = 0; i < attrs.length; i++) { var v = el.getAttribute(attrs[i]); if (v) item[attrs[i]] = v.slice(0, 200); }
+  var label = labelOf(el); if (label) item.label = label;
+  if (kind !== 'input') { var t = (el.innerText || el.value || '').replace(/\s+/g, ' ').trim().slice(0, 80); if (t) item.text = t; }
+  return item;
+}
+var items = [], seen = new Set();
+function add(el, kind) { if (!seen.has(el)) { seen.add(el); items.push(describe(el, kind)); } }
+document.querySelectorAll('input, textarea, select').forEach(function (el) {
+  var type = (el.getAttribute('type') || '').toLowerCase();
+  if (type === 'hidden') return;
+  add(el, (type === 'submit' || type === 'button' || type === 'image') ? 'button' : 'input');
+});
+document.querySelectorAll('button, [role="button"]').forEach(function (el) { add(el, 'button'); });
+document.querySelectorAll('a[href]').forEach(function (el) { add(el, 'link'); });
+return {
+  url: location.href,
+  title: document.title,
+  items: items,
+  forms: forms.map(function (f, i) {
+    return {index: i, selector: selectorFor(f), action: f.getAttribute('action') || '', method: (f.method || 'get').toLowerCase(),
+            id: f.id || '', name: f.getAttribute('name') || ''};
+  })
+};
+"""
+
+# Returns the first selector that matches an element, or null
+FIRST_PRESENT_JS = """
+var selectors = arguments[0];
+for (var i = 0; i < selectors.length; i++) {
+  try { if (document.querySelector(selectors[i])) return selectors[i]; } catch (e) {}
+}
+return null;
+"""
+
+# Resolves each selector to its first matching element (or null) in one call
+RESOLVE_SELECTORS_JS = """
+return arguments[0].map(function (s) { try { return document.querySelector(s); } catch (e) { return null; } });
+"""
+
+
+@dataclass
+class DomElement:
+    """One input, button or link from a DOM snapshot."""
+    kind: str  # 'input', 'button' or 'link'
+    tag: str
+    selector: str
+    visible: bool
+    enabled: bool
+    form: int = -1
+    attrs: Dict[str, str] = field(default_factory=dict)
+    label: str = ""
+    text: str = ""
+    element: Any = None  # WebElement, when the snapshot came from a live driver
+
+    @property
+    def type(self) -> str:
+        return (self.attrs.get("type") or ("text" if self.tag == "input" else self.tag)).lower()
+
+    @property
+    def interactable(self) -> bool:
+        return self.visible and self.enabled
+
+    def describe(self) -> str:
+        """All human- and machine-readable hints about the element, lowercased."""
+        keys = ("name", "id", "placeholder", "aria-label", "autocomplete")
+        return " ".join([self.attrs.get(k, "") for k in keys] + [self.label, self.text]).lower()
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {"kind": self.kind, "tag": self.tag, "selector": self.selector, "visible": self.visible,
+                "enabled": self.enabled, "form": self.form, **self.attrs}
+        if self.label:
+            data["label"] = self.label
+        if self.text:
+            data["text"] = self.text
+        return data
+
+
+@dataclass
+class DomSnapshot:
+    url: str
+    title: str
+    elements: List[DomElement]
+    forms: List[Dict[str, Any]]
+
+    @classmethod
+    def from_script_result(cls, result: Dict[str, Any]) -> "DomSnapshot":
+        base = {"kind", "element", "tag", "selector", "visible", "enabled", "form", "label", "text"}
+        elements = [
+            DomElement(
+                kind=item["kind"], tag=item["tag"], selector=item["selector"],
+                visible=bool(item.get("visible")), enabled=bool(item.get("enabled")),
+                form=item.get("form", -1), label=item.get("label", ""), text=item.get("text", ""),
+                attrs={k: v for k, v in item.items() if k not in base}, element=item.get("element"),
+            )
+            for item in result.get("items", [])
+        ]
+        return cls(result.get("url", ""), result.get("title", ""), elements, result.get("forms", []))
+
+    def _of_kind(self, kind: str, interactable_only: bool) -> List[DomElement]:
+        return [e for e in self.elements if e.kind == kind and (e.interactable or not interactable_only)]
+
+    def inputs(self, interactable_only: bool = True) -> List[DomElement]:
+        return self._of_kind("input", interactable_only)
+
+    def buttons(self, interactable_only: bool = True) -> List[DomElement]:
+        return self._of_kind("button", interactable_only)
+
+    def links(self, interactable_only: bool = True) -> List[DomElement]:
+        return self._of_kind("link", interactable_only)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"url": self.url, "title": self.title, "forms": self.forms,
+                "elements": [e.to_dict() for e in self.elements]}
+
+
+def take_dom_snapshot(driver) -> DomSnapshot:
+    """Capture inputs, buttons, links and forms of the current page in one WebDriver call."""
+    return DomSnapshot.from_script_result(driver.execute_script(DOM_SNAPSHOT_JS) or {})
+
+
+def first_present_selector(driver, selectors: Iterable[str]) -> Optional[str]:
+    """Return the first of ``selectors`` present on the page, checking all of them in one call."""
+    return driver.execute_script(FIRST_PRESENT_JS, list(selectors))
+
+
+def resolve_selectors(driver, selectors: List[str]) -> List[Any]:
+    """Resolve every selector to its first matching WebElement (or None) in one call."""
+    return driver.execute_script(RESOLVE_SELECTORS_JS, list(selectors)) or [None] * len(selectors)
+
+
+def classify_field(element: DomElement) -> str:
+    """Guess which piece of account data an input expects."""
+    autocomplete = element.attrs.get("autocomplete", "").lower()
+    autocomplete_types = {
+        "email": "email", "username": "username", "new-password": "password", "current-password": "password",
+        "given-name": "first_name", "family-name": "last_name", "name": "full_name", "tel": "phone",
+        "bday-year": "birth_year", "bday-month": "birth_month", "bday-day": "birth_day",
+    }
+    text = element.describe()
+    field_type = element.type
+
+    if field_type == "password" or "password" in text:
+        if "confirm" in text or "repeat" in text or "again" in text:
+            return "password_confirm"
+        return "password"
+    if autocomplete in autocomplete_types:
+        return autocomplete_types[autocomplete]
+    if field_type == "email" or "email" in text or "e-mail" in text:
+        return "email"
+    if "username" in text or "user" in text or "login" in text:
+        return "username"
+    if "first" in text and "name" in text:
+        return "first_name"
+    if ("last" in text and "name" in text) or "surname" in text:
+        return "last_name"
+    if "name" in text:
+        return "full_name"
+    if field_type == "tel" or "phone" in text or "mobile" in text:
+        return "phone"
+    if "birth" in text or "age" in text:
+        if "year" in text:
+            return "birth_year"
+        if "month" in text:
+            return "birth_month"
+        if "day" in text:
+            return "birth_day"
+    return "unknown"
+
+
+SUBMIT_KEYWORDS = ("sign up", "signup", "register", "create account", "join")
+
+
+def find_submit_button(snapshot: DomSnapshot, keywords: Iterable[str] = SUBMIT_KEYWORDS) -> Optional[DomElement]:
+    """Pick the most likely registration submit button from a snapshot."""
+    keywords = [k.lower() for k in keywords]
+    buttons = snapshot.buttons()
+    for button in buttons:
+        if button.type == "submit":
+            return button
+    for button in buttons:
+        hints = f"{button.describe()} {button.attrs.get('class', '').lower()}"
+        if any(k in hints for k in keywords):
+            return button
+    return None
+
+
+def find_links(snapshot: DomSnapshot, texts: Iterable[str]) -> List[DomElement]:
+    """Visible links whose text contains any of ``texts`` (case-insensitive)."""
+    texts = [t.lower() for t in texts]
+    return [link for link in snapshot.links() if any(t in link.text.lower() for t in texts)]
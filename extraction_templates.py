@@ -0,0 +1,409 @@
+"""
+Declarative structured-data extraction templates.
+
+A template maps field names to CSS selectors or XPath expressions, and gives
+each field a type:
+
+    {
+        "name": "ebay_search",
+        "domains": ["ebay.com"],
+        "items": "li.s-item",
+        "skip": 1,
+        "limit": 3,
+        "fields": {
+            "title": "div.s-item__title span",
+            "price": {"css": "span.s-item__price", "type": "number", "pattern": "[\\d.,]+"},
+            "link": {"css": "a.s-item__link", "attr": "href", "type": "url"},
+            "images": {"xpath": ".//img/@src", "type": "url", "many": true},
+        },
+    }
+
+``items`` selects one record per match. Without it the page is one record.
+``skip`` and ``limit`` slice the records. A field is either a CSS selector
+string or a dict with:
+
+- ``css`` or ``xpath`` (``selector`` is read as XPath when it starts with
+  "/", "./" or "(" and as CSS otherwise); XPath inside ``items`` should start
+  with "./";
+- ``attr``: read this attribute instead of the text;
+- ``type``: string (default), integer, number, boolean, date, datetime or
+  url (resolved against the page URL). Numbers and dates are parsed as in
+  table_extract. ``format`` is an optional strptime format; without one it
+  is inferred;
+- ``pattern``: regex applied to the raw value first; its first group, or the
+  whole match, is kept;
+- ``many``: a list of every match instead of the first;
+- ``default``: value when nothing matches;
+- ``required``: drop the record when this field is missing.
+
+Templates are compiled once: every CSS selector is translated to XPath and
+every XPath is compiled, keyed by the spec. ``extract_structured`` then
+evaluates a page's templates on one parsed lxml tree; callers that have
+already parsed the page (``extract_page``) pass its tree in. The templates
+for a domain are resolved once. Results are cached per domain, keyed by the
+page content, so re-extracting an unchanged listing costs a hash. All three
+caches are LRUs: EXTRACTION_COMPILED_TEMPLATES bounds the compiled specs and
+EXTRACTION_CACHE_DOMAINS the hosts with resolved templates or cached results.
+
+Built-in templates cover the marketplaces in ecommerce.py. More are loaded
+from the JSON files in ``EXTRACTION_TEMPLATES_DIR``, or added with
+``register_template``. CSS selectors need the ``cssselect`` package. XPath
+always works.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Pattern, Sequence, Tuple, Union
+from urllib.parse import urljoin, urlparse
+
+from lxml import etree
+
+from core.config import settings
+from page_extract import parse_html
+from table_extract import convert, infer_column
+
+try:
+    from cssselect import HTMLTranslator, SelectorError
+    CSSSELECT_AVAILABLE = True
+except ImportError:
+    CSSSELECT_AVAILABLE = False
+
+FIELD_TYPES = {"string", "integer", "number", "boolean", "date", "datetime", "url"}
+
+BUILTIN_TEMPLATES: List[Dict[str, Any]] = [
+    {
+        "name": "amazon_search",
+        "domains": ["amazon.com"],
+        "items": "div[data-component-type='s-search-result']",
+        "limit": 3,
+        "fields": {
+            "title": {"css": "h2 a.a-link-normal span.a-text-normal, h2 span", "required": True},
+            "link": {"css": "h2 a.a-link-normal, h2 a", "attr": "href", "type": "url"},
+            "price": {"css": "span.a-price span.a-offscreen", "type": "number"},
+        },
+    },
+    {
+        "name": "ebay_search",
+        "domains": ["ebay.com"],
+        "items": "li.s-item",
+        "skip": 1,  # the first item is a placeholder header
+        "limit": 3,
+        "fields": {
+            "title": {"css": "div.s-item__title span", "required": True},
+            "price": "span.s-item__price",
+            "link": {"css": "a.s-item__link", "attr": "href", "type": "url"},
+        },
+    },
+    {
+        "name": "aliexpress_search",
+        "domains": ["aliexpress.com"],
+        "items": "div._1OUGS",
+        "limit": 3,
+        "fields": {
+            "title": {"css": "h1, a._3t7zg", "required": True},
+            "price": "div._12A8D, div.mGXnE",
+            "link": {"css": "a", "attr": "href", "type": "url"},
+        },
+    },
+]
+
+
+class TemplateError(ValueError):
+    """A template spec is invalid or uses a selector that cannot be compiled."""
+
+
+def _is_xpath(selector: str) -> bool:
+    return selector.startswith(("/", "./", "("))
+
+
+def _compile_selector(spec: Union[str, Dict[str, Any]], where: str) -> etree.XPath:
+    if isinstance(spec, str):
+        spec = {"selector": spec}
+    if spec.get("xpath"):
+        expression = spec["xpath"]
+    elif spec.get("css") or spec.get("selector"):
+        selector = spec.get("css") or spec["selector"]
+        if not spec.get("css") and _is_xpath(selector):
+            expression = selector
+        elif not CSSSELECT_AVAILABLE:
+            raise TemplateError(f"{where}: CSS selectors need the cssselect package; use 'xpath' instead")
+        else:
+            try:
+                expression = HTMLTranslator().css_to_xpath(selector)
+            except SelectorError as e:
+                raise TemplateError(f"{where}: invalid CSS selector {selector!r}: {e}")
+    else:
+        raise TemplateError(f"{where}: needs 'css', 'xpath' or 'selector'")
+    try:
+        return etree.XPath(expression)
+    except etree.XPathSyntaxError as e:
+        raise TemplateError(f"{where}: invalid XPath {expression!r}: {e}")
+
+
+def _text(el) -> str:
+    return " ".join("".join(el.itertext()).split())
+
+
+def _json_safe(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+@dataclass
+class CompiledField:
+    name: str
+    path: etree.XPath
+    attr: Optional[str] = None
+    type: str = "string"
+    format: Optional[str] = None
+    pattern: Optional[Pattern] = None
+    many: bool = False
+    default: Any = None
+    required: bool = False
+
+    def coerce(self, raw: str, base_url: str) -> Any:
+        if self.pattern is not None:
+            match = self.pattern.search(raw)
+            if not match:
+                return None
+            raw = match.group(1) if match.groups() else match.group(0)
+        raw = " ".join(raw.split())
+        if not raw:
+            return None
+        if self.type == "string":
+            return raw
+        if self.type == "url":
+            return urljoin(base_url, raw)
+        column = {"type": self.type, "format": self.format}
+        if self.type in ("date", "datetime") and not self.format:
+            column = infer_column([raw])
+            if column["type"] != self.type:
+                return None
+        return _json_safe(convert(raw, column))
+
+    def extract(self, node, base_url: str) -> Any:
+        values = []
+        for match in self.path(node):
+            if isinstance(match, str):
+                raw = str(match)
+            elif isinstance(match, etree._Element):
+                raw = match.get(self.attr) if self.attr else _text(match)
+            else:
+                raw = str(match)  # numbers and booleans from XPath functions
+            value = self.coerce(raw, base_url) if raw is not None else None
+            if value is not None:
+                values.append(value)
+                if not self.many:
+                    break
+        if self.many:
+            return values
+        return values[0] if values else self.default
+
+
+@dataclass
+class CompiledTemplate:
+    name: str
+    fields: List[CompiledField]
+    domains: Tuple[str, ...] = ()
+    items: Optional[etree.XPath] = None
+    skip: int = 0
+    limit: Optional[int] = None
+    key: str = ""
+    spec: Dict[str, Any] = field(default_factory=dict)
+
+    def apply(self, root, base_url: str) -> List[Dict[str, Any]]:
+        """Records extracted from the parsed page ``root``; records with no value at all are dropped."""
+        nodes = self.items(root) if self.items is not None else [root]
+        records = []
+        for node in nodes[self.skip:]:
+            if not isinstance(node, etree._Element):
+                continue
+            record = {}
+            for compiled in self.fields:
+                value = compiled.extract(node, base_url)
+                if compiled.required and value in (None, []):
+                    record = None
+                    break
+                record[compiled.name] = value
+            if not record or all(value in (None, []) for value in record.values()):
+                continue
+            records.append(record)
+            if self.limit and len(records) >= self.limit:
+                break
+        return records
+
+
+_compiled: "OrderedDict[str, CompiledTemplate]" = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def _trim(cache: OrderedDict, setting: str, default: int):
+    """Drop the least recently used entries of ``cache`` beyond the ``setting`` limit (caller holds its lock)."""
+    while len(cache) > max(1, int(getattr(settings, setting, default))):
+        cache.popitem(last=False)
+
+
+def _compile_field(name: str, spec: Union[str, Dict[str, Any]], template: str) -> CompiledField:
+    where = f"template '{template}', field '{name}'"
+    options = {"css": spec} if isinstance(spec, str) else spec
+    if not isinstance(options, dict):
+        raise TemplateError(f"{where}: must be a selector string or an object")
+    kind = options.get("type", "string")
+    if kind not in FIELD_TYPES:
+        raise TemplateError(f"{where}: unknown type '{kind}'; expected one of {', '.join(sorted(FIELD_TYPES))}")
+    try:
+        pattern = re.compile(options["pattern"]) if options.get("pattern") else None
+    except re.error as e:
+        raise TemplateError(f"{where}: invalid pattern: {e}")
+    return CompiledField(name=name, path=_compile_selector(options, where), attr=options.get("attr"), type=kind,
+                         format=options.get("format"), pattern=pattern, many=bool(options.get("many")),
+                         default=options.get("default"), required=bool(options.get("required")))
+
+
+def compile_template(spec: Dict[str, Any]) -> CompiledTemplate:
+    """Compile a template spec (see module docstring); the same spec is compiled only once."""
+    if not isinstance(spec, dict):
+        raise TemplateError("A template must be an object")
+    key = hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+    with _compiled_lock:
+        if key in _compiled:
+            _compiled.move_to_end(key)
+            return _compiled[key]
+    name = spec.get("name") or f"template_{key}"
+    fields = spec.get("fields")
+    if isinstance(fields, list):
+        # target_elements style: [{"name": "price", "css": "...", "type": "number"}, ...]
+        if not all(isinstance(item, dict) and item.get("name") for item in fields):
+            raise TemplateError(f"template '{name}': every field in a list needs a 'name'")
+        fields = {item["name"]: {k: v for k, v in item.items() if k != "name"} for item in fields}
+    if not isinstance(fields, dict) or not fields:
+        raise TemplateError(f"template '{name}': needs at least one field")
+    compiled = CompiledTemplate(
+        name=name,
+        fields=[_compile_field(field_name, field_spec, name) for field_name, field_spec in fields.items()],
+        domains=tuple(domain.lower().removeprefix("www.") for domain in spec.get("domains", [])),
+        items=_compile_selector(spec["items"], f"template '{name}', items") if spec.get("items") else None,
+        skip=max(0, int(spec.get("skip") or 0)),
+        limit=int(spec["limit"]) if spec.get("limit") else None,
+        key=key,
+        spec=spec,
+    )
+    with _compiled_lock:
+        compiled = _compiled.setdefault(key, compiled)
+        _trim(_compiled, "EXTRACTION_COMPILED_TEMPLATES", 256)
+        return compiled
+
+
+_registry: "OrderedDict[str, Dict[str, Any]]" = OrderedDict((spec["name"], spec) for spec in BUILTIN_TEMPLATES)
+_registry_lock = threading.Lock()
+_directory_loaded = False
+_domain_templates: "OrderedDict[str, List[CompiledTemplate]]" = OrderedDict()
+
+
+def _load_directory():
+    """Add the templates in EXTRACTION_TEMPLATES_DIR (once); each file holds a spec or a list of specs."""
+    global _directory_loaded
+    if _directory_loaded:
+        return
+    _directory_loaded = True
+    directory = getattr(settings, "EXTRACTION_TEMPLATES_DIR", "")
+    if not directory or not os.path.isdir(directory):
+        return
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, filename), encoding="utf-8") as f:
+                specs = json.load(f)
+            for spec in specs if isinstance(specs, list) else [specs]:
+                compile_template(spec)
+                _registry[spec.get("name") or filename[:-5]] = spec
+        except (OSError, ValueError) as e:
+            logging.warning(f"Skipping extraction template file {filename}: {e}")
+
+
+def register_template(spec: Dict[str, Any]) -> CompiledTemplate:
+    """Add or replace (by name) a template; raises TemplateError when it does not compile."""
+    compiled = compile_template(spec)
+    with _registry_lock:
+        _load_directory()
+        _registry[compiled.name] = spec
+        _domain_templates.clear()
+    return compiled
+
+
+def list_templates() -> List[Dict[str, Any]]:
+    with _registry_lock:
+        _load_directory()
+        return [copy.deepcopy(spec) for spec in _registry.values()]
+
+
+def get_template(name: str) -> Optional[CompiledTemplate]:
+    with _registry_lock:
+        _load_directory()
+        spec = _registry.get(name)
+    return compile_template(spec) if spec else None
+
+
+def _host(url: str) -> str:
+    return (urlparse(url).hostname or "").lower().removeprefix("www.")
+
+
+def templates_for_url(url: str) -> List[CompiledTemplate]:
+    """Registered templates whose domains cover ``url``'s host (resolved once per host)."""
+    host = _host(url)
+    with _registry_lock:
+        if host not in _domain_templates:
+            _load_directory()
+            matching = []
+            for spec in _registry.values():
+                compiled = compile_template(spec)
+                if any(host == domain or host.endswith("." + domain) for domain in compiled.domains):
+                    matching.append(compiled)
+            _domain_templates[host] = matching
+            _trim(_domain_templates, "EXTRACTION_CACHE_DOMAINS", 1024)
+        _domain_templates.move_to_end(host)
+        return list(_domain_templates[host])
+
+
+_results: "OrderedDict[str, OrderedDict[str, Dict[str, List[Dict[str, Any]]]]]" = OrderedDict()
+_results_lock = threading.Lock()
+
+
+def extract_structured(html: str, url: str, templates: Optional[Sequence[CompiledTemplate]] = None,
+                       root=None) -> Dict[str, List[Dict[str, Any]]]:
+    """Records per template name for a page (templates default to those registered for its domain).
+
+    ``root`` is the page already parsed by the caller. Results are cached per domain by page
+    content, URL and templates, up to EXTRACTION_CACHE_PER_DOMAIN pages for each of the
+    EXTRACTION_CACHE_DOMAINS most recently used domains.
+    """
+    templates = templates_for_url(url) if templates is None else list(templates)
+    if not templates or not html:
+        return {}
+    host = _host(url)
+    key = hashlib.sha256("\0".join([url, *(t.key for t in templates), html]).encode("utf-8", "replace")).hexdigest()
+    with _results_lock:
+        cached = _results.get(host, {}).get(key)
+        if cached is not None:
+            _results.move_to_end(host)
+            _results[host].move_to_end(key)
+            return copy.deepcopy(cached)
+    root = root if root is not None else parse_html(html)
+    if root is None:
+        return {}
+    results = {template.name: template.apply(root, url) for template in templates}
+    with _results_lock:
+        entries = _results.setdefault(host, OrderedDict())
+        _results.move_to_end(host)
+        entries[key] = copy.deepcopy(results)
+        _trim(entries, "EXTRACTION_CACHE_PER_DOMAIN", 128)
+        _trim(_results, "EXTRACTION_CACHE_DOMAINS", 1024)
+    return results
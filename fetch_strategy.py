@@ -0,0 +1,220 @@
+"""
+HTTP-first page fetching with escalation to a headless browser.
+
+Scrapes used to open Chrome for every URL. They fell back to
+``requests.get`` only when the rendered page came out under 1000 characters.
+``fetch_page`` reverses that order. It fetches with a pooled HTTP client and
+inspects the served HTML. It escalates to a pooled browser only when the
+page evidently needs JavaScript to render:
+
+- an empty body;
+- an empty SPA mount point (``<div id="root"></div>``, ``__next``, ``app-root``, ...);
+- a ``<noscript>`` "enable JavaScript" notice on a page with little text;
+- hardly any text next to ``<script>`` tags.
+
+Responses that look like bot walls (401/403/429/503) and network errors
+also escalate; other 4xx/5xx statuses are reported as they are.
+
+Each outcome is remembered per host for ``FETCH_DECISION_TTL`` seconds.
+Later fetches from that host go straight to the method that worked, so
+client-rendered sites do not pay for a wasted HTTP request. A cached "http"
+decision is still checked on every page, and a page that needs a browser
+flips the host to "browser".
+"""
+
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+from core.config import settings
+from core.http_cache import CachingTransport
+from page_extract import SPA_ROOT_IDS, visible_word_count
+
+HTTP = "http"
+BROWSER = "browser"
+
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9,ur;q=0.8",
+}
+
+SPA_ROOT_PATTERN = re.compile(
+    r"<(div|main|section|app-root)\b[^>]*\bid\s*=\s*[\"']?(%s)[\"']?[^>]*>\s*</\1>"
+    r"|<app-root\b[^>]*>\s*</app-root>" % "|".join(re.escape(i) for i in SPA_ROOT_IDS),
+    re.IGNORECASE,
+)
+# Bot walls and rate limits that a real browser often gets past; other 4xx/5xx are final
+BLOCKED_STATUSES = {401, 403, 429, 503}
+NOSCRIPT_PATTERN = re.compile(r"<noscript\b[^>]*>(.*?)</noscript>", re.IGNORECASE | re.DOTALL)
+NOSCRIPT_JS_NOTICE = re.compile(r"(enable|requires?|turn on|activate|need)[^.<]{0,40}javascript|javascript[^.<]{0,40}(disabled|required|enabled)",
+                                re.IGNORECASE)
+
+
+class FetchError(Exception):
+    """Neither HTTP nor the browser produced the page."""
+
+
+@dataclass
+class FetchResult:
+    url: str
+    html: str
+    method: str
+    reason: str
+    elapsed_ms: int
+    status_code: Optional[int] = None
+    settle: Optional[Dict[str, Any]] = None
+
+    def summary(self) -> Dict[str, Any]:
+        return {"method": self.method, "reason": self.reason, "elapsed_ms": self.elapsed_ms,
+                "status_code": self.status_code, "final_url": self.url}
+
+
+def js_required_from_signals(word_count: int, has_scripts: bool, empty_spa_root: bool, noscript_text: str) -> Optional[str]:
+    """Why a page with these properties needs a browser, or None (see ``PageEventExtractor.signals``)."""
+    min_words = int(getattr(settings, "FETCH_JS_MIN_WORDS", 50))
+    if empty_spa_root:
+        return "empty SPA root"
+    if word_count == 0:
+        return "empty body"
+    if word_count < min_words * 4 and NOSCRIPT_JS_NOTICE.search(noscript_text or ""):
+        return "noscript JavaScript notice"
+    if word_count < min_words and has_scripts:
+        return "script-only page"
+    return None
+
+
+def js_required_reason(html: str, word_count: Optional[int] = None) -> Optional[str]:
+    """Why ``html`` needs a browser to render, or None when the served HTML is the content."""
+    if word_count is None:
+        word_count = visible_word_count(html)
+    return js_required_from_signals(word_count, "<script" in html.lower(), bool(SPA_ROOT_PATTERN.search(html)),
+                                    " ".join(NOSCRIPT_PATTERN.findall(html)))
+
+
+class FetchDecisions:
+    """Per-host record of which fetch method works, expiring after ``ttl`` seconds."""
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl
+        self._decisions: Dict[str, Tuple[str, str, float]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host(url: str) -> str:
+        return (urlparse(url).hostname or "").lower()
+
+    def get(self, url: str) -> Optional[str]:
+        ttl = self.ttl if self.ttl is not None else float(getattr(settings, "FETCH_DECISION_TTL", 3600))
+        with self._lock:
+            decision = self._decisions.get(self.host(url))
+            if decision is None:
+                return None
+            if time.monotonic() - decision[2] > ttl:
+                del self._decisions[self.host(url)]
+                return None
+            return decision[0]
+
+    def record(self, url: str, method: str, reason: str):
+        with self._lock:
+            previous = self._decisions.get(self.host(url))
+            self._decisions[self.host(url)] = (method, reason, time.monotonic())
+        if previous is None or previous[0] != method:
+            logging.info(f"Fetch strategy for {self.host(url)}: {method} ({reason})")
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {host: {"method": method, "reason": reason, "age_seconds": round(time.monotonic() - at)}
+                    for host, (method, reason, at) in self._decisions.items()}
+
+    def clear(self):
+        with self._lock:
+            self._decisions.clear()
+
+
+fetch_decisions = FetchDecisions()
+
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+
+
+def http_client() -> httpx.Client:
+    """Process-wide pooled HTTP client (thread-safe, keep-alive across scrapes) behind the HTTP cache."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            transport = httpx.HTTPTransport(limits=httpx.Limits(max_connections=32, max_keepalive_connections=16))
+            _client = httpx.Client(
+                headers=HTTP_HEADERS,
+                follow_redirects=True,
+                timeout=float(getattr(settings, "FETCH_HTTP_TIMEOUT", 20)),
+                transport=CachingTransport(transport),
+            )
+        return _client
+
+
+def browser_fetch(url: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """Render ``url`` in a pooled headless browser; returns ``(html, settle_report)``."""
+    from browsing import get_page_content, leased_browser
+    from page_settle import scroll_and_settle
+
+    with leased_browser(url, profile="scrape-fast") as (browser_id, driver):
+        settle_report = scroll_and_settle(driver, max_scrolls=3, label="scrape")
+        return get_page_content(browser_id), settle_report
+
+
+def fetch_page(url: str, client: Optional[httpx.Client] = None,
+               render: Optional[Callable[[str], Tuple[str, Optional[Dict[str, Any]]]]] = None,
+               decisions: Optional[FetchDecisions] = None) -> FetchResult:
+    """Fetch ``url`` over HTTP, escalating to a browser when the page needs JavaScript.
+
+    Raises:
+        FetchError: for final HTTP error statuses, or when both methods fail
+    """
+    client = client or http_client()
+    render = render or browser_fetch
+    decisions = decisions if decisions is not None else fetch_decisions
+    started = time.perf_counter()
+    elapsed = lambda: int((time.perf_counter() - started) * 1000)
+
+    http_html, status_code, final_url = None, None, url
+    if decisions.get(url) == BROWSER:
+        reason = "host needs a browser (cached)"
+    else:
+        try:
+            response = client.get(url, headers={"Referer": url})
+            status_code, final_url = response.status_code, str(response.url)
+            if response.status_code in BLOCKED_STATUSES:
+                reason = f"HTTP {response.status_code}"
+            elif response.status_code >= 400:
+                raise FetchError(f"Failed to retrieve page content: HTTP {response.status_code}")
+            else:
+                http_html = response.text
+                reason = js_required_reason(http_html)
+                if reason is None:
+                    decisions.record(url, HTTP, "static HTML")
+                    return FetchResult(final_url, http_html, HTTP, "static HTML", elapsed(), status_code)
+        except httpx.HTTPError as e:
+            reason = f"HTTP error: {str(e).splitlines()[0] if str(e) else type(e).__name__}"
+
+    try:
+        html, settle_report = render(url)
+    except Exception as e:
+        if http_html:
+            # Chrome unavailable: the served HTML is better than nothing
+            logging.warning(f"Browser fetch failed for {url} ({e}); using the HTTP response")
+            return FetchResult(final_url, http_html, HTTP, f"{reason}; browser failed: {e}", elapsed(), status_code)
+        raise FetchError(f"Failed to retrieve page content: {reason}; browser: {e}") from e
+    if not html and http_html:
+        return FetchResult(final_url, http_html, HTTP, f"{reason}; browser returned nothing", elapsed(), status_code)
+    if not html:
+        raise FetchError(f"Failed to retrieve page content: {reason}; browser returned nothing")
+    if status_code is not None:
+        decisions.record(url, BROWSER, reason)  # network errors may be transient; don't pin the host
+    return FetchResult(url, html, BROWSER, reason, elapsed(), status_code, settle_report)
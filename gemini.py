@@ -15,6 +15,11 @@ import itertools
 import time
 import random
 
+# Per-key limits generate_text enforces; get_request_budget counts against the same ones
+GEMINI_HOURLY_LIMIT = 5
+GEMINI_DAILY_LIMIT = 45
+GEMINI_WINDOW_SECONDS = 3600
+
 # Preferred model candidates (first is configured). Will fallback if model not found/unsupported.
 _MODEL_CANDIDATES = []
 if settings.GEMINI_MODEL_NAME:
@@ -93,7 +98,7 @@ class APIKeyManager:
                 if not self.is_daily_limit_reached(key):
                     available_keys.append(key)
                 else:
-                    logging.warning(f"Key ({key[:8]}...) has reached daily limit ({self.daily_usage.get(key, 0)}/45 requests)")
+                    logging.warning(f"Key ({key[:8]}...) has reached daily limit ({self.daily_usage.get(key, 0)}/{GEMINI_DAILY_LIMIT} requests)")
         
         if not available_keys:
             # If all keys have too many failures, reset and try again
@@ -123,7 +128,7 @@ class APIKeyManager:
 
         return best_key
 
-    def is_daily_limit_reached(self, key: str, daily_limit: int = 45) -> bool:
+    def is_daily_limit_reached(self, key: str, daily_limit: int = GEMINI_DAILY_LIMIT) -> bool:
         """Check if the daily limit for a key has been reached."""
         current_time = time.time()
         last_reset = self.daily_reset_time.get(key, 0)
@@ -150,6 +155,24 @@ class APIKeyManager:
 # Global API key manager
 api_key_manager = APIKeyManager()
 
+def get_request_budget() -> dict:
+    """
+    How many generate_text calls the configured keys can make right now, and how many keys
+    can serve them in parallel, under the same hourly and daily per-key limits generate_text applies.
+    """
+    requests_left, keys = 0, 0
+    for key in api_key_manager.api_keys:
+        if api_key_manager.key_failures.get(key, 0) >= 3 or api_key_manager.is_daily_limit_reached(key):
+            continue
+        key_prefix = key[:10] if len(key) >= 10 else key[:6]
+        hourly = rate_limiter.get_remaining_requests(f"gemini_{key_prefix}", max_requests=GEMINI_HOURLY_LIMIT,
+                                                     window_seconds=GEMINI_WINDOW_SECONDS)
+        left = min(hourly, GEMINI_DAILY_LIMIT - api_key_manager.daily_usage.get(key, 0))
+        if left > 0:
+            requests_left += left
+            keys += 1
+    return {"requests": requests_left, "keys": keys}
+
 def generate_text(prompt: str) -> str:
     """
     Generates text using the Gemini Pro model with enhanced failover and rate limiting.
@@ -181,9 +204,9 @@ def generate_text(prompt: str) -> str:
             continue
 
         try:
-            # Apply conservative rate limiting per API key (5 requests per hour)
+            # Apply conservative rate limiting per API key (GEMINI_HOURLY_LIMIT requests per hour)
             key_id = f"gemini_{key_prefix}"
-            remaining = rate_limiter.get_remaining_requests(key_id, max_requests=5, window_seconds=3600)
+            remaining = rate_limiter.get_remaining_requests(key_id, max_requests=GEMINI_HOURLY_LIMIT, window_seconds=GEMINI_WINDOW_SECONDS)
 
             if remaining <= 0:
                 logging.warning(f"Rate limit reached for Gemini key ({key_prefix}...), skipping to next")
@@ -191,7 +214,7 @@ def generate_text(prompt: str) -> str:
                 continue
                 
             # Wait if needed to avoid hitting rate limits
-            rate_limiter.wait_if_needed(key_id, max_requests=5, window_seconds=3600)  # 5 requests per hour
+            rate_limiter.wait_if_needed(key_id, max_requests=GEMINI_HOURLY_LIMIT, window_seconds=GEMINI_WINDOW_SECONDS)
             
             logging.info(f"Attempt {attempts}: Trying Gemini generation with key ({key_prefix}...) - {remaining} requests remaining")
             
@@ -14,12 +14,15 @@ apply_memory_optimizations()
 
 from core.config import settings
 from core.structured_logging import structured_logger, LogContext, operation_context
-from core.circuit_breaker import circuit_breaker, CircuitBreakerConfig, CircuitBreakerManager
+from core.circuit_breaker import circuit_breaker, circuit_manager, CircuitBreakerConfig, CircuitBreakerManager
 from core.lazy_imports import lazy_import_decorator, get_lazy_import
+from core.executors import run_in_category, category_executors
+from core.job_queue import agent_job_queue, LeaseLostError
+from core.http_cache import http_cache
 
 from fastapi import FastAPI, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from authlib.integrations.starlette_client import OAuth
 from jose import jwt, JWTError
@@ -34,7 +37,6 @@ from core.db import SessionLocal, Base
 from core.db import init_db
 from models import User, CloudCredential, PlanHistory, ChatHistory, AgentSession
 from security import encrypt_text as encrypt, decrypt_text as decrypt
-from openai import OpenAI
 
 from audit import log_audit
 from tools import tool_registry, browsers
@@ -42,6 +44,10 @@ from self_learning import SelfLearningCore
 import api_integration
 import autonomy
 import browsing
+import cdp_browser
+import browser_service
+from page_settle import settle_stats
+from browser_sessions import set_browser_owner
 # Import clear_users module but don't execute code
 from clear_users import clear_all_users
 import cli
@@ -66,6 +72,8 @@ import universal_assistant
 import request_parser
 import service_handlers
 from task_data_manager import task_manager
+from plan_executor import PlanDAGExecutor, PlanStep
+from question_router import question_router
 from response_formatter import ResponseFormatter
 import json
 import re
@@ -131,7 +139,7 @@ from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
 import schemas
-from schemas.scraping import ScrapeRequest
+from schemas.scraping import ExtractRequest, ScrapeRequest, ScrapeStreamRequest
 import logging
 from fastapi.responses import JSONResponse
 from fastapi.exception_handlers import RequestValidationError
@@ -140,6 +148,7 @@ from fastapi import WebSocket, WebSocketDisconnect
 
 core = SelfLearningCore()
 circuit_breaker_manager = CircuitBreakerManager()
+plan_dag_executor = PlanDAGExecutor()
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -150,7 +159,36 @@ from auth import get_current_user
 # Configure logging for production
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+async def relay_agent_job_events():
+    """Forward progress events written by agent workers to connected websockets."""
+    poll_interval = getattr(settings, 'AGENT_WORKER_POLL_INTERVAL', 1.0)
+    retention = getattr(settings, 'AGENT_EVENT_RETENTION_HOURS', 24) * 3600
+    last_id = await run_in_category('cpu', agent_job_queue.latest_event_id)
+    last_prune = time.time()
+    while True:
+        try:
+            events = await run_in_category('cpu', agent_job_queue.read_events, last_id)
+            for event in events:
+                last_id = event["id"]
+                websocket = active_connections.get(event["user_id"])
+                if websocket:
+                    try:
+                        await websocket.send_json(event["payload"])
+                    except RuntimeError as e:
+                        logging.warning(f"Could not relay agent event to WebSocket for user {event['user_id']}: {e}")
+            if time.time() - last_prune > 3600:
+                await run_in_category('cpu', agent_job_queue.prune_events, retention)
+                last_prune = time.time()
+            if not events:
+                await asyncio.sleep(poll_interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Error relaying agent job events: {e}")
+            await asyncio.sleep(poll_interval)
+
 async def lifespan(app: FastAPI):
+    relay_task = None
     try:
         logging.info("Database initialization handled by init_db_script.py.")
         
@@ -166,12 +204,27 @@ async def lifespan(app: FastAPI):
         # start_memory_monitoring()
         logging.info("Memory monitoring started for 512MB limit")
         
+        if getattr(settings, 'BROWSER_POOL_WARM_ON_STARTUP', False) and not browser_service.client_enabled():
+            browsing.browser_pool.warm()
+            logging.info("Pre-launching pooled browsers")
+        
+        if getattr(settings, 'AGENT_RUN_BACKGROUND', False):
+            relay_task = asyncio.create_task(relay_agent_job_events())
+            logging.info("Relaying background agent run events to websockets")
+        
         app.state.running = True
     except Exception as e:
         logging.error(f"Fatal error during database initialization: {e}", exc_info=True)
         raise
     yield
     app.state.running = False
+    if relay_task:
+        relay_task.cancel()
+    browsing.session_manager.stop()
+    await cdp_browser.shutdown()
+    browsing.context_manager.shutdown()
+    browsing.browser_pool.shutdown()
+    category_executors.shutdown(wait=False)
 
 app = FastAPI(lifespan=lifespan)
 
@@ -421,6 +474,81 @@ def scrape_website(scrape_req: ScrapeRequest, user: schemas.User = Depends(get_c
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post('/scrape/extract')
+def scrape_structured(extract_req: ExtractRequest, user: schemas.User = Depends(get_current_user)):
+    """Structured records from a page with extraction templates, fetched over HTTP when possible"""
+    from extraction_templates import TemplateError, compile_template, extract_structured, get_template, templates_for_url
+    from fetch_strategy import FetchError, fetch_page
+    try:
+        if extract_req.template:
+            templates = [compile_template(extract_req.template)]
+        elif extract_req.template_name:
+            template = get_template(extract_req.template_name)
+            if template is None:
+                raise HTTPException(status_code=404, detail=f"Unknown extraction template '{extract_req.template_name}'")
+            templates = [template]
+        else:
+            templates = templates_for_url(extract_req.url)
+            if not templates:
+                raise HTTPException(status_code=400, detail="No extraction template is registered for this domain")
+        fetch = fetch_page(extract_req.url)
+        return {"success": True, "url": extract_req.url, "fetch": fetch.summary(),
+                "extracted": extract_structured(fetch.html, fetch.url, templates)}
+    except HTTPException:
+        raise
+    except TemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FetchError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get('/scrape/templates')
+def list_extraction_templates(user: schemas.User = Depends(get_current_user)):
+    """Registered extraction templates"""
+    from extraction_templates import list_templates
+    return {"templates": list_templates()}
+
+@app.post('/scrape/stream')
+async def scrape_website_stream(scrape_req: ScrapeStreamRequest, user: schemas.User = Depends(get_current_user)):
+    """Stream extraction events as NDJSON or server-sent events while the page is scraped.
+
+    Every event is also pushed to the user's websocket under the 'scrape_stream' topic,
+    and saved to the task store as it is produced (see scrape_stream.py).
+    """
+    from scrape_stream import STREAM_FORMATS, format_event, iter_scrape_events
+    fmt = scrape_req.format.lower()
+    if fmt not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(STREAM_FORMATS)}")
+    try:
+        events = iter_scrape_events(scrape_req.url, scrape_req.scrape_type, scrape_req.chunk_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    user_id = user.id
+
+    async def stream_events():
+        try:
+            while True:
+                event = await run_in_category('network', next, events, None)
+                if event is None:
+                    break
+                websocket = active_connections.get(user_id)
+                if websocket:
+                    try:
+                        await websocket.send_json({"topic": "scrape_stream", "payload": event})
+                    except RuntimeError as e:
+                        logging.warning(f"Could not send scrape event to WebSocket for user {user_id}: {e}")
+                yield format_event(event, fmt)
+        finally:
+            try:
+                events.close()
+            except ValueError:
+                pass  # still running in the executor after a client disconnect; it ends on its own
+
+    media_type = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return StreamingResponse(stream_events(), media_type=media_type,
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.post('/prompt')
 @circuit_breaker(
     'prompt_generation',
@@ -432,7 +560,7 @@ def scrape_website(scrape_req: ScrapeRequest, user: schemas.User = Depends(get_c
     )
 )
 @limiter.limit("10/minute")
-def prompt(request: Request, prompt_req: schemas.PromptRequest, user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def prompt(request: Request, prompt_req: schemas.PromptRequest, user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
     prompt_text = prompt_req.prompt
     prompt_context = LogContext(
         metadata={
@@ -451,7 +579,7 @@ def prompt(request: Request, prompt_req: schemas.PromptRequest, user: schemas.Us
     
     try:
         memory_instance = memory.get_memory_instance()
-        retrieved_docs_tuples = memory_instance.search(prompt_text, k=3)
+        retrieved_docs_tuples = await run_in_category('cpu', memory_instance.search, prompt_text, k=3)
         context_parts = []
         for _, doc in retrieved_docs_tuples:
             context_parts.append(
@@ -529,7 +657,7 @@ YOUR PLAN:
     logging.info("Generating plan with LLM...")
     
     try:
-        response_text = generate_text(gemini_prompt)
+        response_text = await run_in_category('network', generate_text, gemini_prompt)
         logging.info(f"LLM raw response: {response_text}")
         
         json_match = re.search(r"```(?:json)?\s*(\{.*?\})\s*```", response_text, re.DOTALL)
@@ -567,8 +695,9 @@ YOUR PLAN:
     )
 )
 @limiter.limit("10/minute")
-def execute_plan(request: Request, exec_req: schemas.PlanExecutionRequest, user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    core.log_action('execute_plan', {'prompt': exec_req.prompt})
+async def execute_plan(request: Request, exec_req: schemas.PlanExecutionRequest, user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    await run_in_category('cpu', core.log_action, 'execute_plan', {'prompt': exec_req.prompt})
+    set_browser_owner(user.id)
     execution_context = LogContext(
         metadata={
             'user_id': user.id,
@@ -588,66 +717,79 @@ def execute_plan(request: Request, exec_req: schemas.PlanExecutionRequest, user:
                 {"plan_steps": len(plan), "prompt": prompt_text}
             )
         
-        creds = db.query(CloudCredential).filter_by(user_id=user.id).all()
-        user_creds = {}
-        for c in creds:
-            if c.provider == 'aws':
-                user_creds['aws'] = {'access_key': decrypt(c.access_key), 'secret_key': decrypt(c.secret_key)}
-            elif c.provider == 'azure':
-                user_creds['azure'] = {'azure_subscription_id': decrypt(c.azure_subscription_id), 'azure_client_id': decrypt(c.azure_client_id), 'azure_client_secret': decrypt(c.azure_client_secret), 'azure_tenant_id': decrypt(c.azure_tenant_id)}
-            elif c.provider == 'gcp':
-                 user_creds['gcp'] = {'gcp_project_id': decrypt(c.gcp_project_id), 'gcp_credentials_json': decrypt(c.gcp_credentials_json)}
-
-        execution_steps = []
-        for i, planned_step in enumerate(plan):
-            action = planned_step.get('action')
-            params = planned_step.get('params', {})
-            step_num = planned_step.get('step', i + 1)
+        def load_user_creds() -> Dict[str, Any]:
+            creds = db.query(CloudCredential).filter_by(user_id=user.id).all()
+            user_creds = {}
+            for c in creds:
+                if c.provider == 'aws':
+                    user_creds['aws'] = {'access_key': decrypt(c.access_key), 'secret_key': decrypt(c.secret_key)}
+                elif c.provider == 'azure':
+                    user_creds['azure'] = {'azure_subscription_id': decrypt(c.azure_subscription_id), 'azure_client_id': decrypt(c.azure_client_id), 'azure_client_secret': decrypt(c.azure_client_secret), 'azure_tenant_id': decrypt(c.azure_tenant_id)}
+                elif c.provider == 'gcp':
+                     user_creds['gcp'] = {'gcp_project_id': decrypt(c.gcp_project_id), 'gcp_credentials_json': decrypt(c.gcp_credentials_json)}
+            return user_creds
+
+        user_creds = await run_in_category('network', load_user_creds)
+
+        # Steps after the first ask_user are not run until the user answers.
+        ask_user_index = next((i for i, s in enumerate(plan) if s.get('action') == "ask_user"), None)
+        runnable_plan = plan if ask_user_index is None else plan[:ask_user_index]
+
+        async def run_plan_step(planned_step: PlanStep) -> Dict[str, Any]:
+            action = planned_step.action
+            params = planned_step.params
+            step_num = planned_step.number
 
             if not action:
-                execution_steps.append({"step": step_num, "action": "unknown", "status": "error", "details": "Missing 'action' in plan step."})
-                continue
-            
-            if action == "ask_user":
-                return {"status": "requires_input", "message": "User input required", "details": params.get("question")}
+                return {"step": step_num, "action": "unknown", "status": "error", "details": "Missing 'action' in plan step."}
 
             tool = tool_registry.get_tool(action)
             if not tool:
-                execution_steps.append({"step": step_num, "action": action, "status": "error", "details": f"Tool '{action}' not found in registry."})
-                continue
+                return {"step": step_num, "action": action, "status": "error", "details": f"Tool '{action}' not found in registry."}
 
             try:
                 logging.info(f"Executing step {step_num}: action='{action}', params={params}")
                 if action == "cloud_operation":
                     params["user_creds"] = user_creds
-                result = tool.func(**params)
-                execution_steps.append({"step": step_num, "action": action, "status": "done", "details": result})
+                # Async (CDP) tools are awaited; blocking ones run on the pool for their category
+                result = await tool.ainvoke(**params)
+                return {"step": step_num, "action": action, "status": "done", "details": result}
             except Exception as e:
                 logging.error(f"Error executing step {step_num} ('{action}'): {e}", exc_info=True)
-                execution_steps.append({"step": step_num, "action": action, "status": "error", "details": f"An exception occurred: {str(e)}"})
+                return {"step": step_num, "action": action, "status": "error", "details": f"An exception occurred: {str(e)}"}
+
+        execution_steps, execution_timings = await plan_dag_executor.aexecute(runnable_plan, run_plan_step)
+
+        if ask_user_index is not None:
+            return {"status": "requires_input", "message": "User input required", "details": plan[ask_user_index].get('params', {}).get("question"), "steps": execution_steps, "timings": execution_timings}
 
         overall_status = "error" if any(s['status'] == 'error' for s in execution_steps) else "success"
         
-        new_plan_history = PlanHistory(
-            user_id=user.id,
-            prompt=prompt_text,
-            plan=json.dumps(plan),
-            status='requires_feedback',
-            execution_results=json.dumps(execution_steps)
-        )
-        db.add(new_plan_history)
-        db.commit()
-        db.refresh(new_plan_history)
+        def record_plan_history() -> PlanHistory:
+            new_plan_history = PlanHistory(
+                user_id=user.id,
+                prompt=prompt_text,
+                plan=json.dumps(plan),
+                status='requires_feedback',
+                execution_results=json.dumps(execution_steps)
+            )
+            db.add(new_plan_history)
+            db.commit()
+            db.refresh(new_plan_history)
 
-        log_audit(db, user.id, 'execute_plan', f'Plan History ID: {new_plan_history.id}')
-        core.post_task_review(prompt_text, overall_status == 'success', {'steps': len(execution_steps)})
+            log_audit(db, user.id, 'execute_plan', f'Plan History ID: {new_plan_history.id}')
+            core.post_task_review(prompt_text, overall_status == 'success', {'steps': len(execution_steps)})
+            return new_plan_history
+
+        new_plan_history = await run_in_category('network', record_plan_history)
     except Exception as e:
-        core.log_error(str(e), {'prompt': prompt_text})
+        await run_in_category('cpu', core.log_error, str(e), {'prompt': exec_req.prompt})
         raise
     return {
         "status": overall_status,
         "message": "Plan execution finished. Your feedback is valuable for my improvement.",
         "steps": execution_steps,
+        "timings": execution_timings,
         "plan_id": new_plan_history.id,
         "feedback_prompt": f"Did this work as expected? To help me learn, please use the /feedback endpoint with plan_id: {new_plan_history.id} and your feedback ('success' or 'failure')."
     }
@@ -706,9 +848,10 @@ def get_browser_status():
     try:
         return {
             "status": "success",
-            "active_browsers": browsing.get_browser_count(),
-            "browser_ids": list(browsing.browsers.keys()),
-            "profiles": list(browsing.browser_profiles.keys())
+            "service": browser_service.client_enabled(),
+            **browsing.get_browser_status(),
+            "cdp": cdp_browser.get_stats(),
+            "settle": settle_stats.get_stats()
         }
     except Exception as e:
         return {
@@ -841,9 +984,7 @@ def send_message_via_service(service: str, browser_id: str, contact: str, messag
 def healthz():
     try:
         # Get circuit breaker statuses
-        circuit_breaker_status = {
-            name: str(cb.state) for name, cb in circuit_breaker_manager.circuit_breakers.items()
-        }
+        circuit_breaker_status = circuit_manager.get_status()
         
         # Memory monitoring disabled
         # memory_stats = get_memory_stats()
@@ -852,6 +993,9 @@ def healthz():
             "status": "ok",
             "timestamp": datetime.now().isoformat(),
             "circuit_breakers": circuit_breaker_status,
+            "executors": category_executors.get_stats(),
+            "question_router": question_router.get_stats(),
+            "http_cache": http_cache.get_stats(),
             "performance_monitoring": getattr(settings, 'ENABLE_PERFORMANCE_MONITORING', False),
             "memory": {"monitoring_disabled": True, "unlimited_memory": True}
         }
@@ -1018,10 +1162,116 @@ def generate_text(prompt: str) -> str:
 @app.post('/agent/run', response_model=schemas.AgentRunResponse, tags=["Agent"])
 @limiter.limit(f"{getattr(settings, 'RATE_LIMIT_PER_MINUTE', 60)}/minute")
 async def agent_run(request: Request, agent_req: schemas.AgentStateRequest, user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    core.log_action('agent_run', {'user_input': agent_req.user_input})
     user_id = user.id
+    if getattr(settings, 'AGENT_RUN_BACKGROUND', False):
+        handle = await enqueue_agent_run(user_id, agent_req, db)
+        if "error" in handle:
+            return schemas.AgentRunResponse(status="error", message=handle["error"], history=[], final_result=None)
+        return schemas.AgentRunResponse(
+            status="queued",
+            message=f"Agent run queued (job_id={handle['job_id']}). Progress is streamed over the websocket; poll {handle['status_url']} for status.",
+            history=[],
+            final_result=None
+        )
+
     websocket = active_connections.get(user_id)
-    
+
+    async def send_log(message: str):
+        if websocket:
+            try:
+                await websocket.send_json({"topic": "agent_updates", "payload": {"log": message}})
+            except RuntimeError as e:
+                logging.warning(f"Could not send log to WebSocket for user {user_id}: {e}")
+        else:
+            logging.warning(f"No active WebSocket connection for user {user_id} to send log: {message}")
+
+    return await run_agent_session(user_id, agent_req, db, send_log)
+
+async def enqueue_agent_run(user_id: int, agent_req: schemas.AgentStateRequest, db: Session) -> Dict[str, Any]:
+    """Create (or reuse) the AgentSession for a run and put it on the background job queue."""
+    run_id = agent_req.run_id
+    if not run_id:
+        return {"error": "run_id is required to start or resume an agent run."}
+
+    def save_session() -> bool:
+        session_obj = db.query(AgentSession).filter(AgentSession.run_id == run_id, AgentSession.user_id == user_id).first()
+        if not session_obj:
+            if not agent_req.user_input:
+                return False
+            session_obj = AgentSession(
+                user_id=user_id,
+                run_id=run_id,
+                goal=agent_req.user_input,
+                status='queued',
+                current_step=0,
+                history=json.dumps([])
+            )
+            db.add(session_obj)
+        else:
+            session_obj.status = 'queued'
+        db.commit()
+        return True
+
+    if not await run_in_category('cpu', save_session):
+        return {"error": "No existing session for run_id and no user_input provided to start a new session."}
+    job = await run_in_category('cpu', agent_job_queue.enqueue, run_id, user_id, {"user_input": agent_req.user_input})
+    return {
+        "run_id": run_id,
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"/agent/runs/{run_id}",
+    }
+
+@app.post('/agent/runs', tags=["Agent"])
+@limiter.limit(f"{getattr(settings, 'RATE_LIMIT_PER_MINUTE', 60)}/minute")
+async def create_agent_run(request: Request, agent_req: schemas.AgentStateRequest, user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Queue an agent run for a background worker and return its handle immediately."""
+    await run_in_category('cpu', core.log_action, 'agent_run_enqueue', {'user_input': agent_req.user_input, 'run_id': agent_req.run_id})
+    handle = await enqueue_agent_run(user.id, agent_req, db)
+    if "error" in handle:
+        raise HTTPException(status_code=400, detail=handle["error"])
+    return handle
+
+@app.get('/agent/runs/{run_id}', tags=["Agent"])
+async def get_agent_run(run_id: str, user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Get the checkpointed state of an agent run and its background job."""
+    def load_session():
+        return db.query(AgentSession).filter(AgentSession.run_id == run_id, AgentSession.user_id == user.id).first()
+
+    session_obj = await run_in_category('cpu', load_session)
+    if not session_obj:
+        raise HTTPException(status_code=404, detail="Agent run not found")
+    job = await run_in_category('cpu', agent_job_queue.get_job, run_id)
+    try:
+        history = json.loads(session_obj.history) if session_obj.history else []
+    except Exception:
+        history = []
+    return {
+        "run_id": run_id,
+        "goal": session_obj.goal,
+        "status": session_obj.status,
+        "current_step": session_obj.current_step,
+        "awaiting_assistance": session_obj.awaiting_assistance,
+        "history": history,
+        "job": {
+            "job_id": job["id"],
+            "status": job["status"],
+            "attempts": job["attempts"],
+            "worker": job["lease_owner"],
+            "last_error": job["last_error"],
+            "result": job["result"],
+        } if job else None,
+    }
+
+async def run_agent_session(user_id: int, agent_req: schemas.AgentStateRequest, db: Session, send_log) -> schemas.AgentRunResponse:
+    """Run (or resume) the agent loop for ``agent_req.run_id``.
+
+    The AgentSession is checkpointed after every step, so a run interrupted
+    part-way can be resumed by calling this again with the same run_id.
+    Progress messages are passed to the ``send_log`` coroutine.
+    """
+    core.log_action('agent_run', {'user_input': agent_req.user_input})
+
     # Add current goal to memory only if provided (avoid adding None during resume)
     if agent_req.user_input:
         memory.memory_instance.add_document({"type": "user_goal", "content": agent_req.user_input, "timestamp": datetime.now().isoformat()})
@@ -1061,20 +1311,13 @@ async def agent_run(request: Request, agent_req: schemas.AgentStateRequest, user
         if context_str:
             print(f"Retrieved context from memory: {context_str}")
 
-    async def send_log(message: str):
-        if websocket:
-            try:
-                await websocket.send_json({"topic": "agent_updates", "payload": {"log": message}})
-            except RuntimeError as e:
-                logging.warning(f"Could not send log to WebSocket for user {user_id}: {e}")
-        else:
-            logging.warning(f"No active WebSocket connection for user {user_id} to send log: {message}")
-
     try:
         # Ensure we have a run_id to persist and resume the session
         run_id = agent_req.run_id
         if not run_id:
             return schemas.AgentRunResponse(status="error", message="run_id is required to start or resume an agent run.", history=[], final_result=None)
+        # Browsers opened by this run count against the user's quota and are closed when it ends
+        set_browser_owner(user_id, run_id)
 
         # Load or create AgentSession
         session_obj = db.query(AgentSession).filter(AgentSession.run_id == run_id, AgentSession.user_id == user_id).first()
@@ -1105,7 +1348,7 @@ async def agent_run(request: Request, agent_req: schemas.AgentStateRequest, user
 
         # Enhanced request processing with service detection
         def classify_question_type(question: str) -> str:
-            """Classify if a question is general knowledge, service request, or requires specific tools/browser actions."""
+            """LLM fallback for the question router: classify as general, service or task (None if unclear)."""
             classification_prompt = f"""
             Classify the following user input into one of these categories:
 
@@ -1135,10 +1378,10 @@ async def agent_run(request: Request, agent_req: schemas.AgentStateRequest, user
                 elif 'task' in response:
                     return 'task'
                 else:
-                    return 'task'
+                    return None
             except Exception as e:
-                logging.warning(f"Question classification failed: {e}, defaulting to task")
-                return 'task'
+                logging.warning(f"Question classification failed: {e}, using local router guess")
+                return None
 
         def answer_general_question(question: str, context: str = "") -> str:
             """Answer general questions using Gemini API with optional context."""
@@ -1217,8 +1460,9 @@ async def agent_run(request: Request, agent_req: schemas.AgentStateRequest, user
 
         # Enhanced request processing
         if goal:
-            question_type = classify_question_type(goal)
-            await send_log(f"Request classified as: {question_type}")
+            route = await run_in_category('network', question_router.classify, goal, classify_question_type)
+            question_type = route.label
+            await send_log(f"Request classified as: {question_type} (confidence={route.confidence}, via {route.source})")
 
             if question_type == 'general':
                 # Handle general questions
@@ -1459,8 +1703,8 @@ async def agent_run(request: Request, agent_req: schemas.AgentStateRequest, user
                     
                     # Filter out invalid parameters for specific tools
                     tool_param_filters = {
-                        'open_browser': ['url', 'max_retries', 'retry_delay'],
-                        'get_page_content': ['browser_id'],
+                        'open_browser': ['url', 'max_retries', 'retry_delay', 'profile'],
+                        'get_page_content': ['browser_id', 'mode', 'max_chars'],
                         'fill_form': ['browser_id', 'selector', 'value', 'wait_timeout'],
                         'click_button': ['browser_id', 'selector'],
                         'close_browser': ['browser_id'],
@@ -1477,12 +1721,12 @@ async def agent_run(request: Request, agent_req: schemas.AgentStateRequest, user
                             await send_log(f"Removed invalid parameters for {action_name}: {removed_params}")
                             action_params = valid_params
                     
-                    # Execute tool in a thread to avoid blocking the event loop
+                    # Execute tool without blocking the event loop (async CDP tools are cancelled on timeout)
                     if action_name in browser_required_tools:
                         timeout_duration = 60 if action_name in ['fill_multiple_fields', 'fill_form'] else 30
                         try:
                             result = await asyncio.wait_for(
-                                asyncio.to_thread(tool.func, **action_params),
+                                tool.ainvoke(**action_params),
                                 timeout=timeout_duration
                             )
                         except asyncio.TimeoutError:
@@ -1492,7 +1736,7 @@ async def agent_run(request: Request, agent_req: schemas.AgentStateRequest, user
                             else:
                                 result = f"Error: Browser operation '{action_name}' timed out. This may be due to GPU/WebGL issues."
                     else:
-                        result = await asyncio.to_thread(tool.func, **action_params)
+                        result = await tool.ainvoke(**action_params)
                     
                     await send_log(f"Action Result: {str(result)[:200]}...") # Log first 200 chars
                 except Exception as e:
@@ -1520,7 +1764,7 @@ async def agent_run(request: Request, agent_req: schemas.AgentStateRequest, user
                                     timeout_duration = 60 if action_name in ['fill_multiple_fields', 'fill_form'] else 30
                                     try:
                                         result = await asyncio.wait_for(
-                                            asyncio.to_thread(tool.func, **action_params),
+                                            tool.ainvoke(**action_params),
                                             timeout=timeout_duration
                                         )
                                     except asyncio.TimeoutError:
@@ -1658,6 +1902,8 @@ async def agent_run(request: Request, agent_req: schemas.AgentStateRequest, user
                 session_obj.status = 'completed'
                 session_obj.history = json.dumps(history)
                 db.commit()
+                await cdp_browser.close_run_browsers(run_id)
+                await run_in_category('browser', browsing.close_run_browsers, run_id)
                 
                 return schemas.AgentRunResponse(
                     status="success", 
@@ -1704,6 +1950,9 @@ async def agent_run(request: Request, agent_req: schemas.AgentStateRequest, user
             history=history, 
             final_result=None
         )
+    except LeaseLostError:
+        # Another worker owns this run now; leave the session to it.
+        raise
     except Exception as e:
         error_message = f"An unexpected error occurred during agent run: {e}"
         logging.error(error_message, exc_info=True)
@@ -1716,6 +1965,9 @@ async def agent_run(request: Request, agent_req: schemas.AgentStateRequest, user
                 db.commit()
         except Exception:
             pass
+        if agent_req.run_id:
+            await cdp_browser.close_run_browsers(agent_req.run_id)
+            await run_in_category('browser', browsing.close_run_browsers, agent_req.run_id)
         await send_log(error_message)
         await send_log(json.dumps({"topic": "agent_updates", "payload": {"status": "error", "data": {"message": error_message}}}))
         raise
@@ -1789,6 +2041,15 @@ def get_scraping_results(user: schemas.User = Depends(get_current_user), limit:
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+@app.get('/tasks/scraping/versions')
+def get_page_versions(url: str, scrape_type: Optional[str] = None, limit: int = 20, user: schemas.User = Depends(get_current_user)):
+    """Version history of a scraped URL: one entry per content change, with block counts"""
+    try:
+        versions = task_manager.get_page_versions(url, scrape_type=scrape_type, limit=limit)
+        return {"success": True, "url": url, "versions": versions}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
 @app.get('/tasks/{task_id}')
 def get_task_details(task_id: str, user: schemas.User = Depends(get_current_user)):
     """Get detailed information about a specific task"""
@@ -1853,66 +2114,46 @@ async def websocket_chat_endpoint(websocket: WebSocket, user: schemas.User = Dep
 def chat_with_scraped_content(task_id: str, message: Dict[str, str], user: schemas.User = Depends(get_current_user)):
     """Chat with AI about scraped content"""
     try:
-        # Get scraped content from database
-        scraped_data = task_manager.get_scraped_content(task_id)
-        if not scraped_data:
+        # Answer from the chunks of the page relevant to the question (see scraped_chat.py)
+        from scraped_chat import answer_question
+        answer = answer_question(task_id, message.get('message', ''), task_manager)
+        if answer is None:
             raise HTTPException(status_code=404, detail="Scraped content not found")
-        
-        # Parse the full scraped content
-        full_content = json.loads(scraped_data.get('full_scraped_content', '{}'))
-        
-        # Extract relevant content for AI context
-        context_data = {
-            'url': scraped_data.get('url', ''),
-            'title': scraped_data.get('title', ''),
-            'text_content': full_content.get('data', {}).get('text_content', {}),
-            'metadata': full_content.get('data', {}).get('metadata', {}),
-            'statistics': full_content.get('statistics', {})
-        }
-        
-        # Create AI prompt with context
-        user_message = message.get('message', '')
-        system_prompt = f"""You are an AI assistant helping analyze scraped web content. 
-        
-Content Context:
-        - URL: {context_data['url']}
-        - Title: {context_data['title']}
-        - Word Count: {context_data['statistics'].get('word_count', 0)}
-        - Page Size: {context_data['statistics'].get('page_size_chars', 0)} characters
-        
-Text Content Summary:
-{json.dumps(context_data['text_content'], indent=2)[:2000]}...
-        
-Please answer the user's question about this content."""
-        
-        # Use OpenAI to generate response
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ],
-            max_tokens=1000,
-            temperature=0.7
-        )
-        
-        ai_response = response.choices[0].message.content
-        
-        return {
-            "success": True,
-            "response": ai_response,
-            "context": {
-                "url": context_data['url'],
-                "title": context_data['title'],
-                "word_count": context_data['statistics'].get('word_count', 0)
-            }
-        }
-        
+
+        return {"success": True, **answer}
+
+    except HTTPException:
+        raise
     except Exception as e:
         structured_logger.error(f"Error in AI chat: {str(e)}")
         raise HTTPException(status_code=500, detail=f"AI chat error: {str(e)}")
 
+@app.get('/tasks/{task_id}/tables')
+def list_scraped_tables(task_id: str, user: schemas.User = Depends(get_current_user)):
+    """Tables of a scraping task with their typed columns, without the rows"""
+    try:
+        return {"success": True, "task_id": task_id, "tables": task_manager.get_scraped_tables(task_id)}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@app.get('/tasks/{task_id}/tables/{table_id}/download')
+def download_scraped_table(task_id: str, table_id: int, format: str = 'csv', user: schemas.User = Depends(get_current_user)):
+    """Stream one scraped table as typed CSV, Arrow IPC stream or Parquet, reading rows from storage as it goes"""
+    from table_export import EXPORT_FORMATS, ExportUnavailable, export_table
+    fmt = format.lower()
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format. Use {', '.join(repr(f) for f in EXPORT_FORMATS)}")
+    table = next((t for t in task_manager.get_scraped_tables(task_id) if t.get('table_id') == table_id), None)
+    if table is None:
+        raise HTTPException(status_code=404, detail="Table not found")
+    try:
+        body = export_table(table, task_manager.iter_table_rows(task_id, table_id), fmt)
+    except ExportUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    media_type, extension = EXPORT_FORMATS[fmt]
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Content-Disposition": f"attachment; filename=table_{table_id}_{task_id}.{extension}"})
+
 @app.get('/tasks/{task_id}/download')
 def download_scraped_content(task_id: str, format: str = 'json', user: schemas.User = Depends(get_current_user)):
     """Download scraped content in various formats"""
@@ -1988,6 +2229,13 @@ def download_scraped_content(task_id: str, format: str = 'json', user: schemas.U
             links = full_content.get('data', {}).get('links', [])
             for link in links:
                 writer.writerow(['Link', f"{link.get('text', '')} - {link.get('url', '')}"]) 
+
+            # Write tables, one row per table row (typed per-table exports: /tasks/{task_id}/tables/{table_id}/download)
+            for table in full_content.get('data', {}).get('tables', []):
+                label = f"Table {table.get('table_id', '')}"
+                writer.writerow([f"{label} Header", ' | '.join(table.get('headers', []))])
+                for row in table.get('data', []):
+                    writer.writerow([label, ' | '.join(row)])
             
             from fastapi.responses import Response
             return Response(
@@ -0,0 +1,209 @@
+"""
+Named network profiles for browser sessions.
+
+A profile decides which requests a page may make:
+
+- ``scrape-fast``: reading content only. Blocks images, media, fonts,
+  stylesheets, ads and trackers. JavaScript still runs.
+- ``interactive``: filling forms and clicking. Keeps stylesheets and images,
+  which layout and visibility checks depend on. Blocks media, fonts, ads and
+  trackers.
+- ``full``: no blocking.
+
+Selenium sessions enforce a profile with ``Network.setBlockedURLs`` URL
+patterns (chromedriver cannot handle interception events), so resource types
+are matched by file extension. The CDP backend (``cdp_browser.py``) also
+intercepts requests with the ``Fetch`` domain, which matches resource types
+exactly.
+
+Blocked requests are never downloaded, so bytes saved are estimated from
+typical response sizes per resource type.
+"""
+
+import json
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.config import settings
+
+AD_TRACKER_PATTERNS = (
+    "*doubleclick.net*", "*googlesyndication.com*", "*googleadservices.com*", "*google-analytics.com*",
+    "*googletagmanager.com*", "*googletagservices.com*", "*adservice.google.*", "*connect.facebook.net*",
+    "*facebook.com/tr*", "*hotjar.com*", "*segment.io*", "*cdn.segment.com*", "*scorecardresearch.com*",
+    "*quantserve.com*", "*criteo.com*", "*criteo.net*", "*taboola.com*", "*outbrain.com*", "*amazon-adsystem.com*",
+    "*adsrvr.org*", "*adnxs.com*", "*moatads.com*", "*bing.com/bat*", "*clarity.ms*", "*newrelic.com*",
+    "*nr-data.net*", "*mixpanel.com*", "*optimizely.com*", "*chartbeat.com*",
+)
+
+# Extension patterns used where requests cannot be matched by resource type
+RESOURCE_TYPE_PATTERNS = {
+    "Image": ("*.png", "*.png?*", "*.jpg", "*.jpg?*", "*.jpeg", "*.jpeg?*", "*.gif", "*.gif?*",
+              "*.webp", "*.webp?*", "*.avif", "*.avif?*", "*.svg", "*.svg?*", "*.ico", "*.ico?*"),
+    "Media": ("*.mp4", "*.mp4?*", "*.webm", "*.webm?*", "*.m3u8", "*.m3u8?*", "*.ts?*", "*.mp3", "*.mp3?*",
+              "*.ogg", "*.ogg?*", "*.wav", "*.wav?*", "*.m4a", "*.m4a?*"),
+    "Font": ("*.woff", "*.woff?*", "*.woff2", "*.woff2?*", "*.ttf", "*.ttf?*", "*.otf", "*.otf?*",
+             "*.eot", "*.eot?*", "*fonts.googleapis.com*", "*fonts.gstatic.com*", "*use.typekit.net*"),
+    "Stylesheet": ("*.css", "*.css?*"),
+}
+
+# Typical transfer sizes per resource type, used to estimate bytes saved
+ESTIMATED_BYTES_BY_TYPE = {
+    "Image": 30_000,
+    "Media": 500_000,
+    "Font": 30_000,
+    "Stylesheet": 20_000,
+    "Script": 25_000,
+}
+DEFAULT_ESTIMATED_BYTES = 5_000
+
+
+@dataclass(frozen=True)
+class NetworkProfile:
+    """Which requests a browser session blocks."""
+    name: str
+    blocked_types: Tuple[str, ...] = ()
+    block_ads_and_trackers: bool = False
+
+    def blocked_url_patterns(self, include_types: bool = True) -> List[str]:
+        """URL patterns for ``Network.setBlockedURLs``."""
+        patterns = list(AD_TRACKER_PATTERNS) if self.block_ads_and_trackers else []
+        if include_types:
+            for resource_type in self.blocked_types:
+                patterns.extend(RESOURCE_TYPE_PATTERNS.get(resource_type, ()))
+        return patterns
+
+
+PROFILES: Dict[str, NetworkProfile] = {
+    "scrape-fast": NetworkProfile("scrape-fast", ("Image", "Media", "Font", "Stylesheet"), True),
+    "interactive": NetworkProfile("interactive", ("Media", "Font"), True),
+    "full": NetworkProfile("full"),
+}
+
+
+def get_profile(name: Optional[str] = None) -> NetworkProfile:
+    """Look up a profile, defaulting to ``BROWSER_NETWORK_PROFILE``."""
+    name = name or getattr(settings, "BROWSER_NETWORK_PROFILE", "interactive")
+    profile = PROFILES.get(name)
+    if profile is None:
+        raise ValueError(f"Unknown network profile '{name}'. Available: {', '.join(PROFILES)}")
+    return profile
+
+
+@dataclass
+class PageNetworkStats:
+    """Request accounting for one page load."""
+    profile: str
+    requests: int = 0
+    bytes_received: int = 0
+    blocked: Dict[str, int] = field(default_factory=dict)
+
+    def record_blocked(self, resource_type: Optional[str]):
+        resource_type = resource_type or "Other"
+        self.blocked[resource_type] = self.blocked.get(resource_type, 0) + 1
+
+    def record_event(self, method: str, params: Dict[str, Any]):
+        """Account for one Network domain event."""
+        if method == "Network.requestWillBeSent":
+            self.requests += 1
+        elif method == "Network.loadingFinished":
+            self.bytes_received += int(params.get("encodedDataLength") or 0)
+        elif method == "Network.loadingFailed":
+            # setBlockedURLs sets blockedReason; Fetch.failRequest(BlockedByClient) only the error text
+            if params.get("blockedReason") or "ERR_BLOCKED_BY_CLIENT" in (params.get("errorText") or ""):
+                self.record_blocked(params.get("type"))
+
+    @property
+    def blocked_requests(self) -> int:
+        return sum(self.blocked.values())
+
+    @property
+    def estimated_bytes_saved(self) -> int:
+        return sum(ESTIMATED_BYTES_BY_TYPE.get(t, DEFAULT_ESTIMATED_BYTES) * n for t, n in self.blocked.items())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "profile": self.profile,
+            "requests": self.requests,
+            "bytes_received": self.bytes_received,
+            "blocked_requests": self.blocked_requests,
+            "blocked_by_type": dict(self.blocked),
+            "estimated_bytes_saved": self.estimated_bytes_saved,
+        }
+
+
+def apply_profile(driver, profile: NetworkProfile):
+    """Enforce ``profile`` on the current tab of a Selenium driver."""
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": profile.blocked_url_patterns()})
+
+
+def drain_performance_log(driver) -> List[Dict[str, Any]]:
+    """Read (and clear) the DevTools events chromedriver buffered since the last call."""
+    try:
+        entries = driver.get_log("performance")
+    except Exception:
+        return []
+    webview = getattr(driver, "_handle", None)  # TabDriver: keep only this tab's events
+    messages = []
+    for entry in entries:
+        try:
+            message = json.loads(entry["message"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if webview is not None and message.get("webview") not in (None, webview):
+            continue
+        messages.append(message.get("message", {}))
+    return messages
+
+
+def page_stats_from_events(profile: NetworkProfile, events: List[Dict[str, Any]]) -> PageNetworkStats:
+    """Summarise Network domain events for one page load."""
+    stats = PageNetworkStats(profile.name)
+    for event in events:
+        stats.record_event(event.get("method"), event.get("params", {}))
+    return stats
+
+
+class NetworkStatsRecorder:
+    """Keeps the latest page stats per browser and totals per profile."""
+
+    def __init__(self, max_pages: int = 200):
+        self.max_pages = max_pages
+        self.lock = threading.Lock()
+        self.pages: Dict[str, Dict[str, Any]] = {}
+        self.totals: Dict[str, Dict[str, int]] = {}
+
+    def record(self, browser_id: str, url: str, stats: PageNetworkStats):
+        entry = {"url": url, **stats.to_dict()}
+        with self.lock:
+            self.pages.pop(browser_id, None)
+            self.pages[browser_id] = entry
+            while len(self.pages) > self.max_pages:
+                self.pages.pop(next(iter(self.pages)))
+            totals = self.totals.setdefault(stats.profile, {"pages": 0, "requests": 0, "bytes_received": 0,
+                                                            "blocked_requests": 0, "estimated_bytes_saved": 0})
+            totals["pages"] += 1
+            totals["requests"] += stats.requests
+            totals["bytes_received"] += stats.bytes_received
+            totals["blocked_requests"] += stats.blocked_requests
+            totals["estimated_bytes_saved"] += stats.estimated_bytes_saved
+        logging.info(f"Network profile '{stats.profile}' on {url}: {stats.blocked_requests} requests blocked, "
+                     f"~{stats.estimated_bytes_saved // 1024}KB saved")
+
+    def get_page(self, browser_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            return self.pages.get(browser_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "default_profile": getattr(settings, "BROWSER_NETWORK_PROFILE", "interactive"),
+                "profiles": list(PROFILES),
+                "totals": {name: dict(t) for name, t in self.totals.items()},
+            }
+
+
+# Global recorder shared by the Selenium and CDP backends
+network_stats = NetworkStatsRecorder()
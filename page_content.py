@@ -0,0 +1,108 @@
+"""
+Compact page content for agent steps.
+
+``get_page_content`` used to return ``documentElement.outerHTML``, often
+megabytes, which then went into the agent history, the LLM prompt, the logs
+and the memory store. The extraction below runs in the browser and returns
+one of these views, cut to ``max_chars`` before it crosses the wire:
+
+- ``text``: readable text of the main content (``innerText``, so hidden
+  elements and scripts are skipped);
+- ``outline``: headings, landmarks, forms, fields and buttons, each with a
+  selector the agent can pass to ``fill_form``/``click_button``;
+- ``links``: link text and absolute URLs, deduplicated;
+- ``html``: the full ``outerHTML`` (what scrapers and parsers need).
+"""
+
+from typing import Any, Dict, Optional
+
+from core.config import settings
+from dom_snapshot import SELECTOR_JS
+
+CONTENT_MODES = ("text", "outline", "links", "html")
+
+PAGE_CONTENT_JS = """
+(mode, maxChars) => {
+""" + SELECTOR_JS + """
+    const clean = (s, n) => (s || '').replace(/\\s+/g, ' ').trim().slice(0, n);
+    const isShown = (el) => el.getClientRects().length > 0 && getComputedStyle(el).visibility !== 'hidden';
+    let content = '';
+    if (mode === 'html') {
+        content = document.documentElement ? document.documentElement.outerHTML : (document.body ? document.body.outerHTML : '');
+    } else if (mode === 'links') {
+        const seen = new Set();
+        const lines = [];
+        document.querySelectorAll('a[href]').forEach((a) => {
+            const href = a.href;
+            if (!href || href.startsWith('javascript:') || seen.has(href)) return;
+            seen.add(href);
+            lines.push((clean(a.innerText || a.getAttribute('aria-label') || a.title, 100) || '(no text)') + ' -> ' + href);
+        });
+        content = lines.join('\\n');
+    } else if (mode === 'outline') {
+        const lines = [];
+        const query = 'h1, h2, h3, h4, h5, h6, main, nav, header, footer, aside, [role="main"], [role="navigation"], ' +
+                      '[role="dialog"], form, input, textarea, select, button, [role="button"]';
+        document.querySelectorAll(query).forEach((el) => {
+            const tag = el.tagName.toLowerCase();
+            const type = (el.getAttribute('type') || '').toLowerCase();
+            if (type === 'hidden' || (el.matches('input, textarea, select, button, [role="button"]') && !isShown(el))) return;
+            let depth = 0;
+            for (let p = el.parentElement; p; p = p.parentElement) if (p.tagName === 'FORM') depth++;
+            let line;
+            if (/^h[1-6]$/.test(tag)) {
+                line = tag + ' ' + JSON.stringify(clean(el.innerText, 120));
+            } else if (tag === 'form') {
+                line = 'form ' + selectorFor(el) + (el.getAttribute('action') ? ' -> ' + el.getAttribute('action') : '');
+            } else if (el.matches('input, textarea, select')) {
+                const hint = clean((el.labels && el.labels[0] && el.labels[0].innerText) || el.getAttribute('aria-label') ||
+                                   el.placeholder || el.name, 60);
+                line = tag + (type ? '[' + type + ']' : '') + ' ' + selectorFor(el) + (hint ? ' ' + JSON.stringify(hint) : '');
+            } else if (el.matches('button, [role="button"]')) {
+                line = 'button ' + selectorFor(el) + ' ' + JSON.stringify(clean(el.innerText || el.value || el.getAttribute('aria-label'), 60));
+            } else {
+                line = (el.getAttribute('role') || tag) + ' ' + selectorFor(el);
+            }
+            lines.push('  '.repeat(depth) + line);
+        });
+        content = lines.join('\\n');
+    } else {
+        let root = document.body;
+        const main = document.querySelector('main, article, [role="main"]');
+        if (main && (main.innerText || '').trim().length > 200) root = main;
+        content = root ? root.innerText.replace(/[ \\t]+\\n/g, '\\n').replace(/\\n{3,}/g, '\\n\\n').trim() : '';
+    }
+    const total = content.length;
+    if (maxChars > 0 && total > maxChars) content = content.slice(0, maxChars);
+    return {mode: mode, url: location.href, title: document.title, content: content, total_chars: total,
+            truncated: content.length < total};
+}
+"""
+
+SELENIUM_PAGE_CONTENT_JS = f"return ({PAGE_CONTENT_JS})(arguments[0], arguments[1]);"
+
+
+def resolve_mode(mode: Optional[str]) -> str:
+    """Validate ``mode``; None selects the agent default (``AGENT_PAGE_CONTENT_MODE``)."""
+    mode = (mode or getattr(settings, "AGENT_PAGE_CONTENT_MODE", "text")).lower()
+    if mode not in CONTENT_MODES:
+        raise ValueError(f"Unknown content mode '{mode}'. Available: {', '.join(CONTENT_MODES)}")
+    return mode
+
+
+def resolve_max_chars(mode: str, max_chars: Optional[int]) -> int:
+    """Size cap for ``mode``; compact modes default to ``PAGE_CONTENT_MAX_CHARS``, html to no cap (0)."""
+    if max_chars is not None:
+        return int(max_chars)
+    return 0 if mode == "html" else int(getattr(settings, "PAGE_CONTENT_MAX_CHARS", 20000))
+
+
+def format_page_content(result: Dict[str, Any]) -> str:
+    """Render a PAGE_CONTENT_JS result; compact modes get a title/URL header and a truncation note."""
+    content = result.get("content") or ""
+    if result.get("mode") == "html":
+        return content
+    header = f"[{result.get('mode')}] {result.get('title') or ''} <{result.get('url') or ''}>".strip()
+    if result.get("truncated"):
+        content += f"\n... [truncated: showing {len(result.get('content') or '')} of {result.get('total_chars')} characters]"
+    return f"{header}\n{content}"
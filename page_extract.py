@@ -0,0 +1,466 @@
+"""
+Single-pass HTML extraction for ``scrape_website_comprehensive``.
+
+The original extraction parsed with BeautifulSoup's pure-Python
+``html.parser``. It then walked the tree once per ``find_all`` category
+(links, images, tables, forms, each heading level, paragraphs, lists, meta).
+The statistics block repeated those walks, and ``get_text()`` ran twice.
+``extract_page`` parses once with lxml and collects every category and
+every statistic in one ``iter()`` over the document.
+
+``PageEventExtractor`` is the incremental variant for streamed scrapes. It
+is fed the HTML in chunks and returns extraction events as elements close.
+Finished subtrees are dropped from the tree, so memory stays bounded by the
+largest open container (a table, form, list or paragraph) rather than by the page.
+
+Tables are read by ``table_extract.parse_table``: spans expanded, header
+rows detected, and each column typed (integer, number, date, ...).
+
+``extract_page_bs4`` keeps the previous implementation so
+``bench_extraction.py`` can compare the two on saved pages. Two behaviour
+differences from it are deliberate:
+
+- JSON-LD is found in 'all' mode. The old text extraction removed every
+  ``<script>`` before the structured-data pass could read it.
+- ``word_count`` always counts visible text, without script or style
+  content.
+"""
+
+import json
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urljoin
+
+import lxml.html
+from lxml import etree
+
+from table_extract import parse_table
+
+SCRAPE_TYPES = ("all", "text", "links", "images", "tables", "forms", "structured")
+
+_HEADINGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+_INVISIBLE = {"script", "style"}
+_FIELD_TAGS = ("input", "select", "textarea")
+# Mount points of client-rendered apps; empty ones mean the served HTML is a shell
+SPA_ROOT_IDS = ("root", "app", "__next", "__nuxt", "svelte", "main-app", "application")
+# Elements whose content is read when they close; nothing inside them is dropped before that
+_CAPTURING = {"p", "li", "ul", "ol", "table", "form", "a", "title", "noscript", "script", "style"} | set(_HEADINGS)
+_KEPT = {"html", "head", "body"}
+
+
+def _categories(scrape_type: str) -> set:
+    if scrape_type == "all":
+        return set(SCRAPE_TYPES) - {"all"}
+    return {scrape_type}
+
+
+def parse_html(html: str):
+    """Parse ``html`` with lxml; returns None for empty or unparseable documents."""
+    if not html or not html.strip():
+        return None
+    try:
+        return lxml.html.document_fromstring(html)
+    except ValueError:
+        # lxml rejects str input that carries an XML encoding declaration
+        return lxml.html.document_fromstring(html.encode("utf-8"))
+    except etree.ParserError:
+        return None
+
+
+def _strip_text(el) -> str:
+    """Equivalent of BeautifulSoup's ``get_text(strip=True)``."""
+    return "".join(s.strip() for s in el.itertext(tag=etree.Element) if s.strip()) if el is not None else ""
+
+
+def _visible_strings(root) -> List[str]:
+    """All stripped text nodes outside script/style, in document order (skipping comments)."""
+    strings = []
+    for event, el in etree.iterwalk(root, events=("start", "end")):
+        if event == "start":
+            if isinstance(el.tag, str) and el.tag not in _INVISIBLE and el.text and el.text.strip():
+                strings.append(el.text.strip())
+        elif el is not root and el.tail and el.tail.strip():
+            strings.append(el.tail.strip())
+    return strings
+
+
+def visible_word_count(html: str) -> int:
+    """Words of visible text, counted like ``statistics['word_count']`` of ``extract_page``."""
+    root = parse_html(html)
+    return sum(len(s.split()) for s in _visible_strings(root)) if root is not None else 0
+
+
+def _form(form, form_id: int) -> Dict[str, Any]:
+    return {
+        "form_id": form_id,
+        "action": form.get("action", ""),
+        "method": form.get("method", "GET"),
+        "inputs": [
+            {
+                "type": field.get("type", field.tag),
+                "name": field.get("name", ""),
+                "id": field.get("id", ""),
+                "placeholder": field.get("placeholder", ""),
+                "required": field.get("required") is not None,
+                "value": field.get("value", ""),
+            }
+            for field in form.iter(*_FIELD_TAGS)
+        ],
+    }
+
+
+def extract_page(html: str, base_url: str, scrape_type: str = "all",
+                 with_links: bool = False, templates: Optional[Sequence] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Extract the requested categories and page statistics in one traversal.
+
+    Returns ``(data, statistics)`` with the same keys as the previous
+    BeautifulSoup-based extraction. ``with_links`` adds ``links`` for any
+    ``scrape_type`` (the crawler needs them to find the next pages).
+    ``templates`` (see extraction_templates.py) add ``extracted`` records,
+    evaluated on the same parsed tree.
+    """
+    wanted = _categories(scrape_type) | ({"links"} if with_links else set())
+    counts = {"a": 0, "img": 0, "table": 0, "form": 0, "heading": 0, "p": 0}
+    links, images, tables, forms, headings, paragraphs, lists = [], [], [], [], [], [], []
+    json_ld, meta_data = [], {}
+    title: Optional[str] = None
+
+    root = parse_html(html)
+    elements: Iterable = root.iter(etree.Element) if root is not None else ()
+    for el in elements:
+        tag = el.tag
+        if tag == "a":
+            counts["a"] += 1
+            href = el.get("href")
+            if "links" in wanted and href is not None:
+                links.append({"text": _strip_text(el), "url": urljoin(base_url, href),
+                              "title": el.get("title", ""), "target": el.get("target", "")})
+        elif tag == "img":
+            counts["img"] += 1
+            src = el.get("src")
+            if "images" in wanted and src:
+                images.append({"src": urljoin(base_url, src), "alt": el.get("alt", ""), "title": el.get("title", ""),
+                               "width": el.get("width", ""), "height": el.get("height", "")})
+        elif tag in _HEADINGS:
+            counts["heading"] += 1
+            if "text" in wanted:
+                headings.append({"level": _HEADINGS[tag], "text": _strip_text(el), "id": el.get("id", "")})
+        elif tag == "p":
+            counts["p"] += 1
+            if "text" in wanted:
+                text = _strip_text(el)
+                if text:
+                    paragraphs.append(text)
+        elif tag == "table":
+            counts["table"] += 1
+            if "tables" in wanted:
+                tables.append(parse_table(el, counts["table"]))
+        elif tag == "form":
+            counts["form"] += 1
+            if "forms" in wanted:
+                forms.append(_form(el, counts["form"]))
+        elif tag in ("ul", "ol"):
+            if "text" in wanted:
+                lists.append({"type": tag, "items": [_strip_text(li) for li in el.iter("li")]})
+        elif tag == "title":
+            if title is None:
+                title = el.text or ""
+        elif tag == "meta":
+            if "structured" in wanted:
+                name = el.get("name") or el.get("property") or el.get("itemprop")
+                content = el.get("content")
+                if name and content:
+                    meta_data[name] = content
+        elif tag == "script":
+            if "structured" in wanted and (el.get("type") or "").lower() == "application/ld+json":
+                try:
+                    json_ld.append({"type": "json-ld", "data": json.loads(el.text or "")})
+                except ValueError:
+                    pass
+
+    visible = _visible_strings(root) if root is not None else []
+    data: Dict[str, Any] = {}
+    if "text" in wanted:
+        data["text_content"] = {"title": title or "", "headings": sorted(headings, key=lambda h: h["level"]),
+                                "paragraphs": paragraphs, "lists": lists, "full_text": " ".join(visible)}
+    if "links" in wanted:
+        data["links"] = links
+    if "images" in wanted:
+        data["images"] = images
+    if "tables" in wanted:
+        data["tables"] = tables
+    if "forms" in wanted:
+        data["forms"] = forms
+    if "structured" in wanted:
+        data["structured_data"] = json_ld + ([{"type": "meta_tags", "data": meta_data}] if meta_data else [])
+    if templates:
+        from extraction_templates import extract_structured
+        data["extracted"] = extract_structured(html, base_url, templates, root=root)
+
+    statistics = {
+        "total_links": counts["a"],
+        "total_images": counts["img"],
+        "total_tables": counts["table"],
+        "total_forms": counts["form"],
+        "total_headings": counts["heading"],
+        "total_paragraphs": counts["p"],
+        "page_size_chars": len(html or ""),
+        "word_count": sum(len(s.split()) for s in visible),
+    }
+    return data, statistics
+
+
+class PageEventExtractor:
+    """Incremental ``extract_page`` over HTML chunks, for streamed scrapes.
+
+    ``feed`` and ``close`` return lists of events, each a dict with an
+    ``event`` key:
+
+    - ``metadata``: title and meta tags, once ``<head>`` closes;
+    - ``text``: headings, paragraphs and lists;
+    - ``links`` and ``images``;
+    - ``table``: one table, rows sent in parts;
+    - ``form``;
+    - ``structured``: JSON-LD.
+
+    Item events carry up to ``chunk_size`` items. ``statistics`` matches
+    ``extract_page``. Page-wide ``full_text`` is not produced; ``word_count``
+    covers it. ``signals`` records what ``fetch_strategy`` needs to spot
+    client-rendered pages.
+    """
+
+    def __init__(self, base_url: str, scrape_type: str = "all", chunk_size: int = 50):
+        self.base_url = base_url
+        self.wanted = _categories(scrape_type)
+        self.chunk_size = max(1, chunk_size)
+        self.parser = etree.HTMLPullParser(events=("start", "end"))
+        self.counts = {"a": 0, "img": 0, "table": 0, "form": 0, "heading": 0, "p": 0}
+        self.chars = 0
+        self.word_count = 0
+        self.title: Optional[str] = None
+        self.meta: Dict[str, str] = {}
+        self.metadata_sent = False
+        self.buffers: Dict[str, List[Any]] = {"text": [], "links": [], "images": [], "structured": []}
+        self.signals: Dict[str, Any] = {"scripts": 0, "empty_spa_root": False, "noscript_text": ""}
+        self._capture_depth = 0
+
+    @property
+    def statistics(self) -> Dict[str, Any]:
+        return {
+            "total_links": self.counts["a"],
+            "total_images": self.counts["img"],
+            "total_tables": self.counts["table"],
+            "total_forms": self.counts["form"],
+            "total_headings": self.counts["heading"],
+            "total_paragraphs": self.counts["p"],
+            "page_size_chars": self.chars,
+            "word_count": self.word_count,
+        }
+
+    def feed(self, data: str) -> List[Dict[str, Any]]:
+        self.chars += len(data)
+        self.parser.feed(data)
+        return self._drain()
+
+    def close(self) -> List[Dict[str, Any]]:
+        try:
+            self.parser.close()
+        except etree.ParserError:
+            pass  # empty document
+        events = self._drain()
+        if not self.metadata_sent:
+            events.append(self._metadata())
+        for kind in self.buffers:
+            self._flush(kind, events)
+        return events
+
+    def _metadata(self) -> Dict[str, Any]:
+        self.metadata_sent = True
+        event = {"event": "metadata", "title": self.title or ""}
+        if "structured" in self.wanted:
+            event["meta"] = dict(self.meta)
+        return event
+
+    def _add(self, kind: str, item: Any, events: List[Dict[str, Any]]):
+        self.buffers[kind].append(item)
+        if len(self.buffers[kind]) >= self.chunk_size:
+            self._flush(kind, events)
+
+    def _flush(self, kind: str, events: List[Dict[str, Any]]):
+        if self.buffers[kind]:
+            events.append({"event": kind, "items": self.buffers[kind]})
+            self.buffers[kind] = []
+
+    def _count_words(self, text: Optional[str]):
+        if text:
+            self.word_count += len(text.split())
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        events: List[Dict[str, Any]] = []
+        for action, el in self.parser.read_events():
+            if action == "start":
+                if el.tag in _CAPTURING:
+                    self._capture_depth += 1
+                if el.tag == "script":
+                    self.signals["scripts"] += 1
+            else:
+                self._end(el, events)
+        return events
+
+    def _end(self, el, events: List[Dict[str, Any]]):
+        tag = el.tag
+        # Each text node is counted once: an element's text when it closes, a child's tail when its
+        # parent closes (or when the child is dropped, below)
+        if tag not in _INVISIBLE:
+            self._count_words(el.text)
+        for child in el:
+            self._count_words(child.tail)
+
+        wanted = self.wanted
+        if tag == "a":
+            self.counts["a"] += 1
+            href = el.get("href")
+            if "links" in wanted and href is not None:
+                self._add("links", {"text": _strip_text(el), "url": urljoin(self.base_url, href),
+                                    "title": el.get("title", ""), "target": el.get("target", "")}, events)
+        elif tag == "img":
+            self.counts["img"] += 1
+            src = el.get("src")
+            if "images" in wanted and src:
+                self._add("images", {"src": urljoin(self.base_url, src), "alt": el.get("alt", ""), "title": el.get("title", ""),
+                                     "width": el.get("width", ""), "height": el.get("height", "")}, events)
+        elif tag in _HEADINGS:
+            self.counts["heading"] += 1
+            if "text" in wanted:
+                self._add("text", {"type": "heading", "level": _HEADINGS[tag], "text": _strip_text(el),
+                                   "id": el.get("id", "")}, events)
+        elif tag == "p":
+            self.counts["p"] += 1
+            text = _strip_text(el) if "text" in wanted else ""
+            if text:
+                self._add("text", {"type": "paragraph", "text": text}, events)
+        elif tag in ("ul", "ol"):
+            if "text" in wanted:
+                self._add("text", {"type": "list", "list_type": tag, "items": [_strip_text(li) for li in el.iter("li")]}, events)
+        elif tag == "table":
+            self.counts["table"] += 1
+            if "tables" in wanted:
+                table = parse_table(el, self.counts["table"])
+                rows = table.pop("data")
+                for start in range(0, max(len(rows), 1), self.chunk_size):
+                    events.append({"event": "table", **table, "rows": rows[start:start + self.chunk_size],
+                                   "offset": start, "final": start + self.chunk_size >= len(rows)})
+        elif tag == "form":
+            self.counts["form"] += 1
+            if "forms" in wanted:
+                events.append({"event": "form", **_form(el, self.counts["form"])})
+        elif tag == "title":
+            if self.title is None:
+                self.title = el.text or ""
+        elif tag == "meta":
+            name = el.get("name") or el.get("property") or el.get("itemprop")
+            if name and el.get("content"):
+                self.meta[name] = el.get("content")
+        elif tag == "head":
+            events.append(self._metadata())
+        elif tag == "script":
+            if "structured" in wanted and (el.get("type") or "").lower() == "application/ld+json":
+                try:
+                    self._add("structured", {"type": "json-ld", "data": json.loads(el.text or "")}, events)
+                except ValueError:
+                    pass
+        elif tag == "noscript":
+            if len(self.signals["noscript_text"]) < 2000:
+                self.signals["noscript_text"] += " " + " ".join(el.itertext())
+        elif (tag == "app-root" or el.get("id") in SPA_ROOT_IDS) and len(el) == 0 and not (el.text or "").strip():
+            self.signals["empty_spa_root"] = True
+
+        if tag in _CAPTURING:
+            self._capture_depth -= 1
+        if self._capture_depth == 0 and tag not in _KEPT:
+            # Nothing still open needs this subtree: drop it and the siblings before it
+            el.clear(keep_tail=True)
+            parent = el.getparent()
+            previous = el.getprevious()
+            while previous is not None:
+                self._count_words(previous.tail)
+                parent.remove(previous)
+                previous = el.getprevious()
+
+
+def extract_page_bs4(html: str, base_url: str, scrape_type: str = "all") -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Previous multi-pass BeautifulSoup extraction, kept as the benchmark baseline."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    data: Dict[str, Any] = {}
+
+    if scrape_type in ["all", "text"]:
+        for script in soup(["script", "style"]):
+            script.decompose()
+        headings = []
+        for i in range(1, 7):
+            for heading in soup.find_all(f"h{i}"):
+                headings.append({"level": i, "text": heading.get_text(strip=True), "id": heading.get("id", "")})
+        paragraphs = [p.get_text(strip=True) for p in soup.find_all("p") if p.get_text(strip=True)]
+        lists = [{"type": ul.name, "items": [li.get_text(strip=True) for li in ul.find_all("li")]}
+                 for ul in soup.find_all(["ul", "ol"])]
+        data["text_content"] = {"title": soup.title.string if soup.title else "", "headings": headings,
+                                "paragraphs": paragraphs, "lists": lists,
+                                "full_text": soup.get_text(separator=" ", strip=True)}
+
+    if scrape_type in ["all", "links"]:
+        data["links"] = [{"text": link.get_text(strip=True), "url": urljoin(base_url, link["href"]),
+                          "title": link.get("title", ""), "target": link.get("target", "")}
+                         for link in soup.find_all("a", href=True)]
+
+    if scrape_type in ["all", "images"]:
+        data["images"] = [{"src": urljoin(base_url, img.get("src")), "alt": img.get("alt", ""),
+                           "title": img.get("title", ""), "width": img.get("width", ""), "height": img.get("height", "")}
+                          for img in soup.find_all("img") if img.get("src")]
+
+    if scrape_type in ["all", "tables"]:
+        tables = []
+        for i, table in enumerate(soup.find_all("table")):
+            header_row = table.find("tr")
+            headers = [th.get_text(strip=True) for th in header_row.find_all(["th", "td"])] if header_row else []
+            rows = [[td.get_text(strip=True) for td in row.find_all(["td", "th"])] for row in table.find_all("tr")[1:]]
+            rows = [row for row in rows if row]
+            tables.append({"table_id": i + 1, "headers": headers, "data": rows,
+                           "row_count": len(rows), "column_count": len(headers)})
+        data["tables"] = tables
+
+    if scrape_type in ["all", "forms"]:
+        data["forms"] = [{"form_id": i + 1, "action": form.get("action", ""), "method": form.get("method", "GET"),
+                          "inputs": [{"type": f.get("type", f.name), "name": f.get("name", ""), "id": f.get("id", ""),
+                                      "placeholder": f.get("placeholder", ""), "required": f.has_attr("required"),
+                                      "value": f.get("value", "")}
+                                     for f in form.find_all(["input", "select", "textarea"])]}
+                         for i, form in enumerate(soup.find_all("form"))]
+
+    if scrape_type in ["all", "structured"]:
+        structured = []
+        for script in soup.find_all("script", type="application/ld+json"):
+            try:
+                structured.append({"type": "json-ld", "data": json.loads(script.string)})
+            except Exception:
+                pass
+        meta_data = {}
+        for meta in soup.find_all("meta"):
+            name = meta.get("name") or meta.get("property") or meta.get("itemprop")
+            if name and meta.get("content"):
+                meta_data[name] = meta.get("content")
+        if meta_data:
+            structured.append({"type": "meta_tags", "data": meta_data})
+        data["structured_data"] = structured
+
+    statistics = {
+        "total_links": len(soup.find_all("a")),
+        "total_images": len(soup.find_all("img")),
+        "total_tables": len(soup.find_all("table")),
+        "total_forms": len(soup.find_all("form")),
+        "total_headings": len(soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"])),
+        "total_paragraphs": len(soup.find_all("p")),
+        "page_size_chars": len(html),
+        "word_count": len(soup.get_text().split()),
+    }
+    return data, statistics
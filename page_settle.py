@@ -0,0 +1,193 @@
+"""
+Event-driven page settling.
+
+Instead of fixed ``time.sleep`` calls and polling ``innerHTML.length``, a small
+tracker is installed in the page. It records DOM mutations (MutationObserver)
+and counts in-flight ``fetch``/``XMLHttpRequest`` requests. A page is settled
+once no request is in flight and nothing has changed for a quiet window.
+Every wait gives up after a timeout, so a page that never settles (e.g. one
+with long-polling requests) costs no more than the sleep it replaces. The
+settles of one ``scroll_and_settle`` share a single overall deadline,
+``PAGE_SCROLL_SETTLE_TIMEOUT``, for the same reason.
+
+Settle times are returned per call and aggregated per label in
+``settle_stats``.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+from core.config import settings
+
+# Resolves with a summary once the page has been quiet for quietMs, or after timeoutMs
+SETTLE_JS = """
+(quietMs, timeoutMs) => new Promise((resolve) => {
+    const w = window;
+    if (!w.__settleTracker) {
+        const t = w.__settleTracker = {inflight: 0, requests: 0, mutations: 0, last: performance.now(), listeners: new Set()};
+        const touch = () => { t.last = performance.now(); t.listeners.forEach((fn) => fn()); };
+        new MutationObserver(() => { t.mutations++; touch(); }).observe(document.documentElement || document,
+            {childList: true, subtree: true, attributes: true, characterData: true});
+        const start = () => { t.inflight++; t.requests++; touch(); };
+        const end = () => { t.inflight = Math.max(0, t.inflight - 1); touch(); };
+        if (w.fetch) {
+            const fetch = w.fetch;
+            w.fetch = function (...args) {
+                start();
+                return fetch.apply(this, args).finally(end);
+            };
+        }
+        const send = XMLHttpRequest.prototype.send;
+        XMLHttpRequest.prototype.send = function (...args) {
+            start();
+            this.addEventListener('loadend', end, {once: true});
+            return send.apply(this, args);
+        };
+    }
+    const t = w.__settleTracker;
+    const began = performance.now();
+    const mutations = t.mutations, requests = t.requests;
+    let quietTimer = null, deadline = null;
+    const finish = (timedOut) => {
+        clearTimeout(quietTimer);
+        clearTimeout(deadline);
+        t.listeners.delete(arm);
+        document.removeEventListener('readystatechange', arm);
+        resolve({
+            settled: !timedOut, timed_out: timedOut, elapsed_ms: Math.round(performance.now() - began),
+            mutations: t.mutations - mutations, requests: t.requests - requests, inflight: t.inflight,
+        });
+    };
+    function arm() {
+        clearTimeout(quietTimer);
+        if (t.inflight > 0 || document.readyState === 'loading') return;
+        quietTimer = setTimeout(() => finish(false), Math.max(0, quietMs - (performance.now() - t.last)));
+    }
+    deadline = setTimeout(() => finish(true), timeoutMs);
+    t.listeners.add(arm);
+    document.addEventListener('readystatechange', arm);
+    arm();
+})
+"""
+
+# Selenium's execute_async_script passes a completion callback as the last argument
+SELENIUM_SETTLE_JS = f"const done = arguments[arguments.length - 1]; ({SETTLE_JS})(arguments[0], arguments[1]).then(done);"
+
+
+@dataclass
+class SettleResult:
+    """Outcome of one settle wait."""
+    settled: bool
+    timed_out: bool
+    elapsed_ms: int
+    mutations: int = 0
+    requests: int = 0
+    inflight: int = 0
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _resolve(quiet_ms: Optional[int], timeout: Optional[float]):
+    if quiet_ms is None:
+        quiet_ms = int(getattr(settings, "PAGE_SETTLE_QUIET_MS", 500))
+    if timeout is None:
+        timeout = float(getattr(settings, "PAGE_SETTLE_TIMEOUT", 10.0))
+    return quiet_ms, timeout
+
+
+def result_from_js(raw: Optional[Dict[str, Any]]) -> SettleResult:
+    raw = raw or {}
+    return SettleResult(
+        settled=bool(raw.get("settled")),
+        timed_out=bool(raw.get("timed_out")),
+        elapsed_ms=int(raw.get("elapsed_ms") or 0),
+        mutations=int(raw.get("mutations") or 0),
+        requests=int(raw.get("requests") or 0),
+        inflight=int(raw.get("inflight") or 0),
+    )
+
+
+def wait_for_settle(driver, quiet_ms: int = None, timeout: float = None, label: str = "default") -> SettleResult:
+    """Block until the page in ``driver`` is quiet for ``quiet_ms`` or ``timeout`` seconds pass."""
+    quiet_ms, timeout = _resolve(quiet_ms, timeout)
+    started = time.monotonic()
+    try:
+        result = result_from_js(driver.execute_async_script(SELENIUM_SETTLE_JS, quiet_ms, int(timeout * 1000)))
+    except Exception as e:
+        # Typically a navigation replaced the document while we were waiting
+        result = SettleResult(settled=False, timed_out=False, elapsed_ms=int((time.monotonic() - started) * 1000), error=str(e).split("\n")[0])
+    settle_stats.record(label, result)
+    return result
+
+
+def scroll_and_settle(driver, max_scrolls: int = 3, quiet_ms: int = None, timeout: float = None,
+                      label: str = "scroll", total_timeout: float = None) -> Dict[str, Any]:
+    """Scroll to the bottom until the page stops growing, settling after each scroll to let lazy content load.
+
+    All settles together wait at most ``total_timeout`` seconds (``PAGE_SCROLL_SETTLE_TIMEOUT``).
+    Each gets an even share of the time left, capped at ``timeout``.
+    """
+    quiet_ms, timeout = _resolve(quiet_ms, timeout)
+    if total_timeout is None:
+        total_timeout = float(getattr(settings, "PAGE_SCROLL_SETTLE_TIMEOUT", 9.0))
+    deadline = time.monotonic() + total_timeout
+
+    def settle(settles_left: int) -> SettleResult:
+        share = max(0.0, deadline - time.monotonic()) / settles_left
+        return wait_for_settle(driver, quiet_ms, min(timeout, share), label=label)
+
+    settles = [settle(max_scrolls + 1)]
+    scrolls = 0
+    for settles_left in range(max_scrolls, 0, -1):
+        if time.monotonic() >= deadline:
+            break
+        try:
+            height = driver.execute_script("window.scrollTo(0, document.body.scrollHeight); return document.body.scrollHeight;")
+        except Exception:
+            break
+        scrolls += 1
+        settles.append(settle(settles_left))
+        try:
+            if driver.execute_script("return document.body.scrollHeight;") == height:
+                break
+        except Exception:
+            break
+    return {
+        "scrolls": scrolls,
+        "settle_ms": sum(s.elapsed_ms for s in settles),
+        "timed_out": any(s.timed_out for s in settles),
+    }
+
+
+class SettleStats:
+    """Settle times aggregated per label."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.labels: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, label: str, result: SettleResult):
+        with self.lock:
+            entry = self.labels.setdefault(label, {"calls": 0, "total_ms": 0, "max_ms": 0, "timeouts": 0, "errors": 0})
+            entry["calls"] += 1
+            entry["total_ms"] += result.elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], result.elapsed_ms)
+            entry["timeouts"] += int(result.timed_out)
+            entry["errors"] += int(result.error is not None)
+        logging.debug(f"Page settle [{label}]: {result.elapsed_ms}ms (settled={result.settled})")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                label: {**entry, "avg_ms": round(entry["total_ms"] / entry["calls"], 1)}
+                for label, entry in self.labels.items()
+            }
+
+
+# Global settle statistics, reported on /browsers/status
+settle_stats = SettleStats()
@@ -0,0 +1,241 @@
+"""Dependency-aware parallel execution of agent plan steps.
+
+Plans produced by ``/prompt`` are flat lists of steps. Many of them (several
+``search_web`` or ``cloud_operation`` calls, for example) do not depend on each
+other and can run concurrently. This module turns a plan into a DAG, either from
+explicit ``depends_on`` lists or from resources the steps share (the same
+``browser_id``, the same file path, ...), and runs it on a bounded thread pool
+or, from async handlers, as a bounded set of asyncio tasks. Results are always
+returned in plan order.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from core.config import settings
+
+# Params whose values identify a stateful resource. Two steps touching the same
+# resource value must run in plan order.
+RESOURCE_PARAMS = ("browser_id", "file_path", "repo_path", "local_path")
+
+# Actions that create a browser. Their id is only known after they run, so any
+# later step that addresses a browser must wait for them.
+BROWSER_PRODUCING_ACTIONS = {"open_browser", "create_persistent_browser", "create_tempmail_account"}
+
+# Actions that must observe every earlier step before running.
+BARRIER_ACTIONS = {"finish_task"}
+
+
+@dataclass
+class PlanStep:
+    """A single plan step together with its resolved dependencies."""
+    index: int
+    number: Any
+    action: Optional[str]
+    params: Dict[str, Any]
+    raw: Dict[str, Any]
+    depends_on: Set[int] = field(default_factory=set)
+
+
+def build_step_graph(plan: List[Dict[str, Any]]) -> List[PlanStep]:
+    """Build the dependency graph for a plan.
+
+    A step may declare ``depends_on`` (a step number or list of step numbers).
+    On top of that, dependencies are inferred from shared resources: steps with
+    the same ``browser_id`` (or file/repo path) are ordered, browser steps wait
+    for earlier steps that open browsers, and barrier actions wait for everything.
+    """
+    steps: List[PlanStep] = []
+    number_to_index: Dict[Any, int] = {}
+    for i, planned_step in enumerate(plan):
+        params = planned_step.get('params') or {}
+        if not isinstance(params, dict):
+            params = {}
+        number = planned_step.get('step', i + 1)
+        steps.append(PlanStep(index=i, number=number, action=planned_step.get('action'), params=params, raw=planned_step))
+        number_to_index.setdefault(number, i)
+
+    last_resource_user: Dict[Tuple[str, str], int] = {}
+    last_browser_producer: Optional[int] = None
+
+    for step in steps:
+        explicit = step.raw.get('depends_on')
+        if explicit is not None:
+            if not isinstance(explicit, (list, tuple, set)):
+                explicit = [explicit]
+            for dep in explicit:
+                dep_index = number_to_index.get(dep)
+                if dep_index is None or dep_index == step.index:
+                    logging.warning(f"Plan step {step.number} declares unknown dependency {dep!r}; ignoring it.")
+                    continue
+                step.depends_on.add(dep_index)
+
+        if step.action in BARRIER_ACTIONS:
+            step.depends_on.update(range(step.index))
+            continue
+
+        for param in RESOURCE_PARAMS:
+            value = step.params.get(param)
+            if isinstance(value, str) and value:
+                key = (param, value)
+                if key in last_resource_user:
+                    step.depends_on.add(last_resource_user[key])
+                last_resource_user[key] = step.index
+
+        if step.params.get('browser_id') and last_browser_producer is not None:
+            step.depends_on.add(last_browser_producer)
+
+        if step.action in BROWSER_PRODUCING_ACTIONS:
+            # Browser ids come from a process-wide counter; creating browsers in
+            # plan order keeps the ids later steps refer to in that order too.
+            if last_browser_producer is not None:
+                step.depends_on.add(last_browser_producer)
+            last_browser_producer = step.index
+
+    return steps
+
+
+class PlanDAGExecutor:
+    """Runs plan steps concurrently while respecting their dependencies."""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max(1, int(max_workers or getattr(settings, 'PLAN_MAX_PARALLEL_STEPS', 4)))
+
+    @staticmethod
+    def _dependency_counts(steps: List[PlanStep]) -> Tuple[Dict[int, Set[int]], Dict[int, int]]:
+        dependents: Dict[int, Set[int]] = {step.index: set() for step in steps}
+        remaining: Dict[int, int] = {}
+        for step in steps:
+            remaining[step.index] = len(step.depends_on)
+            for dep in step.depends_on:
+                dependents[dep].add(step.index)
+        return dependents, remaining
+
+    @staticmethod
+    def _error_record(step: PlanStep, error: Exception) -> Dict[str, Any]:
+        logging.error(f"Unhandled error in plan step {step.number} ('{step.action}'): {error}", exc_info=True)
+        return {"step": step.number, "action": step.action or "unknown", "status": "error", "details": f"An exception occurred: {str(error)}"}
+
+    @staticmethod
+    def _attach_timing(record: Dict[str, Any], step: PlanStep, steps: List[PlanStep], started: float, step_started: float) -> Dict[str, Any]:
+        record["timing"] = {
+            "started_offset_ms": round((step_started - started) * 1000, 2),
+            "duration_ms": round((time.perf_counter() - step_started) * 1000, 2),
+            "depends_on": sorted(steps[d].number for d in step.depends_on),
+        }
+        return record
+
+    def _finalize(self, steps: List[PlanStep], results: List[Optional[Dict[str, Any]]], started: float, max_in_flight: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        for step in steps:
+            if results[step.index] is None:
+                # Only reachable with a dependency cycle in explicit depends_on lists.
+                results[step.index] = {
+                    "step": step.number,
+                    "action": step.action or "unknown",
+                    "status": "error",
+                    "details": "Step was not executed because its dependencies form a cycle.",
+                    "timing": {"started_offset_ms": None, "duration_ms": 0.0, "depends_on": sorted(steps[d].number for d in step.depends_on)},
+                }
+
+        wall_ms = (time.perf_counter() - started) * 1000
+        busy_ms = sum(r["timing"]["duration_ms"] for r in results)
+        timings = {
+            "wall_time_ms": round(wall_ms, 2),
+            "total_step_time_ms": round(busy_ms, 2),
+            "max_parallel_steps": max_in_flight,
+            "worker_pool_size": self.max_workers,
+            "speedup": round(busy_ms / wall_ms, 2) if wall_ms > 0 else None,
+        }
+        return results, timings
+
+    def execute(
+        self,
+        plan: List[Dict[str, Any]],
+        run_step: Callable[[PlanStep], Dict[str, Any]],
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Execute a plan and return ``(execution_steps, timings)``.
+
+        ``run_step`` receives a :class:`PlanStep` and returns the step record
+        (``step``, ``action``, ``status``, ``details``). Each record gets a
+        ``timing`` entry; the returned list is in plan order regardless of the
+        order in which steps finished.
+        """
+        steps = build_step_graph(plan)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(steps)
+        dependents, remaining = self._dependency_counts(steps)
+        started = time.perf_counter()
+        max_in_flight = 0
+
+        def timed(step: PlanStep) -> Dict[str, Any]:
+            step_started = time.perf_counter()
+            try:
+                record = run_step(step)
+            except Exception as e:
+                record = self._error_record(step, e)
+            return self._attach_timing(record, step, steps, started, step_started)
+
+        ready = [step.index for step in steps if remaining[step.index] == 0]
+        in_flight: Dict[Future, int] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="plan-step") as pool:
+            while ready or in_flight:
+                while ready:
+                    index = ready.pop(0)
+                    in_flight[pool.submit(timed, steps[index])] = index
+                max_in_flight = max(max_in_flight, min(len(in_flight), self.max_workers))
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = in_flight.pop(future)
+                    results[index] = future.result()
+                    for child in sorted(dependents[index]):
+                        remaining[child] -= 1
+                        if remaining[child] == 0:
+                            ready.append(child)
+
+        return self._finalize(steps, results, started, max_in_flight)
+
+    async def aexecute(
+        self,
+        plan: List[Dict[str, Any]],
+        run_step: Callable[[PlanStep], Awaitable[Dict[str, Any]]],
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Async variant of :meth:`execute` for use inside async handlers.
+
+        ``run_step`` is a coroutine function; it is responsible for moving any
+        blocking work off the event loop. At most ``max_workers`` steps are in
+        flight at once.
+        """
+        steps = build_step_graph(plan)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(steps)
+        dependents, remaining = self._dependency_counts(steps)
+        started = time.perf_counter()
+        max_in_flight = 0
+
+        async def timed(step: PlanStep) -> Dict[str, Any]:
+            step_started = time.perf_counter()
+            try:
+                record = await run_step(step)
+            except Exception as e:
+                record = self._error_record(step, e)
+            return self._attach_timing(record, step, steps, started, step_started)
+
+        ready = [step.index for step in steps if remaining[step.index] == 0]
+        in_flight: Dict[asyncio.Task, int] = {}
+        while ready or in_flight:
+            while ready and len(in_flight) < self.max_workers:
+                index = ready.pop(0)
+                in_flight[asyncio.ensure_future(timed(steps[index]))] = index
+            max_in_flight = max(max_in_flight, len(in_flight))
+            done, _ = await asyncio.wait(list(in_flight), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = in_flight.pop(task)
+                results[index] = task.result()
+                for child in sorted(dependents[index]):
+                    remaining[child] -= 1
+                    if remaining[child] == 0:
+                        ready.append(child)
+
+        return self._finalize(steps, results, started, max_in_flight)
@@ -0,0 +1,330 @@
+"""
+Local fast-path router for classifying user requests.
+
+Deciding whether a request is a general question, a web service request or a
+browser task used to cost a full LLM call per request. The router answers the
+confident cases locally in two stages:
+
+1. Compiled regex rules built from ``RequestParser`` service/action patterns
+   plus imperative task verbs and question forms.
+2. A nearest-centroid model over text embeddings (hashed n-gram vectors, or the
+   local sentence-transformers model when enabled), seeded with labelled
+   examples and updated with every label the LLM returns.
+
+Only inputs neither stage is confident about go to the LLM classifier.
+"""
+
+import logging
+import math
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from core.config import settings
+from request_parser import RequestParser
+
+LABELS = ("general", "service", "task")
+
+# Service keywords from RequestParser that are too generic to signal a service on their own
+GENERIC_SERVICE_TERMS = {
+    "email", "mail", "call", "video call", "voice call", "text message", "sms", "workspace",
+    "server", "meeting", "conference", "meet", "x", "tg", "fb", "tweet", "professional network",
+}
+
+TASK_VERBS = [
+    "open", "go to", "navigate to", "browse", "visit", "book", "order", "buy", "purchase", "fill",
+    "fill out", "submit", "sign up", "register", "create an account", "create account", "log in",
+    "login", "sign in", "scrape", "crawl", "download", "upload", "apply", "search", "search for",
+    "find", "look up", "click", "compare", "monitor", "track", "deploy", "install", "automate",
+    "extract", "check my", "reserve", "subscribe", "unsubscribe",
+]
+
+GENERAL_OPENERS = [
+    "what", "who", "whom", "whose", "why", "how", "when", "where", "which", "is", "are", "was",
+    "were", "does", "do", "did", "can", "could", "should", "would", "explain", "define",
+    "describe", "tell me about", "what's", "who's", "how's",
+]
+
+SEED_EXAMPLES = {
+    "general": [
+        "What is the capital of France?",
+        "Explain quantum physics",
+        "What's the weather today?",
+        "Who wrote Pride and Prejudice?",
+        "How does photosynthesis work?",
+        "Why is the sky blue?",
+        "Define machine learning",
+        "Give me advice on preparing for an interview",
+        "What are the benefits of exercise?",
+        "Summarize the history of the Roman empire",
+        "Tell me a joke",
+        "What is the difference between TCP and UDP?",
+    ],
+    "service": [
+        "Send email to john@example.com",
+        "Call mom on Skype",
+        "Send a message to the team on Slack",
+        "Write an email to my boss saying I will be late",
+        "Text Sarah on WhatsApp that I'm on my way",
+        "Schedule a Zoom meeting with the design team",
+        "Post an update on LinkedIn about my new job",
+        "Tweet about the product launch",
+        "Join the Teams meeting",
+        "Send a DM to alex on Twitter",
+        "Message my friend on Telegram",
+        "Compose a Gmail to support about my order",
+    ],
+    "task": [
+        "Book a flight to Paris",
+        "Search for hotels in London",
+        "Fill out this form",
+        "Order pizza online",
+        "Open https://example.com and get the page title",
+        "Create an account on github.com",
+        "Scrape the product prices from amazon.com",
+        "Apply to software engineer jobs on Upwork",
+        "Download the latest report from the dashboard",
+        "Compare prices for the iPhone on different stores",
+        "Log in to my bank account and check the balance",
+        "Find cheap flights from New York to Tokyo",
+    ],
+}
+
+
+@dataclass
+class RouteDecision:
+    """Result of routing a request."""
+    label: str
+    confidence: float
+    source: str  # 'rules', 'model' or 'llm'
+    latency_ms: float
+
+
+def _phrase_pattern(phrases: Sequence[str]) -> str:
+    # Longest first so multi-word phrases win over their prefixes
+    ordered = sorted({p.strip().lower() for p in phrases if p.strip()}, key=len, reverse=True)
+    return "|".join(re.escape(p).replace(r"\ ", r"\s+") for p in ordered)
+
+
+class QuestionRouter:
+    """Classifies requests locally and falls back to an LLM only when unsure."""
+
+    def __init__(self, rule_confidence: Optional[float] = None, model_confidence: Optional[float] = None,
+                 use_embeddings: Optional[bool] = None, hash_dim: int = 1024):
+        self.rule_confidence = rule_confidence if rule_confidence is not None else getattr(settings, 'QUESTION_ROUTER_RULE_CONFIDENCE', 0.85)
+        self.model_confidence = model_confidence if model_confidence is not None else getattr(settings, 'QUESTION_ROUTER_MODEL_CONFIDENCE', 0.75)
+        if use_embeddings is None:
+            use_embeddings = getattr(settings, 'QUESTION_ROUTER_USE_EMBEDDINGS', False) and getattr(settings, 'ENABLE_LOCAL_EMBEDDINGS', False)
+        self.use_embeddings = use_embeddings
+        self.hash_dim = hash_dim
+        self.lock = threading.Lock()
+        self._centroids: Optional[Dict[str, List[float]]] = None
+        self._compile_rules()
+        self.stats = {
+            "total": 0,
+            "by_source": {"rules": 0, "model": 0, "llm": 0},
+            "by_label": {label: 0 for label in LABELS},
+            "confidence_sum": {"rules": 0.0, "model": 0.0, "llm": 0.0},
+            "local_latency_ms_sum": 0.0,
+            "llm_latency_ms_sum": 0.0,
+            "learned_examples": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Stage 1: compiled rules
+    # ------------------------------------------------------------------
+    def _compile_rules(self):
+        parser = RequestParser()
+        service_terms = list(parser.service_patterns.keys())
+        service_terms.extend(term for patterns in parser.service_patterns.values() for term in patterns)
+        service_terms = [term for term in service_terms if term not in GENERIC_SERVICE_TERMS]
+        action_terms = [term for patterns in parser.action_patterns.values() for term in patterns]
+        action_terms.extend(["send", "dial", "dm", "reply"])
+
+        self.service_re = re.compile(rf"\b(?:{_phrase_pattern(service_terms)})\b", re.IGNORECASE)
+        self.service_action_re = re.compile(rf"\b(?:{_phrase_pattern(action_terms)})\b", re.IGNORECASE)
+        self.email_address_re = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
+        self.task_verb_re = re.compile(rf"^\s*(?:please\s+|can you\s+|could you\s+)?(?:{_phrase_pattern(TASK_VERBS)})\b", re.IGNORECASE)
+        self.url_re = re.compile(r"(?:https?://|www\.)\S+|\b[a-z0-9-]+\.(?:com|org|net|io|co|dev|ai|edu|gov)\b", re.IGNORECASE)
+        self.general_opener_re = re.compile(rf"^\s*(?:{_phrase_pattern(GENERAL_OPENERS)})\b", re.IGNORECASE)
+
+    def rule_scores(self, question: str) -> Dict[str, float]:
+        """Score each label from the compiled rules."""
+        scores = {label: 0.0 for label in LABELS}
+        has_service = bool(self.service_re.search(question))
+        has_action = bool(self.service_action_re.search(question))
+        if has_service and has_action:
+            scores["service"] += 3.0
+        elif has_service:
+            scores["service"] += 1.5
+        if self.email_address_re.search(question) and has_action:
+            scores["service"] += 3.0
+        elif has_action and not has_service:
+            scores["service"] += 0.5
+        if self.task_verb_re.search(question):
+            scores["task"] += 3.0
+        if self.url_re.search(question):
+            scores["task"] += 1.5
+        if self.general_opener_re.search(question):
+            scores["general"] += 2.0
+        if question.rstrip().endswith("?"):
+            scores["general"] += 1.0
+        return scores
+
+    @staticmethod
+    def _rule_decision(scores: Dict[str, float]) -> Tuple[str, float]:
+        label = max(scores, key=scores.get)
+        top = scores[label]
+        total = sum(scores.values())
+        if top <= 0:
+            return label, 0.0
+        # Share of the evidence, discounted when the evidence itself is weak
+        return label, (top / total) * min(1.0, top / 3.0)
+
+    # ------------------------------------------------------------------
+    # Stage 2: nearest-centroid model over embeddings
+    # ------------------------------------------------------------------
+    def _hashed_vector(self, text: str) -> List[float]:
+        tokens = re.findall(r"[a-z0-9@']+", text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        vector = [0.0] * self.hash_dim
+        for feature in features:
+            vector[zlib.crc32(feature.encode("utf-8")) % self.hash_dim] += 1.0
+        return vector
+
+    def _vectorize(self, text: str) -> List[float]:
+        if self.use_embeddings:
+            try:
+                from core import local_embeddings
+                return list(local_embeddings.generate_embedding_cached(text))
+            except Exception as e:
+                logging.warning(f"Local embeddings unavailable for question router, using hashed features: {e}")
+                self.use_embeddings = False
+                self._centroids = None
+        return self._hashed_vector(text)
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> List[float]:
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector] if norm else vector
+
+    def _ensure_model(self):
+        if self._centroids is not None:
+            return
+        with self.lock:
+            if self._centroids is not None:
+                return
+            centroids = {}
+            for label, examples in SEED_EXAMPLES.items():
+                total = None
+                for example in examples:
+                    vector = self._normalize(self._vectorize(example))
+                    total = vector if total is None else [a + b for a, b in zip(total, vector)]
+                centroids[label] = total
+            self._centroids = centroids
+
+    def model_probabilities(self, question: str) -> Dict[str, float]:
+        """Softmax over cosine similarity to each label centroid."""
+        self._ensure_model()
+        vector = self._normalize(self._vectorize(question))
+        sims = {}
+        for label, centroid in self._centroids.items():
+            centroid = self._normalize(centroid)
+            sims[label] = sum(a * b for a, b in zip(vector, centroid))
+        temperature = 10.0
+        peak = max(sims.values())
+        exps = {label: math.exp((sim - peak) * temperature) for label, sim in sims.items()}
+        total = sum(exps.values())
+        return {label: value / total for label, value in exps.items()}
+
+    def learn(self, question: str, label: str):
+        """Add a labelled example (e.g. an LLM decision) to the model."""
+        if label not in LABELS:
+            return
+        self._ensure_model()
+        vector = self._normalize(self._vectorize(question))
+        with self.lock:
+            self._centroids[label] = [a + b for a, b in zip(self._centroids[label], vector)]
+            self.stats["learned_examples"] += 1
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _restrict(scores: Dict[str, float], labels: Sequence[str]) -> Dict[str, float]:
+        # Callers without a 'service' route treat service requests as tasks
+        restricted = {label: scores.get(label, 0.0) for label in labels}
+        if "service" not in labels and "task" in labels:
+            restricted["task"] += scores.get("service", 0.0)
+        return restricted
+
+    def classify(self, question: str, llm_classify: Optional[Callable[[str], Optional[str]]] = None,
+                 labels: Sequence[str] = LABELS) -> RouteDecision:
+        """Classify ``question`` into one of ``labels``.
+
+        ``llm_classify`` is only called when neither local stage reaches its
+        confidence threshold. It may return None when it cannot decide, in
+        which case the best local guess is used.
+        """
+        started = time.perf_counter()
+        question = question or ""
+
+        label, confidence = self._rule_decision(self._restrict(self.rule_scores(question), labels))
+        source = "rules"
+        if confidence < self.rule_confidence:
+            probabilities = self._restrict(self.model_probabilities(question), labels)
+            model_label = max(probabilities, key=probabilities.get)
+            if probabilities[model_label] >= confidence:
+                label, confidence = model_label, probabilities[model_label]
+            source = "model"
+        local_ms = (time.perf_counter() - started) * 1000
+
+        llm_ms = 0.0
+        if source == "model" and confidence < self.model_confidence and llm_classify is not None:
+            llm_started = time.perf_counter()
+            llm_label = llm_classify(question)
+            llm_ms = (time.perf_counter() - llm_started) * 1000
+            if llm_label in labels:
+                self.learn(question, llm_label)
+                label, confidence = llm_label, 1.0
+            source = "llm"
+
+        self._record(source, label, confidence, local_ms, llm_ms)
+        return RouteDecision(label=label, confidence=round(confidence, 3), source=source,
+                             latency_ms=round(local_ms + llm_ms, 3))
+
+    def _record(self, source: str, label: str, confidence: float, local_ms: float, llm_ms: float):
+        with self.lock:
+            self.stats["total"] += 1
+            self.stats["by_source"][source] += 1
+            self.stats["by_label"][label] = self.stats["by_label"].get(label, 0) + 1
+            self.stats["confidence_sum"][source] += confidence
+            self.stats["local_latency_ms_sum"] += local_ms
+            self.stats["llm_latency_ms_sum"] += llm_ms
+
+    def get_stats(self) -> Dict[str, object]:
+        """Get routing counters, fallback rate and mean confidence per stage."""
+        with self.lock:
+            total = self.stats["total"]
+            by_source = dict(self.stats["by_source"])
+            return {
+                "total": total,
+                "by_source": by_source,
+                "by_label": dict(self.stats["by_label"]),
+                "fallback_rate": round(by_source["llm"] / total, 3) if total else 0.0,
+                "mean_confidence": {
+                    source: round(self.stats["confidence_sum"][source] / count, 3) if count else None
+                    for source, count in by_source.items()
+                },
+                "mean_local_latency_ms": round(self.stats["local_latency_ms_sum"] / total, 3) if total else None,
+                "mean_llm_latency_ms": round(self.stats["llm_latency_ms_sum"] / by_source["llm"], 1) if by_source["llm"] else None,
+                "learned_examples": self.stats["learned_examples"],
+                "embedding_backend": "local_model" if self.use_embeddings else "hashed_ngrams",
+            }
+
+
+# Global router shared by /agent/run and the universal assistant
+question_router = QuestionRouter()
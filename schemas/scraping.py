@@ -1,4 +1,15 @@
+from typing import Any, Dict, Optional
+
 from pydantic import BaseModel, Field
 
 class ScrapeRequest(BaseModel):
-    url: str = Field(..., description="The URL to scrape")
\ No newline at end of file
+    url: str = Field(..., description="The URL to scrape")
+
+class ScrapeStreamRequest(ScrapeRequest):
+    scrape_type: str = Field("all", description="What to extract: 'all', 'text', 'links', 'images', 'tables', 'forms' or 'structured'")
+    format: str = Field("ndjson", description="'ndjson' (one JSON event per line) or 'sse' (server-sent events)")
+    chunk_size: Optional[int] = Field(None, ge=1, le=1000, description="Items per text/links/images event (defaults to SCRAPE_STREAM_CHUNK_ITEMS)")
+
+class ExtractRequest(ScrapeRequest):
+    template: Optional[Dict[str, Any]] = Field(None, description="Extraction template to apply (see extraction_templates.py)")
+    template_name: Optional[str] = Field(None, description="Name of a registered template; without either, the templates registered for the URL's domain are used")
@@ -0,0 +1,207 @@
+"""
+Streaming variant of ``scrape_website_comprehensive``.
+
+``iter_scrape_events`` yields extraction events while the page downloads:
+``start``, then ``metadata``, ``text``, ``links``, ``images``, ``table``,
+``form`` and ``structured`` chunks as elements close, then ``done``
+(statistics, fetch method) or ``error``. The page is fed to
+``page_extract.PageEventExtractor`` in pieces, so neither the HTML nor the
+result is ever held whole.
+
+Each event is written to the task store as it is produced (see
+``TaskDataManager.append_scraping_chunk``). ``/tasks/{id}/download`` and chat
+reassemble it on demand.
+
+Fetching follows ``fetch_strategy``: HTTP first, and the browser for hosts
+already known to need it. The JavaScript check runs on the stream. Events are
+held back until the page has shown ``FETCH_JS_MIN_WORDS`` words of text.
+A page that ends before that and looks client-rendered is re-fetched in the
+browser, and its held events are discarded, never sent.
+"""
+
+import json
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import httpx
+
+import fetch_strategy
+from core.config import settings
+from fetch_strategy import BLOCKED_STATUSES, BROWSER, HTTP, FetchDecisions, js_required_from_signals
+from page_extract import SCRAPE_TYPES, PageEventExtractor
+from task_data_manager import task_manager
+
+STREAM_FORMATS = ("ndjson", "sse")
+BROWSER_CHUNK_CHARS = 64 * 1024
+
+
+def format_event(event: Dict[str, Any], fmt: str = "ndjson") -> str:
+    """One wire frame: a JSON line, or an SSE message named after the event."""
+    payload = json.dumps(event, ensure_ascii=False)
+    if fmt == "sse":
+        return f"event: {event.get('event', 'message')}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+
+def _chunks(text: str, size: int = BROWSER_CHUNK_CHARS) -> Iterator[str]:
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+class _Stream:
+    """Runs one streamed scrape; ``events()`` is the generator handed to callers."""
+
+    def __init__(self, url: str, scrape_type: str, chunk_size: Optional[int], store: bool,
+                 client: Optional[httpx.Client], render: Optional[Callable], decisions: Optional[FetchDecisions]):
+        if scrape_type not in SCRAPE_TYPES:
+            raise ValueError(f"Unknown scrape_type '{scrape_type}'; expected one of {', '.join(SCRAPE_TYPES)}")
+        self.url = url
+        self.scrape_type = scrape_type
+        self.chunk_size = int(chunk_size or getattr(settings, "SCRAPE_STREAM_CHUNK_ITEMS", 50))
+        self.store = store
+        self.client = client
+        self.render = render or fetch_strategy.browser_fetch
+        self.decisions = decisions if decisions is not None else fetch_strategy.fetch_decisions
+        self.task_id: Optional[str] = None
+        self.seq = 0
+        self.title = ""
+
+    def _emit(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        if event["event"] == "metadata":
+            self.title = event.get("title", "")
+        if self.task_id:
+            try:
+                task_manager.append_scraping_chunk(self.task_id, self.seq, event)
+            except Exception as e:
+                logging.warning(f"Could not save scrape event {self.seq} of task {self.task_id}: {e}")
+        self.seq += 1
+        return event
+
+    def _extract(self, chunks: Iterable[str], hold_back: bool) -> Iterator[Dict[str, Any]]:
+        """Yield events for ``chunks``, setting ``self.statistics``.
+
+        With ``hold_back``, a page that looks client-rendered emits nothing: ``self.escalation``
+        gets the reason and ``self.fallback`` the withheld events, in case the browser fails.
+        """
+        extractor = PageEventExtractor(self.url, self.scrape_type, self.chunk_size)
+        min_words = int(getattr(settings, "FETCH_JS_MIN_WORDS", 50))
+        held: Optional[List[Dict[str, Any]]] = [] if hold_back else None
+        for chunk in chunks:
+            for event in extractor.feed(chunk):
+                if held is None:
+                    yield self._emit(event)
+                else:
+                    held.append(event)
+            if held is not None and extractor.word_count >= min_words:
+                for event in held:
+                    yield self._emit(event)
+                held = None
+        tail = extractor.close()
+        self.statistics = extractor.statistics
+        if held is not None:
+            signals = extractor.signals
+            self.escalation = js_required_from_signals(extractor.word_count, signals["scripts"] > 0,
+                                                       signals["empty_spa_root"], signals["noscript_text"])
+            if self.escalation:
+                self.fallback = held + tail
+                return
+            tail = held + tail
+        for event in tail:
+            yield self._emit(event)
+
+    def events(self) -> Iterator[Dict[str, Any]]:
+        if self.store:
+            self.task_id = task_manager.save_task_result(
+                task_type='web_scraping',
+                result_data={"url": self.url, "scrape_type": self.scrape_type, "status": "streaming",
+                             "started_at": datetime.now().isoformat()},
+                task_description=f'Streamed scraping of {self.url}',
+                url=self.url,
+                metadata={'scrape_type': self.scrape_type, 'streamed': True}
+            )
+        yield self._emit({"event": "start", "url": self.url, "scrape_type": self.scrape_type, "task_id": self.task_id})
+        try:
+            fetch = yield from self._fetch_and_extract()
+        except Exception as e:
+            error = str(e).splitlines()[0] if str(e) else type(e).__name__
+            logging.info(f"Streamed scrape of {self.url} failed: {error}")
+            if self.task_id:
+                task_manager.finish_scraping_stream(self.task_id, {"success": False, "url": self.url, "error": error},
+                                                   status='failed')
+            yield self._emit({"event": "error", "url": self.url, "error": error, "task_id": self.task_id})
+            return
+        summary = {
+            "success": True,
+            "url": self.url,
+            "title": self.title,
+            "scraped_at": datetime.now().isoformat(),
+            "scrape_type": self.scrape_type,
+            "statistics": self.statistics,
+            "fetch": fetch,
+            "streamed": True,
+            "events": self.seq + 1,
+        }
+        if self.task_id:
+            task_manager.finish_scraping_stream(self.task_id, summary)
+        yield self._emit({"event": "done", "task_id": self.task_id, **summary})
+
+    def _fetch_and_extract(self):
+        """Generator: yields events, returns the fetch summary for ``done``."""
+        self.escalation, self.fallback = None, None
+        pinned = self.decisions.get(self.url) == BROWSER
+        network_error = False
+        if pinned:
+            self.escalation = "host needs a browser (cached)"
+        else:
+            client = self.client or fetch_strategy.http_client()
+            emitted = self.seq
+            try:
+                with client.stream("GET", self.url, headers={"Referer": self.url}) as response:
+                    if response.status_code in BLOCKED_STATUSES:
+                        self.escalation = f"HTTP {response.status_code}"
+                    elif response.status_code >= 400:
+                        raise fetch_strategy.FetchError(f"Failed to retrieve page content: HTTP {response.status_code}")
+                    else:
+                        yield from self._extract(response.iter_text(), hold_back=True)
+                        http_fetch = {"method": HTTP, "reason": "static HTML", "status_code": response.status_code,
+                                      "final_url": str(response.url)}
+            except httpx.HTTPError as e:
+                if self.seq != emitted:
+                    raise  # part of the page was already sent
+                self.escalation, self.fallback = f"HTTP error: {str(e).splitlines()[0] if str(e) else type(e).__name__}", None
+                network_error = True
+            if not self.escalation:
+                self.decisions.record(self.url, HTTP, "static HTML")
+                return http_fetch
+
+        reason = self.escalation
+        try:
+            html, settle_report = self.render(self.url)
+            if not html:
+                raise fetch_strategy.FetchError("browser returned nothing")
+        except Exception as e:
+            if self.fallback is None:
+                raise fetch_strategy.FetchError(f"Failed to retrieve page content: {reason}; browser: {e}") from e
+            # Chrome unavailable: the served HTML is better than nothing
+            logging.warning(f"Browser fetch failed for {self.url} ({e}); streaming the HTTP response")
+            for event in self.fallback:
+                yield self._emit(event)
+            return {**http_fetch, "reason": f"{reason}; browser failed: {e}"}
+        if not pinned and not network_error:  # network errors may be transient; don't pin the host
+            self.decisions.record(self.url, BROWSER, reason)
+        yield from self._extract(_chunks(html), hold_back=False)
+        fetch = {"method": BROWSER, "reason": reason}
+        if settle_report:
+            fetch["settle"] = settle_report
+        return fetch
+
+
+def iter_scrape_events(url: str, scrape_type: str = "all", chunk_size: Optional[int] = None, store: bool = True,
+                       client: Optional[httpx.Client] = None, render: Optional[Callable] = None,
+                       decisions: Optional[FetchDecisions] = None) -> Iterator[Dict[str, Any]]:
+    """Scrape ``url`` and yield extraction events as they are produced (see module docstring).
+
+    Errors after the ``start`` event are reported as an ``error`` event, not raised.
+    """
+    return _Stream(url, scrape_type, chunk_size, store, client, render, decisions).events()
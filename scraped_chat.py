@@ -0,0 +1,124 @@
+"""
+Chat about scraped content, grounded in the chunks relevant to each question.
+
+Every turn used to load the whole stored scrape and put the first 2000
+characters of its text in the prompt. ``answer_question`` retrieves only the
+chunks relevant to the question from the task's chunk index (see
+``chunk_index.py``), so any part of the page can be used. A page short
+enough to fit in ``CHAT_CONTEXT_CHARS`` is sent whole. Tasks scraped before
+the index existed are indexed on their first question.
+
+All turns share one OpenAI client and its connection pool.
+"""
+
+import json
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from openai import OpenAI
+
+import chunk_index
+from core.config import settings
+
+_client: Optional[OpenAI] = None
+_client_lock = threading.Lock()
+
+
+def openai_client() -> OpenAI:
+    """Process-wide OpenAI client; its HTTP connections are reused across chats."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OpenAI(api_key=settings.OPENAI_API_KEY, timeout=getattr(settings, "NETWORK_TIMEOUT", 30) * 2)
+        return _client
+
+
+def ensure_index(task_id: str, manager) -> bool:
+    """Index a scrape saved before chat indexing existed; False when the task has no scraped content."""
+    if chunk_index.load_index(task_id, manager) is not None:
+        return True
+    scraped = manager.get_scraped_content(task_id)
+    if not scraped:
+        return False
+    full_content = json.loads(scraped.get('full_scraped_content') or '{}')
+    chunk_index.index_scraped_page(task_id, full_content.get('data', {}), manager, {
+        'url': scraped.get('url', ''),
+        'title': scraped.get('title', ''),
+        'word_count': full_content.get('statistics', {}).get('word_count', scraped.get('word_count', 0)),
+    })
+    return True
+
+
+def select_context(task_id: str, question: str, manager) -> Optional[Dict[str, Any]]:
+    """Index info and the chunks to put in the prompt, in page order (None when the task has no index)."""
+    budget = int(getattr(settings, "CHAT_CONTEXT_CHARS", 6000))
+    index = chunk_index.load_index(task_id, manager)
+    if index is None:
+        return None
+    if index["info"].get("chars", budget + 1) <= budget:
+        texts = manager.get_chunk_texts(task_id, list(range(index["chunk_count"])))
+        chunks = [{"chunk": chunk, "text": texts[chunk]} for chunk in sorted(texts)]
+    else:
+        chunks = chunk_index.search(task_id, question, manager, limit=int(getattr(settings, "CHAT_RETRIEVE_CHUNKS", 8))) or []
+        if not chunks:
+            # Nothing matched the question: fall back to the start of the page
+            texts = manager.get_chunk_texts(task_id, [0, 1])
+            chunks = [{"chunk": chunk, "text": texts[chunk]} for chunk in sorted(texts)]
+    selected, used = [], 0
+    for chunk in chunks:
+        if selected and used + len(chunk["text"]) > budget:
+            break
+        selected.append(chunk)
+        used += len(chunk["text"])
+    return {"info": index["info"], "chunks": sorted(selected, key=lambda chunk: chunk["chunk"])}
+
+
+def build_prompt(info: Dict[str, Any], chunks: List[Dict[str, Any]]) -> str:
+    excerpts = "\n\n".join(f"[Excerpt {chunk['chunk'] + 1}]\n{chunk['text']}" for chunk in chunks)
+    outline = f"\n        - Outline: {info['outline']}" if info.get('outline') else ""
+    return f"""You are an AI assistant helping analyze scraped web content.
+
+Content Context:
+        - URL: {info.get('url', '')}
+        - Title: {info.get('title', '')}
+        - Word Count: {info.get('word_count', 0)}{outline}
+
+Excerpts of the page relevant to the question:
+{excerpts}
+
+Please answer the user's question about this content using these excerpts. If they do not contain the answer, say so."""
+
+
+def answer_question(task_id: str, question: str, manager,
+                    complete: Optional[Callable[[List[Dict[str, str]]], str]] = None) -> Optional[Dict[str, Any]]:
+    """Answer ``question`` about the scrape of ``task_id`` (None when the task has no scraped content).
+
+    ``complete`` turns chat messages into a reply; it defaults to the pooled OpenAI client.
+    """
+    if not ensure_index(task_id, manager):
+        return None
+    context = select_context(task_id, question, manager)
+    info, chunks = context["info"], context["chunks"]
+    messages = [
+        {"role": "system", "content": build_prompt(info, chunks)},
+        {"role": "user", "content": question},
+    ]
+    if complete is None:
+        response = openai_client().chat.completions.create(
+            model=getattr(settings, "OPENAI_MODEL_NAME", "gpt-3.5-turbo"),
+            messages=messages,
+            max_tokens=1000,
+            temperature=0.7
+        )
+        reply = response.choices[0].message.content
+    else:
+        reply = complete(messages)
+    return {
+        "response": reply,
+        "context": {
+            "url": info.get("url", ""),
+            "title": info.get("title", ""),
+            "word_count": info.get("word_count", 0),
+            "excerpts": [chunk["chunk"] for chunk in chunks],
+        },
+    }
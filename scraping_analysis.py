@@ -1,342 +1,147 @@
-from bs4 import BeautifulSoup
-from browsing import open_browser, get_page_content, close_browser, browsers
-from gemini import generate_text as gemini_generate
-import requests
+from browsing import get_page_content, close_browser, browsers
+from gemini import generate_text as gemini_generate, get_request_budget
 import re
 import json
 from typing import Dict, List, Any, Optional, Union
-import time
 from datetime import datetime
 import lxml.html
 from lxml import etree
 import csv
 import os
-from urllib.parse import urljoin, urlparse
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from task_data_manager import task_manager
+from page_settle import scroll_and_settle
+from page_extract import extract_page
+from fetch_strategy import FetchError, fetch_page
+from crawler import crawl_site
+from text_chunks import html_blocks
+from chunked_analysis import ANALYSES, analyze_blocks
+from extraction_templates import compile_template, templates_for_url
+from core.executors import run_in_category
+import asyncio
 
-def scrape_website_comprehensive(url: str, scrape_type: str = 'all', max_depth: int = 1, browser_id: str = None, target_elements: 'Optional[List[Dict[str, Any]]]' = None) -> str:
+def scrape_website_comprehensive(url: str, scrape_type: str = 'all', max_depth: int = 1, browser_id: str = None, target_elements: 'Optional[List[Dict[str, Any]]]' = None, changes_only: bool = False) -> str:
     """Comprehensive website scraping with intelligent data extraction.
     
     Args:
         url: The URL to scrape
         scrape_type: Type of scraping ('all', 'text', 'links', 'images', 'tables', 'forms', 'structured')
-        max_depth: Maximum depth for crawling (1 = current page only)
+        max_depth: Maximum depth for crawling (1 = current page only; larger values crawl the site, see crawl_website)
         browser_id: Optional browser ID (automatically provided by agent loop)
+        target_elements: Optional fields to extract, e.g. [{"name": "price", "css": ".price", "type": "number"}],
+            or a whole extraction template (see extraction_templates.py); results are in data["extracted"]
+            with those of the templates registered for the URL's domain
+        changes_only: Return only what changed since the last scrape of this URL instead of the full data
     
     Returns:
-        str: JSON string with comprehensive scraped data
+        str: JSON string with comprehensive scraped data; "changes" compares it with the previous scrape
     """
     import json
     
-    def extract_all_links(soup, base_url):
-        """Extract all links from the page"""
-        links = []
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            absolute_url = urljoin(base_url, href)
-            links.append({
-                'text': link.get_text(strip=True),
-                'url': absolute_url,
-                'title': link.get('title', ''),
-                'target': link.get('target', '')
-            })
-        return links
-    
-    def extract_all_images(soup, base_url):
-        """Extract all images from the page"""
-        images = []
-        for img in soup.find_all('img'):
-            src = img.get('src')
-            if src:
-                absolute_url = urljoin(base_url, src)
-                images.append({
-                    'src': absolute_url,
-                    'alt': img.get('alt', ''),
-                    'title': img.get('title', ''),
-                    'width': img.get('width', ''),
-                    'height': img.get('height', '')
-                })
-        return images
-    
-    def extract_all_tables(soup):
-        """Extract all tables from the page"""
-        tables = []
-        for i, table in enumerate(soup.find_all('table')):
-            table_data = []
-            headers = []
-            
-            # Extract headers
-            header_row = table.find('tr')
-            if header_row:
-                headers = [th.get_text(strip=True) for th in header_row.find_all(['th', 'td'])]
-            
-            # Extract rows
-            for row in table.find_all('tr')[1:]:  # Skip header row
-                row_data = [td.get_text(strip=True) for td in row.find_all(['td', 'th'])]
-                if row_data:
-                    table_data.append(row_data)
-            
-            tables.append({
-                'table_id': i + 1,
-                'headers': headers,
-                'data': table_data,
-                'row_count': len(table_data),
-                'column_count': len(headers)
-            })
-        return tables
-    
-    def extract_all_forms(soup):
-        """Extract all forms from the page"""
-        forms = []
-        for i, form in enumerate(soup.find_all('form')):
-            form_data = {
-                'form_id': i + 1,
-                'action': form.get('action', ''),
-                'method': form.get('method', 'GET'),
-                'inputs': []
-            }
-            
-            # Extract form inputs
-            for input_elem in form.find_all(['input', 'select', 'textarea']):
-                input_data = {
-                    'type': input_elem.get('type', input_elem.name),
-                    'name': input_elem.get('name', ''),
-                    'id': input_elem.get('id', ''),
-                    'placeholder': input_elem.get('placeholder', ''),
-                    'required': input_elem.has_attr('required'),
-                    'value': input_elem.get('value', '')
-                }
-                form_data['inputs'].append(input_data)
-            
-            forms.append(form_data)
-        return forms
-    
-    def extract_structured_data(soup):
-        """Extract structured data (JSON-LD, microdata, etc.)"""
-        structured_data = []
-        
-        # JSON-LD
-        for script in soup.find_all('script', type='application/ld+json'):
-            try:
-                data = json.loads(script.string)
-                structured_data.append({
-                    'type': 'json-ld',
-                    'data': data
-                })
-            except:
-                pass
-        
-        # Meta tags
-        meta_data = {}
-        for meta in soup.find_all('meta'):
-            name = meta.get('name') or meta.get('property') or meta.get('itemprop')
-            content = meta.get('content')
-            if name and content:
-                meta_data[name] = content
-        
-        if meta_data:
-            structured_data.append({
-                'type': 'meta_tags',
-                'data': meta_data
-            })
-        
-        return structured_data
-    
-    def extract_text_content(soup):
-        """Extract and organize text content"""
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # Extract headings
-        headings = []
-        for i in range(1, 7):
-            for heading in soup.find_all(f'h{i}'):
-                headings.append({
-                    'level': i,
-                    'text': heading.get_text(strip=True),
-                    'id': heading.get('id', '')
-                })
-        
-        # Extract paragraphs
-        paragraphs = [p.get_text(strip=True) for p in soup.find_all('p') if p.get_text(strip=True)]
-        
-        # Extract lists
-        lists = []
-        for ul in soup.find_all(['ul', 'ol']):
-            list_items = [li.get_text(strip=True) for li in ul.find_all('li')]
-            lists.append({
-                'type': ul.name,
-                'items': list_items
-            })
-        
-        return {
-            'title': soup.title.string if soup.title else '',
-            'headings': headings,
-            'paragraphs': paragraphs,
-            'lists': lists,
-            'full_text': soup.get_text(separator=' ', strip=True)
-        }
-    
-    try:
-        content = None
-        used_browser_id = None
-        # Try browser first
-        if not browser_id:
-            try:
-                browser_result = open_browser(url)
-                if "browser_" in browser_result:
-                    used_browser_id = browser_result.split("browser_")[1].split(".")[0]
-                    used_browser_id = f"browser_{used_browser_id}"
-                else:
-                    used_browser_id = None
-            except Exception:
-                used_browser_id = None
-        else:
-            used_browser_id = browser_id
+    if max_depth and int(max_depth) > 1:
+        return crawl_website(url, scrape_type=scrape_type, max_depth=int(max_depth))
 
-        if used_browser_id:
-            # Assist dynamic content: wait, scroll, and wait for DOM to stabilize
-            try:
-                from browsing import browsers as _browsers
-                driver = _browsers.get(used_browser_id)
-                if driver:
-                    # Initial short wait
-                    time.sleep(2)
-                    # Scroll to bottom a few times to trigger lazy loads
-                    for _ in range(3):
-                        try:
-                            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                            time.sleep(0.8)
-                        except Exception:
-                            break
-                    # Wait for DOM size to stabilize
-                    try:
-                        last_size = 0
-                        stable = 0
-                        for _ in range(10):
-                            size = driver.execute_script("return document.body ? document.body.innerHTML.length : 0;")
-                            if size == last_size:
-                                stable += 1
-                                if stable >= 2:
-                                    break
-                            else:
-                                stable = 0
-                                last_size = size
-                            time.sleep(0.5)
-                    except Exception:
-                        pass
-            except Exception:
-                pass
-            # Now get content
-            content = get_page_content(used_browser_id)
-            # If content looks too small, try HTTP fallback too
-            if not content or len(content) < 1000:
+    try:
+        settle_report = None
+        fetch = None
+        if browser_id:
+            # Scrape the caller's own session (logins, navigation) as it is now
+            driver = browsers.get(browser_id)
+            if driver:
                 try:
-                    headers = {
-                        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
-                        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
-                        "Accept-Language": "en-US,en;q=0.9,ur;q=0.8",
-                        "Referer": url
-                    }
-                    resp = requests.get(url, headers=headers, timeout=20)
-                    resp.raise_for_status()
-                    # Prefer richer content between browser and HTTP
-                    content = resp.text if len(resp.text) > len(content or "") else content
+                    settle_report = scroll_and_settle(driver, max_scrolls=3, label="scrape")
                 except Exception:
                     pass
+            content = get_page_content(browser_id)
         else:
-            # Fallback to requests if browser is unavailable
+            # HTTP first; a pooled browser only for pages that need JavaScript (see fetch_strategy.py)
             try:
-                headers = {
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
-                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
-                    "Accept-Language": "en-US,en;q=0.9,ur;q=0.8",
-                    "Referer": url
-                }
-                resp = requests.get(url, headers=headers, timeout=20)
-                resp.raise_for_status()
-                content = resp.text
-            except Exception as req_err:
+                fetch = fetch_page(url)
+            except FetchError as fetch_err:
                 return json.dumps({
                     "success": False,
-                    "error": f"Failed to retrieve page content: {req_err}",
+                    "error": str(fetch_err),
                     "url": url
                 }, indent=2)
+            content = fetch.html
+            settle_report = fetch.settle
 
         if not content:
-            if used_browser_id:
-                close_browser(used_browser_id)
+            if browser_id:
+                close_browser(browser_id)
             return json.dumps({
                 "success": False,
                 "error": "Failed to get page content",
                 "url": url
             }, indent=2)
 
-        # Parse with BeautifulSoup
-        soup = BeautifulSoup(content, 'html.parser')
-        
+        # Parse once with lxml and collect all categories, statistics and template fields in a single pass
+        templates = templates_for_url(url)
+        if target_elements:
+            templates.append(compile_template(target_elements if isinstance(target_elements, dict)
+                                              else {"name": "target_elements", "fields": target_elements}))
+        data, page_statistics = extract_page(content, url, scrape_type, templates=templates)
+
         # Initialize result structure
         result = {
             "success": True,
             "url": url,
             "scraped_at": datetime.now().isoformat(),
             "scrape_type": scrape_type,
-            "data": {}
+            "data": data
         }
-        
-        # Extract data based on scrape_type
-        if scrape_type in ['all', 'text']:
-            result['data']['text_content'] = extract_text_content(soup)
-        
-        if scrape_type in ['all', 'links']:
-            result['data']['links'] = extract_all_links(soup, url)
-        
-        if scrape_type in ['all', 'images']:
-            result['data']['images'] = extract_all_images(soup, url)
-        
-        if scrape_type in ['all', 'tables']:
-            result['data']['tables'] = extract_all_tables(soup)
-        
-        if scrape_type in ['all', 'forms']:
-            result['data']['forms'] = extract_all_forms(soup)
-        
-        if scrape_type in ['all', 'structured']:
-            result['data']['structured_data'] = extract_structured_data(soup)
-        
+        if fetch:
+            result["fetch"] = fetch.summary()
+        if settle_report:
+            result["settle"] = settle_report
+
         # Add page statistics
-        result['statistics'] = {
-            'total_links': len(soup.find_all('a')),
-            'total_images': len(soup.find_all('img')),
-            'total_tables': len(soup.find_all('table')),
-            'total_forms': len(soup.find_all('form')),
-            'total_headings': len(soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])),
-            'total_paragraphs': len(soup.find_all('p')),
-            'page_size_chars': len(content),
-            'word_count': len(soup.get_text().split())
-        }
+        result['statistics'] = page_statistics
         
-        # Save successful scraping result to database
+        # Compare with the last scrape of this URL; an unchanged page is not stored again
         try:
+            changes = task_manager.check_page_changes(url, scrape_type, data, describe=changes_only)
+        except Exception as check_error:
+            changes = {'status': 'unknown', 'error': str(check_error)}
+        diff = changes.pop('changes', None)
+        result['changes'] = changes
+        if changes_only and changes['status'] in ('changed', 'unchanged'):
+            del result['data']
+            if diff is not None:
+                result['diff'] = diff
+
+        if changes['status'] == 'unchanged':
+            result['task_id'] = changes['previous_task_id']
+            result['saved_to_database'] = True
+            if browser_id:
+                try:
+                    close_browser(browser_id)
+                except Exception:
+                    pass
+            return json.dumps(result, indent=2, ensure_ascii=False)
+
+        # Save successful scraping result to database; the page data itself is stored
+        # once, as the blocks of a page version, not in every copy of the result
+        try:
+            stored = {key: value for key, value in result.items() if key not in ('data', 'diff')}
             task_id = task_manager.save_task_result(
                 task_type='web_scraping',
-                result_data=result,
+                result_data=stored,
                 task_description=f'Comprehensive scraping of {url}',
                 url=url,
                 metadata={
                     'scrape_type': scrape_type,
                     'max_depth': max_depth,
-                    'browser_used': used_browser_id or 'requests_fallback',
+                    'browser_used': browser_id or fetch.method,
                     'statistics': result.get('statistics', {})
                 }
             )
             
             # Save detailed scraping data
-            task_manager.save_scraping_result(task_id, result)
+            task_manager.save_scraping_result(task_id, {**stored, 'data': data})
             
             # Add task_id to result for reference
             result['task_id'] = task_id
@@ -347,19 +152,19 @@ def scrape_website_comprehensive(url: str, scrape_type: str = 'all', max_depth:
             result['save_error'] = str(save_error)
             result['saved_to_database'] = False
         
-        # Close browser if used
-        if used_browser_id:
+        # Close the caller's browser, as before
+        if browser_id:
             try:
-                close_browser(used_browser_id)
+                close_browser(browser_id)
             except Exception:
                 pass
         
         return json.dumps(result, indent=2, ensure_ascii=False)
         
     except Exception as e:
-        if 'used_browser_id' in locals() and used_browser_id:
+        if browser_id:
             try:
-                close_browser(used_browser_id)
+                close_browser(browser_id)
             except Exception:
                 pass
         
@@ -369,20 +174,72 @@ def scrape_website_comprehensive(url: str, scrape_type: str = 'all', max_depth:
             "url": url
         }, indent=2)
 
-def scrape_and_analyze(url: str, analysis: str = 'summarize') -> str:
-    """Legacy function - kept for backward compatibility"""
+def crawl_website(url: str, scrape_type: str = 'all', max_depth: int = 2, max_pages: int = None) -> str:
+    """Crawl a site breadth-first over HTTP and store every page as it is scraped.
+
+    Must be called from a thread without a running event loop (tools run in executor threads);
+    async callers use ``crawler.crawl_site`` directly.
+
+    Args:
+        url: Start URL; links are followed on the same host only
+        scrape_type: What to extract from each page (same values as scrape_website_comprehensive)
+        max_depth: 1 = start page only, 2 = start page and the pages it links to, ...
+        max_pages: Page limit (defaults to CRAWL_MAX_PAGES)
+
+    Returns:
+        str: JSON summary with one entry per page; full page data is in the task store under task_id
+    """
+    task_id = task_manager.save_task_result(
+        task_type='web_crawl',
+        result_data={"url": url, "scrape_type": scrape_type, "max_depth": max_depth, "started_at": datetime.now().isoformat()},
+        task_description=f'Crawl of {url} (depth {max_depth})',
+        url=url,
+        metadata={'scrape_type': scrape_type, 'max_depth': max_depth, 'max_pages': max_pages}
+    )
+    save_errors = []
+
+    def store_page(page: Dict[str, Any]):
+        try:
+            task_manager.save_scraping_result(task_id, page)
+        except Exception as e:
+            save_errors.append(f"{page['url']}: {e}")
+
+    async def on_page(page: Dict[str, Any]):
+        await run_in_category('network', store_page, page)
+
     try:
-        browser_id = open_browser(url)
-        content = get_page_content(browser_id)
-        close_browser(browser_id)
-        soup = BeautifulSoup(content, 'html.parser')
-        clean_text = soup.get_text(separator=' ', strip=True)
-        if analysis == 'summarize':
-            prompt = f"Summarize the following content: {clean_text[:2000]}"
-            return gemini_generate(prompt)
-        elif analysis == 'extract_data':
-            prompt = f"Extract key data points from: {clean_text[:2000]}"
-            return gemini_generate(prompt)
+        summary = asyncio.run(crawl_site(url, max_depth=max_depth, max_pages=max_pages, scrape_type=scrape_type, on_page=on_page))
+    except Exception as e:
+        return json.dumps({"success": False, "error": f"Error crawling website: {str(e)}", "url": url, "task_id": task_id}, indent=2)
+
+    result = {
+        "success": bool(summary["pages"]),
+        "url": url,
+        "mode": "crawl",
+        "scraped_at": datetime.now().isoformat(),
+        "scrape_type": scrape_type,
+        "max_depth": max_depth,
+        "task_id": task_id,
+        "saved_to_database": not save_errors,
+        "statistics": summary["stats"],
+        "pages": summary["pages"],
+        "errors": summary["errors"],
+    }
+    if save_errors:
+        result["save_errors"] = save_errors[:20]
+    return json.dumps(result, indent=2, ensure_ascii=False)
+
+def scrape_and_analyze(url: str, analysis: str = 'summarize') -> str:
+    """Legacy function - kept for backward compatibility.
+
+    The whole page is analyzed: long pages are split into chunks whose results are
+    combined (see chunked_analysis.py).
+    """
+    if analysis not in ANALYSES:
         return "Unsupported analysis type."
+    try:
+        blocks = html_blocks(fetch_page(url).html)
+        report = analyze_blocks(blocks, analysis, generate=gemini_generate, budget=get_request_budget())
+        return report['result']
     except Exception as e:
         return f"Error scraping and analyzing: {e}"
\ No newline at end of file
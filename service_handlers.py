@@ -3,7 +3,6 @@ Service-specific handlers for common web services like Gmail, Skype, etc.
 These handlers use browser automation to perform actions while preserving user sessions.
 """
 
-import time
 import re
 from typing import Dict, Any, Optional
 from selenium.webdriver.common.by import By
@@ -11,6 +10,7 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.keys import Keys
 from browsing import browsers, check_login_status, navigate_to_service
+from page_settle import wait_for_settle
 from core.config import settings
 
 
@@ -59,7 +59,7 @@ class GmailHandler:
                 return "Could not find compose button. Please make sure you're on the Gmail inbox page."
 
             compose_button.click()
-            time.sleep(2)
+            wait_for_settle(driver, quiet_ms=500, timeout=2, label="gmail")
 
             # Fill recipient
             to_selectors = [
@@ -81,7 +81,7 @@ class GmailHandler:
             if to_field:
                 to_field.clear()
                 to_field.send_keys(to)
-                time.sleep(1)
+                wait_for_settle(driver, quiet_ms=200, timeout=1, label="gmail")
 
             # Fill CC if provided
             if cc:
@@ -133,7 +133,7 @@ class GmailHandler:
             if subject_field:
                 subject_field.clear()
                 subject_field.send_keys(subject)
-                time.sleep(1)
+                wait_for_settle(driver, quiet_ms=200, timeout=1, label="gmail")
 
             # Fill body
             body_selectors = [
@@ -156,7 +156,7 @@ class GmailHandler:
             if body_field:
                 body_field.clear()
                 body_field.send_keys(body)
-                time.sleep(1)
+                wait_for_settle(driver, quiet_ms=200, timeout=1, label="gmail")
 
             # Send email
             send_selectors = [
@@ -178,7 +178,7 @@ class GmailHandler:
 
             if send_button:
                 send_button.click()
-                time.sleep(3)  # Wait for send confirmation
+                wait_for_settle(driver, quiet_ms=500, timeout=3, label="gmail")  # Wait for send confirmation
                 return f"Email sent successfully to {to}"
             else:
                 return "Could not find send button"
@@ -232,7 +232,7 @@ class SkypeHandler:
 
             search_field.clear()
             search_field.send_keys(contact)
-            time.sleep(2)
+            wait_for_settle(driver, quiet_ms=500, timeout=2, label="skype")
 
             # Click on contact
             contact_selectors = [
@@ -255,7 +255,7 @@ class SkypeHandler:
                 return f"Could not find contact '{contact}' in Skype"
 
             contact_element.click()
-            time.sleep(2)
+            wait_for_settle(driver, quiet_ms=500, timeout=2, label="skype")
 
             # Click call button
             call_selectors = [
@@ -319,7 +319,7 @@ class SkypeHandler:
 
             search_field.clear()
             search_field.send_keys(contact)
-            time.sleep(2)
+            wait_for_settle(driver, quiet_ms=500, timeout=2, label="skype")
 
             # Click on contact to open chat
             contact_selectors = [
@@ -342,7 +342,7 @@ class SkypeHandler:
                 return f"Could not find contact '{contact}' in Skype"
 
             contact_element.click()
-            time.sleep(2)
+            wait_for_settle(driver, quiet_ms=500, timeout=2, label="skype")
 
             # Find message input
             message_selectors = [
@@ -367,11 +367,11 @@ class SkypeHandler:
 
             message_field.clear()
             message_field.send_keys(message)
-            time.sleep(1)
+            wait_for_settle(driver, quiet_ms=200, timeout=1, label="skype")
 
             # Send message
             message_field.send_keys(Keys.RETURN)
-            time.sleep(2)
+            wait_for_settle(driver, quiet_ms=500, timeout=2, label="skype")
 
             return f"Message sent to {contact}"
 
@@ -424,7 +424,7 @@ class OutlookHandler:
                 return "Could not find new email button"
 
             new_email_button.click()
-            time.sleep(3)
+            wait_for_settle(driver, quiet_ms=500, timeout=3, label="outlook")
 
             # Fill recipient
             to_selectors = [
@@ -446,7 +446,7 @@ class OutlookHandler:
             if to_field:
                 to_field.clear()
                 to_field.send_keys(to)
-                time.sleep(1)
+                wait_for_settle(driver, quiet_ms=200, timeout=1, label="outlook")
 
             # Fill subject
             subject_selectors = [
@@ -468,7 +468,7 @@ class OutlookHandler:
             if subject_field:
                 subject_field.clear()
                 subject_field.send_keys(subject)
-                time.sleep(1)
+                wait_for_settle(driver, quiet_ms=200, timeout=1, label="outlook")
 
             # Fill body
             body_selectors = [
@@ -490,7 +490,7 @@ class OutlookHandler:
             if body_field:
                 body_field.clear()
                 body_field.send_keys(body)
-                time.sleep(1)
+                wait_for_settle(driver, quiet_ms=200, timeout=1, label="outlook")
 
             # Send email
             send_selectors = [
@@ -511,7 +511,7 @@ class OutlookHandler:
 
             if send_button:
                 send_button.click()
-                time.sleep(3)
+                wait_for_settle(driver, quiet_ms=500, timeout=3, label="outlook")
                 return f"Email sent successfully to {to}"
             else:
                 return "Could not find send button"
@@ -0,0 +1,145 @@
+"""
+Cookie and localStorage snapshots of logged-in service sessions.
+
+A persistent profile in ``./browser_profiles/{profile_name}`` keeps cookies
+that Chrome writes to disk, but session cookies and the login checks in
+``service_handlers`` still cost a full login detection (several selector
+waits) on every action. Once a login is detected, the cookies of the service
+(CDP ``Storage.getCookies``) and the localStorage of its origin are written to
+``{BROWSER_SNAPSHOT_DIR}/{profile_name}/{service}.json``. ``navigate_to_service``
+restores them with ``Storage.setCookies`` before loading the service, so the
+browser lands directly in an authenticated session.
+
+Snapshots contain credentials: files are written with mode 0600.
+"""
+
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+from core.config import settings
+
+# Cookie domains that make up a logged-in session, per service
+SERVICE_COOKIE_DOMAINS: Dict[str, List[str]] = {
+    "gmail": ["google.com"],
+    "meet": ["google.com"],
+    "outlook": ["live.com", "outlook.com", "microsoft.com", "microsoftonline.com"],
+    "skype": ["skype.com", "live.com", "microsoft.com"],
+    "teams": ["microsoft.com", "microsoftonline.com", "live.com"],
+    "slack": ["slack.com"],
+    "discord": ["discord.com"],
+    "whatsapp": ["whatsapp.com"],
+    "telegram": ["telegram.org"],
+    "facebook": ["facebook.com", "messenger.com"],
+    "twitter": ["twitter.com", "x.com"],
+    "linkedin": ["linkedin.com"],
+    "zoom": ["zoom.us"],
+}
+
+# Fields accepted by Storage.setCookies (CookieParam); getCookies returns more
+_COOKIE_PARAM_FIELDS = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite", "expires",
+                        "priority", "sourceScheme", "sourcePort", "partitionKey")
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name) or "default"
+
+
+def snapshot_path(profile_name: str, service: str) -> str:
+    base = getattr(settings, "BROWSER_SNAPSHOT_DIR", "") or "./browser_profiles/_snapshots"
+    return os.path.join(base, _safe_name(profile_name), f"{_safe_name(service)}.json")
+
+
+def _origin(url: str) -> str:
+    parsed = urlparse(url or "")
+    return f"{parsed.scheme}://{parsed.netloc}" if parsed.scheme and parsed.netloc else ""
+
+
+def _matches_domain(cookie_domain: str, domains: List[str]) -> bool:
+    host = cookie_domain.lstrip(".").lower()
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+def capture_snapshot(driver, service: str) -> Dict[str, Any]:
+    """Read the service's cookies and the localStorage of the current origin from ``driver``."""
+    domains = SERVICE_COOKIE_DOMAINS.get(service, [])
+    cookies = driver.execute_cdp_cmd("Storage.getCookies", {}).get("cookies", [])
+    current_url = driver.current_url
+    local_storage = {}
+    try:
+        local_storage = driver.execute_script("return Object.assign({}, window.localStorage);") or {}
+    except Exception as e:
+        logging.debug(f"Could not read localStorage for {service}: {e}")
+    return {
+        "service": service,
+        "captured_at": time.time(),
+        "url": current_url,
+        "origin": _origin(current_url),
+        "cookies": [c for c in cookies if _matches_domain(c.get("domain", ""), domains)],
+        "local_storage": local_storage,
+    }
+
+
+def restore_cookies(driver, snapshot: Dict[str, Any]) -> int:
+    """Load the snapshot's unexpired cookies into the browser. Returns the number restored."""
+    now = time.time()
+    cookies = []
+    for cookie in snapshot.get("cookies", []):
+        expires = cookie.get("expires", -1)
+        if not cookie.get("session") and 0 < expires < now:
+            continue
+        param = {k: cookie[k] for k in _COOKIE_PARAM_FIELDS if k in cookie}
+        if cookie.get("session") or expires <= 0:
+            param.pop("expires", None)
+        cookies.append(param)
+    if cookies:
+        driver.execute_cdp_cmd("Storage.setCookies", {"cookies": cookies})
+    return len(cookies)
+
+
+def restore_local_storage(driver, snapshot: Dict[str, Any]) -> int:
+    """Set localStorage keys missing on the current page if it is on the snapshot's origin."""
+    items = snapshot.get("local_storage") or {}
+    if not items or _origin(driver.current_url) != snapshot.get("origin"):
+        return 0
+    return driver.execute_script(
+        "var items = arguments[0], added = 0;"
+        "for (var key in items) { if (localStorage.getItem(key) === null) { localStorage.setItem(key, items[key]); added++; } }"
+        "return added;",
+        items,
+    ) or 0
+
+
+def save_snapshot(profile_name: str, snapshot: Dict[str, Any]) -> str:
+    path = snapshot_path(profile_name, snapshot["service"])
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_snapshot(profile_name: str, service: str) -> Optional[Dict[str, Any]]:
+    path = snapshot_path(profile_name, service)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable session snapshot {path}: {e}")
+        return None
+
+
+def delete_snapshot(profile_name: str, service: str) -> bool:
+    try:
+        os.unlink(snapshot_path(profile_name, service))
+        return True
+    except FileNotFoundError:
+        return False
@@ -0,0 +1,157 @@
+"""
+Columnar exports of scraped tables: CSV, Arrow IPC stream and Parquet.
+
+Each writer takes a table description (``columns`` from
+``table_extract.parse_table``) and an iterator of string rows. It yields the
+file in pieces as rows arrive, so a table is never held whole. Rows are
+read from storage by ``TaskDataManager.iter_table_rows`` and converted to
+their column types on the way (see ``table_extract.convert``).
+
+Arrow and Parquet need ``pyarrow``. Without it, ``export_table`` raises
+``ExportUnavailable`` and CSV still works. Tables saved before columns were
+typed are exported with every column as a string.
+"""
+
+import csv
+import io
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from core.config import settings
+from table_extract import convert
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+class ExportUnavailable(RuntimeError):
+    """The requested format needs an optional dependency that is not installed."""
+
+
+def export_columns(table: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Typed columns of ``table`` with unique names (older tables get string columns from their headers)."""
+    columns = table.get("columns") or [{"name": header, "type": "string"} for header in table.get("headers", [])]
+    seen: Dict[str, int] = {}
+    unique = []
+    for position, column in enumerate(columns):
+        name = column.get("name") or f"column_{position + 1}"
+        seen[name] = seen.get(name, 0) + 1
+        unique.append({**column, "name": name if seen[name] == 1 else f"{name}_{seen[name]}"})
+    return unique
+
+
+def _typed(rows: Iterable[Sequence[str]], columns: List[Dict[str, Any]]) -> Iterator[List[Any]]:
+    for row in rows:
+        yield [convert(row[i] if i < len(row) else None, column) for i, column in enumerate(columns)]
+
+
+def _batches(rows: Iterator[List[Any]], size: int) -> Iterator[List[List[Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(table: Dict[str, Any], rows: Iterable[Sequence[str]], batch_rows: int) -> Iterator[bytes]:
+    columns = export_columns(table)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column["name"] for column in columns])
+    for batch in _batches(_typed(rows, columns), batch_rows):
+        writer.writerows([_csv_value(value) for value in row] for row in batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands written bytes back to the generator producing them."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> Optional[bytes]:
+        data, self.chunks = b"".join(self.chunks), []
+        return data or None
+
+
+def arrow_schema(columns: List[Dict[str, Any]]):
+    types = {"integer": pa.int64(), "number": pa.float64(), "boolean": pa.bool_(),
+             "date": pa.date32(), "datetime": pa.timestamp("us")}
+    return pa.schema([(column["name"], types.get(column.get("type"), pa.string())) for column in columns])
+
+
+def iter_arrow(table: Dict[str, Any], rows: Iterable[Sequence[str]], batch_rows: int, fmt: str = "arrow") -> Iterator[bytes]:
+    """Arrow IPC stream (``fmt="arrow"``) or Parquet file, one record batch / row group per ``batch_rows``."""
+    if not PYARROW_AVAILABLE:
+        raise ExportUnavailable(f"{fmt} export requires pyarrow")
+    columns = export_columns(table)
+    schema = arrow_schema(columns)
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(sink, schema) if fmt == "arrow" else pq.ParquetWriter(sink, schema)
+    try:
+        for batch in _batches(_typed(rows, columns), batch_rows):
+            arrays = [pa.array([row[i] for row in batch], type=field.type) for i, field in enumerate(schema)]
+            record_batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+            if fmt == "arrow":
+                writer.write_batch(record_batch)
+            else:
+                writer.write_table(pa.Table.from_batches([record_batch]))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def export_table(table: Dict[str, Any], rows: Iterable[Sequence[str]], fmt: str,
+                 batch_rows: Optional[int] = None) -> Iterator[bytes]:
+    """Bytes of ``table`` in ``fmt`` ('csv', 'arrow' or 'parquet'), produced as ``rows`` are consumed."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'; expected one of {', '.join(EXPORT_FORMATS)}")
+    if fmt != "csv" and not PYARROW_AVAILABLE:
+        raise ExportUnavailable(f"{fmt} export requires pyarrow")
+    batch_rows = int(batch_rows or getattr(settings, "TABLE_EXPORT_BATCH_ROWS", 10000))
+    if fmt == "csv":
+        return iter_csv(table, rows, batch_rows)
+    return iter_arrow(table, rows, batch_rows, fmt)
@@ -0,0 +1,221 @@
+"""
+Typed table extraction for scraped pages.
+
+``parse_table`` lays a ``<table>`` out as a rectangular grid. A cell with
+``colspan``/``rowspan`` is repeated into every position it covers, so each
+row has one value per column. Nested tables are left to their own entry.
+
+Header rows are found in this order:
+
+- the ``<thead>`` rows;
+- otherwise, the leading rows made only of ``<th>`` cells;
+- otherwise, a first row of non-empty labels that are not numbers or dates.
+
+Stacked header rows are joined per column, e.g. "2024 / Q1". Columns without
+a header are named ``column_<n>``.
+
+``infer_column`` types a column from its values. The type is integer,
+number, boolean, date, datetime or string. A column is typed only when every
+non-empty value parses. Placeholders such as "-" or "n/a" count as empty.
+Values with a leading zero, such as ZIP codes, keep the column a string so
+the zero is not lost. Date columns carry the one ``format`` that parses all
+of their values, so day-first and month-first columns are told apart. ``convert`` turns a cell
+into its typed value for the columnar exports in ``table_export.py``.
+"""
+
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from lxml import etree
+
+MAX_SPAN = 1000
+NULL_VALUES = {"", "-", "--", "–", "—", "n/a", "na", "none", "null", "nan", "?"}
+BOOLEAN_VALUES = {"true": True, "false": False, "yes": True, "no": False}
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%d.%m.%Y", "%m/%d/%Y", "%d/%m/%Y", "%d-%m-%Y",
+                "%b %d, %Y", "%B %d, %Y", "%d %b %Y", "%d %B %Y", "%b %Y", "%B %Y")
+DATETIME_FORMATS = ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M",
+                    "%m/%d/%Y %H:%M", "%d/%m/%Y %H:%M", "%d.%m.%Y %H:%M")
+
+_NUMBER = re.compile(r"^(?P<open>[(\-−+])?\s*(?:[$€£¥₹]\s*)?"
+                     r"(?P<digits>\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?|\.\d+)"
+                     r"\s*(?:[$€£¥₹%])?\s*(?P<close>\))?$")
+_TIMEZONE_SUFFIX = re.compile(r"(?:Z|[+-]\d{2}:?\d{2})$")
+# Codes such as ZIP codes or account numbers: their leading zeros are data
+_LEADING_ZERO = re.compile(r"^[(\-−+]?\s*(?:[$€£¥₹]\s*)?0\d")
+
+Cell = Tuple[str, bool]  # (text, is a <th>)
+
+
+def _text(cell) -> str:
+    return " ".join(" ".join(cell.itertext(tag=etree.Element)).split())
+
+
+def _span(cell, name: str) -> int:
+    try:
+        return min(max(int(cell.get(name, 1)), 1), MAX_SPAN)
+    except (TypeError, ValueError):
+        return 1
+
+
+def _own_rows(table) -> List[Any]:
+    """``<tr>`` elements of ``table`` itself, not of tables nested in it."""
+    rows = []
+    for row in table.iter("tr"):
+        parent = row.getparent()
+        while parent is not None and parent.tag != "table":
+            parent = parent.getparent()
+        if parent is table:
+            rows.append(row)
+    return rows
+
+
+def table_grid(table) -> Tuple[List[List[Cell]], int]:
+    """``(grid, thead_rows)``: rows with spans expanded, and how many lead rows sit in ``<thead>``."""
+    grid: List[List[Cell]] = []
+    pending: Dict[int, List[Any]] = {}  # column -> [rows left, cell] for rowspans
+    thead_rows, in_head = 0, True
+    for row in _own_rows(table):
+        out: List[Cell] = []
+
+        def place_pending():
+            while len(out) in pending:
+                left = pending[len(out)]
+                out.append(left[1])
+                left[0] -= 1
+                if left[0] == 0:
+                    del pending[len(out) - 1]
+
+        for cell in row:
+            if not isinstance(cell.tag, str) or cell.tag not in ("td", "th"):
+                continue
+            place_pending()
+            value = (_text(cell), cell.tag == "th")
+            rowspan = _span(cell, "rowspan")
+            for _ in range(_span(cell, "colspan")):
+                if rowspan > 1:
+                    pending[len(out)] = [rowspan - 1, value]
+                out.append(value)
+        place_pending()
+        for column in sorted(column for column in pending if column > len(out)):
+            out.extend([("", False)] * (column - len(out)))
+            place_pending()
+        if not out:
+            continue
+        if in_head and row.getparent() is not None and row.getparent().tag == "thead":
+            thead_rows += 1
+        else:
+            in_head = False
+        grid.append(out)
+    return grid, thead_rows
+
+
+def is_null(value: Optional[str]) -> bool:
+    return value is None or value.strip().lower() in NULL_VALUES
+
+
+def parse_number(value: str) -> Optional[float]:
+    match = _NUMBER.match(value.strip())
+    if not match or (match.group("open") == "(") != bool(match.group("close")):
+        return None
+    number = float(match.group("digits").replace(",", ""))
+    return -number if match.group("open") in ("(", "-", "−") else number
+
+
+def _parses(value: str, fmt: str) -> bool:
+    try:
+        datetime.strptime(value, fmt)
+        return True
+    except ValueError:
+        return False
+
+
+def infer_column(values: Sequence[str]) -> Dict[str, Any]:
+    """Column type (and date format) that every non-empty value in ``values`` parses as."""
+    present = [value.strip() for value in values if not is_null(value)]
+    if not present:
+        return {"type": "string"}
+    numbers = [parse_number(value) for value in present]
+    if all(number is not None for number in numbers) and not any(_LEADING_ZERO.match(value) for value in present):
+        integral = all("." not in value and number.is_integer() for value, number in zip(present, numbers))
+        return {"type": "integer" if integral else "number"}
+    if all(value.lower() in BOOLEAN_VALUES for value in present):
+        return {"type": "boolean"}
+    stripped = [_TIMEZONE_SUFFIX.sub("", value) for value in present]
+    for kind, formats, candidates in (("date", DATE_FORMATS, present), ("datetime", DATETIME_FORMATS, stripped)):
+        for fmt in formats:
+            if all(_parses(value, fmt) for value in candidates):
+                return {"type": kind, "format": fmt}
+    return {"type": "string"}
+
+
+def convert(value: Optional[str], column: Dict[str, Any]) -> Any:
+    """Typed value of a cell: int, float, bool, date, datetime, str, or None when empty."""
+    if is_null(value):
+        return None
+    value = value.strip()
+    kind = column.get("type", "string")
+    try:
+        if kind == "integer":
+            return int(parse_number(value))
+        if kind == "number":
+            return parse_number(value)
+        if kind == "boolean":
+            return BOOLEAN_VALUES[value.lower()]
+        if kind == "date":
+            return datetime.strptime(value, column["format"]).date()
+        if kind == "datetime":
+            return datetime.strptime(_TIMEZONE_SUFFIX.sub("", value), column["format"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return value
+
+
+def _is_label(value: str) -> bool:
+    return bool(value.strip()) and parse_number(value) is None and infer_column([value])["type"] == "string"
+
+
+def header_row_count(grid: List[List[Cell]], thead_rows: int) -> int:
+    if thead_rows:
+        return min(thead_rows, len(grid) - 1) if len(grid) > 1 else thead_rows
+    count = 0
+    while count < len(grid) - 1 and all(is_th for _, is_th in grid[count]):
+        count += 1
+    if count:
+        return count
+    if grid and all(_is_label(text) for text, _ in grid[0]):
+        return 1
+    return 0
+
+
+def parse_table(table, table_id: int) -> Dict[str, Any]:
+    """Headers, string rows and typed column descriptions of one ``<table>`` element."""
+    grid, thead_rows = table_grid(table)
+    width = max((len(row) for row in grid), default=0)
+    header_rows = header_row_count(grid, thead_rows)
+
+    headers = []
+    for column in range(width):
+        parts: List[str] = []
+        for row in grid[:header_rows]:
+            text = row[column][0] if column < len(row) else ""
+            if text and text not in parts:
+                parts.append(text)
+        headers.append(" / ".join(parts))
+    data = [[text for text, _ in row] + [""] * (width - len(row)) for row in grid[header_rows:]]
+
+    columns = []
+    for column, header in enumerate(headers):
+        columns.append({"name": header or f"column_{column + 1}",
+                        **infer_column([row[column] for row in data])})
+    caption = table.find("caption")
+    return {"table_id": table_id, "caption": _text(caption) if caption is not None else "",
+            "headers": headers, "columns": columns, "data": data,
+            "row_count": len(data), "column_count": width}
+
+
+def typed_rows(table: Dict[str, Any]) -> List[List[Any]]:
+    """``table["data"]`` with every cell converted to its column's type."""
+    columns = table.get("columns") or [{"type": "string"}] * table.get("column_count", 0)
+    return [[convert(row[i] if i < len(row) else None, column) for i, column in enumerate(columns)]
+            for row in table.get("data", [])]
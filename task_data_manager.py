@@ -1,4 +1,5 @@
 import json
+import logging
 import sqlite3
 import os
 from datetime import datetime
@@ -7,13 +8,18 @@ from pathlib import Path
 import hashlib
 import uuid
 
+from content_fingerprint import assemble_blocks, describe_diff, diff_blocks, fingerprint
+
 class TaskDataManager:
     """Manages persistent storage of all successful task results"""
     
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, data_dir: str = None):
         if db_path is None:
             db_path = os.path.join(os.path.dirname(__file__), 'task_data.db')
+        if data_dir is None:
+            data_dir = os.path.join(os.path.dirname(__file__), 'saved_task_data')
         self.db_path = db_path
+        self.data_dir = data_dir
         self.init_database()
     
     def init_database(self):
@@ -67,6 +73,95 @@ class TaskDataManager:
                 ALTER TABLE scraped_data ADD COLUMN full_scraped_content TEXT
             ''')
         
+        # Link to the page version holding the content (see content_fingerprint.py)
+        if 'page_version_id' not in columns:
+            cursor.execute('''
+                ALTER TABLE scraped_data ADD COLUMN page_version_id INTEGER
+            ''')
+
+        # Blocks of scraped pages keyed by hash, shared by every version that contains them
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS content_blocks (
+                hash TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                content TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # One row per distinct version of a page (url + scrape_type)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS page_versions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                scrape_type TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                task_id TEXT,
+                page_hash TEXT NOT NULL,
+                sections TEXT NOT NULL,
+                block_hashes TEXT NOT NULL,
+                diff TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_checked_at TIMESTAMP,
+                FOREIGN KEY (task_id) REFERENCES task_results (id)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_page_versions_url ON page_versions (url, scrape_type, version)')
+
+        # Events of streamed scrapes, written as they are extracted (see scrape_stream.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scraped_chunks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                event_type TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (task_id) REFERENCES task_results (id)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_scraped_chunks_task ON scraped_chunks (task_id, seq)')
+
+        # Retrieval index of scraped pages for chat: chunk texts, BM25 postings, embeddings (see chunk_index.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS chunk_index_info (
+                task_id TEXT PRIMARY KEY,
+                info TEXT NOT NULL,
+                chunk_count INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS chunk_texts (
+                task_id TEXT NOT NULL,
+                chunk INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                length INTEGER NOT NULL,
+                embedding BLOB,
+                PRIMARY KEY (task_id, chunk)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS chunk_terms (
+                task_id TEXT NOT NULL,
+                term TEXT NOT NULL,
+                chunk INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (task_id, term, chunk)
+            ) WITHOUT ROWID
+        ''')
+
+        # LLM results per chunk of page text, keyed by a hash of prompt and text (see chunked_analysis.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                key TEXT PRIMARY KEY,
+                analysis TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
         # Create account creation results table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS account_results (
@@ -147,7 +242,11 @@ class TaskDataManager:
         return task_id
     
     def save_scraping_result(self, task_id: str, scraping_data: Dict) -> str:
-        """Save detailed scraping results"""
+        """Save detailed scraping results.
+
+        The page data is stored as a page version (only blocks not seen before are written);
+        raw_data keeps the rest of the result and full_scraped_content is assembled on read.
+        """
         scrape_id = str(uuid.uuid4())
         
         conn = sqlite3.connect(self.db_path)
@@ -169,13 +268,16 @@ class TaskDataManager:
         table_count = stats.get('total_tables', 0)
         form_count = stats.get('total_forms', 0)
         data_size = stats.get('page_size_chars', 0)
+
+        version_id, _ = self._record_page_version(cursor, url, scrape_type, task_id, scraping_data.get('data', {}))
+        summary = {key: value for key, value in scraping_data.items() if key != 'data'}
         
         cursor.execute('''
             INSERT INTO scraped_data 
             (id, task_id, url, scrape_type, title, content_type, data_size, 
              word_count, link_count, image_count, table_count, form_count, 
-             scraped_at, raw_data, full_scraped_content)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+             scraped_at, raw_data, full_scraped_content, page_version_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             scrape_id,
             task_id,
@@ -190,15 +292,433 @@ class TaskDataManager:
             table_count,
             form_count,
             datetime.now().isoformat(),
-            json.dumps(scraping_data), # raw_data
-            json.dumps(scraping_data) # full_scraped_content
+            json.dumps(summary), # raw_data
+            None, # full_scraped_content, assembled from the page version
+            version_id
          ))
-        
+
         conn.commit()
         conn.close()
-        
+
+        # Crawls save every page under one task: each page adds its chunks to the task's index
+        self._index_for_chat(task_id, scraping_data.get('data', {}), {'url': url, 'title': title, 'word_count': word_count})
         return scrape_id
+
+    def _index_for_chat(self, task_id: str, data: Dict, info: Dict) -> None:
+        """Add a saved scrape to the chat retrieval index of its task; a failure only costs retrieval quality"""
+        try:
+            from chunk_index import index_scraped_page
+            index_scraped_page(task_id, data, self, info, append=True)
+        except Exception as e:
+            logging.warning(f"Could not index scraped content of task {task_id} for chat: {e}")
+
+    def _latest_page_version(self, cursor, url: str, scrape_type: str) -> Optional[Dict]:
+        cursor.execute('''
+            SELECT id, version, task_id, page_hash, block_hashes, created_at FROM page_versions
+            WHERE url = ? AND scrape_type = ? ORDER BY version DESC LIMIT 1
+        ''', (url, scrape_type))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return dict(zip(['id', 'version', 'task_id', 'page_hash', 'block_hashes', 'created_at'], row))
+
+    def _load_blocks(self, cursor, block_hashes: List[str]) -> List:
+        contents = {}
+        distinct = list(set(block_hashes))
+        for start in range(0, len(distinct), 500):
+            batch = distinct[start:start + 500]
+            cursor.execute(f'''
+                SELECT hash, kind, content FROM content_blocks WHERE hash IN ({','.join('?' * len(batch))})
+            ''', batch)
+            for block_hash, kind, content in cursor.fetchall():
+                contents[block_hash] = (kind, json.loads(content))
+        return [contents[block_hash] for block_hash in block_hashes]
+
+    def _record_page_version(self, cursor, url: str, scrape_type: str, task_id: str, data: Dict):
+        """Store ``data`` as the next version of the page unless it is unchanged; returns (version_id, status)"""
+        page = fingerprint(data)
+        latest = self._latest_page_version(cursor, url, scrape_type)
+        now = datetime.now().isoformat()
+        if latest and latest['page_hash'] == page['page_hash']:
+            cursor.execute('UPDATE page_versions SET last_checked_at = ? WHERE id = ?', (now, latest['id']))
+            return latest['id'], 'unchanged'
+
+        new_blocks = {}
+        for block_hash, (kind, content) in zip(page['block_hashes'], page['blocks']):
+            new_blocks.setdefault(block_hash, (block_hash, kind, json.dumps(content, ensure_ascii=False)))
+        cursor.executemany('''
+            INSERT OR IGNORE INTO content_blocks (hash, kind, content) VALUES (?, ?, ?)
+        ''', list(new_blocks.values()))
+
+        diff = diff_blocks(json.loads(latest['block_hashes']), page['block_hashes']) if latest else None
+        cursor.execute('''
+            INSERT INTO page_versions
+            (url, scrape_type, version, task_id, page_hash, sections, block_hashes, diff, created_at, last_checked_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            url,
+            scrape_type,
+            latest['version'] + 1 if latest else 1,
+            task_id,
+            page['page_hash'],
+            json.dumps(page['sections']),
+            json.dumps(page['block_hashes']),
+            json.dumps(diff) if diff else None,
+            now,
+            now
+        ))
+        return cursor.lastrowid, 'changed' if latest else 'new'
+
+    def check_page_changes(self, url: str, scrape_type: str, data: Dict, describe: bool = False) -> Dict:
+        """Compare freshly scraped ``data`` with the latest stored version of the page.
+
+        Returns ``status`` ('new', 'changed' or 'unchanged') with the fingerprint and version
+        numbers; 'changed' adds block counts, and ``describe`` the changed blocks themselves.
+        An unchanged page is recorded as checked and nothing else is written.
+        """
+        page = fingerprint(data)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            latest = self._latest_page_version(cursor, url, scrape_type)
+            if not latest:
+                return {'status': 'new', 'fingerprint': page['page_hash'], 'version': 1}
+            changes = {
+                'fingerprint': page['page_hash'],
+                'previous_version': latest['version'],
+                'previous_task_id': latest['task_id'],
+                'previous_scraped_at': latest['created_at'],
+            }
+            if latest['page_hash'] == page['page_hash']:
+                cursor.execute('UPDATE page_versions SET last_checked_at = ? WHERE id = ?',
+                               (datetime.now().isoformat(), latest['id']))
+                conn.commit()
+                return {'status': 'unchanged', 'version': latest['version'], **changes}
+            old_hashes = json.loads(latest['block_hashes'])
+            diff = diff_blocks(old_hashes, page['block_hashes'])
+            changes.update(status='changed', version=latest['version'] + 1,
+                           **{key: diff[key] for key in ('added', 'removed', 'unchanged')})
+            if describe:
+                changes['changes'] = describe_diff(diff, self._load_blocks(cursor, old_hashes), page['blocks'])
+            return changes
+        finally:
+            conn.close()
+
+    def get_page_versions(self, url: str, scrape_type: str = None, limit: int = 20) -> List[Dict]:
+        """Version history of a page, newest first, with the block counts of each change"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        query = '''
+            SELECT id, url, scrape_type, version, task_id, page_hash, diff, created_at, last_checked_at
+            FROM page_versions WHERE url = ?
+        '''
+        params = [url]
+        if scrape_type:
+            query += ' AND scrape_type = ?'
+            params.append(scrape_type)
+        cursor.execute(query + ' ORDER BY created_at DESC, version DESC LIMIT ?', (*params, limit))
+        columns = [description[0] for description in cursor.description]
+        versions = []
+        for row in cursor.fetchall():
+            version = dict(zip(columns, row))
+            diff = json.loads(version.pop('diff') or 'null')
+            if diff:
+                version.update({key: diff[key] for key in ('added', 'removed', 'unchanged')})
+            versions.append(version)
+        conn.close()
+        return versions
+
+    def iter_table_blocks(self, task_id: str, rows: bool = True):
+        """Yield ('table', meta) and ('row', cells) pairs for a task's scraped tables, in order.
+
+        Reads only table blocks (or table events of a streamed scrape), never the assembled page.
+        The connection may be used from several threads, as by a streaming response.
+        """
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT content_type, page_version_id, full_scraped_content IS NOT NULL FROM scraped_data WHERE task_id = ?
+            ''', (task_id,))
+            found = cursor.fetchone()
+            if not found:
+                return
+            content_type, version_id, has_full_content = found
+            if version_id:
+                cursor.execute('SELECT block_hashes FROM page_versions WHERE id = ?', (version_id,))
+                block_hashes = json.loads(cursor.fetchone()[0])
+                kinds = ('table', 'row') if rows else ('table',)
+                for start in range(0, len(block_hashes), 500):
+                    batch = block_hashes[start:start + 500]
+                    distinct = list(set(batch))
+                    cursor.execute(f'''
+                        SELECT hash, kind, content FROM content_blocks
+                        WHERE hash IN ({','.join('?' * len(distinct))}) AND kind IN ({','.join('?' * len(kinds))})
+                    ''', (*distinct, *kinds))
+                    blocks = {block_hash: (kind, content) for block_hash, kind, content in cursor.fetchall()}
+                    for block_hash in batch:
+                        if block_hash in blocks:
+                            kind, content = blocks[block_hash]
+                            yield kind, json.loads(content)
+            elif content_type == 'web_page_stream':
+                cursor.execute('''
+                    SELECT payload FROM scraped_chunks WHERE task_id = ? AND event_type = 'table' ORDER BY seq
+                ''', (task_id,))
+                current = None
+                for (payload,) in cursor:
+                    event = json.loads(payload)
+                    if event['table_id'] != current:
+                        current = event['table_id']
+                        yield 'table', {k: v for k, v in event.items() if k not in ('event', 'rows', 'offset', 'final')}
+                    if rows:
+                        for row in event['rows']:
+                            yield 'row', row
+            elif has_full_content:
+                # Scrapes saved before page versions hold the whole result in one JSON document
+                cursor.execute('SELECT full_scraped_content FROM scraped_data WHERE task_id = ?', (task_id,))
+                for table in json.loads(cursor.fetchone()[0]).get('data', {}).get('tables', []):
+                    yield 'table', {k: v for k, v in table.items() if k != 'data'}
+                    if rows:
+                        for row in table.get('data', []):
+                            yield 'row', row
+        finally:
+            conn.close()
+
+    def get_scraped_tables(self, task_id: str) -> List[Dict]:
+        """Descriptions (headers, typed columns, row counts) of a task's scraped tables, without their rows"""
+        return [meta for _, meta in self.iter_table_blocks(task_id, rows=False)]
+
+    def iter_table_rows(self, task_id: str, table_id: int):
+        """Rows of one scraped table, read from storage as they are needed"""
+        blocks = self.iter_table_blocks(task_id)
+        try:
+            current = None
+            for kind, content in blocks:
+                if kind == 'table':
+                    if current == table_id:
+                        return
+                    current = content.get('table_id')
+                elif current == table_id:
+                    yield content
+        finally:
+            blocks.close()
+
+    def _assemble_scraped_content(self, cursor, content: Dict) -> Dict:
+        """Fill in full_scraped_content for rows whose content lives in a page version or in stream chunks"""
+        if content.get('full_scraped_content') is not None:
+            return content
+        summary = json.loads(content.get('raw_data') or '{}')
+        if content.get('page_version_id'):
+            cursor.execute('SELECT sections, block_hashes FROM page_versions WHERE id = ?', (content['page_version_id'],))
+            row = cursor.fetchone()
+            if row:
+                data = assemble_blocks(json.loads(row[0]), self._load_blocks(cursor, json.loads(row[1])))
+                content['full_scraped_content'] = json.dumps({**summary, 'data': data}, ensure_ascii=False)
+        elif content.get('content_type') == 'web_page_stream':
+            content['full_scraped_content'] = json.dumps(
+                self.assemble_streamed_scrape(content['task_id'], summary), ensure_ascii=False)
+        return content
     
+    def save_chunk_index(self, task_id: str, info: Dict, texts: List[str], terms: List[Dict[str, int]],
+                         vectors: Optional[List[bytes]] = None, append: bool = False) -> None:
+        """Replace the chat retrieval index of a task: chunk texts, term counts and optional embeddings.
+
+        With ``append`` the chunks are added after those already indexed for the task (one more
+        page of a crawl); the stored info keeps the first page's url and title and sums the sizes.
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute('SELECT info, chunk_count FROM chunk_index_info WHERE task_id = ?', (task_id,)).fetchone()
+            if append and row:
+                offset, stored = row[1], json.loads(row[0])
+                info = {**info, **stored,
+                        'pages': stored.get('pages', 1) + 1,
+                        'chars': stored.get('chars', 0) + info.get('chars', 0),
+                        'word_count': stored.get('word_count', 0) + info.get('word_count', 0)}
+                conn.execute('UPDATE chunk_index_info SET info = ?, chunk_count = ? WHERE task_id = ?',
+                             (json.dumps(info, ensure_ascii=False), offset + len(texts), task_id))
+            else:
+                offset = 0
+                for table in ('chunk_index_info', 'chunk_texts', 'chunk_terms'):
+                    conn.execute(f'DELETE FROM {table} WHERE task_id = ?', (task_id,))
+                conn.execute('INSERT INTO chunk_index_info (task_id, info, chunk_count) VALUES (?, ?, ?)',
+                             (task_id, json.dumps(info, ensure_ascii=False), len(texts)))
+            conn.executemany('INSERT INTO chunk_texts (task_id, chunk, text, length, embedding) VALUES (?, ?, ?, ?, ?)', [
+                (task_id, offset + chunk, text, sum(terms[chunk].values()), vectors[chunk] if vectors else None)
+                for chunk, text in enumerate(texts)
+            ])
+            conn.executemany('INSERT INTO chunk_terms (task_id, term, chunk, tf) VALUES (?, ?, ?, ?)', [
+                (task_id, term, offset + chunk, tf) for chunk, counts in enumerate(terms) for term, tf in counts.items()
+            ])
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_chunk_index(self, task_id: str) -> Optional[Dict]:
+        """Index info, chunk lengths and embeddings (bytes, or None when not embedded) of a task"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute('SELECT info, chunk_count FROM chunk_index_info WHERE task_id = ?', (task_id,)).fetchone()
+            if not row:
+                return None
+            lengths, vectors = [], []
+            for length, embedding in conn.execute(
+                    'SELECT length, embedding FROM chunk_texts WHERE task_id = ? ORDER BY chunk', (task_id,)):
+                lengths.append(length)
+                vectors.append(embedding)
+        finally:
+            conn.close()
+        return {'info': json.loads(row[0]), 'chunk_count': row[1], 'lengths': lengths,
+                'vectors': vectors if vectors and all(vectors) else None}
+
+    def get_chunk_postings(self, task_id: str, terms: List[str]) -> List[tuple]:
+        """(term, chunk, tf) for every chunk of the task containing one of ``terms``"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(
+                f'SELECT term, chunk, tf FROM chunk_terms WHERE task_id = ? AND term IN ({",".join("?" * len(terms))})',
+                [task_id, *terms]
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def get_chunk_texts(self, task_id: str, chunks: List[int]) -> Dict[int, str]:
+        """Texts of the given chunks of a task"""
+        if not chunks:
+            return {}
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return dict(conn.execute(
+                f'SELECT chunk, text FROM chunk_texts WHERE task_id = ? AND chunk IN ({",".join("?" * len(chunks))})',
+                [task_id, *chunks]
+            ).fetchall())
+        finally:
+            conn.close()
+
+    def get_cached_analyses(self, keys: List[str]) -> Dict[str, str]:
+        """Cached analysis results for those of ``keys`` that have one"""
+        found = {}
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = conn.execute(
+                    f'SELECT key, result FROM analysis_cache WHERE key IN ({",".join("?" * len(batch))})', batch
+                ).fetchall()
+                found.update(rows)
+        finally:
+            conn.close()
+        return found
+
+    def save_cached_analysis(self, key: str, analysis: str, stage: str, result: str) -> None:
+        """Cache the result of one analysis call"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute('INSERT OR REPLACE INTO analysis_cache (key, analysis, stage, result) VALUES (?, ?, ?, ?)',
+                         (key, analysis, stage, result))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def append_scraping_chunk(self, task_id: str, seq: int, event: Dict) -> None:
+        """Save one event of a streamed scrape"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute('''
+                INSERT INTO scraped_chunks (task_id, seq, event_type, payload) VALUES (?, ?, ?, ?)
+            ''', (task_id, seq, event.get('event', ''), json.dumps(event, ensure_ascii=False)))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def finish_scraping_stream(self, task_id: str, summary: Dict, status: str = 'success') -> str:
+        """Record the outcome of a streamed scrape; the content stays in scraped_chunks"""
+        scrape_id = str(uuid.uuid4())
+        stats = summary.get('statistics', {})
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute('''
+                UPDATE task_results SET status = ?, result_data = ? WHERE id = ?
+            ''', (status, json.dumps(summary, ensure_ascii=False, indent=2), task_id))
+            if status == 'success':
+                conn.execute('''
+                    INSERT INTO scraped_data
+                    (id, task_id, url, scrape_type, title, content_type, data_size,
+                     word_count, link_count, image_count, table_count, form_count,
+                     scraped_at, raw_data, full_scraped_content)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    scrape_id,
+                    task_id,
+                    summary.get('url', ''),
+                    summary.get('scrape_type', 'all'),
+                    summary.get('title', ''),
+                    'web_page_stream',
+                    stats.get('page_size_chars', 0),
+                    stats.get('word_count', 0),
+                    stats.get('total_links', 0),
+                    stats.get('total_images', 0),
+                    stats.get('total_tables', 0),
+                    stats.get('total_forms', 0),
+                    datetime.now().isoformat(),
+                    json.dumps(summary),
+                    None  # assembled from scraped_chunks on demand
+                ))
+            conn.commit()
+        finally:
+            conn.close()
+
+        if status == 'success':
+            self._index_for_chat(task_id, self.assemble_streamed_scrape(task_id, summary).get('data', {}),
+                                 {'url': summary.get('url', ''), 'title': summary.get('title', ''),
+                                  'word_count': stats.get('word_count', 0)})
+        return scrape_id
+
+    def iter_scraping_chunks(self, task_id: str):
+        """Yield the saved events of a streamed scrape in order"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for (payload,) in conn.execute('''
+                SELECT payload FROM scraped_chunks WHERE task_id = ? ORDER BY seq
+            ''', (task_id,)):
+                yield json.loads(payload)
+        finally:
+            conn.close()
+
+    def assemble_streamed_scrape(self, task_id: str, summary: Dict) -> Dict:
+        """Rebuild the scrape_website_comprehensive result layout from a streamed scrape's events"""
+        data = {}
+        text_content = {'title': summary.get('title', ''), 'headings': [], 'paragraphs': [], 'lists': []}
+        tables = {}
+        for event in self.iter_scraping_chunks(task_id):
+            kind = event.get('event')
+            if kind == 'text':
+                data['text_content'] = text_content
+                for item in event['items']:
+                    if item['type'] == 'heading':
+                        text_content['headings'].append({k: item[k] for k in ('level', 'text', 'id')})
+                    elif item['type'] == 'paragraph':
+                        text_content['paragraphs'].append(item['text'])
+                    elif item['type'] == 'list':
+                        text_content['lists'].append({'type': item['list_type'], 'items': item['items']})
+            elif kind in ('links', 'images'):
+                data.setdefault(kind, []).extend(event['items'])
+            elif kind == 'structured':
+                data.setdefault('structured_data', []).extend(event['items'])
+            elif kind == 'metadata' and event.get('meta'):
+                data.setdefault('structured_data', []).append({'type': 'meta_tags', 'data': event['meta']})
+            elif kind == 'form':
+                data.setdefault('forms', []).append({k: v for k, v in event.items() if k != 'event'})
+            elif kind == 'table':
+                table = tables.setdefault(event['table_id'], {
+                    **{k: v for k, v in event.items() if k not in ('event', 'rows', 'offset', 'final')}, 'data': []})
+                table['data'].extend(event['rows'])
+        if tables:
+            data['tables'] = [tables[table_id] for table_id in sorted(tables)]
+        text_content['headings'].sort(key=lambda h: h['level'])
+        return {**summary, 'data': data}
+
     def save_account_creation_result(self, task_id: str, account_data: Dict) -> str:
         """Save account creation results"""
         account_id = str(uuid.uuid4())
@@ -228,11 +748,10 @@ class TaskDataManager:
     def _save_to_file(self, task_id: str, task_type: str, data: str) -> str:
         """Save task data to file system"""
         # Create data directory if it doesn't exist
-        data_dir = os.path.join(os.path.dirname(__file__), 'saved_task_data')
-        os.makedirs(data_dir, exist_ok=True)
+        os.makedirs(self.data_dir, exist_ok=True)
         
         # Create subdirectory for task type
-        type_dir = os.path.join(data_dir, task_type)
+        type_dir = os.path.join(self.data_dir, task_type)
         os.makedirs(type_dir, exist_ok=True)
         
         # Create filename with timestamp
@@ -255,15 +774,11 @@ class TaskDataManager:
             SELECT * FROM scraped_data WHERE task_id = ?
         ''', (task_id,))
         
+        columns = [description[0] for description in cursor.description]
         result = cursor.fetchone()
+        content = self._assemble_scraped_content(cursor, dict(zip(columns, result))) if result else None
         conn.close()
-        
-        if result:
-            columns = ['id', 'task_id', 'url', 'scrape_type', 'title', 'content_type', 
-                      'data_size', 'word_count', 'link_count', 'image_count', 'table_count', 
-                      'form_count', 'scraped_at', 'raw_data', 'full_scraped_content']
-            return dict(zip(columns, result))
-        return None
+        return content
     
     def get_task_results(self, user_id: int, limit: int = 100, offset: int = 0, task_type: str = None) -> List[Dict]:
         """Retrieve paginated task results (user_id accepted for compatibility, not stored in schema)."""
@@ -401,12 +916,13 @@ class TaskDataManager:
         # Get additional data based on task type
         if task_details['task_type'] == 'web_scraping':
             cursor.execute('''
-                SELECT id, task_id, url, scrape_type, title, content_type, data_size, word_count, link_count, image_count, table_count, form_count, scraped_at, raw_data, full_scraped_content FROM scraped_data WHERE task_id = ?
+                SELECT id, task_id, url, scrape_type, title, content_type, data_size, word_count, link_count, image_count, table_count, form_count, scraped_at, raw_data, full_scraped_content, page_version_id FROM scraped_data WHERE task_id = ?
             ''', (task_id,))
             scraping_columns = [description[0] for description in cursor.description]
             scraping_row = cursor.fetchone()
             if scraping_row:
-                task_details['scraping_details'] = dict(zip(scraping_columns, scraping_row))
+                task_details['scraping_details'] = self._assemble_scraped_content(
+                    cursor, dict(zip(scraping_columns, scraping_row)))
         
         elif task_details['task_type'] == 'account_creation':
             cursor.execute('''
@@ -0,0 +1,150 @@
+import json
+import unittest
+from unittest import mock
+
+from selenium.webdriver.remote.webelement import WebElement
+
+from browser_contexts import BrowserContextManager, TabDriver
+from network_profiles import drain_performance_log
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.switches.append(handle)
+        self.driver.current_window_handle = handle
+
+
+class FakeElement(WebElement):
+    def __init__(self, driver):
+        super().__init__(driver, "element")
+        self.driver = driver
+        self.clicked_in = []
+
+    def click(self):
+        self.clicked_in.append(self.driver.current_window_handle)
+
+
+class FakeHostDriver:
+    def __init__(self):
+        self.capabilities = {}
+        self.window_handles = ["base"]
+        self.current_window_handle = "base"
+        self.switch_to = FakeSwitchTo(self)
+        self.switches = []
+        self.contexts = {}
+        self.urls = {}
+        self.log = []
+        self.next_id = 0
+
+    def execute_cdp_cmd(self, method, params):
+        self.next_id += 1
+        if method == "Target.createBrowserContext":
+            context_id = f"ctx{self.next_id}"
+            self.contexts[context_id] = []
+            return {"browserContextId": context_id}
+        if method == "Target.createTarget":
+            target_id = f"tab{self.next_id}"
+            self.contexts[params["browserContextId"]].append(target_id)
+            self.window_handles.append(target_id)
+            return {"targetId": target_id}
+        if method == "Target.disposeBrowserContext":
+            for target_id in self.contexts.pop(params["browserContextId"]):
+                self.window_handles.remove(target_id)
+            return {}
+        raise AssertionError(method)
+
+    def get(self, url):
+        self.urls[self.current_window_handle] = url
+        self.log.append({"message": json.dumps({"webview": self.current_window_handle,
+                                                "message": {"method": "Network.requestWillBeSent", "params": {}}})})
+
+    def get_log(self, log_type):
+        entries, self.log = self.log, []
+        return entries
+
+    def execute_script(self, script, *args):
+        # Shaped like dom_snapshot / resolve_selectors results
+        return {"links": [None, {"element": FakeElement(self), "text": "Sign up"}]}
+
+    @property
+    def current_url(self):
+        return self.urls.get(self.current_window_handle, "about:blank")
+
+
+class TestBrowserContextManager(unittest.TestCase):
+    def setUp(self):
+        self.launched = []
+        self.released = []
+
+        def acquire():
+            self.assertFalse(self.manager.lock.locked(), "Chrome launched under the manager lock")
+            driver = FakeHostDriver()
+            self.launched.append(driver)
+            return driver
+
+        self.manager = BrowserContextManager(acquire, self.released.append, contexts_per_process=2, enabled=True)
+
+    def test_contexts_share_processes_up_to_limit(self):
+        tabs = [self.manager.open_context() for _ in range(3)]
+        self.assertTrue(all(isinstance(t, TabDriver) for t in tabs))
+        self.assertEqual(len(self.launched), 2)
+        self.assertEqual(self.manager.get_stats()["contexts_by_host"], [2, 1])
+        self.assertEqual(len({(id(t._host), t.context_id) for t in tabs}), 3)
+
+    def test_calls_are_routed_to_the_right_tab(self):
+        first = self.manager.open_context()
+        second = self.manager.open_context()
+        first.get("https://a.example")
+        second.get("https://b.example")
+        self.assertEqual(first.current_url, "https://a.example")
+        self.assertEqual(second.current_url, "https://b.example")
+        self.assertEqual(first.window_handles, [first._handle])
+
+    def test_nested_script_elements_switch_to_their_tab(self):
+        first = self.manager.open_context()
+        second = self.manager.open_context()
+        link = first.execute_script("return snapshot()")["links"][1]["element"]
+        second.get("https://b.example")
+        link.click()
+        self.assertEqual(link._element.clicked_in, [first._handle])
+
+    def test_performance_log_is_kept_for_the_tab_it_belongs_to(self):
+        first = self.manager.open_context()
+        second = self.manager.open_context()
+        first.get("https://a.example")
+        second.get("https://b.example")
+        self.assertEqual(len(drain_performance_log(second)), 1)
+        self.assertEqual(len(drain_performance_log(first)), 1)
+        self.assertEqual(drain_performance_log(first), [])
+        second.get("https://b.example/next")
+        first.quit()
+        self.assertEqual(len(drain_performance_log(second)), 1)
+        self.assertEqual(second._host.pending_logs, {})
+
+    def test_closing_last_context_releases_host(self):
+        tab = self.manager.open_context()
+        host_driver = self.launched[0]
+        tab.quit()
+        self.assertEqual(host_driver.window_handles, ["base"])
+        self.assertEqual(self.released, [host_driver])
+        self.assertEqual(self.manager.get_stats()["hosts"], 0)
+
+    def test_failed_context_releases_new_host(self):
+        original = FakeHostDriver.execute_cdp_cmd
+
+        def failing(driver, method, params):
+            if method == "Target.createTarget":
+                raise Exception("target crashed")
+            return original(driver, method, params)
+
+        with mock.patch.object(FakeHostDriver, "execute_cdp_cmd", failing):
+            with self.assertRaises(Exception):
+                self.manager.open_context()
+        self.assertEqual(self.released, self.launched)
+        self.assertEqual(self.manager.get_stats()["hosts"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
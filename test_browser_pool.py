@@ -0,0 +1,140 @@
+import time
+import unittest
+
+from browsing import BrowserPool
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.current = handle
+
+
+class FakeDriver:
+    def __init__(self):
+        self.window_handles = ["main"]
+        self.current = "main"
+        self.switch_to = FakeSwitchTo(self)
+        self.cdp_calls = []
+        self.history = {"main": ["https://example.com/page"]}
+        self.url = "https://example.com/page"
+        self.quit_called = False
+        self.broken = False
+        self.cleared = []
+
+    def execute_script(self, script):
+        return "https://example.com"
+
+    def execute_cdp_cmd(self, cmd, params):
+        if self.broken:
+            raise RuntimeError("chrome not reachable")
+        self.cdp_calls.append(cmd)
+        if cmd == "Page.getNavigationHistory":
+            return {"entries": [{"url": url} for url in self.history.get(self.current, [])]}
+        if cmd == "Storage.clearDataForOrigin":
+            self.cleared.append(params["origin"])
+
+    def get(self, url):
+        self.url = url
+
+    def close(self):
+        self.window_handles.remove(self.current)
+
+    def quit(self):
+        self.quit_called = True
+
+
+class TestBrowserPool(unittest.TestCase):
+    def make_pool(self, **kwargs):
+        self.launched = []
+
+        def launcher():
+            driver = FakeDriver()
+            self.launched.append(driver)
+            return driver
+
+        params = dict(size=1, max_uses=3, max_rss_mb=0, launcher=launcher)
+        params.update(kwargs)
+        return BrowserPool(**params)
+
+    def wait_for_idle(self, pool, count):
+        deadline = time.time() + 2
+        while time.time() < deadline and pool.get_stats()["idle"] < count:
+            time.sleep(0.01)
+
+    def test_miss_then_hit_after_release(self):
+        pool = self.make_pool()
+        driver = pool.acquire()
+        self.assertEqual(pool.get_stats()["misses"], 1)
+        pool.release(driver)
+        self.assertIs(pool.acquire(), driver)
+        stats = pool.get_stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertIsNotNone(stats["avg_launch_ms"])
+
+    def test_release_resets_driver(self):
+        pool = self.make_pool()
+        driver = pool.acquire()
+        driver.window_handles.append("popup")
+        driver.history = {"main": ["https://example.com/page", "https://shop.example:8443/cart", "about:blank"],
+                          "popup": ["https://login.example/sso"]}
+        pool.drain()
+        pool.release(driver)
+        self.assertEqual(driver.url, "about:blank")
+        self.assertEqual(driver.window_handles, ["main"])
+        self.assertIn("Network.clearBrowserCookies", driver.cdp_calls)
+        self.assertEqual(sorted(driver.cleared), ["https://example.com", "https://login.example",
+                                                  "https://shop.example:8443"])
+
+    def test_recycled_after_max_uses(self):
+        pool = self.make_pool(max_uses=1)
+        driver = pool.acquire()
+        pool.release(driver)
+        self.assertTrue(driver.quit_called)
+        self.assertEqual(pool.get_stats()["recycled"]["max_uses"], 1)
+
+    def test_broken_driver_is_not_reused(self):
+        pool = self.make_pool()
+        driver = pool.acquire()
+        pool.drain()
+        driver.broken = True
+        pool.release(driver)
+        self.assertTrue(driver.quit_called)
+        self.assertEqual(pool.get_stats()["recycled"]["reset_failed"], 1)
+
+    def test_no_prelaunch_unless_warmed(self):
+        pool = self.make_pool(size=2)
+        first = pool.acquire()
+        pool.release(first, discard=True)
+        time.sleep(0.05)
+        self.assertEqual(len(self.launched), 1)
+        self.assertEqual(pool.get_stats()["idle"], 0)
+
+    def test_warmed_pool_refills_after_lease(self):
+        pool = self.make_pool(size=1)
+        pool.warm()
+        self.wait_for_idle(pool, 1)
+        pool.acquire()
+        self.wait_for_idle(pool, 1)
+        self.assertEqual(len(self.launched), 2)
+        self.assertEqual(pool.get_stats()["hits"], 1)
+        pool.shutdown()
+
+    def test_size_zero_quits_on_release(self):
+        pool = self.make_pool(size=0)
+        driver = pool.acquire()
+        pool.release(driver)
+        self.assertTrue(driver.quit_called)
+        self.assertEqual(pool.get_stats()["idle"], 0)
+
+    def test_unknown_driver_is_quit(self):
+        pool = self.make_pool()
+        stranger = FakeDriver()
+        pool.release(stranger)
+        self.assertTrue(stranger.quit_called)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import browser_service
+from browser_service import BrowserServiceServer, RemoteBrowsers, service_method
+from browser_sessions import BrowserQuotaExceeded, get_browser_owner, set_browser_owner
+
+calls = []
+
+
+@service_method
+def fake_open(url: str, profile: str = None) -> str:
+    calls.append(("open", url, profile, get_browser_owner()))
+    return f"Browser opened with ID: browser_{len(calls)}."
+
+
+@service_method
+def fake_full() -> str:
+    raise BrowserQuotaExceeded("No browser slot available")
+
+
+class TestBrowserService(unittest.TestCase):
+    def setUp(self):
+        calls.clear()
+        self.tmpdir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmpdir, "browsers.sock")
+        self.server = BrowserServiceServer(self.socket_path)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.settings = mock.patch.object(browser_service.settings, "BROWSER_SERVICE_SOCKET", self.socket_path, create=True)
+        self.settings.start()
+        browser_service._client = None
+
+    def tearDown(self):
+        self.settings.stop()
+        browser_service._client = None
+        self.server.shutdown()
+        self.server.server_close()
+        os.unlink(self.socket_path)
+        os.rmdir(self.tmpdir)
+
+    def test_service_methods_are_called_in_the_service(self):
+        # The call goes over the socket and the owner is restored in the handler thread
+        set_browser_owner(5, "run-x")
+        self.addCleanup(set_browser_owner, None, None)
+        result = fake_open("https://example.com", profile="scrape-fast")
+        self.assertEqual(result, "Browser opened with ID: browser_1.")
+        self.assertEqual(calls, [("open", "https://example.com", "scrape-fast", (5, "run-x"))])
+
+    def test_errors_keep_their_type(self):
+        with self.assertRaises(BrowserQuotaExceeded):
+            fake_full()
+
+    def test_remote_browsers_view(self):
+        with mock.patch.dict(browser_service.SERVICE_METHODS, {
+            "has_browser": lambda browser_id: browser_id == "browser_3",
+            "list_browsers": lambda: ["browser_3"],
+        }):
+            browsers = RemoteBrowsers()
+            self.assertIn("browser_3", browsers)
+            self.assertNotIn("browser_4", browsers)
+            self.assertEqual(list(browsers), ["browser_3"])
+            self.assertEqual(len(browsers), 1)
+            with self.assertRaises(TypeError):
+                browsers["browser_5"] = object()
+
+    def test_unreachable_service(self):
+        client = browser_service.BrowserServiceClient(os.path.join(self.tmpdir, "missing.sock"))
+        with self.assertRaises(browser_service.BrowserServiceError):
+            client.call("list_browsers")
+
+    def test_refuses_to_replace_a_live_socket(self):
+        with self.assertRaises(RuntimeError):
+            BrowserServiceServer(self.socket_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
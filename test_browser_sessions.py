@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from browser_sessions import (
+    BrowserQuotaExceeded,
+    BrowserRegistry,
+    BrowserSessionManager,
+    set_browser_owner,
+)
+
+
+class TestBrowserSessions(unittest.TestCase):
+    def setUp(self):
+        self.closed = []
+        self.browsers = BrowserRegistry()
+        self.manager = BrowserSessionManager(self.close_browser, idle_ttl=60, max_sessions=3, max_per_user=2,
+                                             queue_timeout=0.2, reap_interval=3600)
+        self.browsers.manager = self.manager
+
+    def tearDown(self):
+        self.manager.stop()
+
+    def close_browser(self, browser_id):
+        self.closed.append(browser_id)
+        self.browsers.pop(browser_id, None)
+
+    def open(self, browser_id, user_id=None, run_id=None):
+        set_browser_owner(user_id, run_id)
+        self.manager.reserve_slot()
+        self.browsers[browser_id] = object()
+
+    def test_registry_tracks_owner_and_activity(self):
+        self.open("browser_1", user_id=7, run_id="run-a")
+        session = self.manager.sessions["browser_1"]
+        self.assertEqual((session.user_id, session.run_id), (7, "run-a"))
+        session.last_activity -= 30
+        self.browsers["browser_1"]
+        self.assertLess(time.time() - session.last_activity, 1)
+        self.browsers.pop("browser_1")
+        self.assertNotIn("browser_1", self.manager.sessions)
+
+    def test_idle_sessions_are_reaped(self):
+        self.open("browser_1", user_id=1)
+        self.open("browser_2", user_id=1)
+        self.manager.sessions["browser_1"].last_activity -= 120
+        self.assertEqual(self.manager.reap_idle(), ["browser_1"])
+        self.assertEqual(self.closed, ["browser_1"])
+        self.assertEqual(list(self.browsers), ["browser_2"])
+        self.assertEqual(self.manager.get_stats()["reaped"], 1)
+
+    def test_per_user_cap_rejects_after_queue_timeout(self):
+        self.open("browser_1", user_id=1)
+        self.open("browser_2", user_id=1)
+        with self.assertRaises(BrowserQuotaExceeded):
+            self.open("browser_3", user_id=1)
+        # Another user still fits under the global cap
+        self.open("browser_4", user_id=2)
+        stats = self.manager.get_stats()
+        self.assertEqual(stats["per_user"], {"1": 2, "2": 1})
+        self.assertEqual(stats["rejected"], 1)
+
+    def test_queued_open_proceeds_when_a_slot_frees(self):
+        self.manager.queue_timeout = 5
+        self.open("browser_1", user_id=1)
+        self.open("browser_2", user_id=1)
+        opened = threading.Event()
+
+        def waiter():
+            self.open("browser_3", user_id=1)
+            opened.set()
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        time.sleep(0.1)
+        self.assertFalse(opened.is_set())
+        self.browsers.pop("browser_1")
+        self.assertTrue(opened.wait(2))
+        thread.join()
+        self.assertEqual(self.manager.get_stats()["queued"], 1)
+
+    def test_failed_open_releases_its_slot(self):
+        set_browser_owner(1, None)
+        self.manager.reserve_slot()
+        self.manager.reserve_slot()
+        self.manager.release_slot()
+        self.manager.release_slot()
+        self.assertEqual(self.manager.get_stats()["pending"], 0)
+
+    def test_async_wait_uses_no_thread_and_hands_slot_to_open(self):
+        self.open("browser_1", user_id=1)
+        self.open("browser_2", user_id=1)
+        self.addCleanup(set_browser_owner, None, None)
+
+        async def scenario():
+            asyncio.get_running_loop().call_later(0.05, self.browsers.pop, "browser_1")
+            async with self.manager.slot_reserved_ahead(timeout=1):
+                # The blocking open in an executor thread takes the reservation without waiting
+                await asyncio.to_thread(self.open, "browser_3", 1)
+            self.browsers.pop("browser_3")
+            async with self.manager.slot_reserved_ahead(timeout=1):
+                self.assertEqual(self.manager.get_stats()["pending"], 1)
+
+        asyncio.run(scenario())
+        stats = self.manager.get_stats()
+        self.assertEqual((stats["queued"], stats["pending"], list(self.browsers)), (1, 0, ["browser_2"]))
+
+    def test_close_run_sessions(self):
+        self.open("browser_1", user_id=1, run_id="run-a")
+        self.open("browser_2", user_id=2, run_id="run-b")
+        self.assertEqual(self.manager.close_run_sessions("run-a"), 1)
+        self.assertEqual(list(self.browsers), ["browser_2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
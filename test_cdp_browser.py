@@ -0,0 +1,170 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+import browsing
+import cdp_browser
+from browser_sessions import BrowserQuotaExceeded, BrowserSessionManager, set_browser_owner
+from cdp_browser import CDPConnection, CDPError, CDPPage
+
+
+class FakeWebSocket:
+    """In-memory DevTools websocket answering commands from a handler."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.incoming = asyncio.Queue()
+        self.sent = []
+
+    async def send(self, raw):
+        message = json.loads(raw)
+        self.sent.append(message)
+        for reply in self.handler(message) or []:
+            await self.incoming.put(json.dumps(reply))
+
+    async def close(self):
+        await self.incoming.put(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        raw = await self.incoming.get()
+        if raw is None:
+            raise StopAsyncIteration
+        return raw
+
+
+class TestCDPConnection(unittest.TestCase):
+    def run_async(self, coro):
+        return asyncio.run(coro)
+
+    def test_replies_are_matched_to_commands(self):
+        async def scenario():
+            ws = FakeWebSocket(lambda m: [{"id": m["id"], "result": {"echo": m["method"]}}])
+            connection = CDPConnection(ws)
+            first, second = await asyncio.gather(connection.send("A.one"), connection.send("B.two"))
+            await connection.close()
+            return first, second, connection.pending
+
+        first, second, pending = self.run_async(scenario())
+        self.assertEqual(first, {"echo": "A.one"})
+        self.assertEqual(second, {"echo": "B.two"})
+        self.assertEqual(pending, {})
+
+    def test_error_reply_raises(self):
+        async def scenario():
+            connection = CDPConnection(FakeWebSocket(lambda m: [{"id": m["id"], "error": {"message": "boom"}}]))
+            try:
+                await connection.send("Page.navigate")
+            finally:
+                await connection.close()
+
+        with self.assertRaises(CDPError):
+            self.run_async(scenario())
+
+    def test_event_waiter_filters_by_session(self):
+        async def scenario():
+            ws = FakeWebSocket(lambda m: [])
+            connection = CDPConnection(ws)
+            waiter = connection.wait_for_event("Page.loadEventFired", session_id="s2")
+            await ws.incoming.put(json.dumps({"method": "Page.loadEventFired", "sessionId": "s1", "params": {"timestamp": 1}}))
+            await ws.incoming.put(json.dumps({"method": "Page.loadEventFired", "sessionId": "s2", "params": {"timestamp": 2}}))
+            params = await asyncio.wait_for(waiter, 1)
+            await connection.close()
+            return params, connection.waiters
+
+        params, waiters = self.run_async(scenario())
+        self.assertEqual(params, {"timestamp": 2})
+        self.assertEqual(waiters, [])
+
+    def test_cancelled_navigation_stops_loading(self):
+        async def scenario():
+            ws = FakeWebSocket(lambda m: [{"id": m["id"], "result": {"frameId": "f"}}])
+            connection = CDPConnection(ws)
+            page = CDPPage(connection, "ctx", "target", "s1")
+            task = asyncio.ensure_future(page.goto("https://example.com", timeout=30))
+            await asyncio.sleep(0.05)  # navigation sent, load event never arrives
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0.05)
+            await connection.close()
+            return [m["method"] for m in ws.sent], connection.waiters
+
+        methods, waiters = self.run_async(scenario())
+        self.assertEqual(methods, ["Page.navigate", "Page.stopLoading"])
+        self.assertEqual(waiters, [])
+
+    def test_closed_connection_fails_pending_commands(self):
+        async def scenario():
+            ws = FakeWebSocket(lambda m: [])
+            connection = CDPConnection(ws)
+            command = asyncio.ensure_future(connection.send("Runtime.evaluate"))
+            await asyncio.sleep(0.01)
+            await ws.close()
+            return await command
+
+        with self.assertRaises(CDPError):
+            self.run_async(scenario())
+
+
+
+class FakePage:
+    network_stats = None
+
+    def __init__(self):
+        self.closed = False
+
+    async def apply_profile(self, profile):
+        pass
+
+    async def goto(self, url):
+        return True
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.pages = []
+
+    async def new_page(self):
+        self.pages.append(FakePage())
+        return self.pages[-1]
+
+
+class TestCDPSessions(unittest.TestCase):
+    def setUp(self):
+        self.browser = FakeBrowser()
+        self.manager = BrowserSessionManager(browsing._close_session, max_sessions=2, max_per_user=2,
+                                             queue_timeout=0.2, reap_interval=3600)
+        self.addCleanup(self.manager.stop)
+        for patch in (mock.patch.object(browsing, "session_manager", self.manager),
+                      mock.patch.object(cdp_browser, "get_browser", mock.AsyncMock(return_value=self.browser)),
+                      mock.patch.object(cdp_browser.network_stats, "record"),
+                      mock.patch.dict(cdp_browser.pages, clear=True)):
+            patch.start()
+            self.addCleanup(patch.stop)
+        set_browser_owner(3, "run-cdp")
+        self.addCleanup(set_browser_owner, None, None)
+
+    def test_pages_count_against_caps_and_close_with_their_run(self):
+        async def scenario():
+            await cdp_browser.open_browser("https://a.example")
+            await cdp_browser.open_browser("https://b.example")
+            with self.assertRaises(BrowserQuotaExceeded):
+                await cdp_browser.open_browser("https://c.example")
+            return await cdp_browser.close_run_browsers("run-cdp")
+
+        self.assertEqual(asyncio.run(scenario()), 2)
+        self.assertTrue(all(page.closed for page in self.browser.pages))
+        stats = self.manager.get_stats()
+        self.assertEqual((stats["opened"], stats["closed"], stats["open"], stats["pending"]), (2, 2, 0, 0))
+        self.assertEqual(cdp_browser.pages, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
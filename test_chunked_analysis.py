@@ -0,0 +1,131 @@
+import threading
+import unittest
+from unittest import mock
+
+import chunked_analysis
+from chunked_analysis import analyze_blocks, reduce_calls
+from core.executors import CategoryExecutors
+from test_helpers import temp_task_manager
+from text_chunks import TextBlock, data_blocks, html_blocks, pack_chunks
+
+PAGE = """<html><head><title>Guide</title><script>var x = 1;</script></head><body>
+<nav><a href="/">Home</a> | <a href="/docs">Docs</a></nav>
+<h1>Install</h1><p>Run the <b>installer</b> and wait.</p>
+<h2>Linux</h2><ul><li>Download</li><li>Unpack</li></ul>
+<table><tr><th>OS</th><th>Size</th></tr><tr><td>Linux</td><td>12 MB</td></tr></table>
+<div>Footer text<br>second line</div></body></html>"""
+
+
+def section(n):
+    return [TextBlock(f"Section {n}", 2)] + [TextBlock(f"Paragraph {n}.{i} " + "word " * 40) for i in range(5)]
+
+
+class FakeModel:
+    def __init__(self):
+        self.prompts = []
+        self.lock = threading.Lock()
+
+    def __call__(self, prompt):
+        with self.lock:
+            self.prompts.append(prompt)
+            return f"result {len(self.prompts)}"
+
+    def stages(self):
+        return [next(stage for stage, template in chunked_analysis.PROMPTS["summarize"].items()
+                     if prompt.startswith(template.split("{title}")[0])) for prompt in self.prompts]
+
+
+class TestTextChunks(unittest.TestCase):
+    def test_html_blocks(self):
+        blocks = html_blocks(PAGE)
+        self.assertEqual([(b.text, b.heading_level) for b in blocks], [
+            ("Home | Docs", 0), ("Install", 1), ("Run the installer and wait.", 0), ("Linux", 2),
+            ("Download", 0), ("Unpack", 0), ("OS | Size", 0), ("Linux | 12 MB", 0),
+            ("Footer text", 0), ("second line", 0),
+        ])
+
+    def test_data_blocks(self):
+        blocks = data_blocks({"text_content": {"title": "Guide", "paragraphs": ["Intro"],
+                                               "headings": [{"level": 2, "text": "Setup"}]},
+                              "tables": [{"headers": ["a", "b"], "data": [["1", "2"]]}]})
+        self.assertEqual([b.text for b in blocks], ["Guide", "Headings: Setup", "Intro", "a | b", "1 | 2"])
+
+    def test_packing(self):
+        blocks = [TextBlock("Guide", 1)] + section(1) + section(2) + [TextBlock("long sentence. " * 200)]
+        chunks = pack_chunks(blocks, 700)
+        self.assertTrue(all(len(chunk.text) <= 700 for chunk in chunks))
+        self.assertTrue(chunks[0].text.startswith("# Guide\n## Section 1"))
+        starts = [chunk for chunk in chunks if chunk.text.startswith("## Section 2")]
+        self.assertEqual([chunk.headings for chunk in starts], [["Guide"]])
+        self.assertEqual(chunks[-1].headings, ["Guide", "Section 2"])
+        self.assertTrue(chunks[-1].as_prompt_text().startswith("[Section: Guide > Section 2]\n"))
+
+
+class TestChunkedAnalysis(unittest.TestCase):
+    def setUp(self):
+        manager = temp_task_manager(self)
+        patches = [mock.patch.object(chunked_analysis, "task_manager", manager)]
+        for name, value in {"ANALYSIS_CHUNK_CHARS": 1000, "ANALYSIS_MAX_CHUNK_CHARS": 5000,
+                            "ANALYSIS_MAX_PARALLEL": 4, "ANALYSIS_REDUCE_FAN_IN": 3}.items():
+            patches.append(mock.patch.object(chunked_analysis.settings, name, value, create=True))
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.blocks = [block for n in range(8) for block in section(n)]
+
+    def test_short_page_is_one_call(self):
+        model = FakeModel()
+        report = analyze_blocks([TextBlock("Short page")], generate=model, budget={})
+        self.assertEqual((report["result"], report["calls"], model.stages()), ("result 1", 1, ["single"]))
+
+    def test_map_reduce_and_cache(self):
+        model = FakeModel()
+        report = analyze_blocks(self.blocks, generate=model, budget={"requests": 100, "keys": 2})
+        chunks = report["chunks"]
+        self.assertGreater(chunks, 3)
+        self.assertEqual(model.stages().count("map"), chunks)
+        self.assertLessEqual(model.stages().count("reduce"), reduce_calls(chunks, 3))
+        self.assertEqual(report["calls"], len(model.prompts))
+        self.assertTrue(report["result"].startswith("result"))
+
+        again = FakeModel()
+        cached = analyze_blocks(self.blocks, generate=again, budget={"requests": 100, "keys": 2})
+        self.assertEqual((again.prompts, cached["cached"], cached["result"]), ([], report["calls"], report["result"]))
+
+        edited = self.blocks[:-1] + [TextBlock("A changed last paragraph")]
+        analyze_blocks(edited, generate=again, budget={"requests": 100, "keys": 2})
+        self.assertEqual(again.stages().count("map"), 1)
+
+    def test_budget_uses_larger_chunks(self):
+        model = FakeModel()
+        report = analyze_blocks(self.blocks, generate=model, budget={"requests": 4, "keys": 1})
+        self.assertLessEqual(report["calls"], 4)
+        self.assertGreater(report["chunk_chars"], 1000)
+
+    def test_calls_run_on_the_shared_network_pool(self):
+        executors = CategoryExecutors({"browser": 1, "network": 1, "cpu": 1})
+        self.addCleanup(executors.shutdown)
+        model = FakeModel()
+        with mock.patch.object(chunked_analysis, "category_executors", executors):
+            # Called from the pool's only worker, as an async handler would: must not deadlock
+            future = executors.get_executor("network").submit(
+                analyze_blocks, self.blocks, generate=model, budget={"requests": 100, "keys": 4})
+            report = future.result(timeout=10)
+        self.assertEqual(executors.get_stats()["network"]["completed"], report["calls"])
+
+    def test_failed_parts(self):
+        def flaky(prompt):
+            if "Paragraph 0.0" in prompt:
+                raise RuntimeError("quota")
+            return "ok"
+        report = analyze_blocks(self.blocks, generate=flaky, budget={})
+        self.assertEqual(report["result"], "ok")
+        self.assertEqual(len(report["failed"]), 1)
+        with self.assertRaises(RuntimeError):
+            analyze_blocks(self.blocks, "extract_data", generate=mock.Mock(side_effect=RuntimeError("down")), budget={})
+        with self.assertRaises(ValueError):
+            analyze_blocks(self.blocks, "translate", generate=FakeModel(), budget={})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from core.circuit_breaker import (
+    CircuitBreaker,
+    CircuitBreakerConfig,
+    CircuitBreakerOpenError,
+    CircuitState,
+)
+
+
+def make_breaker(**overrides):
+    params = dict(
+        failure_threshold=3,
+        recovery_timeout=0.05,
+        expected_exception=ValueError,
+        name="test",
+        failure_rate_threshold=0.5,
+        window_size=10,
+        window_seconds=60.0,
+        half_open_max_calls=2,
+    )
+    params.update(overrides)
+    return CircuitBreaker(CircuitBreakerConfig(**params))
+
+
+def fail():
+    raise ValueError("boom")
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_calls_are_not_serialized(self):
+        breaker = make_breaker()
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def slow():
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.1)
+            with lock:
+                active.pop()
+
+        threads = [threading.Thread(target=breaker.call, args=(slow,)) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertGreater(max(peak), 1)
+
+    def test_opens_on_failure_rate_not_consecutive_failures(self):
+        breaker = make_breaker()
+        # 3 failures out of 9 calls = 33% < 50%: stays closed
+        for i in range(9):
+            if i % 3 == 0:
+                with self.assertRaises(ValueError):
+                    breaker.call(fail)
+            else:
+                breaker.call(lambda: None)
+        self.assertTrue(breaker.is_closed)
+        with self.assertRaises(ValueError):
+            breaker.call(fail)
+        self.assertTrue(breaker.is_closed)
+        failures = 0
+        while breaker.is_closed and failures < 5:
+            with self.assertRaises(ValueError):
+                breaker.call(fail)
+            failures += 1
+        self.assertTrue(breaker.is_open)
+        self.assertGreaterEqual(breaker.failure_rate, 0.5)
+        with self.assertRaises(CircuitBreakerOpenError):
+            breaker.call(lambda: None)
+
+    def test_unexpected_exceptions_are_not_counted(self):
+        breaker = make_breaker(failure_threshold=1)
+        with self.assertRaises(KeyError):
+            breaker.call(lambda: {}["missing"])
+        self.assertTrue(breaker.is_closed)
+        self.assertEqual(breaker.failure_count, 0)
+
+    def test_half_open_limits_concurrent_probes(self):
+        breaker = make_breaker(failure_threshold=1, half_open_max_calls=1)
+        with self.assertRaises(ValueError):
+            breaker.call(fail)
+        self.assertTrue(breaker.is_open)
+        time.sleep(0.06)
+
+        release = threading.Event()
+        probe = threading.Thread(target=breaker.call, args=(release.wait,))
+        probe.start()
+        time.sleep(0.02)
+        self.assertEqual(breaker.state, CircuitState.HALF_OPEN)
+        with self.assertRaises(CircuitBreakerOpenError):
+            breaker.call(lambda: None)
+        release.set()
+        probe.join()
+        self.assertTrue(breaker.is_closed)
+
+    def test_probe_failure_reopens(self):
+        breaker = make_breaker(failure_threshold=1)
+        with self.assertRaises(ValueError):
+            breaker.call(fail)
+        time.sleep(0.06)
+        with self.assertRaises(ValueError):
+            breaker.call(fail)
+        self.assertTrue(breaker.is_open)
+
+    def test_acall_and_async_decorator(self):
+        breaker = make_breaker(failure_threshold=1)
+
+        @breaker
+        async def ok(value):
+            await asyncio.sleep(0)
+            return value
+
+        async def boom():
+            raise ValueError("boom")
+
+        self.assertEqual(asyncio.run(ok(5)), 5)
+        with self.assertRaises(ValueError):
+            asyncio.run(breaker.acall(boom))
+        self.assertTrue(breaker.is_open)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import json
+import sqlite3
+import unittest
+
+from content_fingerprint import assemble_blocks, diff_blocks, fingerprint, page_blocks, text_runs
+from page_extract import extract_page
+from test_helpers import temp_task_manager
+
+PAGE = """<html><head><title>Prices</title><meta name="description" content="Daily prices"></head><body>
+<h1>Market</h1><p>Prices are updated every morning.</p><p>Delivery is free over $50.</p>
+<ul><li>Apples</li><li>Pears</li></ul><a href="/about">About us</a><img src="/logo.png" alt="Logo">
+<table><tr><th>Item</th><th>Price</th></tr><tr><td>Apples</td><td>$3</td></tr><tr><td>Pears</td><td>$4</td></tr></table>
+<form action="/order"><input name="qty"></form></body></html>"""
+
+
+def scrape(html, url="https://shop.example/prices"):
+    data, statistics = extract_page(html, url)
+    return {"success": True, "url": url, "scrape_type": "all", "data": data, "statistics": statistics}
+
+
+class TestContentFingerprint(unittest.TestCase):
+    def test_blocks_round_trip(self):
+        data = scrape(PAGE)["data"]
+        self.assertEqual(assemble_blocks(*page_blocks(data)), data)
+        text_only, _ = extract_page(PAGE, "https://shop.example/", "links")
+        self.assertEqual(assemble_blocks(*page_blocks(text_only)), text_only)
+
+    def test_whitespace_does_not_change_the_fingerprint(self):
+        spaced = PAGE.replace("Prices are updated", "Prices   are\n updated")
+        self.assertEqual(fingerprint(scrape(PAGE)["data"])["page_hash"], fingerprint(scrape(spaced)["data"])["page_hash"])
+        changed = PAGE.replace("$4", "$5")
+        self.assertNotEqual(fingerprint(scrape(PAGE)["data"])["page_hash"], fingerprint(scrape(changed)["data"])["page_hash"])
+
+    def test_text_runs_are_local_and_diffs_count_blocks(self):
+        words = " ".join(f"word{i}" for i in range(2000))
+        edited = words.replace("word1000 ", "word1000 inserted ")
+        before, after = text_runs(words), text_runs(edited)
+        self.assertEqual(" ".join(after), edited)
+        diff = diff_blocks(before, after)
+        self.assertLessEqual(diff["added"], 2)
+        self.assertEqual(diff["unchanged"], len(after) - diff["added"])
+        self.assertEqual(diff_blocks(before, before), {"added": 0, "removed": 0, "unchanged": len(before), "ops": []})
+
+
+class TestPageVersions(unittest.TestCase):
+    def setUp(self):
+        self.manager = temp_task_manager(self)
+
+    def count(self, table):
+        conn = sqlite3.connect(self.manager.db_path)
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        finally:
+            conn.close()
+
+    def save(self, result):
+        task_id = self.manager.save_task_result("web_scraping", {"url": result["url"]}, url=result["url"])
+        self.manager.save_scraping_result(task_id, result)
+        return task_id
+
+    def test_rescrapes_store_only_changed_blocks(self):
+        first = scrape(PAGE)
+        self.assertEqual(self.manager.check_page_changes(first["url"], "all", first["data"])["status"], "new")
+        task_id = self.save(first)
+        blocks = self.count("content_blocks")
+
+        content = self.manager.get_scraped_content(task_id)
+        self.assertEqual(json.loads(content["full_scraped_content"]), first)
+        self.assertNotIn('"data"', content["raw_data"])
+
+        unchanged = self.manager.check_page_changes(first["url"], "all", scrape(PAGE)["data"])
+        self.assertEqual((unchanged["status"], unchanged["previous_task_id"]), ("unchanged", task_id))
+
+        second = scrape(PAGE.replace("$4", "$5"))
+        changes = self.manager.check_page_changes(second["url"], "all", second["data"], describe=True)
+        self.assertEqual((changes["status"], changes["version"], changes["added"], changes["removed"]), ("changed", 2, 2, 2))
+        added = [block for change in changes["changes"] for block in change["added"]]
+        self.assertIn({"kind": "row", "content": ["Pears", "$5"]}, added)
+        second_id = self.save(second)
+        self.assertEqual(self.count("content_blocks"), blocks + 2)
+        self.assertEqual(json.loads(self.manager.get_scraped_content(second_id)["full_scraped_content"]), second)
+        self.assertEqual(json.loads(self.manager.get_scraped_content(task_id)["full_scraped_content"]), first)
+
+        versions = self.manager.get_page_versions(first["url"])
+        self.assertEqual([(v["version"], v.get("added")) for v in versions], [(2, 2), (1, None)])
+
+
+if __name__ == "__main__":
+    unittest.main()
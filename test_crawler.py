@@ -0,0 +1,110 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import httpx
+
+import crawler
+from crawler import BloomFilter, Crawler, normalize_url
+from fetch_strategy import FetchDecisions
+
+SITE = {
+    "/robots.txt": "User-agent: *\nDisallow: /private\n",
+    "/": '<html><head><title>Home</title></head><body><p>Welcome to the example site with plenty of words.</p>'
+         '<a href="/a#top">A</a><a href="/b?utm_source=x">B</a><a href="/private/x">P</a>'
+         '<a href="/report.pdf">PDF</a><a href="https://other.example/">Elsewhere</a></body></html>',
+    "/a": '<html><body><p>Page A</p><a href="/">Home</a><a href="/c">C</a></body></html>',
+    "/b": '<html><body><p>Page B</p><a href="/a">A</a></body></html>',
+    "/c": '<html><body><p>Page C</p></body></html>',
+    "/app": '<html><body><div id="root"></div><script src="/bundle.js"></script></body></html>',
+}
+
+
+def make_client(requested):
+    def handler(request):
+        requested.append(request.url.path)
+        body = SITE.get(request.url.path)
+        if body is None:
+            return httpx.Response(404, text="missing")
+        content_type = "text/plain" if request.url.path.endswith(".txt") else "text/html; charset=utf-8"
+        return httpx.Response(200, text=body, headers={"content-type": content_type})
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler), follow_redirects=True)
+
+
+class TestCrawler(unittest.TestCase):
+    def setUp(self):
+        self.settings = mock.patch.multiple(crawler.settings, create=True, CRAWL_HOST_DELAY=0, CRAWL_CONCURRENCY=4,
+                                            CRAWL_RESPECT_ROBOTS=True, FETCH_JS_MIN_WORDS=5, CRAWL_MAX_PAGES=100)
+        self.settings.start()
+        self.cpu = mock.patch.object(crawler, "run_in_category", side_effect=self._inline)
+        self.cpu.start()
+
+    def tearDown(self):
+        self.cpu.stop()
+        self.settings.stop()
+
+    @staticmethod
+    async def _inline(category, func, *args):
+        return func(*args)
+
+    def crawl(self, url="https://site.example/", **kwargs):
+        requested = []
+
+        async def run():
+            async with make_client(requested) as client:
+                return await Crawler(url, client=client, browser_fetch=kwargs.pop("browser_fetch", None),
+                                     decisions=FetchDecisions(), **kwargs).run()
+        return asyncio.run(run()), requested
+
+    def test_normalize_url(self):
+        self.assertEqual(normalize_url("HTTPS://Site.Example:443?b=2&a=1&utm_source=x#frag"), "https://site.example/?a=1&b=2")
+        self.assertEqual(normalize_url("http://site.example:8080/p"), "http://site.example:8080/p")
+        self.assertIsNone(normalize_url("mailto:someone@site.example"))
+
+    def test_bloom_filter(self):
+        seen = BloomFilter(1000)
+        self.assertTrue(seen.add("https://site.example/"))
+        self.assertFalse(seen.add("https://site.example/"))
+        self.assertIn("https://site.example/", seen)
+        self.assertNotIn("https://site.example/other", seen)
+
+    def test_depth_robots_and_dedup(self):
+        pages = []
+        result, requested = self.crawl(max_depth=3, on_page=pages.append)
+        urls = sorted(p["url"] for p in result["pages"])
+        self.assertEqual(urls, ["https://site.example/", "https://site.example/a", "https://site.example/b",
+                                "https://site.example/c"])
+        self.assertEqual([p["url"] for p in pages].count("https://site.example/a"), 1)
+        self.assertNotIn("/private/x", requested)
+        self.assertNotIn("/report.pdf", requested)
+        self.assertEqual(requested.count("/robots.txt"), 1)
+        self.assertEqual(result["stats"]["skipped_by_robots"], 1)
+        self.assertGreater(result["stats"]["duplicate_links"], 0)
+        self.assertEqual({p["depth"] for p in pages if p["url"].endswith("/c")}, {2})
+        self.assertIn("text_content", pages[0]["data"])
+
+    def test_limits(self):
+        result, requested = self.crawl(max_depth=1)
+        self.assertEqual([p["url"] for p in result["pages"]], ["https://site.example/"])
+        result, _ = self.crawl(max_depth=5, max_pages=2)
+        self.assertEqual(len(result["pages"]), 2)
+
+    def test_script_only_pages_use_the_browser(self):
+        rendered = []
+
+        def browser_fetch(url):
+            rendered.append(url)
+            return "<html><body><p>" + "rendered words " * 10 + "</p></body></html>"
+        result, _ = self.crawl("https://site.example/app", max_depth=1, browser_fetch=browser_fetch)
+        self.assertEqual(rendered, ["https://site.example/app"])
+        self.assertEqual(result["pages"][0]["fetched_via"], "browser")
+        self.assertEqual(result["stats"]["pages_via_browser"], 1)
+
+    def test_failed_pages_are_reported(self):
+        result, _ = self.crawl("https://site.example/missing", max_depth=2)
+        self.assertEqual(result["pages"], [])
+        self.assertEqual(result["errors"][0]["url"], "https://site.example/missing")
+
+
+if __name__ == "__main__":
+    unittest.main()
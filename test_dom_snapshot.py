@@ -0,0 +1,101 @@
+import unittest
+
+import browsing
+from dom_snapshot import (
+    DomSnapshot,
+    classify_field,
+    find_links,
+    find_submit_button,
+    take_dom_snapshot,
+)
+
+SCRIPT_RESULT = {
+    "url": "https://example.com/signup",
+    "title": "Sign up",
+    "forms": [{"index": 0, "selector": "#signup", "action": "/register", "method": "post", "id": "signup", "name": ""}],
+    "items": [
+        {"kind": "input", "tag": "input", "selector": "#em", "visible": True, "enabled": True, "form": 0,
+         "id": "em", "type": "email", "label": "Your e-mail", "element": "el-email"},
+        {"kind": "input", "tag": "input", "selector": "input[name=\"pw\"]", "visible": True, "enabled": True,
+         "form": 0, "name": "pw", "type": "password", "placeholder": "Password", "element": "el-pw"},
+        {"kind": "input", "tag": "input", "selector": "#pw2", "visible": True, "enabled": True, "form": 0,
+         "id": "pw2", "type": "password", "placeholder": "Repeat password", "element": "el-pw2"},
+        {"kind": "input", "tag": "input", "selector": "form > div:nth-of-type(1) > input:nth-of-type(1)",
+         "visible": True, "enabled": True, "form": 0, "type": "text", "label": "First name", "element": "el-fn"},
+        {"kind": "input", "tag": "input", "selector": "#nick", "visible": False, "enabled": True, "form": 0,
+         "id": "nick", "element": "el-hidden"},
+        {"kind": "input", "tag": "input", "selector": "#tel", "visible": True, "enabled": True, "form": 0,
+         "id": "tel", "type": "tel", "element": "el-tel"},
+        {"kind": "button", "tag": "button", "selector": "#cancel", "visible": True, "enabled": True, "form": 0,
+         "id": "cancel", "type": "button", "text": "Cancel", "element": "el-cancel"},
+        {"kind": "button", "tag": "button", "selector": "#go", "visible": True, "enabled": True, "form": 0,
+         "id": "go", "class": "btn signup", "text": "Create account", "element": "el-go"},
+        {"kind": "link", "tag": "a", "selector": "a:nth-of-type(1)", "visible": True, "enabled": True, "form": -1,
+         "href": "/login", "text": "Log in", "element": "el-login"},
+        {"kind": "link", "tag": "a", "selector": "a:nth-of-type(2)", "visible": True, "enabled": True, "form": -1,
+         "href": "/join", "text": "Join now", "element": "el-join"},
+    ],
+}
+
+
+class FakeElement:
+    def __init__(self, name):
+        self.name = name
+        self.keys = []
+
+    def send_keys(self, value):
+        self.keys.append(value)
+
+
+class FakeDriver:
+    def __init__(self, result=None, elements=None):
+        self.result = result
+        self.elements = elements or {}
+        self.scripts = 0
+
+    def execute_script(self, script, *args):
+        self.scripts += 1
+        if args:
+            return [self.elements.get(s) for s in args[0]]
+        return self.result
+
+
+class TestDomSnapshot(unittest.TestCase):
+    def test_snapshot_is_one_script_call(self):
+        driver = FakeDriver(SCRIPT_RESULT)
+        snapshot = take_dom_snapshot(driver)
+        self.assertEqual(driver.scripts, 1)
+        self.assertEqual(len(snapshot.inputs()), 5)
+        self.assertEqual(len(snapshot.inputs(interactable_only=False)), 6)
+        self.assertEqual(snapshot.inputs()[0].element, "el-email")
+        self.assertNotIn("element", snapshot.to_dict()["elements"][0])
+
+    def test_fields_are_classified_locally(self):
+        snapshot = DomSnapshot.from_script_result(SCRIPT_RESULT)
+        self.assertEqual([classify_field(f) for f in snapshot.inputs()],
+                         ["email", "password", "password_confirm", "first_name", "phone"])
+
+    def test_submit_button_and_links(self):
+        snapshot = DomSnapshot.from_script_result(SCRIPT_RESULT)
+        self.assertEqual(find_submit_button(snapshot).selector, "#go")
+        self.assertEqual([l.element for l in find_links(snapshot, ["Join", "Register"])], ["el-join"])
+
+    def test_fill_multiple_fields_resolves_in_one_call(self):
+        email, name = FakeElement("email"), FakeElement("name")
+        driver = FakeDriver(elements={"#email": email, "#name": name})
+        browsing.browsers["browser_dom"] = driver
+        try:
+            result = browsing.fill_multiple_fields("browser_dom", [
+                {"selector": "#email", "value": "a@example.com"},
+                {"selector": "#name", "value": "Ada"},
+                {"selector": "#skip"},
+            ])
+        finally:
+            browsing.browsers.pop("browser_dom", None)
+        self.assertEqual(driver.scripts, 1)
+        self.assertEqual((email.keys, name.keys), (["a@example.com"], ["Ada"]))
+        self.assertIn("Skipped invalid field", result)
+
+
+if __name__ == "__main__":
+    unittest.main()
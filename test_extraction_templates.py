@@ -0,0 +1,109 @@
+import unittest
+from unittest import mock
+
+import extraction_templates
+from extraction_templates import (TemplateError, compile_template, extract_structured, get_template,
+                                  register_template, templates_for_url)
+from page_extract import extract_page
+
+LISTING = """<html><body><ul>
+<li class="s-item"><div class="s-item__title"><span>Shop on eBay</span></div></li>
+<li class="s-item"><div class="s-item__title"><span>Blue kettle</span></div>
+  <span class="s-item__price">$24.99</span><a class="s-item__link" href="/itm/1">view</a></li>
+<li class="s-item"><div class="s-item__title"><span>Red kettle</span></div>
+  <span class="s-item__price">$1,030.00</span><a class="s-item__link" href="https://www.ebay.com/itm/2">view</a></li>
+<li class="s-item"><span class="s-item__price">$5.00</span></li>
+</ul></body></html>"""
+
+PRODUCT = """<html><body><h1 class="name"> Kettle  Pro </h1>
+<span class="price">Now only US $1,299.50!</span><span class="stock">yes</span>
+<time datetime="2024-03-05">5 March</time><img src="/a.jpg"><img src="//cdn.example.com/b.jpg">
+</body></html>"""
+
+PRODUCT_TEMPLATE = {
+    "name": "shop_product",
+    "domains": ["shop.example"],
+    "fields": {
+        "name": "h1.name",
+        "price": {"css": ".price", "type": "number", "pattern": r"\$([\d.,]+)"},
+        "in_stock": {"css": ".stock", "type": "boolean"},
+        "released": {"xpath": "//time/@datetime", "type": "date"},
+        "images": {"css": "img", "attr": "src", "type": "url", "many": True},
+        "rating": {"css": ".rating", "type": "number", "default": 0},
+    },
+}
+
+
+@unittest.skipUnless(extraction_templates.CSSSELECT_AVAILABLE, "cssselect not installed")
+class TestExtractionTemplates(unittest.TestCase):
+    def setUp(self):
+        extraction_templates._results.clear()
+        registry = extraction_templates._registry.copy()
+        self.addCleanup(self.restore_registry, registry)
+
+    def restore_registry(self, registry):
+        with extraction_templates._registry_lock:
+            extraction_templates._registry.clear()
+            extraction_templates._registry.update(registry)
+            extraction_templates._domain_templates.clear()
+
+    def test_builtin_listing_template(self):
+        records = extract_structured(LISTING, "https://www.ebay.com/sch/i.html?_nkw=kettle")
+        self.assertEqual(records["ebay_search"], [
+            {"title": "Blue kettle", "price": "$24.99", "link": "https://www.ebay.com/itm/1"},
+            {"title": "Red kettle", "price": "$1,030.00", "link": "https://www.ebay.com/itm/2"},
+        ])
+        self.assertEqual([t.name for t in templates_for_url("https://ebay.com/x")], ["ebay_search"])
+        self.assertEqual(templates_for_url("https://notebay.com/"), [])
+
+    def test_types_and_coercion(self):
+        record = extract_structured(PRODUCT, "https://shop.example/p/1", [compile_template(PRODUCT_TEMPLATE)])["shop_product"][0]
+        self.assertEqual(record, {
+            "name": "Kettle Pro", "price": 1299.5, "in_stock": True, "released": "2024-03-05",
+            "images": ["https://shop.example/a.jpg", "https://cdn.example.com/b.jpg"], "rating": 0,
+        })
+
+    def test_compiled_once_and_results_cached(self):
+        self.assertIs(compile_template(dict(PRODUCT_TEMPLATE)), compile_template(dict(PRODUCT_TEMPLATE)))
+        template = compile_template(PRODUCT_TEMPLATE)
+        with mock.patch.object(extraction_templates, "parse_html", wraps=extraction_templates.parse_html) as parse:
+            first = extract_structured(PRODUCT, "https://shop.example/p/1", [template])
+            first["shop_product"][0]["name"] = "changed by caller"
+            second = extract_structured(PRODUCT, "https://shop.example/p/1", [template])
+            extract_structured(PRODUCT.replace("Pro", "Max"), "https://shop.example/p/1", [template])
+        self.assertEqual(parse.call_count, 2)
+        self.assertEqual(second["shop_product"][0]["name"], "Kettle Pro")
+        self.assertIn("shop.example", extraction_templates._results)
+
+    def test_caches_are_bounded(self):
+        template = compile_template(PRODUCT_TEMPLATE)
+        with mock.patch.multiple(extraction_templates.settings, create=True, EXTRACTION_COMPILED_TEMPLATES=2,
+                                 EXTRACTION_CACHE_DOMAINS=2):
+            for n in range(3):
+                compile_template({**PRODUCT_TEMPLATE, "name": f"one_off_{n}"})
+                templates_for_url(f"https://shop{n}.example/")
+                extract_structured(PRODUCT, f"https://shop{n}.example/p/1", [template])
+            self.assertEqual(len(extraction_templates._compiled), 2)
+            self.assertEqual(list(extraction_templates._domain_templates), ["shop1.example", "shop2.example"])
+            self.assertEqual(list(extraction_templates._results), ["shop1.example", "shop2.example"])
+
+    def test_registration_and_errors(self):
+        register_template({**PRODUCT_TEMPLATE, "name": "registered_product"})
+        self.assertIsNotNone(get_template("registered_product"))
+        self.assertIn("registered_product", [t.name for t in templates_for_url("https://shop.example/p/2")])
+        for spec in ({"fields": {}}, {"fields": {"a": {"css": "p", "type": "money"}}},
+                     {"fields": {"a": {"xpath": "//p["}}}, {"fields": {"a": {"css": "p:::x"}}},
+                     {"fields": [{"css": "p"}]}):
+            with self.assertRaises(TemplateError):
+                compile_template(spec)
+
+    def test_extract_page_applies_templates_on_its_tree(self):
+        template = compile_template({"name": "inline", "fields": [{"name": "price", "css": ".price", "type": "number",
+                                                                    "pattern": r"[\d,]+\.\d+"}]})
+        data, _ = extract_page(PRODUCT, "https://shop.example/p/1", "text", templates=[template])
+        self.assertEqual(data["extracted"], {"inline": [{"price": 1299.5}]})
+        self.assertNotIn("extracted", extract_page(PRODUCT, "https://shop.example/p/1", "text")[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
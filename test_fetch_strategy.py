@@ -0,0 +1,88 @@
+import unittest
+from unittest import mock
+
+import httpx
+
+import fetch_strategy
+from fetch_strategy import BROWSER, HTTP, FetchDecisions, FetchError, fetch_page, js_required_reason
+
+ARTICLE = "<html><head><title>News</title><script>analytics()</script></head><body><p>%s</p></body></html>" % (
+    "Plenty of server rendered words here. " * 5)
+PAGES = {
+    "/article": (200, ARTICLE),
+    "/app": (200, '<html><body><div id="root"></div><script src="/main.js"></script></body></html>'),
+    "/blocked": (403, "Access denied"),
+    "/gone": (404, "Not found"),
+}
+
+
+class TestFetchStrategy(unittest.TestCase):
+    def setUp(self):
+        self.settings = mock.patch.multiple(fetch_strategy.settings, create=True, FETCH_JS_MIN_WORDS=10,
+                                            FETCH_DECISION_TTL=3600)
+        self.settings.start()
+        self.requested, self.rendered = [], []
+        self.decisions = FetchDecisions()
+
+        def handler(request):
+            self.requested.append(request.url.path)
+            status, body = PAGES[request.url.path]
+            return httpx.Response(status, text=body, headers={"content-type": "text/html"})
+        self.client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    def tearDown(self):
+        self.client.close()
+        self.settings.stop()
+
+    def render(self, url):
+        self.rendered.append(url)
+        return "<html><body><p>Rendered by the browser</p></body></html>", {"settled": True}
+
+    def fetch(self, path, render=None):
+        return fetch_page("https://site.example" + path, client=self.client, render=render or self.render,
+                          decisions=self.decisions)
+
+    def test_js_required_heuristics(self):
+        self.assertIsNone(js_required_reason(ARTICLE))
+        self.assertEqual(js_required_reason("<html><body>  </body></html>"), "empty body")
+        self.assertEqual(js_required_reason(PAGES["/app"][1]), "empty SPA root")
+        self.assertEqual(js_required_reason("<body><noscript>Please enable JavaScript to continue.</noscript>"
+                                            "<p>%s</p></body>" % ("word " * 20)), "noscript JavaScript notice")
+        self.assertEqual(js_required_reason("<body><p>Loading</p><script>boot()</script></body>"), "script-only page")
+        self.assertIsNone(js_required_reason("<body><noscript><img src='/pixel'></noscript><p>%s</p></body>" % ("word " * 20)))
+
+    def test_static_pages_never_touch_the_browser(self):
+        result = self.fetch("/article")
+        self.assertEqual((result.method, result.reason, result.status_code), (HTTP, "static HTML", 200))
+        self.assertEqual(result.html, ARTICLE)
+        self.assertEqual(self.rendered, [])
+        self.assertEqual(self.decisions.get("https://site.example/other"), HTTP)
+
+    def test_js_pages_escalate_and_pin_the_host(self):
+        result = self.fetch("/app")
+        self.assertEqual((result.method, result.reason), (BROWSER, "empty SPA root"))
+        self.assertEqual(result.settle, {"settled": True})
+        result = self.fetch("/article")
+        self.assertEqual(result.method, BROWSER)
+        self.assertEqual(self.requested, ["/app"])
+        self.assertEqual(len(self.rendered), 2)
+
+    def test_blocked_and_failed_responses(self):
+        with self.assertRaises(FetchError):
+            self.fetch("/gone")
+        self.assertEqual(self.fetch("/blocked").reason, "HTTP 403")
+        self.assertEqual(self.rendered, ["https://site.example/blocked"])
+
+    def test_served_html_is_used_when_the_browser_fails(self):
+        def broken(url):
+            raise RuntimeError("chrome not installed")
+        result = self.fetch("/app", render=broken)
+        self.assertEqual(result.method, HTTP)
+        self.assertIn("browser failed", result.reason)
+        self.assertIsNone(self.decisions.get("https://site.example/app"))
+        with self.assertRaises(FetchError):
+            self.fetch("/blocked", render=broken)
+
+
+if __name__ == "__main__":
+    unittest.main()
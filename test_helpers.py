@@ -0,0 +1,16 @@
+"""Shared fixtures for the unittest modules."""
+
+import os
+import tempfile
+
+from task_data_manager import TaskDataManager
+
+
+def temp_task_manager(test_case) -> TaskDataManager:
+    """TaskDataManager whose database and saved task files live in a temporary directory.
+
+    The directory is removed when ``test_case`` finishes.
+    """
+    tmp = tempfile.TemporaryDirectory()
+    test_case.addCleanup(tmp.cleanup)
+    return TaskDataManager(os.path.join(tmp.name, "tasks.db"), data_dir=os.path.join(tmp.name, "saved_task_data"))
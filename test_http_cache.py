@@ -0,0 +1,153 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from email.utils import formatdate
+from http.cookiejar import DefaultCookiePolicy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import httpx
+import requests
+
+import core.http_cache as http_cache_module
+from core.http_cache import CacheEntry, CachingAdapter, CachingTransport, HttpCache, parse_cache_control
+
+
+class Handler(BaseHTTPRequestHandler):
+    hits = {}
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, status, headers, body=b""):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        Handler.hits[path] = Handler.hits.get(path, 0) + 1
+        count = str(Handler.hits[path]).encode()
+        if path == "/fresh":
+            self._respond(200, {"Cache-Control": "max-age=60", "Set-Cookie": "sid=1"}, b"fresh " + count)
+        elif path == "/etag":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self._respond(304, {"ETag": '"v1"'})
+            else:
+                self._respond(200, {"Cache-Control": "no-cache", "ETag": '"v1"'}, b"etag " + count)
+        elif path == "/private":
+            self._respond(200, {"Cache-Control": "no-store"}, b"private " + count)
+        elif path == "/account":
+            self._respond(200, {"Cache-Control": "private, max-age=60"}, b"account " + count)
+        else:
+            self._respond(200, {"Cache-Control": "no-cache, max-age=0"}, b"search " + count)
+
+    def do_POST(self):
+        self._respond(201, {})
+
+
+class TestHttpCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        Handler.hits = {}
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings = mock.patch.multiple(http_cache_module.settings, create=True, HTTP_CACHE_ENABLED=True,
+                                            HTTP_CACHE_DOMAIN_TTLS="", HTTP_CACHE_HEURISTIC_MAX=86400)
+        self.settings.start()
+        self.cache = HttpCache(os.path.join(self.tmp.name, "cache.db"), max_bytes=1024 * 1024)
+        self.session = requests.Session()
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))  # as http_session() does
+        self.session.mount("http://", CachingAdapter(self.cache))
+
+    def tearDown(self):
+        self.session.close()
+        self.settings.stop()
+        self.tmp.cleanup()
+
+    def get(self, path, headers=None):
+        response = self.session.get(self.base + path, headers=headers, timeout=5)
+        return response.text, response.from_cache
+
+    def test_fresh_responses_are_served_without_a_request(self):
+        self.assertEqual(self.get("/fresh"), ("fresh 1", False))
+        self.assertEqual(self.get("/fresh"), ("fresh 1", True))
+        self.assertEqual(Handler.hits["/fresh"], 1)
+        self.assertNotIn("set-cookie", self.session.get(self.base + "/fresh").headers)
+        stats = self.cache.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["stored"], stats["entries"]), (2, 1, 1, 1))
+
+    def test_stale_responses_are_revalidated(self):
+        self.assertEqual(self.get("/etag"), ("etag 1", False))
+        self.assertEqual(self.get("/etag"), ("etag 1", True))
+        self.assertEqual(Handler.hits["/etag"], 2)
+        self.assertEqual(self.cache.get_stats()["revalidated"], 1)
+
+    def test_no_store_and_forced_domain_ttls(self):
+        self.get("/private")
+        self.assertEqual(self.get("/private"), ("private 2", False))
+        self.get("/search?q=x")
+        self.assertEqual(self.get("/search?q=x"), ("search 2", False))
+        with mock.patch.object(http_cache_module.settings, "HTTP_CACHE_DOMAIN_TTLS", "127.0.0.1=60"):
+            self.get("/search?q=y")
+            self.assertEqual(self.get("/search?q=y"), ("search 3", True))
+
+    def test_credentialed_and_private_responses_are_never_shared(self):
+        with mock.patch.object(http_cache_module.settings, "HTTP_CACHE_DOMAIN_TTLS", "127.0.0.1=60"):
+            for headers in ({"Authorization": "Bearer a"}, {"Cookie": "sid=a"}, {"X-API-Key": "a"}):
+                self.get("/fresh?user=a", headers)
+                self.assertEqual(self.get("/fresh?user=a")[1], False)
+                Handler.hits.clear()
+                self.cache.clear()
+            self.get("/fresh?user=b")
+            self.assertEqual(self.get("/fresh?user=b", {"X-Auth-Token": "b"})[1], False)
+            self.get("/account")
+            self.assertEqual(self.get("/account"), ("account 2", False))
+        self.assertEqual(self.cache.get_stats()["entries"], 1)
+
+    def test_unsafe_requests_invalidate(self):
+        self.get("/fresh")
+        self.session.post(self.base + "/fresh", json={"a": 1}, timeout=5)
+        self.assertEqual(self.get("/fresh"), ("fresh 2", False))
+        self.assertEqual(self.cache.get_stats()["invalidated"], 1)
+
+    def test_httpx_transport_shares_the_cache(self):
+        self.get("/fresh")
+        with httpx.Client(transport=CachingTransport(cache=self.cache)) as client:
+            response = client.get(self.base + "/fresh")
+            self.assertEqual((response.text, response.extensions["from_cache"]), ("fresh 1", True))
+            self.assertEqual(client.get(self.base + "/etag").text, "etag 1")
+            self.assertEqual(client.get(self.base + "/etag").text, "etag 1")
+        self.assertEqual(Handler.hits, {"/fresh": 1, "/etag": 2})
+
+    def test_freshness_rules(self):
+        now = time.time()
+        entry = lambda **headers: CacheEntry("https://example.com/", 200, "OK", headers, b"", now, now)
+        self.assertEqual(parse_cache_control('max-age=5, no-cache, private="x"'),
+                         {"max-age": "5", "no-cache": None, "private": "x"})
+        self.assertEqual(entry(**{"cache-control": "max-age=30"}).freshness_lifetime(), 30)
+        expires = entry(date=formatdate(now, usegmt=True), expires=formatdate(now + 120, usegmt=True))
+        self.assertAlmostEqual(expires.freshness_lifetime(), 120, delta=1)
+        heuristic = entry(date=formatdate(now, usegmt=True), **{"last-modified": formatdate(now - 1000, usegmt=True)})
+        self.assertAlmostEqual(heuristic.freshness_lifetime(), 100, delta=1)
+        self.assertFalse(entry(**{"cache-control": "max-age=30", "age": "40"}).is_fresh())
+        self.assertEqual(entry(etag='"a"', **{"last-modified": "x"}).validators(),
+                         {"If-None-Match": '"a"', "If-Modified-Since": "x"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from agent_worker import AgentWorker
+from core.job_queue import JobQueue, LeaseLostError
+
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.queue = JobQueue(db_path=os.path.join(self.tmpdir.name, "jobs.db"), max_attempts=2)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_enqueue_is_idempotent_for_active_runs(self):
+        first = self.queue.enqueue("run-1", 1, {"user_input": "goal"})
+        second = self.queue.enqueue("run-1", 1, {"user_input": "goal"})
+        self.assertEqual(first["id"], second["id"])
+        self.assertEqual(first["payload"], {"user_input": "goal"})
+
+    def test_lease_complete(self):
+        job = self.queue.enqueue("run-1", 1)
+        leased = self.queue.lease("w1", lease_seconds=30)
+        self.assertEqual(leased["id"], job["id"])
+        self.assertEqual(leased["attempts"], 1)
+        self.assertIsNone(self.queue.lease("w2", lease_seconds=30))
+        self.assertTrue(self.queue.heartbeat(job["id"], "w1", 30, {"step": 3}))
+        self.assertFalse(self.queue.heartbeat(job["id"], "w2", 30))
+        self.assertTrue(self.queue.complete(job["id"], "w1", status="success", result={"ok": True}))
+        finished = self.queue.get_job("run-1")
+        self.assertEqual(finished["status"], "success")
+        self.assertEqual(finished["result"], {"ok": True})
+        # A finished run can be queued again (e.g. to resume after requires_input)
+        self.assertNotEqual(self.queue.enqueue("run-1", 1)["id"], job["id"])
+
+    def test_expired_lease_is_reclaimed_until_max_attempts(self):
+        job = self.queue.enqueue("run-1", 1)
+        self.queue.lease("w1", lease_seconds=0.01)
+        time.sleep(0.02)
+        reclaimed = self.queue.lease("w2", lease_seconds=0.01)
+        self.assertEqual(reclaimed["id"], job["id"])
+        self.assertEqual(reclaimed["attempts"], 2)
+        self.assertFalse(self.queue.heartbeat(job["id"], "w1"))
+        time.sleep(0.02)
+        self.assertIsNone(self.queue.lease("w3"))
+        self.assertEqual(self.queue.get_job("run-1")["status"], "failed")
+
+    def test_fail_requeues_then_fails(self):
+        job = self.queue.enqueue("run-1", 1)
+        self.queue.lease("w1")
+        self.assertEqual(self.queue.fail(job["id"], "w1", "boom"), "queued")
+        self.queue.lease("w1")
+        self.assertEqual(self.queue.fail(job["id"], "w1", "boom"), "failed")
+        self.assertEqual(self.queue.get_job("run-1")["last_error"], "boom")
+
+    def test_events_are_read_in_order(self):
+        self.queue.publish_event("run-1", 1, {"log": "a"})
+        start = self.queue.latest_event_id()
+        self.queue.publish_event("run-1", 1, {"log": "b"})
+        self.queue.publish_event("run-1", 1, {"log": "c"})
+        events = self.queue.read_events(start)
+        self.assertEqual([e["payload"]["log"] for e in events], ["b", "c"])
+        self.assertEqual(self.queue.prune_events(-1), 3)
+
+
+
+class TestAgentWorkerLease(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.queue = JobQueue(db_path=os.path.join(self.tmpdir.name, "jobs.db"), max_attempts=2)
+        self.worker = AgentWorker(self.queue, worker_id="w1")
+        self.worker.lease_seconds = 0.3
+        self.queue.enqueue("run-1", 1, {"user_input": "goal"})
+        self.job = self.queue.lease("w1", self.worker.lease_seconds)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_lease_is_renewed_while_the_run_is_silent(self):
+        async def silent_run():
+            await asyncio.sleep(0.5)
+            return "done"
+
+        result = asyncio.run(self.worker.run_with_lease(self.job, {"messages": 0}, silent_run()))
+        self.assertEqual(result, "done")
+        self.assertIsNone(self.queue.lease("w2", 30))
+
+    def test_lease_renewal_runs_off_the_event_loop(self):
+        heartbeat = self.queue.heartbeat
+        threads = []
+
+        def recording_heartbeat(*args):
+            threads.append(threading.get_ident())
+            return heartbeat(*args)
+
+        async def silent_run():
+            await asyncio.sleep(0.25)
+            return threading.get_ident()
+
+        self.queue.heartbeat = recording_heartbeat
+        loop_thread = asyncio.run(self.worker.run_with_lease(self.job, {"messages": 0}, silent_run()))
+        self.assertTrue(threads)
+        self.assertNotIn(loop_thread, threads)
+
+    def test_run_is_cancelled_when_the_lease_is_lost(self):
+        cancelled = []
+
+        async def long_run():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        self.queue.heartbeat(self.job["id"], "w1", -1)
+        self.assertIsNotNone(self.queue.lease("w2", 30))
+        with self.assertRaises(LeaseLostError):
+            asyncio.run(self.worker.run_with_lease(self.job, {"messages": 0}, long_run()))
+        self.assertEqual(cancelled, [True])
+
+
+if __name__ == '__main__':
+    unittest.main()
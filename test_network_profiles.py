@@ -0,0 +1,81 @@
+import json
+import unittest
+
+from network_profiles import (
+    ESTIMATED_BYTES_BY_TYPE,
+    NetworkStatsRecorder,
+    apply_profile,
+    drain_performance_log,
+    get_profile,
+    page_stats_from_events,
+)
+
+
+class FakeDriver:
+    def __init__(self, events=None):
+        self.commands = []
+        self.events = events or []
+
+    def execute_cdp_cmd(self, method, params):
+        self.commands.append((method, params))
+        return {}
+
+    def get_log(self, log_type):
+        entries = [{"message": json.dumps({"message": e, "webview": e.pop("webview", None)})} for e in self.events]
+        self.events = []
+        return entries
+
+
+class TestNetworkProfiles(unittest.TestCase):
+    def test_profiles_block_progressively_less(self):
+        fast = get_profile("scrape-fast").blocked_url_patterns()
+        interactive = get_profile("interactive").blocked_url_patterns()
+        self.assertIn("*.css", fast)
+        self.assertNotIn("*.css", interactive)
+        self.assertIn("*.woff2", interactive)
+        self.assertIn("*doubleclick.net*", interactive)
+        self.assertEqual(get_profile("full").blocked_url_patterns(), [])
+
+    def test_unknown_profile_raises(self):
+        with self.assertRaises(ValueError):
+            get_profile("turbo")
+
+    def test_apply_profile_sets_blocked_urls(self):
+        driver = FakeDriver()
+        apply_profile(driver, get_profile("scrape-fast"))
+        self.assertEqual(driver.commands[0][0], "Network.enable")
+        method, params = driver.commands[1]
+        self.assertEqual(method, "Network.setBlockedURLs")
+        self.assertIn("*.png", params["urls"])
+
+    def test_page_stats_count_blocked_requests_and_bytes(self):
+        driver = FakeDriver([
+            {"method": "Network.requestWillBeSent", "params": {"type": "Document"}},
+            {"method": "Network.loadingFinished", "params": {"encodedDataLength": 1200}},
+            {"method": "Network.loadingFailed", "params": {"type": "Image", "blockedReason": "inspector"}},
+            {"method": "Network.loadingFailed", "params": {"type": "Font", "errorText": "net::ERR_BLOCKED_BY_CLIENT"}},
+            {"method": "Network.loadingFailed", "params": {"type": "Script", "errorText": "net::ERR_TIMED_OUT"}},
+        ])
+        stats = page_stats_from_events(get_profile("scrape-fast"), drain_performance_log(driver))
+        self.assertEqual(stats.requests, 1)
+        self.assertEqual(stats.bytes_received, 1200)
+        self.assertEqual(stats.blocked, {"Image": 1, "Font": 1})
+        self.assertEqual(stats.estimated_bytes_saved, ESTIMATED_BYTES_BY_TYPE["Image"] + ESTIMATED_BYTES_BY_TYPE["Font"])
+
+    def test_recorder_totals_per_profile(self):
+        recorder = NetworkStatsRecorder(max_pages=1)
+        profile = get_profile("interactive")
+        stats = page_stats_from_events(profile, [
+            {"method": "Network.loadingFailed", "params": {"type": "Media", "blockedReason": "inspector"}},
+        ])
+        recorder.record("browser_1", "https://a.example", stats)
+        recorder.record("browser_2", "https://b.example", stats)
+        self.assertIsNone(recorder.get_page("browser_1"))
+        self.assertEqual(recorder.get_page("browser_2")["blocked_requests"], 1)
+        totals = recorder.get_stats()["totals"]["interactive"]
+        self.assertEqual(totals["pages"], 2)
+        self.assertEqual(totals["estimated_bytes_saved"], 2 * ESTIMATED_BYTES_BY_TYPE["Media"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from unittest import mock
+
+import browsing
+import page_content
+from page_content import format_page_content, resolve_max_chars, resolve_mode
+
+
+class FakeDriver:
+    page_source = "<html><body>fallback</body></html>"
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    def execute_script(self, script, *args):
+        self.calls.append(args)
+        if self.fail:
+            raise RuntimeError("javascript error")
+        mode, max_chars = args
+        text = "Welcome " * 10
+        content = text[:max_chars] if max_chars else text
+        return {"mode": mode, "url": "https://example.com/", "title": "Example", "content": content,
+                "total_chars": len(text), "truncated": len(content) < len(text)}
+
+
+class TestPageContent(unittest.TestCase):
+    def setUp(self):
+        self.settings = mock.patch.multiple(page_content.settings, create=True,
+                                            AGENT_PAGE_CONTENT_MODE="text", PAGE_CONTENT_MAX_CHARS=1000)
+        self.settings.start()
+
+    def tearDown(self):
+        self.settings.stop()
+        for browser_id in ("browser_pc",):
+            browsing.browsers.pop(browser_id, None)
+
+    def test_modes_and_caps(self):
+        self.assertEqual(resolve_mode(None), "text")
+        self.assertEqual(resolve_mode("Outline"), "outline")
+        with self.assertRaises(ValueError):
+            resolve_mode("markdown")
+        self.assertEqual(resolve_max_chars("text", None), 1000)
+        self.assertEqual(resolve_max_chars("html", None), 0)
+        self.assertEqual(resolve_max_chars("html", 500), 500)
+
+    def test_compact_content_is_capped_in_the_page(self):
+        driver = FakeDriver()
+        browsing.browsers["browser_pc"] = driver
+        result = browsing.get_page_content("browser_pc", mode="text", max_chars=16)
+        self.assertEqual(driver.calls, [("text", 16)])
+        self.assertEqual(result.splitlines()[0], "[text] Example <https://example.com/>")
+        self.assertIn("Welcome Welcome ", result)
+        self.assertIn("[truncated: showing 16 of 80 characters]", result)
+
+    def test_html_mode_is_unchanged_and_falls_back_to_page_source(self):
+        self.assertEqual(format_page_content({"mode": "html", "content": "<html></html>"}), "<html></html>")
+        browsing.browsers["browser_pc"] = FakeDriver(fail=True)
+        self.assertEqual(browsing.get_page_content("browser_pc"), FakeDriver.page_source)
+        with self.assertRaises(Exception):
+            browsing.get_page_content("browser_pc", mode="links")
+
+
+if __name__ == "__main__":
+    unittest.main()
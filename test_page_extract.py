@@ -0,0 +1,53 @@
+import unittest
+
+from page_extract import extract_page, extract_page_bs4
+
+PAGE = """<!DOCTYPE html><html><head><title>Shop &amp; more</title>
+<meta name="description" content="A shop"><meta property="og:title" content="Shop">
+<script type="application/ld+json">{"@type": "Product", "name": "Lamp"}</script><style>p { color: red }</style></head>
+<body><h2 id="offers">Offers</h2><h1>Welcome <b>home</b></h1><!-- banner -->
+<p>Buy a <a href="/lamp" title="Lamp">lamp</a> today</p><p>  </p>
+<ul><li>one</li><li>two <i>more</i></li></ul>
+<img src="lamp.png" alt="Lamp"><img alt="no source">
+<table><tr><th>Item</th><th>Price</th></tr><tr><td>Lamp</td><td>$10</td></tr><tr></tr></table>
+<form action="/search" method="post"><input name="q" required><select name="sort"></select><textarea id="note"></textarea></form>
+<a name="top">anchor</a><script>track();</script> footer text</body></html>"""
+
+
+class TestPageExtract(unittest.TestCase):
+    def test_matches_bs4_baseline(self):
+        data, stats = extract_page(PAGE, "https://shop.example/catalog/")
+        baseline, baseline_stats = extract_page_bs4(PAGE, "https://shop.example/catalog/")
+        for key in ("text_content", "links", "images", "forms"):
+            self.assertEqual(data[key], baseline[key], key)
+        # Tables add typed columns and a caption on top of the baseline fields
+        self.assertEqual([{k: table[k] for k in baseline["tables"][0]} for table in data["tables"]], baseline["tables"])
+        for key in baseline_stats:
+            if key != "word_count":
+                self.assertEqual(stats[key], baseline_stats[key], key)
+
+    def test_categories_and_statistics(self):
+        data, stats = extract_page(PAGE, "https://shop.example/catalog/")
+        self.assertEqual(data["links"][0]["url"], "https://shop.example/lamp")
+        self.assertEqual([(h["level"], h["id"]) for h in data["text_content"]["headings"]], [(1, ""), (2, "offers")])
+        self.assertEqual(data["tables"][0]["data"], [["Lamp", "$10"]])
+        self.assertTrue(data["forms"][0]["inputs"][0]["required"])
+        self.assertNotIn("track", data["text_content"]["full_text"])
+        self.assertEqual(stats["total_links"], 2)
+        self.assertEqual(stats["word_count"], len(data["text_content"]["full_text"].split()))
+
+    def test_json_ld_survives_all_mode(self):
+        data, _ = extract_page(PAGE, "https://shop.example/")
+        self.assertEqual(data["structured_data"][0], {"type": "json-ld", "data": {"@type": "Product", "name": "Lamp"}})
+        self.assertEqual(data["structured_data"][1]["data"], {"description": "A shop", "og:title": "Shop"})
+
+    def test_single_category_and_empty_page(self):
+        data, _ = extract_page(PAGE, "https://shop.example/", "links")
+        self.assertEqual(list(data), ["links"])
+        data, stats = extract_page("", "https://shop.example/")
+        self.assertEqual(data["links"], [])
+        self.assertEqual(stats["total_links"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
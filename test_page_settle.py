@@ -0,0 +1,82 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import page_settle
+from page_settle import SELENIUM_SETTLE_JS, SettleStats, scroll_and_settle, wait_for_settle
+
+
+class FakeDriver:
+    def __init__(self, heights, settle_result=None, fail=False):
+        self.heights = list(heights)
+        self.settle_result = settle_result or {"settled": True, "timed_out": False, "elapsed_ms": 120, "mutations": 4, "requests": 1}
+        self.fail = fail
+        self.async_calls = []
+        self.scrolls = 0
+
+    def execute_async_script(self, script, *args):
+        self.async_calls.append(args)
+        if self.fail:
+            raise Exception("javascript error: document unloaded while waiting for result\n(Session info: chrome)")
+        return self.settle_result
+
+    def execute_script(self, script):
+        # Scrolling reports the current height; content loaded meanwhile shows up in the next check
+        if script.startswith("window.scrollTo"):
+            self.scrolls += 1
+        elif len(self.heights) > 1:
+            self.heights.pop(0)
+        return self.heights[0]
+
+
+class TestPageSettle(unittest.TestCase):
+    def test_wait_for_settle_passes_quiet_window_and_timeout(self):
+        driver = FakeDriver([1000])
+        result = wait_for_settle(driver, quiet_ms=250, timeout=2, label="test")
+        self.assertTrue(result.settled)
+        self.assertEqual(result.elapsed_ms, 120)
+        self.assertEqual(driver.async_calls, [(250, 2000)])
+        self.assertIn("MutationObserver", SELENIUM_SETTLE_JS)
+
+    def test_navigation_during_wait_is_reported_not_raised(self):
+        result = wait_for_settle(FakeDriver([1000], fail=True), quiet_ms=100, timeout=1, label="test")
+        self.assertFalse(result.settled)
+        self.assertTrue(result.error.startswith("javascript error"))
+
+    def test_scroll_stops_when_page_stops_growing(self):
+        driver = FakeDriver([1000, 2000, 2000])
+        report = scroll_and_settle(driver, max_scrolls=5, quiet_ms=100, timeout=1)
+        self.assertEqual(report["scrolls"], 2)
+        self.assertEqual(report["settle_ms"], 3 * 120)
+        self.assertFalse(report["timed_out"])
+
+    def test_scroll_settles_share_one_deadline(self):
+        now = [0.0]
+        driver = FakeDriver([1000, 2000, 3000, 4000, 5000], settle_result={"settled": False, "timed_out": True})
+        original = driver.execute_async_script
+
+        def never_quiet(script, quiet_ms, timeout_ms):
+            now[0] += timeout_ms / 1000  # the page never goes quiet: every settle runs to its timeout
+            return original(script, quiet_ms, timeout_ms)
+
+        driver.execute_async_script = never_quiet
+        with mock.patch.object(page_settle, "time", SimpleNamespace(monotonic=lambda: now[0])):
+            report = scroll_and_settle(driver, max_scrolls=3, quiet_ms=100, timeout=10, total_timeout=8)
+        self.assertEqual([timeout for _, timeout in driver.async_calls], [2000, 2000, 2000, 2000])
+        self.assertEqual((report["scrolls"], report["timed_out"]), (3, True))
+        self.assertLessEqual(now[0], 8)
+
+    def test_stats_aggregate_per_label(self):
+        from page_settle import SettleResult
+        stats = SettleStats()
+        stats.record("scrape", SettleResult(settled=True, timed_out=False, elapsed_ms=100))
+        stats.record("scrape", SettleResult(settled=False, timed_out=True, elapsed_ms=300))
+        entry = stats.get_stats()["scrape"]
+        self.assertEqual(entry["calls"], 2)
+        self.assertEqual(entry["avg_ms"], 200.0)
+        self.assertEqual(entry["max_ms"], 300)
+        self.assertEqual(entry["timeouts"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
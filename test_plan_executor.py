@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from plan_executor import PlanDAGExecutor, build_step_graph
+
+
+class TestBuildStepGraph(unittest.TestCase):
+    def test_independent_steps_have_no_dependencies(self):
+        plan = [
+            {"step": 1, "action": "search_web", "params": {"query": "a"}},
+            {"step": 2, "action": "search_web", "params": {"query": "b"}},
+        ]
+        steps = build_step_graph(plan)
+        self.assertEqual(steps[0].depends_on, set())
+        self.assertEqual(steps[1].depends_on, set())
+
+    def test_shared_browser_id_orders_steps(self):
+        plan = [
+            {"step": 1, "action": "open_browser", "params": {"url": "https://example.com"}},
+            {"step": 2, "action": "fill_form", "params": {"browser_id": "browser_0", "selector": "#q", "value": "x"}},
+            {"step": 3, "action": "search_web", "params": {"query": "c"}},
+            {"step": 4, "action": "click_button", "params": {"browser_id": "browser_0", "selector": "#go"}},
+        ]
+        steps = build_step_graph(plan)
+        self.assertEqual(steps[1].depends_on, {0})
+        self.assertEqual(steps[2].depends_on, set())
+        self.assertEqual(steps[3].depends_on, {0, 1})
+
+    def test_explicit_depends_on_and_barrier(self):
+        plan = [
+            {"step": 1, "action": "search_web", "params": {"query": "a"}},
+            {"step": 2, "action": "search_web", "params": {"query": "b"}, "depends_on": [1]},
+            {"step": 3, "action": "finish_task", "params": {"final_answer": "done"}},
+        ]
+        steps = build_step_graph(plan)
+        self.assertEqual(steps[1].depends_on, {0})
+        self.assertEqual(steps[2].depends_on, {0, 1})
+
+
+class TestPlanDAGExecutor(unittest.TestCase):
+    def test_independent_steps_run_concurrently_and_keep_order(self):
+        plan = [{"step": i + 1, "action": "search_web", "params": {"delay": 0.2 - i * 0.05}} for i in range(4)]
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def run_step(step):
+            with lock:
+                active.append(step.index)
+                peak.append(len(active))
+            time.sleep(step.params["delay"])
+            with lock:
+                active.remove(step.index)
+            return {"step": step.number, "action": step.action, "status": "done", "details": step.index}
+
+        results, timings = PlanDAGExecutor(max_workers=4).execute(plan, run_step)
+        self.assertEqual([r["step"] for r in results], [1, 2, 3, 4])
+        self.assertGreater(max(peak), 1)
+        self.assertIn("duration_ms", results[0]["timing"])
+        self.assertLess(timings["wall_time_ms"], timings["total_step_time_ms"])
+
+    def test_dependent_steps_run_after_dependencies(self):
+        plan = [
+            {"step": 1, "action": "open_browser", "params": {"url": "https://example.com"}},
+            {"step": 2, "action": "get_page_content", "params": {"browser_id": "browser_0"}},
+        ]
+        finished = []
+
+        def run_step(step):
+            if step.index == 0:
+                time.sleep(0.05)
+            finished.append(step.index)
+            return {"step": step.number, "action": step.action, "status": "done", "details": None}
+
+        PlanDAGExecutor(max_workers=4).execute(plan, run_step)
+        self.assertEqual(finished, [0, 1])
+
+    def test_step_exception_is_recorded(self):
+        def run_step(step):
+            raise RuntimeError("boom")
+
+        results, _ = PlanDAGExecutor(max_workers=2).execute([{"action": "search_web", "params": {}}], run_step)
+        self.assertEqual(results[0]["status"], "error")
+        self.assertIn("boom", results[0]["details"])
+
+    def test_dependency_cycle_is_reported(self):
+        plan = [
+            {"step": 1, "action": "search_web", "params": {}, "depends_on": [2]},
+            {"step": 2, "action": "search_web", "params": {}, "depends_on": [1]},
+        ]
+        results, _ = PlanDAGExecutor(max_workers=2).execute(plan, lambda step: {"step": step.number, "status": "done"})
+        self.assertTrue(all(r["status"] == "error" for r in results))
+
+
+class TestPlanDAGExecutorAsync(unittest.TestCase):
+    def test_aexecute_bounds_concurrency_and_keeps_order(self):
+        plan = [{"step": i + 1, "action": "search_web", "params": {}} for i in range(5)]
+        state = {"active": 0, "peak": 0}
+
+        async def run_step(step):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.02 * (5 - step.index))
+            state["active"] -= 1
+            return {"step": step.number, "action": step.action, "status": "done", "details": None}
+
+        results, timings = asyncio.run(PlanDAGExecutor(max_workers=2).aexecute(plan, run_step))
+        self.assertEqual([r["step"] for r in results], [1, 2, 3, 4, 5])
+        self.assertEqual(state["peak"], 2)
+        self.assertEqual(timings["max_parallel_steps"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
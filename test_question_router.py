@@ -0,0 +1,55 @@
+import unittest
+
+from question_router import QuestionRouter
+
+
+class TestQuestionRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = QuestionRouter(rule_confidence=0.85, model_confidence=0.75, use_embeddings=False)
+
+    def assertRoutedLocally(self, question, label):
+        decision = self.router.classify(question, llm_classify=lambda q: self.fail(f"LLM called for {q!r}"))
+        self.assertEqual(decision.label, label)
+        self.assertIn(decision.source, ("rules", "model"))
+
+    def test_confident_cases_skip_the_llm(self):
+        self.assertRoutedLocally("What is the capital of France?", "general")
+        self.assertRoutedLocally("Call mom on Skype", "service")
+        self.assertRoutedLocally("Send email to john@example.com about the invoice", "service")
+        self.assertRoutedLocally("Book a flight to Paris", "task")
+        self.assertRoutedLocally("Search for hotels in London", "task")
+
+    def test_uncertain_input_falls_back_and_is_learned(self):
+        calls = []
+
+        def llm(question):
+            calls.append(question)
+            return "task"
+
+        decision = self.router.classify("bananas", llm_classify=llm)
+        self.assertEqual(calls, ["bananas"])
+        self.assertEqual(decision.source, "llm")
+        self.assertEqual(decision.label, "task")
+        stats = self.router.get_stats()
+        self.assertEqual(stats["learned_examples"], 1)
+        self.assertEqual(stats["fallback_rate"], 1.0)
+
+    def test_llm_without_answer_keeps_local_guess(self):
+        decision = self.router.classify("bananas", llm_classify=lambda q: None)
+        self.assertIn(decision.label, ("general", "service", "task"))
+        self.assertEqual(self.router.get_stats()["learned_examples"], 0)
+
+    def test_service_folds_into_task_when_not_a_label(self):
+        decision = self.router.classify("Call mom on Skype", labels=("general", "task"))
+        self.assertEqual(decision.label, "task")
+
+    def test_stats_report_confidence_per_stage(self):
+        self.router.classify("What is the capital of France?")
+        stats = self.router.get_stats()
+        self.assertEqual(stats["total"], 1)
+        self.assertEqual(stats["fallback_rate"], 0.0)
+        self.assertIsNotNone(stats["mean_confidence"]["rules"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import json
+import unittest
+from unittest import mock
+
+import httpx
+
+import fetch_strategy
+import scrape_stream
+from fetch_strategy import BROWSER, HTTP, FetchDecisions
+from page_extract import extract_page
+from scrape_stream import format_event, iter_scrape_events
+from test_helpers import temp_task_manager
+
+ARTICLE = ("<html><head><title>News</title><meta name='description' content='Daily'></head><body>"
+           "<h1 id='top'>Headline</h1>"
+           + "".join("<p>Paragraph %d has enough server rendered words to count.</p>" % i for i in range(30))
+           + "<ul><li>one</li><li>two</li></ul>"
+           + "".join("<a href='/page/%d'>link %d</a>" % (i, i) for i in range(7))
+           + "<table><tr><th>Name</th><th>Qty</th></tr>"
+           + "".join("<tr><td>item %d</td><td>%d</td></tr>" % (i, i) for i in range(5))
+           + "</table><form action='/search'><input name='q'></form></body></html>")
+APP = '<html><head><title>App</title></head><body><div id="root"></div><script src="/main.js"></script></body></html>'
+PAGES = {
+    "/article": (200, ARTICLE),
+    "/app": (200, APP),
+    "/gone": (404, "Not found"),
+}
+
+
+class TestScrapeStream(unittest.TestCase):
+    def setUp(self):
+        self.settings = mock.patch.multiple(fetch_strategy.settings, create=True, FETCH_JS_MIN_WORDS=10,
+                                            FETCH_DECISION_TTL=3600, SCRAPE_STREAM_CHUNK_ITEMS=4)
+        self.settings.start()
+        self.manager = temp_task_manager(self)
+        self.patch_manager = mock.patch.object(scrape_stream, "task_manager", self.manager)
+        self.patch_manager.start()
+        self.rendered = []
+        self.decisions = FetchDecisions()
+
+        def handler(request):
+            status, body = PAGES[request.url.path]
+            return httpx.Response(status, text=body, headers={"content-type": "text/html"})
+        self.client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    def tearDown(self):
+        self.client.close()
+        self.patch_manager.stop()
+        self.settings.stop()
+
+    def render(self, url):
+        self.rendered.append(url)
+        return "<html><head><title>Rendered</title></head><body><p>Rendered by the browser</p></body></html>", None
+
+    def stream(self, path, render=None, **kwargs):
+        return list(iter_scrape_events("https://site.example" + path, client=self.client,
+                                       render=render or self.render, decisions=self.decisions, **kwargs))
+
+    def test_events_are_chunked_and_persisted(self):
+        events = self.stream("/article")
+        kinds = [event["event"] for event in events]
+        self.assertEqual((kinds[0], kinds[1], kinds[-1]), ("start", "metadata", "done"))
+        self.assertTrue(all(len(event["items"]) <= 4 for event in events if "items" in event))
+        done = events[-1]
+        self.assertEqual((done["fetch"]["method"], done["title"], done["events"]), (HTTP, "News", len(events)))
+        self.assertEqual(self.rendered, [])
+
+        task_id = events[0]["task_id"]
+        self.assertEqual([event["event"] for event in self.manager.iter_scraping_chunks(task_id)], kinds)
+        content = json.loads(self.manager.get_scraped_content(task_id)["full_scraped_content"])
+        expected, statistics = extract_page(ARTICLE, "https://site.example/article")
+        self.assertEqual(content["data"]["text_content"]["paragraphs"], expected["text_content"]["paragraphs"])
+        self.assertEqual(content["data"]["links"], expected["links"])
+        self.assertEqual(content["data"]["tables"][0]["data"], expected["tables"][0]["data"])
+        self.assertEqual(content["statistics"]["word_count"], statistics["word_count"])
+
+    def test_client_rendered_pages_escalate_without_leaking_http_events(self):
+        events = self.stream("/app", store=False)
+        titles = [event["title"] for event in events if event["event"] == "metadata"]
+        self.assertEqual(titles, ["Rendered"])
+        self.assertEqual((events[-1]["fetch"]["method"], events[-1]["fetch"]["reason"]), (BROWSER, "empty SPA root"))
+        self.assertEqual(self.decisions.get("https://site.example/other"), BROWSER)
+
+    def test_http_events_are_the_fallback_when_the_browser_fails(self):
+        def broken(url):
+            raise RuntimeError("chrome not installed")
+        events = self.stream("/app", render=broken, store=False)
+        self.assertEqual([event["title"] for event in events if event["event"] == "metadata"], ["App"])
+        self.assertEqual(events[-1]["fetch"]["method"], HTTP)
+        self.assertIn("browser failed", events[-1]["fetch"]["reason"])
+
+    def test_errors_end_the_stream(self):
+        events = self.stream("/gone")
+        self.assertEqual([event["event"] for event in events], ["start", "error"])
+        self.assertIn("404", events[-1]["error"])
+        self.assertEqual(self.manager.get_task_results(None)[0]["status"], "failed")
+        self.assertEqual(self.rendered, [])
+        with self.assertRaises(ValueError):
+            iter_scrape_events("https://site.example/", scrape_type="everything")
+
+    def test_wire_formats(self):
+        event = {"event": "text", "items": ["é"]}
+        self.assertEqual(format_event(event), '{"event": "text", "items": ["é"]}\n')
+        self.assertEqual(format_event(event, "sse"), 'event: text\ndata: {"event": "text", "items": ["é"]}\n\n')
+
+
+if __name__ == "__main__":
+    unittest.main()
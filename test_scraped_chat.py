@@ -0,0 +1,107 @@
+import json
+import sqlite3
+import unittest
+from unittest import mock
+
+import chunk_index
+import scraped_chat
+from test_helpers import temp_task_manager
+
+TOPICS = ["volcano eruption lava", "penguin colony antarctica", "quantum entanglement photons",
+          "medieval castle architecture", "sourdough bread fermentation", "marathon training plan"]
+
+
+def page_data():
+    paragraphs = [f"Section about {topic}. " + f"{topic} details sentence number {i}. " * 12
+                  for topic in TOPICS for i in range(2)]
+    return {"text_content": {"title": "Mixed topics", "headings": [{"level": 2, "text": "Topics"}],
+                             "paragraphs": paragraphs, "lists": [], "full_text": " ".join(paragraphs)}}
+
+
+def fake_embed(texts):
+    # One dimension per topic, plus synonyms the keyword index does not know
+    synonyms = {"volcano": "magma", "penguin": "seabird", "sourdough": "loaf"}
+    vectors = []
+    for text in texts:
+        text = text.lower()
+        vectors.append([1.0 if topic.split()[0] in text or synonyms.get(topic.split()[0], "-") in text else 0.0
+                        for topic in TOPICS])
+    return vectors
+
+
+class TestScrapedChat(unittest.TestCase):
+    def setUp(self):
+        self.manager = temp_task_manager(self)
+        for name, value in {"CHAT_INDEX_CHUNK_CHARS": 800, "CHAT_CONTEXT_CHARS": 2000, "CHAT_RETRIEVE_CHUNKS": 4}.items():
+            patch = mock.patch.object(chunk_index.settings, name, value, create=True)
+            patch.start()
+            self.addCleanup(patch.stop)
+        patch = mock.patch.object(chunk_index, "local_embedder", return_value=None)
+        patch.start()
+        self.addCleanup(patch.stop)
+        chunk_index._cache.clear()
+
+    def save(self, data=None):
+        task_id = self.manager.save_task_result("web_scraping", {"url": "https://example.com/"})
+        self.manager.save_scraping_result(task_id, {"url": "https://example.com/", "scrape_type": "all",
+                                                    "data": data or page_data(), "statistics": {"word_count": 900}})
+        return task_id
+
+    def test_index_built_on_save_and_searched(self):
+        task_id = self.save()
+        index = chunk_index.load_index(task_id, self.manager)
+        self.assertGreater(index["chunk_count"], 4)
+        self.assertEqual(index["info"]["url"], "https://example.com/")
+        self.assertIsNone(index["embeddings"])
+        results = chunk_index.search(task_id, "How is sourdough fermentation done?", self.manager)
+        self.assertIn("sourdough", results[0]["text"])
+        self.assertEqual(chunk_index.search(task_id, "unrelated zebra", self.manager), [])
+
+    def test_chat_reads_only_relevant_chunks(self):
+        task_id = self.save()
+        prompts = []
+        with mock.patch.object(self.manager, "get_scraped_content", side_effect=AssertionError("blob read")):
+            answer = scraped_chat.answer_question(task_id, "Tell me about the penguin colony", self.manager,
+                                                  complete=lambda messages: prompts.append(messages) or "Penguins.")
+        self.assertEqual(answer["response"], "Penguins.")
+        system = prompts[0][0]["content"]
+        self.assertIn("penguin colony", system)
+        self.assertNotIn("marathon", system)
+        self.assertLessEqual(len(system), 2600)
+        self.assertEqual(answer["context"]["excerpts"], sorted(answer["context"]["excerpts"]))
+
+    def test_crawl_pages_share_one_index(self):
+        task_id = self.save()
+        second = {"text_content": {"title": "Other", "paragraphs": ["Glacier hiking routes and crampon advice. " * 30]}}
+        self.manager.save_scraping_result(task_id, {"url": "https://example.com/glaciers", "scrape_type": "all",
+                                                    "data": second, "statistics": {"word_count": 200}})
+        index = chunk_index.load_index(task_id, self.manager)
+        self.assertEqual((index["info"]["url"], index["info"]["pages"], index["info"]["word_count"]),
+                         ("https://example.com/", 2, 1100))
+        self.assertIn("sourdough", chunk_index.search(task_id, "sourdough fermentation", self.manager)[0]["text"])
+        self.assertIn("crampon", chunk_index.search(task_id, "glacier crampon", self.manager)[0]["text"])
+
+    def test_embeddings_find_synonyms(self):
+        task_id = self.save()
+        chunk_index.index_scraped_page(task_id, page_data(), self.manager, {"url": "https://example.com/"}, embed=fake_embed)
+        results = chunk_index.search(task_id, "Where does magma come from?", self.manager, embed=fake_embed)
+        self.assertIn("volcano", results[0]["text"])
+
+    def test_legacy_scrape_is_indexed_on_first_question(self):
+        task_id = self.save({"text_content": {"title": "Short", "paragraphs": ["Only one short paragraph."]}})
+        conn = sqlite3.connect(self.manager.db_path)
+        for table in ("chunk_index_info", "chunk_texts", "chunk_terms"):
+            conn.execute(f"DELETE FROM {table}")
+        conn.commit()
+        conn.close()
+        chunk_index._cache.clear()
+        prompts = []
+        answer = scraped_chat.answer_question(task_id, "anything?", self.manager,
+                                              complete=lambda messages: prompts.append(messages) or "ok")
+        self.assertIn("Only one short paragraph.", prompts[0][0]["content"])
+        self.assertEqual(answer["context"]["word_count"], 900)
+        self.assertIsNone(scraped_chat.answer_question("missing", "anything?", self.manager, complete=json.dumps))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import os
+import shutil
+import stat
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import browsing
+import session_snapshots
+from browser_sessions import set_browser_owner
+from session_snapshots import capture_snapshot, load_snapshot, restore_cookies, restore_local_storage, save_snapshot
+
+
+class FakeDriver:
+    def __init__(self, url="https://mail.google.com/mail/u/0/", cookies=None, local_storage=None):
+        self.current_url = url
+        self.cookies = cookies or []
+        self.local_storage = dict(local_storage or {})
+        self.set_cookies = []
+        self.visited = []
+
+    def execute_cdp_cmd(self, method, params):
+        if method == "Storage.getCookies":
+            return {"cookies": self.cookies}
+        if method == "Storage.setCookies":
+            self.set_cookies.extend(params["cookies"])
+        return {}
+
+    def execute_script(self, script, *args):
+        if "readyState" in script:
+            return "complete"
+        if "Object.assign" in script:
+            return dict(self.local_storage)
+        added = 0
+        for key, value in args[0].items():
+            if key not in self.local_storage:
+                self.local_storage[key] = value
+                added += 1
+        return added
+
+    def get(self, url):
+        self.visited.append(url)
+        self.current_url = url + "/mail/u/0/"
+
+    def refresh(self):
+        self.visited.append("refresh")
+
+
+GOOGLE_COOKIES = [
+    {"name": "SID", "value": "abc", "domain": ".google.com", "path": "/", "expires": time.time() + 3600,
+     "size": 6, "session": False, "secure": True},
+    {"name": "OSID", "value": "tmp", "domain": "mail.google.com", "path": "/", "expires": -1, "session": True},
+    {"name": "old", "value": "x", "domain": ".google.com", "path": "/", "expires": 1000, "session": False},
+    {"name": "ads", "value": "y", "domain": ".doubleclick.net", "path": "/", "expires": -1, "session": True},
+]
+
+
+class TestSessionSnapshots(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.settings = mock.patch.object(session_snapshots.settings, "BROWSER_SNAPSHOT_DIR", self.tmpdir, create=True)
+        self.settings.start()
+
+    def tearDown(self):
+        self.settings.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_capture_keeps_service_cookies_and_local_storage(self):
+        driver = FakeDriver(cookies=GOOGLE_COOKIES, local_storage={"ui": "compact"})
+        snapshot = capture_snapshot(driver, "gmail")
+        self.assertEqual([c["name"] for c in snapshot["cookies"]], ["SID", "OSID", "old"])
+        self.assertEqual(snapshot["origin"], "https://mail.google.com")
+        self.assertEqual(snapshot["local_storage"], {"ui": "compact"})
+
+    def test_snapshot_file_is_private(self):
+        snapshot = capture_snapshot(FakeDriver(cookies=GOOGLE_COOKIES), "gmail")
+        path = save_snapshot("gmail_profile_user1", snapshot)
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+        self.assertEqual(load_snapshot("gmail_profile_user1", "gmail")["cookies"], snapshot["cookies"])
+        self.assertIsNone(load_snapshot("gmail_profile_user2", "gmail"))
+
+    def test_restore_skips_expired_cookies_and_unknown_fields(self):
+        driver = FakeDriver()
+        snapshot = capture_snapshot(FakeDriver(cookies=GOOGLE_COOKIES), "gmail")
+        self.assertEqual(restore_cookies(driver, snapshot), 2)
+        sid, osid = driver.set_cookies
+        self.assertNotIn("size", sid)
+        self.assertIn("expires", sid)
+        self.assertNotIn("expires", osid)
+
+    def test_local_storage_only_restored_on_its_origin(self):
+        snapshot = capture_snapshot(FakeDriver(local_storage={"ui": "compact", "lang": "en"}), "gmail")
+        other = FakeDriver(url="https://outlook.live.com/mail/")
+        self.assertEqual(restore_local_storage(other, snapshot), 0)
+        same = FakeDriver(local_storage={"lang": "de"})
+        self.assertEqual(restore_local_storage(same, snapshot), 1)
+        self.assertEqual(same.local_storage, {"ui": "compact", "lang": "de"})
+
+    def test_restored_session_skips_login_detection(self):
+        browser_id = "persistent_gmail_profile_test"
+        # Snapshots of persistent browsers are scoped to the owning user
+        set_browser_owner(7, "run-snapshot")
+        self.addCleanup(set_browser_owner, None, None)
+        save_snapshot("gmail_profile_user7", capture_snapshot(FakeDriver(cookies=GOOGLE_COOKIES), "gmail"))
+        driver = FakeDriver(url="about:blank")
+        browsing.browsers[browser_id] = driver
+        browsing.browser_profiles[browser_id] = {"profile_name": "gmail_profile", "services": {}}
+        try:
+            result = browsing.navigate_to_service(browser_id, "gmail")
+            self.assertIn("saved session restored", result)
+            self.assertEqual(len(driver.set_cookies), 2)
+            with mock.patch.object(browsing, "WebDriverWait", side_effect=AssertionError("login detection ran")):
+                status = browsing.check_login_status(browser_id, "gmail")
+            self.assertTrue(status["logged_in"])
+            self.assertTrue(status["cached"])
+
+            # Landing on the login page invalidates the cached state and the snapshot
+            driver.current_url = "https://accounts.google.com/signin"
+            self.assertFalse(browsing.check_login_status(browser_id, "gmail")["logged_in"])
+            self.assertIsNone(load_snapshot("gmail_profile_user7", "gmail"))
+        finally:
+            browsing.browsers.pop(browser_id, None)
+            browsing.browser_profiles.pop(browser_id, None)
+            browsing.service_login_states.clear()
+
+
+if __name__ == "__main__":
+    unittest.main()
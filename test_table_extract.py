@@ -0,0 +1,115 @@
+import io
+import unittest
+from datetime import date
+
+import lxml.html
+
+import table_export
+from page_extract import extract_page
+from table_export import ExportUnavailable, export_table
+from table_extract import convert, infer_column, parse_table
+from test_helpers import temp_task_manager
+
+SALES = """<table><caption>Quarterly sales</caption>
+<thead><tr><th rowspan="2">Region</th><th colspan="2">2024</th><th rowspan="2">Updated</th></tr>
+<tr><th>Q1</th><th>Q2</th></tr></thead>
+<tbody><tr><td>North</td><td>$1,200</td><td>(300)</td><td>05/02/2024</td></tr>
+<tr><td rowspan="2">South</td><td>950.5</td><td>-</td><td>20/03/2024</td></tr>
+<tr><td>1,000</td><td>12</td><td>21/03/2024</td></tr></tbody></table>"""
+
+
+def table(html):
+    return parse_table(lxml.html.fragment_fromstring(html), 1)
+
+
+class TestTableExtract(unittest.TestCase):
+    def test_spans_headers_and_types(self):
+        parsed = table(SALES)
+        self.assertEqual(parsed["caption"], "Quarterly sales")
+        self.assertEqual(parsed["headers"], ["Region", "2024 / Q1", "2024 / Q2", "Updated"])
+        self.assertEqual(parsed["data"][2], ["South", "1,000", "12", "21/03/2024"])
+        self.assertEqual([(c["type"], c.get("format")) for c in parsed["columns"]],
+                         [("string", None), ("number", None), ("integer", None), ("date", "%d/%m/%Y")])
+        self.assertEqual(convert("(300)", parsed["columns"][2]), -300)
+        self.assertEqual(convert("05/02/2024", parsed["columns"][3]), date(2024, 2, 5))
+        self.assertIsNone(convert("-", parsed["columns"][2]))
+
+    def test_header_detection_without_th(self):
+        labelled = table("<table><tr><td>Name</td><td>Born</td></tr><tr><td>Ada</td><td>1815</td></tr></table>")
+        self.assertEqual((labelled["headers"], labelled["data"]), (["Name", "Born"], [["Ada", "1815"]]))
+        numeric = table("<table><tr><td>1</td><td>2</td></tr><tr><td>3</td><td>4</td></tr></table>")
+        self.assertEqual([c["name"] for c in numeric["columns"]], ["column_1", "column_2"])
+        self.assertEqual(numeric["row_count"], 2)
+        nested = table("<table><tr><th>Outer</th></tr><tr><td><table><tr><td>inner</td></tr></table></td></tr></table>")
+        self.assertEqual(nested["row_count"], 1)
+
+    def test_inference(self):
+        self.assertEqual(infer_column(["yes", "No", ""])["type"], "boolean")
+        self.assertEqual(infer_column(["2024-01-05T10:00:00Z", "2024-01-06 11:30"])["type"], "string")
+        self.assertEqual(infer_column(["2024-01-05T10:00:00Z", "2024-01-06T11:30:00+02:00"])["type"], "datetime")
+        self.assertEqual(infer_column(["12%", "7.5%"])["type"], "number")
+        self.assertEqual(infer_column(["12 apples", "3"])["type"], "string")
+
+    def test_leading_zeros_stay_strings(self):
+        column = infer_column(["02134", "10001"])
+        self.assertEqual(column["type"], "string")
+        self.assertEqual(convert("02134", column), "02134")
+        self.assertEqual(infer_column(["0", "0.5", "12"])["type"], "number")
+        self.assertEqual(infer_column(["0", "7"])["type"], "integer")
+
+
+class TestTableExport(unittest.TestCase):
+    def setUp(self):
+        self.manager = temp_task_manager(self)
+        data, statistics = extract_page(f"<html><body><p>Report</p>{SALES}</body></html>", "https://example.com/")
+        self.task_id = self.manager.save_task_result("web_scraping", {"url": "https://example.com/"})
+        self.manager.save_scraping_result(self.task_id, {"url": "https://example.com/", "scrape_type": "all",
+                                                         "data": data, "statistics": statistics})
+
+    def export(self, fmt, batch_rows=2):
+        meta = self.manager.get_scraped_tables(self.task_id)[0]
+        return list(export_table(meta, self.manager.iter_table_rows(self.task_id, 1), fmt, batch_rows=batch_rows))
+
+    def test_tables_are_read_from_storage(self):
+        meta = self.manager.get_scraped_tables(self.task_id)
+        self.assertEqual([(t["table_id"], t["row_count"]) for t in meta], [(1, 3)])
+        self.assertNotIn("data", meta[0])
+        self.assertEqual(len(list(self.manager.iter_table_rows(self.task_id, 1))), 3)
+        self.assertEqual(list(self.manager.iter_table_rows(self.task_id, 2)), [])
+
+    def test_csv_is_typed_and_streamed(self):
+        chunks = self.export("csv")
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(b"".join(chunks).decode().splitlines(), [
+            "Region,2024 / Q1,2024 / Q2,Updated",
+            "North,1200.0,-300,2024-02-05",
+            "South,950.5,,2024-03-20",
+            "South,1000.0,12,2024-03-21",
+        ])
+
+    @unittest.skipUnless(table_export.PYARROW_AVAILABLE, "pyarrow not installed")
+    def test_arrow_and_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        arrow = pa.ipc.open_stream(b"".join(self.export("arrow"))).read_all()
+        self.assertEqual(arrow.schema.types, [pa.string(), pa.float64(), pa.int64(), pa.date32()])
+        self.assertEqual(arrow.column("2024 / Q2").to_pylist(), [-300, None, 12])
+        parquet = pq.ParquetFile(io.BytesIO(b"".join(self.export("parquet"))))
+        self.assertEqual(parquet.metadata.num_row_groups, 2)
+        self.assertEqual(parquet.read().to_pylist(), arrow.to_pylist())
+
+    def test_missing_pyarrow(self):
+        original = table_export.PYARROW_AVAILABLE
+        table_export.PYARROW_AVAILABLE = False
+        try:
+            with self.assertRaises(ExportUnavailable):
+                self.export("parquet")
+            self.assertTrue(self.export("csv"))
+        finally:
+            table_export.PYARROW_AVAILABLE = original
+        with self.assertRaises(ValueError):
+            self.export("xlsx")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,199 @@
+"""
+Semantic chunking of page text for LLM analysis and retrieval.
+
+``html_blocks`` walks the page once and cuts its visible text at block-level
+element boundaries: headings, paragraphs, list items, table rows, ``div``
+and so on. Inline markup stays within its block, and table cells are joined
+with " | ". ``data_blocks`` builds the same kind of list from stored
+``extract_page`` data, for scrapes whose HTML is gone.
+
+``pack_chunks`` packs blocks into chunks of at most ``max_chars`` characters.
+A new chunk is preferred at a heading once the current chunk is half full.
+Each chunk records the heading path it starts under, so a chunk read on its
+own still says where it comes from. A block longer than a chunk is split at
+sentence boundaries, then between words. Chunks carry a hash of their text,
+which callers use as a cache key.
+"""
+
+import hashlib
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List
+
+from lxml import etree
+
+from page_extract import parse_html
+
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "body", "caption", "dd", "details", "dialog", "div", "dl", "dt",
+    "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr",
+    "li", "main", "nav", "ol", "p", "pre", "section", "summary", "table", "tbody", "thead", "tfoot", "tr", "ul",
+    "br",
+}
+HEADING_LEVELS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg", "head"}
+CELL_TAGS = {"td", "th"}
+
+_SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s+")
+
+
+@dataclass
+class TextBlock:
+    text: str
+    heading_level: int = 0  # 1-6 for headings, 0 for body text
+
+
+@dataclass
+class Chunk:
+    index: int
+    text: str
+    headings: List[str] = field(default_factory=list)
+    hash: str = ""
+
+    def as_prompt_text(self) -> str:
+        """Chunk text with its heading path, for prompts that see one chunk at a time."""
+        if not self.headings:
+            return self.text
+        return f"[Section: {' > '.join(self.headings)}]\n{self.text}"
+
+
+def _clean(parts: List[str]) -> str:
+    text = " ".join(" ".join(parts).split())
+    return text.strip(" |")
+
+
+def html_blocks(html: str) -> List[TextBlock]:
+    """Visible text of ``html`` as blocks, in document order."""
+    root = parse_html(html)
+    if root is None:
+        return []
+    blocks: List[TextBlock] = []
+    buffer: List[str] = []
+    skipped = 0
+
+    def flush(level: int = 0):
+        text = _clean(buffer)
+        buffer.clear()
+        if text:
+            blocks.append(TextBlock(text, level))
+
+    for event, el in etree.iterwalk(root, events=("start", "end")):
+        tag = el.tag if isinstance(el.tag, str) else None
+        if event == "start":
+            if tag in SKIPPED_TAGS:
+                skipped += 1
+            if skipped:
+                continue
+            if tag in BLOCK_TAGS:
+                flush()
+            if tag and el.text:
+                buffer.append(el.text)
+        else:
+            if tag in SKIPPED_TAGS:
+                skipped -= 1
+            elif not skipped:
+                if tag in HEADING_LEVELS:
+                    flush(HEADING_LEVELS[tag])
+                elif tag in BLOCK_TAGS:
+                    flush()
+                elif tag in CELL_TAGS:
+                    buffer.append(" | ")
+            if not skipped and el is not root and el.tail:
+                buffer.append(el.tail)
+    flush()
+    return blocks
+
+
+def data_blocks(data: Dict[str, Any]) -> List[TextBlock]:
+    """Blocks from stored ``extract_page`` data: title, headings, paragraphs, lists, tables.
+
+    Stored headings are grouped by level, not in page order, so they become one outline
+    block rather than section boundaries. ``full_text`` is added when paragraphs and
+    lists miss most of it (pages laid out with ``div``s).
+    """
+    text_content = data.get("text_content") or {}
+    blocks = []
+    if text_content.get("title"):
+        blocks.append(TextBlock(text_content["title"], 1))
+    headings = [heading.get("text", "") for heading in text_content.get("headings", []) if heading.get("text")]
+    if headings:
+        blocks.append(TextBlock("Headings: " + "; ".join(headings)))
+    blocks.extend(TextBlock(paragraph) for paragraph in text_content.get("paragraphs", []))
+    for item_list in text_content.get("lists", []):
+        blocks.extend(TextBlock(f"- {item}") for item in item_list.get("items", []))
+    full_text = text_content.get("full_text") or ""
+    if len(full_text) > 2 * total_chars(blocks):
+        blocks.append(TextBlock(full_text))
+    for table in data.get("tables", []):
+        if table.get("caption"):
+            blocks.append(TextBlock(table["caption"], 2))
+        if any(table.get("headers", [])):
+            blocks.append(TextBlock(" | ".join(table["headers"])))
+        blocks.extend(TextBlock(" | ".join(row)) for row in table.get("data", []))
+    return [block for block in blocks if block.text.strip()]
+
+
+def _split_long(text: str, max_chars: int) -> List[str]:
+    pieces, current = [], ""
+    for sentence in _SENTENCE_END.split(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def pack_chunks(blocks: Iterable[TextBlock], max_chars: int) -> List[Chunk]:
+    """Pack ``blocks`` into chunks of at most ``max_chars`` characters (see module docstring)."""
+    max_chars = max(200, int(max_chars))
+    chunks: List[Chunk] = []
+    path: Dict[int, str] = {}
+    lines: List[str] = []
+    size = 0
+    start_path: List[str] = []
+
+    def close():
+        nonlocal lines, size
+        if lines:
+            text = "\n".join(lines)
+            chunks.append(Chunk(len(chunks), text, start_path, chunk_hash(text)))
+        lines, size = [], 0
+
+    for block in blocks:
+        if block.heading_level:
+            if size >= max_chars // 2:
+                close()
+            path = {level: text for level, text in path.items() if level < block.heading_level}
+            line = f"{'#' * block.heading_level} {block.text}"
+        else:
+            line = block.text
+        for piece in (_split_long(line, max_chars) if len(line) > max_chars else [line]):
+            if lines and size + len(piece) + 1 > max_chars:
+                close()
+            if not lines:
+                start_path = [path[level] for level in sorted(path)]
+            lines.append(piece)
+            size += len(piece) + 1
+        if block.heading_level:
+            path[block.heading_level] = block.text
+    close()
+    return chunks
+
+
+def total_chars(blocks: Iterable[TextBlock]) -> int:
+    return sum(len(block.text) + 1 for block in blocks)
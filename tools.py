@@ -4,11 +4,16 @@ from cloud_handlers import handle_clouds
 import requests
 import os
 import json
+import logging
 import time
 from gemini import generate_text as gemini_generate
 from cryptography.fernet import Fernet
 import pickle
 from code_editor import code_editor
+import cdp_browser
+from dom_snapshot import classify_field, find_links, take_dom_snapshot
+from dom_snapshot import find_submit_button as dom_find_submit_button
+from page_content import resolve_mode
 
 # Import core modules for memory optimization
 from core.config import settings
@@ -117,13 +122,21 @@ def check_checkbox(browser_id: str, selector: str, check: bool = True) -> str:
 # Use dynamic typing to avoid import issues with WebDriver
 browsers = shared_browsers
 
-def open_browser(url: str) -> str:
-    """Opens a new browser window and navigates to the URL."""
-    return browsing_open_browser(url)
+def open_browser(url: str, profile: str = None) -> str:
+    """Opens a new browser window and navigates to the URL.
 
-def get_page_content(browser_id: str) -> str:
-    """Gets the HTML content of the current page."""
-    return browsing_get_page_content(browser_id)
+    ``profile`` selects a network profile: 'scrape-fast', 'interactive' or 'full'.
+    """
+    return browsing_open_browser(url, profile=profile)
+
+def get_page_content(browser_id: str, mode: str = None, max_chars: int = None) -> str:
+    """Gets the content of the current page.
+
+    ``mode`` is 'text' (readable text), 'outline' (headings, forms, fields and buttons with
+    selectors), 'links' or 'html'. It defaults to AGENT_PAGE_CONTENT_MODE; compact modes are
+    capped at PAGE_CONTENT_MAX_CHARS unless ``max_chars`` is given.
+    """
+    return browsing_get_page_content(browser_id, mode=resolve_mode(mode), max_chars=max_chars)
 
 def fill_form(browser_id: str, selector: str, value: str, wait_timeout: int = 15) -> str:
     """Enhanced form filling with multiple selector strategies and robust waiting."""
@@ -403,7 +416,7 @@ def search_amazon_products(query: str, max_results: int = 10) -> str:
         
         # Get results
         time.sleep(1.5)  # Reduced from 3
-        content = get_page_content(browser_id)
+        content = get_page_content(browser_id, mode="text")
         
         # Extract product information (simplified)
         products = []
@@ -434,7 +447,7 @@ def search_ebay_products(query: str, max_results: int = 10) -> str:
         
         # Get results
         time.sleep(1.5)  # Reduced from 3
-        content = get_page_content(browser_id)
+        content = get_page_content(browser_id, mode="text")
         
         # Extract product information (simplified)
         products = []
@@ -659,10 +672,37 @@ def refactor_code(file_path: str, refactor_type: str, target: str = None) -> str
 
 # --- Tool Registry ---
 class Tool:
-    def __init__(self, name: str, description: str, func: Callable):
+    def __init__(self, name: str, description: str, func: Callable, category: str = "network",
+                 async_func: Callable = None, opens_browser: bool = False):
         self.name = name
         self.description = description
         self.func = func
+        # Executor category ('browser', 'network' or 'cpu') used when the tool
+        # is run from an async handler; see core.executors.
+        self.category = category
+        # Native coroutine implementation, awaited instead of running func in a thread
+        self.async_func = async_func
+        # Waits for a browser session slot on the event loop before taking a 'browser' thread
+        self.opens_browser = opens_browser
+
+    async def ainvoke(self, **params) -> Any:
+        """Run the tool from async code.
+
+        The coroutine implementation is cancellable (e.g. by asyncio.wait_for);
+        the blocking one keeps running in its executor thread after a timeout.
+        """
+        if self.async_func is not None:
+            return await self.async_func(**params)
+        browser_id = params.get("browser_id")
+        if browser_id and browser_id in cdp_browser.pages:
+            return f"Tool '{self.name}' is not supported for browser '{browser_id}' on the CDP backend."
+        from core.executors import run_in_category
+        if self.opens_browser:
+            import browsing
+            if not browsing.client_enabled():
+                async with browsing.session_manager.slot_reserved_ahead():
+                    return await run_in_category(self.category, self.func, **params)
+        return await run_in_category(self.category, self.func, **params)
 
 class ToolRegistry:
     def __init__(self):
@@ -680,41 +720,51 @@ class ToolRegistry:
 # Initialize tool registry
 tool_registry = ToolRegistry()
 
+# Browser tools use the async CDP implementations when BROWSER_BACKEND=cdp
+_async_browser_tools = cdp_browser.ASYNC_TOOLS if cdp_browser.is_enabled() else {}
+
 # Register all tools
 tool_registry.register(Tool("search_web", "Search the web using DuckDuckGo or Google", search_web))
-tool_registry.register(Tool("open_browser", "Open a browser window and navigate to a URL", open_browser))
-tool_registry.register(Tool("get_page_content", "Get the HTML content of the current page", get_page_content))
-tool_registry.register(Tool("fill_form", "Fill a single form field using CSS selector", fill_form))
-tool_registry.register(Tool("fill_multiple_fields", "Fill multiple form fields with enhanced retry logic", fill_multiple_fields))
-tool_registry.register(Tool("click_button", "Click a button using CSS selector", click_button))
-tool_registry.register(Tool("close_browser", "Close a browser window", close_browser))
-tool_registry.register(Tool("search_amazon_products", "Search for products on Amazon", search_amazon_products))
-tool_registry.register(Tool("search_ebay_products", "Search for products on eBay", search_ebay_products))
-tool_registry.register(Tool("read_file", "Read content from a file", read_file))
-tool_registry.register(Tool("write_file", "Write content to a file", write_file))
+tool_registry.register(Tool("open_browser", "Open a browser window and navigate to a URL", open_browser, category="browser",
+                            async_func=_async_browser_tools.get("open_browser"), opens_browser=True))
+tool_registry.register(Tool("get_page_content", "Get the current page as readable text (mode='text', default), an outline of headings, forms and buttons with selectors (mode='outline'), its links (mode='links') or full HTML (mode='html')", get_page_content, category="browser",
+                            async_func=_async_browser_tools.get("get_page_content")))
+tool_registry.register(Tool("fill_form", "Fill a single form field using CSS selector", fill_form, category="browser",
+                            async_func=_async_browser_tools.get("fill_form")))
+tool_registry.register(Tool("fill_multiple_fields", "Fill multiple form fields with enhanced retry logic", fill_multiple_fields, category="browser"))
+tool_registry.register(Tool("click_button", "Click a button using CSS selector", click_button, category="browser",
+                            async_func=_async_browser_tools.get("click_button")))
+tool_registry.register(Tool("close_browser", "Close a browser window", close_browser, category="browser",
+                            async_func=_async_browser_tools.get("close_browser")))
+tool_registry.register(Tool("search_amazon_products", "Search for products on Amazon", search_amazon_products, category="browser"))
+tool_registry.register(Tool("search_ebay_products", "Search for products on eBay", search_ebay_products, category="browser"))
+tool_registry.register(Tool("read_file", "Read content from a file", read_file, category="cpu"))
+tool_registry.register(Tool("write_file", "Write content to a file", write_file, category="cpu"))
 tool_registry.register(Tool("cloud_operation", "Execute cloud operations", cloud_operation))
-tool_registry.register(Tool("finish_task", "Mark task as completed", finish_task))
+tool_registry.register(Tool("finish_task", "Mark task as completed", finish_task, category="cpu"))
 tool_registry.register(Tool("send_email", "Send an email", send_email))
 tool_registry.register(Tool("post_to_twitter", "Post content to Twitter", post_to_twitter))
 
 # Register additional browser interaction tools
-tool_registry.register(Tool("submit_form", "Submit a form by pressing Enter on an element", submit_form))
-tool_registry.register(Tool("wait_for_element", "Wait until an element is present on the page", wait_for_element))
-tool_registry.register(Tool("select_dropdown_option", "Select an option from a dropdown by visible text", select_dropdown_option))
-tool_registry.register(Tool("upload_file", "Upload a file using a file input element", upload_file))
-tool_registry.register(Tool("check_checkbox", "Check or uncheck a checkbox element", check_checkbox))
+tool_registry.register(Tool("submit_form", "Submit a form by pressing Enter on an element", submit_form, category="browser",
+                            async_func=_async_browser_tools.get("submit_form")))
+tool_registry.register(Tool("wait_for_element", "Wait until an element is present on the page", wait_for_element, category="browser",
+                            async_func=_async_browser_tools.get("wait_for_element")))
+tool_registry.register(Tool("select_dropdown_option", "Select an option from a dropdown by visible text", select_dropdown_option, category="browser"))
+tool_registry.register(Tool("upload_file", "Upload a file using a file input element", upload_file, category="browser"))
+tool_registry.register(Tool("check_checkbox", "Check or uncheck a checkbox element", check_checkbox, category="browser"))
 
 # Register code editing tools
 tool_registry.register(Tool("clone_repository", "Clone a Git repository to local path", clone_repository))
 tool_registry.register(Tool("pull_repository", "Pull latest changes from remote repository", pull_repository))
-tool_registry.register(Tool("analyze_repository_structure", "Analyze repository structure and provide overview", analyze_repository_structure))
-tool_registry.register(Tool("analyze_code_file", "Analyze a single code file for structure and complexity", analyze_code_file))
-tool_registry.register(Tool("search_code_patterns", "Search for code patterns across repository", search_code_patterns))
+tool_registry.register(Tool("analyze_repository_structure", "Analyze repository structure and provide overview", analyze_repository_structure, category="cpu"))
+tool_registry.register(Tool("analyze_code_file", "Analyze a single code file for structure and complexity", analyze_code_file, category="cpu"))
+tool_registry.register(Tool("search_code_patterns", "Search for code patterns across repository", search_code_patterns, category="cpu"))
 tool_registry.register(Tool("create_implementation_plan", "Create an implementation plan for a new feature", create_implementation_plan))
-tool_registry.register(Tool("apply_code_changes", "Apply a series of code changes to a file", apply_code_changes))
-tool_registry.register(Tool("run_tests", "Run tests in the repository", run_tests))
-tool_registry.register(Tool("create_new_file", "Create a new code file with proper structure", create_new_file))
-tool_registry.register(Tool("refactor_code", "Refactor code in a file", refactor_code))
+tool_registry.register(Tool("apply_code_changes", "Apply a series of code changes to a file", apply_code_changes, category="cpu"))
+tool_registry.register(Tool("run_tests", "Run tests in the repository", run_tests, category="cpu"))
+tool_registry.register(Tool("create_new_file", "Create a new code file with proper structure", create_new_file, category="cpu"))
+tool_registry.register(Tool("refactor_code", "Refactor code in a file", refactor_code, category="cpu"))
 
 # Universal Account Creation Tool
 def create_account_universal(website_url: str = None, account_data: dict = None, browser_id: str = None) -> str:
@@ -732,7 +782,6 @@ def create_account_universal(website_url: str = None, account_data: dict = None,
     import time
     import random
     import string
-    from selenium.webdriver.common.by import By
     from selenium.webdriver.support.ui import WebDriverWait
     from selenium.webdriver.support import expected_conditions as EC
     from selenium.common.exceptions import TimeoutException, NoSuchElementException
@@ -762,86 +811,17 @@ def create_account_universal(website_url: str = None, account_data: dict = None,
         }
     
     def detect_form_fields(browser_id):
-        """Intelligently detect registration form fields"""
+        """Detect registration form fields from a single DOM snapshot"""
         try:
             from browsing import browsers
             driver = browsers.get(browser_id)
             if not driver:
                 return []
-            
-            # Common selectors for registration forms
-            field_selectors = [
-                # Email fields
-                "input[type='email']",
-                "input[name*='email']", "input[id*='email']", "input[placeholder*='email']",
-                # Username fields
-                "input[name*='username']", "input[id*='username']", "input[placeholder*='username']",
-                "input[name*='user']", "input[id*='user']",
-                # Password fields
-                "input[type='password']",
-                "input[name*='password']", "input[id*='password']",
-                # Name fields
-                "input[name*='first']", "input[id*='first']", "input[placeholder*='first']",
-                "input[name*='last']", "input[id*='last']", "input[placeholder*='last']",
-                "input[name*='name']", "input[id*='name']", "input[placeholder*='name']",
-                # Phone fields
-                "input[type='tel']", "input[name*='phone']", "input[id*='phone']",
-                # Generic text inputs
-                "input[type='text']"
-            ]
-            
-            detected_fields = []
-            for selector in field_selectors:
-                try:
-                    elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                    for element in elements:
-                        if element.is_displayed() and element.is_enabled():
-                            field_info = {
-                                'element': element,
-                                'selector': selector,
-                                'name': element.get_attribute('name') or '',
-                                'id': element.get_attribute('id') or '',
-                                'placeholder': element.get_attribute('placeholder') or '',
-                                'type': element.get_attribute('type') or 'text'
-                            }
-                            detected_fields.append(field_info)
-                except:
-                    continue
-            
-            return detected_fields
-        except:
+            return take_dom_snapshot(driver).inputs()
+        except Exception as e:
+            logging.warning(f"Form field detection failed for {browser_id}: {e}")
             return []
     
-    def classify_field(field_info):
-        """Classify what type of data a field expects"""
-        text = f"{field_info['name']} {field_info['id']} {field_info['placeholder']}".lower()
-        
-        if 'email' in text:
-            return 'email'
-        elif 'password' in text:
-            if 'confirm' in text or 'repeat' in text or 'again' in text:
-                return 'password_confirm'
-            return 'password'
-        elif 'username' in text or 'user' in text:
-            return 'username'
-        elif 'first' in text and 'name' in text:
-            return 'first_name'
-        elif 'last' in text and 'name' in text:
-            return 'last_name'
-        elif 'name' in text and 'first' not in text and 'last' not in text:
-            return 'full_name'
-        elif 'phone' in text or field_info['type'] == 'tel':
-            return 'phone'
-        elif 'birth' in text or 'age' in text:
-            if 'year' in text:
-                return 'birth_year'
-            elif 'month' in text:
-                return 'birth_month'
-            elif 'day' in text:
-                return 'birth_day'
-        
-        return 'unknown'
-    
     def find_submit_button(browser_id):
         """Find the registration/signup submit button"""
         try:
@@ -849,39 +829,10 @@ def create_account_universal(website_url: str = None, account_data: dict = None,
             driver = browsers.get(browser_id)
             if not driver:
                 return None
-            
-            button_selectors = [
-                "button[type='submit']",
-                "input[type='submit']",
-                "button:contains('Sign Up')",
-                "button:contains('Register')",
-                "button:contains('Create Account')",
-                "button:contains('Join')",
-                "*[class*='signup']",
-                "*[class*='register']",
-                "*[id*='signup']",
-                "*[id*='register']"
-            ]
-            
-            for selector in button_selectors:
-                try:
-                    if ':contains(' in selector:
-                        # Handle text-based selectors differently
-                        buttons = driver.find_elements(By.TAG_NAME, "button")
-                        for button in buttons:
-                            if any(text in button.text.lower() for text in ['sign up', 'register', 'create account', 'join']):
-                                if button.is_displayed() and button.is_enabled():
-                                    return button
-                    else:
-                        elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                        for element in elements:
-                            if element.is_displayed() and element.is_enabled():
-                                return element
-                except:
-                    continue
-            
-            return None
-        except:
+            button = dom_find_submit_button(take_dom_snapshot(driver))
+            return button.element if button else None
+        except Exception as e:
+            logging.warning(f"Submit button detection failed for {browser_id}: {e}")
             return None
     
     try:
@@ -915,16 +866,10 @@ def create_account_universal(website_url: str = None, account_data: dict = None,
             from browsing import browsers
             driver = browsers.get(browser_id)
             if driver:
-                signup_links = driver.find_elements(By.PARTIAL_LINK_TEXT, "Sign Up")
-                signup_links.extend(driver.find_elements(By.PARTIAL_LINK_TEXT, "Register"))
-                signup_links.extend(driver.find_elements(By.PARTIAL_LINK_TEXT, "Join"))
-                signup_links.extend(driver.find_elements(By.PARTIAL_LINK_TEXT, "Create Account"))
-                
-                for link in signup_links:
-                    if link.is_displayed():
-                        link.click()
-                        time.sleep(2)
-                        break
+                signup_links = find_links(take_dom_snapshot(driver), ["Sign Up", "Register", "Join", "Create Account"])
+                if signup_links:
+                    signup_links[0].element.click()
+                    time.sleep(2)
         except:
             pass
         
@@ -975,8 +920,8 @@ def create_account_universal(website_url: str = None, account_data: dict = None,
             
             if value:
                 try:
-                    field['element'].clear()
-                    field['element'].send_keys(value)
+                    field.element.clear()
+                    field.element.send_keys(value)
                     filled_fields.append(f"{field_type}: {value}")
                     time.sleep(0.5)
                 except:
@@ -991,7 +936,7 @@ def create_account_universal(website_url: str = None, account_data: dict = None,
                 
                 # Check for success indicators
                 success_indicators = ['welcome', 'success', 'created', 'registered', 'confirmation']
-                page_content = get_page_content(browser_id).lower()
+                page_content = get_page_content(browser_id, mode="text").lower()
                 
                 success = any(indicator in page_content for indicator in success_indicators)
                 
@@ -1105,7 +1050,7 @@ def create_tempmail_account(browser_id: str = None) -> str:
             time.sleep(3)
             
             # Get page content
-            content_result = get_page_content(browser_id)
+            content_result = get_page_content(browser_id, mode="html")
             
             if content_result:
                 # Extract emails from content
@@ -1313,7 +1258,7 @@ def create_account_smart(website_name: str = None, use_tempmail: bool = True, br
 # Import scraping function
 from scraping_analysis import scrape_website_comprehensive
 
-tool_registry.register(Tool("create_account_universal", "Create an account on any website automatically with intelligent form detection", create_account_universal))
-tool_registry.register(Tool("create_tempmail_account", "Create a temporary email account automatically", create_tempmail_account))
-tool_registry.register(Tool("create_account_smart", "Create accounts on popular websites (Gmail, GitHub, Discord, Reddit, etc.) with intelligent automation and complete credentials", create_account_smart))
-tool_registry.register(Tool("scrape_website_comprehensive", "Comprehensively scrape any website with intelligent data extraction (text, links, images, tables, forms, structured data)", scrape_website_comprehensive))
+tool_registry.register(Tool("create_account_universal", "Create an account on any website automatically with intelligent form detection", create_account_universal, category="browser"))
+tool_registry.register(Tool("create_tempmail_account", "Create a temporary email account automatically", create_tempmail_account, category="browser"))
+tool_registry.register(Tool("create_account_smart", "Create accounts on popular websites (Gmail, GitHub, Discord, Reddit, etc.) with intelligent automation and complete credentials", create_account_smart, category="browser"))
+tool_registry.register(Tool("scrape_website_comprehensive", "Comprehensively scrape any website with intelligent data extraction (text, links, images, tables, forms, structured data)", scrape_website_comprehensive, category="browser"))
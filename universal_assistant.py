@@ -9,6 +9,7 @@ from knowledge_base import KnowledgeBase
 from tool_manager import ToolManager
 from evaluation import evaluate_plan_execution
 from gemini import generate_text
+from question_router import question_router
 import logging
 # from self_learning import learn_from_execution
 
@@ -18,8 +19,8 @@ MAX_ITERATIONS = 10
 
 def classify_question_type(question: str) -> str:
     """
-    Classify if a question is general knowledge or requires specific tools/browser actions.
-    Returns 'general' for general questions, 'task' for tasks requiring tools.
+    LLM fallback for the question router.
+    Returns 'general' for general questions, 'task' for tasks requiring tools, None if unclear.
     """
     classification_prompt = f"""
     Classify the following user input as either 'general' or 'task':
@@ -48,11 +49,11 @@ def classify_question_type(question: str) -> str:
         elif 'task' in response:
             return 'task'
         else:
-            # Default to task if classification is unclear
-            return 'task'
+            # Let the router use its local guess if classification is unclear
+            return None
     except Exception as e:
-        logging.warning(f"Question classification failed: {e}, defaulting to task")
-        return 'task'
+        logging.warning(f"Question classification failed: {e}, using local router guess")
+        return None
 
 def answer_general_question(question: str, context: str = "") -> str:
     """
@@ -90,7 +91,9 @@ def handle_prompt(request: PromptRequest, db: Session = Depends(get_db)):
     """Handles a user prompt by generating a plan and executing it with self-correction."""
     try:
         # First, classify if this is a general question or requires tools
-        question_type = classify_question_type(request.prompt)
+        route = question_router.classify(request.prompt, classify_question_type, labels=('general', 'task'))
+        question_type = route.label
+        logging.info(f"Routed prompt as {question_type} (confidence={route.confidence}, via {route.source})")
 
         if question_type == 'general':
             # Handle as general question using Gemini
@@ -5,6 +5,7 @@ from typing import List, Dict, Any, Optional
 import logging
 from core.config import settings
 from core.circuit_breaker import circuit_breaker, CircuitBreakerConfig
+from core.http_cache import http_session
 from core.structured_logging import structured_logger, LogContext, operation_context
 
 # Configure logging
@@ -71,7 +72,7 @@ def search(query: str, max_retries: int = 3, fallback_engines: bool = True) -> s
                 structured_logger.log_retry_attempt('web_search', attempt, f'Searching with {engine_name}', context)
                 
                 network_timeout = getattr(settings, 'NETWORK_TIMEOUT', 10)
-                response = requests.get(
+                response = http_session().get(
                     f"{base_url}{query}", 
                     headers=headers,
                     timeout=network_timeout